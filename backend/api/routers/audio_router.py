@@ -1,39 +1,133 @@
 import asyncio
+import math
+from typing import Optional
 from fastapi import APIRouter, Request, HTTPException
 from fastapi.responses import JSONResponse, StreamingResponse
 
 from backend.api.schemas.audio_schemas import ToggleLikeRequest
 
-from backend.core.audio.stream import stream_audio
-from backend.core.lib.utils import is_downloaded
+from backend.core.audio.file_index import FileIndex
+from backend.core.audio.growing import GrowingFiles
+from backend.core.audio.seek_index import SeekIndex, SeekIndexer
+from backend.core.audio.stream import stream_audio, stream_audio_tier, stream_growing
 
 from backend.core.models.download_job import DownloadJob
 import backend.globals as G
 
-from backend.core.database.audio_database import AudioDatabase
+from backend.core.database.storage import AudioStorage
 
 
 router = APIRouter(prefix="/audio")
 
 
 @router.get("/stream/{id}")
-async def get_audio_stream(id: str, req: Request, full: bool = False):
+async def get_audio_stream(id: str, req: Request, full: bool = False, quality: Optional[str] = None, t: Optional[float] = None):
     """
-    Streams the requested track.
+    Streams the requested track, see stream_audio for ranges and conditional requests.
+    `quality` picks a lower bitrate tier ("low", "medium", "auto"), see stream_audio_tier.
+    `t` seeks to a time in seconds: the stored mp3 is sent from the frame at or before
+    it (quality is ignored), with that frame's time in X-Seek-Time.
+    A track that isn't downloaded yet is queued and answered with a 503. With
+    G.DOWNLOAD_PROGRESSIVE it is instead served while it downloads once the download
+    starts (see stream_growing), 503 if that doesn't happen in time.
     """
     job = DownloadJob(id=id) #add an ensure_fetched field so it fetches if it required a download
 
     queue_manager = req.app.state.queue_manager
-    db: AudioDatabase = req.app.state.db
+    file_index: FileIndex = req.app.state.file_index
 
     download_queue = queue_manager.get(G.DOWNLOAD_QUEUE_NAME)
 
-    if not await db.is_downloaded(id):
-        if not download_queue.contains(job):
-            await download_queue.push(job)
-        
-        raise HTTPException(status_code=503, detail="Track is downloading, try again shortly")
-    return stream_audio(req=req, track_or_id=id, full=full)
+    if not file_index.is_downloaded(id):
+        growing_files: GrowingFiles = req.app.state.growing_files
+        growing = growing_files.get(id)
+        if growing is None:
+            await download_queue.enqueue(job)
+            if G.DOWNLOAD_PROGRESSIVE:
+                growing = await growing_files.wait_started(id, timeout=G.PROGRESSIVE_START_TIMEOUT_S)
+
+        if growing is None:
+            raise HTTPException(status_code=503, detail="Track is downloading, try again shortly")
+        return stream_growing(growing)
+
+    if t is not None:
+        time, offset = (await _seek_index(req, id, t)).lookup(t)
+        response = stream_audio(
+            req=req,
+            track_or_id=id,
+            full=False,
+            file_index=req.app.state.file_index,
+            head_cache=req.app.state.head_cache,
+            start_at=offset
+        )
+        response.headers["X-Seek-Time"] = f"{time:.3f}"
+        return response
+
+    return await stream_audio_tier(
+        req,
+        id,
+        quality,
+        full=full,
+        transcoder=req.app.state.transcoder,
+        throughput=req.app.state.throughput,
+        file_index=req.app.state.file_index,
+        head_cache=req.app.state.head_cache
+    )
+
+
+@router.get("/await/{id}")
+async def await_download(id: str, req: Request, timeout: float = G.DOWNLOAD_AWAIT_TIMEOUT_S):
+    """
+    Long poll for a track's download: queues it if needed and answers once it's in
+    the library, instead of the client retrying /stream until the 503s stop.
+    Requests for the same track share one download.
+
+    Returns:
+        JSONResponse: 200 with the track when it's downloaded, 202 if it still isn't
+            after `timeout` seconds (capped at G.DOWNLOAD_AWAIT_MAX_S), ask again.
+
+    Raises:
+        HTTPException: 502 if the download failed.
+    """
+    if req.app.state.file_index.is_downloaded(id):
+        return JSONResponse(content={"id": id, "status": "downloaded"}, status_code=200)
+
+    download_queue = req.app.state.queue_manager.get(G.DOWNLOAD_QUEUE_NAME)
+    job = await download_queue.enqueue(DownloadJob(id=id))
+
+    try:
+        track = await job.wait(timeout=min(max(timeout, 0), G.DOWNLOAD_AWAIT_MAX_S))
+    except asyncio.TimeoutError:
+        return JSONResponse(content={"id": id, "status": "pending"}, status_code=202)
+    except Exception as e:
+        raise HTTPException(status_code=502, detail=f"Download failed: {e}")
+
+    if track is None:
+        raise HTTPException(status_code=502, detail="Download failed: nothing was found")
+    return JSONResponse(content={"id": id, "status": "downloaded", "track": track.to_json()}, status_code=200)
+
+
+async def _seek_index(req: Request, id: str, t: float) -> SeekIndex:
+    #nan and inf parse as floats, the index can't place them
+    if not math.isfinite(t) or t < 0:
+        raise HTTPException(status_code=400, detail="t must be a finite number >= 0")
+
+    seek_indexer: SeekIndexer = req.app.state.seek_indexer
+    index = await seek_indexer.get(id)
+    if index is None:
+        raise HTTPException(status_code=422, detail="Time seeking needs a downloaded mp3")
+    return index
+
+
+@router.get("/seek/{id}")
+async def get_seek_offset(id: str, t: float, req: Request):
+    """
+    Byte offset of the mp3 frame at or before `t` seconds, for clients that issue the
+    Range request themselves. Also returns the exact duration from the frame count.
+    """
+    index = await _seek_index(req, id, t) #one index for the offset and the duration, a re-download may replace it
+    time, offset = index.lookup(t)
+    return JSONResponse(content={"id": id, "time": time, "offset": offset, "duration": index.duration_ms / 1000}, status_code=200)
 
 
 @router.post("/toggle_like")
@@ -43,7 +137,7 @@ async def toggle_track_like(body: ToggleLikeRequest, req: Request):
     """
     id = body.id
     
-    db: AudioDatabase = req.app.state.db
+    db: AudioStorage = req.app.state.db
 
     await db.toggle_like(id)
 
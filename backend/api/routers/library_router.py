@@ -0,0 +1,34 @@
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import JSONResponse
+
+from backend.core.database.storage import AudioStorage
+
+import backend.globals as G
+
+
+
+router = APIRouter(prefix="/library")
+
+
+
+@router.get("/changes")
+async def get_changes(
+    req: Request,
+    since: int = Query(0, ge=0),
+    limit: int = Query(G.CHANGES_PAGE_LIMIT, ge=1, le=G.PAGE_LIMIT_MAX)
+):
+    """
+    Delta sync of the library (downloads, likes, playlists and their tracks).
+
+    Pass the `seq` of the previous response as `since` to get only what changed
+    after it, repeating while `more` is true. With `reset` the log no longer
+    reaches back to `since`: remember `latest`, re-fetch /playlists/downloads,
+    /playlists/ and /playlists/likes in full, then sync from `latest`.
+
+    Returns:
+        JSONResponse: {"seq", "latest", "reset", "more", "changes": [{"seq", "entity", "key", "op", "data"}]}.
+    """
+    db: AudioStorage = req.app.state.db
+    content = await db.get_changes(since=since, limit=limit)
+
+    return JSONResponse(content={"content": content}, status_code=200)
@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Query, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from backend.core.lib.metrics import MetricsRegistry
+
+
+
+router = APIRouter(prefix="/metrics")
+
+
+
+@router.get("/")
+async def get_metrics(req: Request, format: str = Query("json", pattern="^(json|prometheus)$")):
+    """
+    In-process counters and histograms, e.g. database query timing, queue wait and rows.
+
+    Compare db_queue_wait_seconds and db_query_seconds against request latency to
+    tell whether the database or the network is the bottleneck.
+
+    Returns:
+        JSONResponse: A snapshot of every metric, or the prometheus text format with `format=prometheus`.
+    """
+    metrics: MetricsRegistry = req.app.state.metrics
+
+    if format == "prometheus":
+        return PlainTextResponse(metrics.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+    return JSONResponse(content={"content": metrics.snapshot()}, status_code=200)
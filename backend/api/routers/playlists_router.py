@@ -4,10 +4,11 @@ from fastapi import APIRouter, Query, Request, HTTPException, Response
 from fastapi.responses import JSONResponse
 
 
-from backend.api.schemas.playlist_schemas import CreatePlaylistRequest, DeletePlaylistRequest, DeleteTrackRequest, EditPlaylistRequest, EditTrackRequest
-from backend.core.database.audio_database import AudioDatabase
+from backend.api.schemas.playlist_schemas import CreatePlaylistRequest, DeletePlaylistRequest, DeleteTrackRequest, EditPlaylistRequest, EditTrackRequest, MoveTrackRequest, ReorderPlaylistRequest
+from backend.core.database.storage import AudioStorage
 from backend.core.models.download_job import DownloadJob
 from backend.core.playlists.manager import PlaylistExtractorManager
+from backend.exceptions import InvalidCursorError, PlaylistOrderError
 
 import backend.globals as G
 
@@ -25,7 +26,7 @@ async def get_playlists(req: Request):
     Returns:
         JSONResponse: Playlist names and ids.
     """
-    db: AudioDatabase = req.app.state.db
+    db: AudioStorage = req.app.state.db
     content = await db.get_all_playlists()
 
     print("GET PLAYLISTS CONTENT:", content)
@@ -34,38 +35,64 @@ async def get_playlists(req: Request):
 
 
 @router.get("/content")
-async def get_playlist_content(req: Request, id: Optional[int] = Query(None)):
+async def get_playlist_content(
+    req: Request, 
+    id: Optional[int] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=G.PAGE_LIMIT_MAX),
+    cursor: Optional[str] = Query(None)
+):
     """
     Fetches track ids for the corresponding playlist
 
+    Pass `limit` to page through large playlists, then feed `next_cursor` back as
+    `cursor` until it comes back null. Without `limit` the whole playlist is returned.
+
     Returns:
         JSONResponse: A list of matching track ids from the local SQLite database.
     """
-    db: AudioDatabase = req.app.state.db
-    content = await db.get_playlist_content(id)
+    db: AudioStorage = req.app.state.db
 
-    print("ID:", id, "CONTENT:", content)
+    if limit is None:
+        content = await db.get_playlist_content(id)
+        print("ID:", id, "CONTENT:", content)
+        return JSONResponse(content={"content": content}, status_code=200)
 
-    return JSONResponse(content={"content": content}, status_code=200)
+    try:
+        content, next_cursor = await db.get_playlist_content_page(id, limit=limit, cursor=cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return JSONResponse(content={"content": content, "next_cursor": next_cursor}, status_code=200)
 
 
 @router.get("/downloads")
-async def get_downloads_content(req: Request):
+async def get_downloads_content(
+    req: Request,
+    limit: Optional[int] = Query(None, ge=1, le=G.PAGE_LIMIT_MAX),
+    cursor: Optional[str] = Query(None)
+):
     """
     Fetch all currently downloaded track IDs.
 
     This endpoint retrieves the list of downloaded track IDs from the local
-    SQLite database, ordered by their download time.
+    SQLite database, ordered by their download time. Pass `limit` (and then the
+    returned `next_cursor` as `cursor`) to fetch it page by page.
 
     Returns:
         JSONResponse: An object containing a list of downloaded track IDs.
     """
-    db: AudioDatabase = req.app.state.db
-    content = await db.get_downloads_content()
+    db: AudioStorage = req.app.state.db
 
-    print("DOWNLOADS CONTENT:", content)
+    if limit is None:
+        content = await db.get_downloads_content()
+        return JSONResponse(content={"content": content}, status_code=200)
 
-    return JSONResponse(content={"content": content}, status_code=200)
+    try:
+        content, next_cursor = await db.get_downloads_page(limit=limit, cursor=cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return JSONResponse(content={"content": content, "next_cursor": next_cursor}, status_code=200)
 
 
 @router.post("/create")
@@ -92,7 +119,7 @@ async def create_playlist(body: CreatePlaylistRequest, req: Request) -> Response
     if not name:
         raise HTTPException(status_code=400, detail="Playlist name cannot be empty")
 
-    db: AudioDatabase = req.app.state.db
+    db: AudioStorage = req.app.state.db
     playlist_ext_manager: PlaylistExtractorManager = req.app.state.playlist_ext_manager
 
     queue_manager = req.app.state.queue_manager
@@ -150,7 +177,7 @@ async def edit_playlist(body: EditPlaylistRequest, req: Request) -> Response:
     if not name:
         raise HTTPException(status_code=400, detail="Playlist name cannot be empty")
 
-    db: AudioDatabase = req.app.state.db
+    db: AudioStorage = req.app.state.db
 
     try:
         #edit database name
@@ -178,7 +205,7 @@ async def delete_playlist(body: DeletePlaylistRequest, req: Request) -> Response
     """
     id = body.id
 
-    db: AudioDatabase = req.app.state.db
+    db: AudioStorage = req.app.state.db
 
     await db.delete_playlist(id)
 
@@ -187,6 +214,58 @@ async def delete_playlist(body: DeletePlaylistRequest, req: Request) -> Response
 
 
 
+@router.post("/move-track")
+async def move_track(body: MoveTrackRequest, req: Request) -> Response:
+    """
+    Moves a track within a playlist to right after another track
+
+    Args:
+        body (MoveTrackRequest): Request body containing playlist id, track id and the id it should follow
+        req (Request): FastAPI request object to access app state.
+
+    Returns:
+        status
+
+    Raises:
+        HTTPException: Returns 400 if either track is not in the playlist.
+    """
+    db: AudioStorage = req.app.state.db
+
+    try:
+        await db.move_track(body.playlist_id, body.track_id, after_id=body.after_id)
+    except PlaylistOrderError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return JSONResponse(content={"status": "moved"}, status_code=200)
+
+
+@router.post("/reorder")
+async def reorder_playlist(body: ReorderPlaylistRequest, req: Request) -> Response:
+    """
+    Sets the full track order of a playlist, only moved tracks are rewritten
+
+    Args:
+        body (ReorderPlaylistRequest): Request body containing playlist id and every track id in the new order
+        req (Request): FastAPI request object to access app state.
+
+    Returns:
+        status
+
+    Raises:
+        HTTPException: Returns 400 if the ids don't match the playlist's tracks.
+    """
+    db: AudioStorage = req.app.state.db
+
+    try:
+        await db.reorder_playlist(body.playlist_id, body.track_ids)
+    except PlaylistOrderError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return JSONResponse(content={"status": "reordered"}, status_code=200)
+
+
+
+
 @router.get("/likes")
 async def get_likes(req: Request):
     """
@@ -195,7 +274,7 @@ async def get_likes(req: Request):
     Returns:
         JSONResponse: A list of matching track ids from the local SQLite database.
     """
-    db: AudioDatabase = req.app.state.db
+    db: AudioStorage = req.app.state.db
     content = await db.fetch_liked_tracks()
 
     return JSONResponse(content={"content": content}, status_code=200)
@@ -215,14 +294,17 @@ async def edit_track(body: EditTrackRequest, req: Request) -> Response:
         status
     """
     track_id = body.id
-    title = body.title
-    artist = body.artist
-    playlist_updates = [pl.model_dump() for pl in body.playlists] #build the right data structure from PlaylistSelections
+    add = [(track_id, pl.id) for pl in body.playlists if pl.checked]
+    remove = [(track_id, pl.id) for pl in body.playlists if not pl.checked]
     
-    db: AudioDatabase = req.app.state.db
+    db: AudioStorage = req.app.state.db
 
-    await db.update_track_playlists(track_id=track_id, playlist_updates=playlist_updates)
-    await db.set_custom_metadata(track_id, title, artist)
+    #memberships and metadata in one transaction and one edit_tracks event
+    await db.apply_track_edits(
+        add=add, 
+        remove=remove, 
+        metadata=[{"id": track_id, "title": body.title, "artist": body.artist}]
+    )
 
     return JSONResponse(content={"status": "updated"}, status_code=200)
 
@@ -242,7 +324,7 @@ async def delete_track(body: DeleteTrackRequest, req: Request) -> Response:
     """
     track_id = body.id
 
-    db: AudioDatabase = req.app.state.db
+    db: AudioStorage = req.app.state.db
 
     await db.unlog_download(track_id)
 
@@ -3,7 +3,6 @@ import traceback #debugging
 from fastapi import APIRouter, Request, HTTPException, Response
 from fastapi.responses import JSONResponse
 
-from backend.core.lib.utils import is_downloaded
 from backend.api.schemas.queue_schemas import *
 from backend.core.models.download_job import DownloadJob
 import backend.globals as G
@@ -28,7 +27,8 @@ async def queue_set_all_tracks(body: QueueSetAllTracksRequest, req: Request) ->
     Raises:
         HTTPException: Returns 500 if any unexpected error occurs.
     """
-    ids = [id for id in body.ids if is_downloaded(id)]
+    file_index = req.app.state.file_index
+    ids = [id for id in body.ids if file_index.is_downloaded(id)]
     queue_manager = req.app.state.queue_manager
 
     play_queue = queue_manager.get(G.PLAY_QUEUE_NAME)
@@ -73,12 +73,11 @@ async def queue_set_first_track(body: QueueSetFirstTrackRequest, req: Request) -
 
     try:
         #queueing logic for replacing first item in queue if available
-        if is_downloaded(track_or_id=id):
+        if req.app.state.file_index.is_downloaded(id):
             await play_queue.set_first(id)
         else:
             await play_queue.insert_next(id)
-            if not download_queue.contains(job):
-                await download_queue.insert_next(job)
+            await download_queue.enqueue(job, front=True)
     
         return Response(status_code=204)
     except Exception as e:
@@ -115,9 +114,8 @@ async def queue_push_track(body: QueuePushTrackRequest, req: Request) -> Respons
         #normal queueing logic
         await play_queue.push(id)
 
-        if not is_downloaded(track_or_id=id):
-            if not download_queue.contains(job):
-                await download_queue.push(job)
+        if not req.app.state.file_index.is_downloaded(id):
+            await download_queue.enqueue(job)
         
         return Response(status_code=204)
     except Exception as e:
@@ -154,9 +152,8 @@ async def queue_push_front(body: QueuePushTrackRequest, req: Request) -> Respons
         #push to front
         await play_queue.insert_next(id)
 
-        if not is_downloaded(track_or_id=id):
-            if not download_queue.contains(job):
-                await download_queue.push(job)
+        if not req.app.state.file_index.is_downloaded(id):
+            await download_queue.enqueue(job)
         return Response(status_code=204)
     except Exception as e:
         traceback.print_exc()
@@ -5,32 +5,60 @@ from fastapi.responses import JSONResponse
 from typing import Optional
 
 from backend.api.schemas.search_schemas import *
-from backend.core.lib.utils import is_downloaded
 from backend.core.models.download_job import DownloadJob
 import backend.globals as G
 
-from backend.core.database.audio_database import AudioDatabase
+from backend.core.database.storage import AudioStorage
 from backend.core.youtube.client import YouTubeClient
+from backend.exceptions import InvalidCursorError
 
 router = APIRouter(prefix="/search")
 
 
 @router.get("/")
-async def search(req: Request, q: Optional[str] = Query(None)):
+async def search(
+    req: Request, 
+    q: Optional[str] = Query(None),
+    limit: Optional[int] = Query(None, ge=1, le=G.PAGE_LIMIT_MAX),
+    cursor: Optional[str] = Query(None)
+):
     """
     Search for tracks in the local database by title or artist.
 
     Args:
         q (str, optional): The search query string. Matches against lowercase title or artist.
+        limit (int, optional): Page size, enables keyset pagination.
+        cursor (str, optional): `next_cursor` from the previous page.
+
+    When nothing matches exactly, the first page falls back to typo tolerant matches
+    over the downloaded library ("beatels" finds "The Beatles") and `fuzzy` is true,
+    so the client only needs /search/deep when that is empty too.
+
+    Without `limit` the best G.LOCAL_SEARCH_LIMIT matches are returned.
 
     Returns:
-        JSONResponse: A list of matching tracks from the local SQLite database.
+        JSONResponse: A list of matching tracks from the local database.
     """
     #local db search
-    db: AudioDatabase = req.app.state.db
-    content = await db.search(q)
+    db: AudioStorage = req.app.state.db
 
-    return JSONResponse(content={"content": content}, status_code=200)
+    if limit is None:
+        content = await db.search(q, limit=G.LOCAL_SEARCH_LIMIT)
+        fuzzy = bool(q) and not content
+        if fuzzy:
+            content = await db.fuzzy_search(q, limit=G.FUZZY_SEARCH_LIMIT)
+        return JSONResponse(content={"content": content, "fuzzy": fuzzy}, status_code=200)
+
+    try:
+        content, next_cursor = await db.search_page(q, limit=limit, cursor=cursor)
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    fuzzy = bool(q) and not content and cursor is None
+    if fuzzy:
+        content = await db.fuzzy_search(q, limit=min(limit, G.FUZZY_SEARCH_LIMIT))
+
+    return JSONResponse(content={"content": content, "next_cursor": next_cursor, "fuzzy": fuzzy}, status_code=200)
 
 
 
@@ -55,13 +83,11 @@ async def deep_search(req: Request, q: Optional[str] = Query(None)):
         return Response(status_code=200)
 
     yt: YouTubeClient = req.app.state.yt
-    db: AudioDatabase = req.app.state.db #put into db?
+    db: AudioStorage = req.app.state.db #put into db?
 
     results = await yt.robust_search(q)
 
-    for track in results:
-        print("ATTEMPTING LOG TRACK:", track)
-        await db.log_track(track)
+    await db.log_tracks_many(results)
 
     content = [track.to_json() for track in results]
     return JSONResponse(content={"content": content}, status_code=200)
@@ -29,3 +29,13 @@ class EditTrackRequest(BaseModel):
 
 class DeleteTrackRequest(BaseModel):
     id: str
+
+
+class MoveTrackRequest(BaseModel):
+    playlist_id: str
+    track_id: str
+    after_id: Optional[str] = None  #None moves the track to the front
+
+class ReorderPlaylistRequest(BaseModel):
+    playlist_id: str
+    track_ids: List[str]
@@ -0,0 +1,187 @@
+import os
+import time
+from dataclasses import dataclass
+from email.utils import formatdate
+from pathlib import Path
+from typing import Dict, Iterable, Mapping, Optional, Set, Tuple
+
+from backend.core.events.event_bus import EventBus
+from backend.core.lib.formats import mime_type
+from backend.core.models.event import Event
+
+from backend.core.models.enums import AudioDatabaseAction as ADA
+
+
+@dataclass(frozen=True)
+class FileInfo:
+    path: Path
+    size: int
+    mtime_ns: int
+    media_type: str = "audio/mpeg"
+
+    @property
+    def etag(self) -> str:
+        #strong validator, a replaced file changes size or mtime (yt-dlp writes a new file, never in place)
+        return f'"{self.size:x}-{self.mtime_ns:x}"'
+
+    @property
+    def last_modified(self) -> str:
+        return formatdate(self.mtime_ns / 1e9, usegmt=True)
+
+    @property
+    def mtime(self) -> int:
+        #whole seconds, the resolution of Last-Modified and If-Modified-Since
+        return self.mtime_ns // 1_000_000_000
+
+
+class FileIndex:
+    """
+    Size, mtime and container of downloaded audio files, keyed by track id.
+
+    The stream endpoint needs a file's size and validators (ETag, Last-Modified) on
+    every request, mostly range requests for the same few tracks, and the queue
+    endpoints ask whether tracks are downloaded. Once load()ed from the downloads
+    table this answers both from memory: the downloader records each file's stat()
+    with its row, and the AudioDatabase's download events keep the index in step.
+    Ids that aren't downloads are answered without touching the disk, downloads
+    logged before stats were recorded are stat()ed on first use (and written back by
+    the next DownloadReconciler pass, see AudioStorage.backfill_download_stats).
+
+    Without load() (or for entries dropped by invalidate()) it falls back to a
+    cached stat(), re-checked after `ttl` seconds when one is given. Missing files
+    are not cached, a download can land at any time.
+
+    Args:
+        base_dir (Path): Download folder.
+        audio_format (str): File extension of tracks the index has no format for.
+        event_bus (EventBus, optional): Bus the AudioDatabase publishes on.
+        source (str, optional): Name of the AudioDatabase whose events to follow.
+        ttl (float, optional): Seconds a stat() result is trusted, None for until the
+            next download event of the track.
+    """
+    def __init__(
+        self,
+        *,
+        base_dir: Path,
+        audio_format: str,
+        event_bus: Optional[EventBus] = None,
+        source: Optional[str] = None,
+        ttl: Optional[float] = None
+    ):
+        self.base_dir = base_dir
+        self.audio_format = audio_format
+        self.ttl = ttl
+        self._entries: Dict[str, Tuple[FileInfo, Optional[float]]] = {} #id -> (info, stat()ed at), None when recorded by the downloader
+        self._formats: Dict[str, str] = {} #id -> container, when not audio_format
+        self._downloads: Optional[Set[str]] = None #every downloaded id once loaded, None: ask the disk
+
+        if event_bus and source:
+            event_bus.subscribe(source=source, action=ADA.LOG_DOWNLOAD, handler=self._on_download)
+            event_bus.subscribe(source=source, action=ADA.LOG_DOWNLOADS, handler=self._on_downloads)
+            event_bus.subscribe(source=source, action=ADA.UNLOG_DOWNLOAD, handler=self._on_unlog)
+            event_bus.subscribe(source=source, action=ADA.UNLOG_TRACK, handler=self._on_unlog)
+
+
+    def load(self, files: Mapping[str, Tuple[str, Optional[int], Optional[int]]]):
+        """Seed the index with every download, see AudioStorage.get_download_files."""
+        self._entries.clear()
+        self._formats.clear()
+        self._downloads = set(files)
+        for id, (fmt, size, mtime_ns) in files.items():
+            self._set_format(id, fmt)
+            if size is not None and mtime_ns is not None:
+                self._record(id, size, mtime_ns)
+
+    def format(self, id: str) -> str:
+        return self._formats.get(id, self.audio_format)
+
+    def path(self, id: str) -> Path:
+        return self.base_dir / f"{id}.{self.format(id)}"
+
+    def get(self, id: str) -> Optional[FileInfo]:
+        """
+        Returns:
+            Optional[FileInfo]: The file's size and mtime, None if it isn't downloaded.
+        """
+        entry = self._entries.get(id)
+        if entry is not None:
+            info, checked = entry
+            if checked is None or self.ttl is None or time.monotonic() - checked < self.ttl:
+                return info
+
+        if self._downloads is not None and id not in self._downloads:
+            return None
+
+        path = self.path(id)
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            self._entries.pop(id, None)
+            return None
+
+        info = FileInfo(path=path, size=st.st_size, mtime_ns=st.st_mtime_ns, media_type=mime_type(self.format(id)))
+        self._entries[id] = (info, time.monotonic())
+        return info
+
+    def is_downloaded(self, id: str) -> bool:
+        if self._downloads is not None:
+            return id in self._downloads
+        return self.get(id) is not None
+
+    def invalidate(self, ids: Iterable[str]):
+        """Forget what is known about the files, the next get() stat()s them."""
+        for id in ids:
+            self._entries.pop(id, None)
+
+    def mark_missing(self, ids: Iterable[str]):
+        """Files found gone or broken (see DownloadReconciler), not downloaded until logged again."""
+        for id in ids:
+            if self._downloads is not None:
+                self._downloads.discard(id)
+            self._entries.pop(id, None)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+    def _set_format(self, id: str, fmt: str):
+        if fmt == self.audio_format:
+            self._formats.pop(id, None)
+        else:
+            self._formats[id] = fmt
+
+    def _record(self, id: str, size: int, mtime_ns: int):
+        info = FileInfo(path=self.path(id), size=size, mtime_ns=mtime_ns, media_type=mime_type(self.format(id)))
+        self._entries[id] = (info, None)
+
+
+    #event handlers
+    def _on_download(self, event: Event):
+        id = event.payload["content"]["id"]
+        if event.payload.get("format"):
+            self._set_format(id, event.payload["format"])
+
+        if self._downloads is not None:
+            self._downloads.add(id)
+        self.invalidate([id])
+        if event.payload.get("stats"):
+            self._record(id, *event.payload["stats"])
+
+    def _on_unlog(self, event: Event):
+        id = event.payload["content"]["id"]
+        if self._downloads is not None:
+            self._downloads.discard(id)
+        self._formats.pop(id, None)
+        self.invalidate([id])
+
+    def _on_downloads(self, event: Event):
+        content = event.payload["content"]
+        for id, fmt in (content.get("formats") or {}).items():
+            self._set_format(id, fmt)
+
+        ids = [track["id"] for track in content["tracks"]]
+        if self._downloads is not None:
+            self._downloads.update(ids)
+        self.invalidate(ids)
+        for id, (size, mtime_ns) in (content.get("stats") or {}).items():
+            self._record(id, size, mtime_ns)
@@ -0,0 +1,186 @@
+import asyncio
+import os
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO, Dict, Optional
+
+from backend.core.events.event_bus import EventBus
+from backend.core.models.event import Event
+from backend.exceptions import DownloadFailedError
+
+from backend.core.models.enums import AudioDatabaseAction as ADA
+
+
+class GrowingFile:
+    """
+    A download that is being written while it's streamed.
+
+    The writer fills `{id}.{ext}.part` and renames it to the final path once it's
+    complete. Readers open the file once and keep their descriptor, so the rename
+    doesn't affect them. finish() wakes every reader still waiting for bytes.
+    """
+    def __init__(self, id: str, final_path: Path, media_type: str):
+        self.id = id
+        self.final_path = final_path
+        self.part_path = final_path.with_name(final_path.name + ".part")
+        self.media_type = media_type
+
+        self.done = False
+        self.ok = False
+        self._finished = asyncio.Event()
+
+    @property
+    def path(self) -> Path:
+        #where the bytes are right now, GrowingFiles.finish() renames and flips ok in one loop step
+        return self.final_path if self.ok else self.part_path
+
+    def finish(self, ok: bool):
+        self.done = True
+        self.ok = ok
+        self._finished.set()
+
+    async def wait(self, timeout: float):
+        """Sleep until the writer finishes, at most `timeout` seconds."""
+        try:
+            await asyncio.wait_for(self._finished.wait(), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    def open(self) -> BinaryIO:
+        """
+        Raises:
+            DownloadFailedError: If the download failed and its part file is gone.
+        """
+        try:
+            return open(self.path, "rb")
+        except FileNotFoundError:
+            raise DownloadFailedError(f"Download of {self.id} failed")
+
+    async def tail(self, f: BinaryIO, *, chunk_size: int, poll: float) -> AsyncIterator[bytes]:
+        """
+        The bytes of `f` (from open()) as they land, like `tail -f`, ending when the
+        writer does. Closes `f`.
+
+        Raises:
+            DownloadFailedError: If the writer failed, after the bytes it got to
+                write. The client sees a broken response rather than a short track.
+        """
+        try:
+            while True:
+                finished = self.done #read before the file, so nothing written after the last read is missed
+                data = await asyncio.to_thread(f.read, chunk_size)
+                if data:
+                    yield data
+                elif finished:
+                    break
+                else:
+                    await self.wait(poll)
+        finally:
+            f.close()
+
+        if not self.ok:
+            raise DownloadFailedError(f"Download of {self.id} failed while it was streamed")
+
+
+class GrowingFiles:
+    """
+    Downloads in progress that /audio/stream can serve before they are done.
+
+    The YouTubeClient registers a track when its progressive download starts and
+    finishes it when the file is complete (or the download failed). Finished
+    entries stay until the AudioDatabase logs the download, closing the gap in
+    which the file is complete but the row isn't written yet, or `linger`
+    seconds, in case it never is.
+
+    Args:
+        linger (float): Seconds a finished entry is kept at most.
+        event_bus (EventBus, optional): Bus the AudioDatabase publishes on.
+        source (str, optional): Name of the AudioDatabase whose events to follow.
+    """
+    def __init__(
+        self,
+        *,
+        linger: float = 30.0,
+        event_bus: Optional[EventBus] = None,
+        source: Optional[str] = None
+    ):
+        self.linger = linger
+        self._files: Dict[str, GrowingFile] = {}
+        self._started = asyncio.Event() #set and replaced on every start(), wakes wait_started()
+
+        if event_bus and source:
+            event_bus.subscribe(source=source, action=ADA.LOG_DOWNLOAD, handler=self._on_download)
+            event_bus.subscribe(source=source, action=ADA.LOG_DOWNLOADS, handler=self._on_downloads)
+
+
+    def __len__(self) -> int:
+        return len(self._files)
+
+    def get(self, id: str) -> Optional[GrowingFile]:
+        return self._files.get(id)
+
+    async def wait_started(self, id: str, timeout: float) -> Optional[GrowingFile]:
+        """
+        The growing file of `id`, waiting up to `timeout` seconds for its download
+        to start (it may be queued behind others).
+        """
+        deadline = asyncio.get_running_loop().time() + timeout
+        while id not in self._files:
+            remaining = deadline - asyncio.get_running_loop().time()
+            if remaining <= 0:
+                return None
+            try:
+                await asyncio.wait_for(self._started.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                return None
+        return self._files[id]
+
+
+    #writer side
+    def start(self, id: str, final_path: Path, media_type: str) -> GrowingFile:
+        """Register a download, its (empty) part file is created here so readers can open it right away."""
+        growing = GrowingFile(id, final_path, media_type)
+        growing.part_path.write_bytes(b"")
+        self._files[id] = growing
+
+        self._started.set()
+        self._started = asyncio.Event()
+        return growing
+
+    def finish(self, growing: GrowingFile, ok: bool):
+        """
+        Mark a download complete, moving the part file to the final path, or failed,
+        deleting it. Readers keep their descriptor either way.
+        """
+        try:
+            if ok:
+                os.replace(growing.part_path, growing.final_path)
+            else:
+                growing.part_path.unlink(missing_ok=True)
+        except OSError as e:
+            print(f"[GrowingFiles] Failed to finish {growing.part_path.name}: {e}")
+            ok = False
+        growing.finish(ok)
+
+        if not ok:
+            self._drop(growing.id, growing)
+        else:
+            asyncio.get_running_loop().call_later(self.linger, self._drop, growing.id, growing)
+
+    def _drop(self, id: str, growing: Optional[GrowingFile] = None):
+        #a newer download of the same id may have replaced the entry
+        if growing is None or self._files.get(id) is growing:
+            self._files.pop(id, None)
+
+
+    #event handlers
+    def _on_download(self, event: Event):
+        self._drop_logged(event.payload["content"]["id"])
+
+    def _on_downloads(self, event: Event):
+        for track in event.payload["content"]["tracks"]:
+            self._drop_logged(track["id"])
+
+    def _drop_logged(self, id: str):
+        growing = self._files.get(id)
+        if growing is not None and growing.done:
+            self._drop(id, growing)
@@ -0,0 +1,178 @@
+import asyncio
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Iterable, Optional, Tuple
+
+from backend.core.audio.file_index import FileIndex, FileInfo
+from backend.core.events.event_bus import EventBus
+from backend.core.lib.metrics import MetricsRegistry
+from backend.core.models.event import Event
+
+from backend.core.models.enums import AudioDatabaseAction as ADA
+from backend.core.models.enums import PlayQueueAction as PQA
+
+
+def read_head(path: Path, length: int) -> bytes:
+    with path.open("rb") as f:
+        return f.read(length)
+
+
+class HeadCache:
+    """
+    LRU cache of the first `head_bytes` of recently played and queued tracks, bounded
+    by total bytes.
+
+    A play starts with a range request at byte 0. When the head is cached, the part
+    of the range it covers is answered from memory, so the first bytes leave without
+    touching the disk and a request inside the head does no file io at all (file
+    metadata comes from the FileIndex).
+
+    Entries are tagged with the file's ETag and dropped when it no longer matches,
+    or when the AudioDatabase announces the track was re-downloaded or removed.
+    Misses are filled in the background, and the first few tracks of the play queue
+    are read ahead whenever it changes.
+
+    Args:
+        file_index (FileIndex): File metadata and validators.
+        head_bytes (int): Bytes cached per track.
+        max_bytes (int): Total bytes held, least recently used heads go first.
+        prewarm (int): Tracks at the front of the play queue to read ahead.
+        metrics (MetricsRegistry, optional): Records head_cache_requests_total{result},
+            head_cache_evictions_total and head_cache_loads_total.
+        event_bus (EventBus, optional): Bus for invalidation and prewarm events.
+        db_source (str, optional): Name of the AudioDatabase whose events to follow.
+        queue_source (str, optional): Name of the PlayQueue whose events to follow.
+    """
+    def __init__(
+        self,
+        *,
+        file_index: FileIndex,
+        head_bytes: int,
+        max_bytes: int,
+        prewarm: int = 3,
+        metrics: Optional[MetricsRegistry] = None,
+        event_bus: Optional[EventBus] = None,
+        db_source: Optional[str] = None,
+        queue_source: Optional[str] = None
+    ):
+        self.file_index = file_index
+        self.head_bytes = head_bytes
+        self.max_bytes = max_bytes
+        self.prewarm = prewarm
+        self.metrics = metrics
+
+        self._entries: OrderedDict[str, Tuple[str, bytes]] = OrderedDict() #id -> (etag, head), oldest first
+        self._bytes = 0
+        self._loading: Dict[str, object] = {} #id -> token of the load that owns it
+
+        if event_bus and db_source:
+            for action in (ADA.LOG_DOWNLOAD, ADA.UNLOG_DOWNLOAD, ADA.UNLOG_TRACK):
+                event_bus.subscribe(source=db_source, action=action, handler=self._on_download)
+            event_bus.subscribe(source=db_source, action=ADA.LOG_DOWNLOADS, handler=self._on_downloads)
+
+        if event_bus and queue_source:
+            for action in (PQA.SET_ALL, PQA.SET_FIRST, PQA.INSERT_NEXT, PQA.PUSH, PQA.POP, PQA.REMOVE):
+                event_bus.subscribe(source=queue_source, action=action, handler=self._on_queue)
+
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        return self._bytes
+
+
+    #lookups
+    def get(self, id: str, info: FileInfo) -> Optional[bytes]:
+        """
+        The cached head of a track, None on a miss (which schedules a background load).
+
+        Args:
+            id (str): Track id.
+            info (FileInfo): Current file metadata, the entry must carry its ETag.
+        """
+        entry = self._entries.get(id)
+        if entry is not None and entry[0] != info.etag:
+            self._drop(id)
+            entry = None
+
+        if entry is None:
+            self._count("miss")
+            self.schedule([id])
+            return None
+
+        self._entries.move_to_end(id)
+        self._count("hit")
+        return entry[1]
+
+    def _count(self, result: str):
+        if self.metrics:
+            self.metrics.inc("head_cache_requests_total", result=result)
+
+
+    #loading
+    def schedule(self, ids: Iterable[str]) -> Optional[asyncio.Task]:
+        """Load the heads of `ids` that aren't cached or loading in the background."""
+        missing = [id for id in ids if id not in self._entries and id not in self._loading]
+        if not missing:
+            return None
+        token = object()
+        self._loading.update((id, token) for id in missing)
+        return asyncio.get_running_loop().create_task(self._load(missing, token))
+
+    async def _load(self, ids: list, token: object):
+        try:
+            for id in ids:
+                info = self.file_index.get(id)
+                if info is None:
+                    continue
+                try:
+                    head = await asyncio.to_thread(read_head, info.path, min(self.head_bytes, info.size))
+                except OSError as e:
+                    print(f"[HeadCache] Failed to read {info.path.name}: {e}")
+                    continue
+                #an invalidation during the read took the id from this load, the bytes may be stale
+                if self._loading.get(id) is token:
+                    self._put(id, info.etag, head)
+                    if self.metrics:
+                        self.metrics.inc("head_cache_loads_total")
+        finally:
+            for id in ids:
+                if self._loading.get(id) is token:
+                    del self._loading[id]
+
+    def _put(self, id: str, etag: str, head: bytes):
+        if len(head) > self.max_bytes:
+            return
+        self._drop(id)
+        self._entries[id] = (etag, head)
+        self._bytes += len(head)
+
+        while self._bytes > self.max_bytes:
+            _, (_, data) = self._entries.popitem(last=False)
+            self._bytes -= len(data)
+            if self.metrics:
+                self.metrics.inc("head_cache_evictions_total")
+
+    def _drop(self, id: str):
+        entry = self._entries.pop(id, None)
+        if entry is not None:
+            self._bytes -= len(entry[1])
+
+    def invalidate(self, ids: Iterable[str]):
+        for id in ids:
+            self._drop(id)
+            self._loading.pop(id, None)
+
+
+    #event handlers
+    def _on_download(self, event: Event):
+        self.invalidate([event.payload["content"]["id"]])
+
+    def _on_downloads(self, event: Event):
+        self.invalidate(track["id"] for track in event.payload["content"]["tracks"])
+
+    def _on_queue(self, event: Event):
+        upcoming = [id for id in (event.payload.get("content") or [])[:self.prewarm] if isinstance(id, str)]
+        self.schedule(upcoming)
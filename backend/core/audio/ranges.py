@@ -0,0 +1,123 @@
+from email.utils import parsedate_to_datetime
+from typing import List, Mapping, Optional, Tuple
+
+from backend.core.audio.file_index import FileInfo
+from backend.exceptions import InvalidRangeError, RangeNotSatisfiableError
+
+
+def parse_range(header: str, size: int, max_ranges: int) -> Optional[List[Tuple[int, int]]]:
+    """
+    Parse a Range header against a file of `size` bytes (RFC 9110 14.2).
+
+    Supports "a-b", open "a-" and suffix "-n" ranges, comma separated. Ranges
+    starting past the end are dropped, the rest are clamped to the file, sorted and
+    merged when they overlap or touch, so a client can't make us send a byte twice.
+
+    Args:
+        header (str): Range header value.
+        size (int): File size.
+        max_ranges (int): Most ranges accepted in one request.
+
+    Returns:
+        Optional[List[Tuple[int, int]]]: Inclusive (start, end) ranges, None when the
+            header uses a unit other than bytes and must be ignored.
+
+    Raises:
+        InvalidRangeError: If the bytes range set is malformed or too long.
+        RangeNotSatisfiableError: If no range overlaps the file.
+    """
+    unit, _, spec = header.strip().partition("=")
+    if unit.strip().lower() != "bytes":
+        return None
+
+    specs = [s.strip() for s in spec.split(",") if s.strip()]
+    if not specs:
+        raise InvalidRangeError(f"Invalid Range header: {header}")
+    if len(specs) > max_ranges:
+        raise InvalidRangeError(f"More than {max_ranges} ranges requested")
+
+    ranges = []
+    for s in specs:
+        start_str, dash, end_str = s.partition("-")
+        try:
+            if not dash:
+                raise ValueError(s)
+            if start_str == "":
+                suffix = int(end_str)
+                if suffix < 0:
+                    raise ValueError(s)
+                if suffix == 0:
+                    continue
+                start, end = max(0, size - suffix), size - 1
+            else:
+                start = int(start_str)
+                end = int(end_str) if end_str else max(start, size - 1)
+                if start < 0 or end < start:
+                    raise ValueError(s)
+        except ValueError:
+            raise InvalidRangeError(f"Invalid Range values: {header}")
+
+        if start >= size:
+            continue
+        ranges.append((start, min(end, size - 1)))
+
+    if not ranges:
+        raise RangeNotSatisfiableError(f"Range not satisfiable: {header}")
+
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def _http_date(value: str) -> Optional[int]:
+    try:
+        return int(parsedate_to_datetime(value).timestamp())
+    except (TypeError, ValueError, IndexError):
+        return None
+
+def _etags(value: str) -> List[str]:
+    return [tag.strip() for tag in value.split(",") if tag.strip()]
+
+
+def not_modified(headers: Mapping[str, str], info: FileInfo) -> bool:
+    """
+    Whether a GET can be answered with 304 (RFC 9110 13.2.2).
+
+    If-None-Match wins over If-Modified-Since and uses the weak comparison, so
+    W/"x" matches "x".
+    """
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = _etags(if_none_match)
+        return "*" in tags or info.etag in [tag.removeprefix("W/") for tag in tags]
+
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since is not None:
+        since = _http_date(if_modified_since)
+        return since is not None and info.mtime <= since
+
+    return False
+
+
+def if_range_matches(headers: Mapping[str, str], info: FileInfo) -> bool:
+    """
+    Whether the Range header may be honoured (RFC 9110 13.1.5).
+
+    An If-Range ETag must match strongly (weak tags never do), a date must equal
+    Last-Modified exactly. On a mismatch the client's partial copy is stale and the
+    whole file is sent instead.
+    """
+    if_range = headers.get("if-range")
+    if if_range is None:
+        return True
+
+    if_range = if_range.strip()
+    if if_range.startswith('"') or if_range.startswith("W/"):
+        return if_range == info.etag
+    return _http_date(if_range) == info.mtime
@@ -0,0 +1,339 @@
+import asyncio
+import os
+import struct
+from bisect import bisect_right
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from backend.core.audio.file_index import FileIndex, FileInfo
+from backend.core.events.event_bus import EventBus
+from backend.core.lib.metrics import MetricsRegistry
+from backend.core.models.event import Event
+
+from backend.core.models.enums import AudioDatabaseAction as ADA
+
+
+SEEK_INDEX_SUFFIX = "seekidx"
+
+#magic, version, entries, duration_ms, source size, source mtime_ns
+_HEADER = struct.Struct("<4sBxxxIIQq")
+_MAGIC = b"SKIX"
+_VERSION = 1
+
+#mpeg layer III tables, indexed by the header's version bits (0: 2.5, 2: 2, 3: 1)
+_BITRATES_KBPS = {
+    3: (0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320),
+    2: (0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160),
+}
+_SAMPLE_RATES = {3: (44100, 48000, 32000), 2: (22050, 24000, 16000), 0: (11025, 12000, 8000)}
+
+
+def _frame(data: bytes, pos: int) -> Optional[Tuple[int, int, int]]:
+    """(frame length, samples, sample rate) of a layer III frame header at `pos`, None if there isn't one."""
+    if pos + 4 > len(data) or data[pos] != 0xFF or data[pos + 1] & 0xE0 != 0xE0:
+        return None
+
+    b1, b2 = data[pos + 1], data[pos + 2]
+    version = (b1 >> 3) & 0x3
+    layer = (b1 >> 1) & 0x3
+    bitrate_index = b2 >> 4
+    rate_index = (b2 >> 2) & 0x3
+    if version == 1 or layer != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None #reserved values, free format, or not layer III
+
+    bitrate = _BITRATES_KBPS[3 if version == 3 else 2][bitrate_index] * 1000
+    sample_rate = _SAMPLE_RATES[version][rate_index]
+    padding = (b2 >> 1) & 0x1
+    if version == 3:
+        return 144 * bitrate // sample_rate + padding, 1152, sample_rate
+    return 72 * bitrate // sample_rate + padding, 576, sample_rate
+
+
+def _is_xing(data: bytes, pos: int) -> bool:
+    #the lame/xing info frame carries the vbr header and no audio, players skip it
+    version = (data[pos + 1] >> 3) & 0x3
+    mono = data[pos + 3] >> 6 == 3
+    side_info = (17 if mono else 32) if version == 3 else (9 if mono else 17)
+    tag = data[pos + 4 + side_info:pos + 8 + side_info]
+    return tag in (b"Xing", b"Info")
+
+
+def _audio_start(data: bytes) -> int:
+    #skip an id3v2 tag, its size is synchsafe (7 bits per byte)
+    if len(data) < 10 or data[:3] != b"ID3":
+        return 0
+    size = (data[6] & 0x7F) << 21 | (data[7] & 0x7F) << 14 | (data[8] & 0x7F) << 7 | (data[9] & 0x7F)
+    footer = 10 if data[5] & 0x10 else 0
+    return 10 + size + footer
+
+
+@dataclass(frozen=True)
+class SeekIndex:
+    """
+    Time to byte offset map of an mp3, one entry per `interval_ms` at frame starts.
+
+    A byte offset doesn't map linearly to time in a vbr file, this does: the entry
+    at or before t is the start of a frame, so the decoder can start there.
+    """
+    times_ms: Tuple[int, ...]
+    offsets: Tuple[int, ...]
+    duration_ms: int
+    source_size: int
+    source_mtime_ns: int
+
+    def lookup(self, seconds: float) -> Tuple[float, int]:
+        """
+        Returns:
+            Tuple[float, int]: Start time of the frame to play from and its byte offset.
+        """
+        i = max(bisect_right(self.times_ms, int(seconds * 1000)) - 1, 0)
+        return self.times_ms[i] / 1000, self.offsets[i]
+
+    def matches(self, info: FileInfo) -> bool:
+        return (self.source_size, self.source_mtime_ns) == (info.size, info.mtime_ns)
+
+    def to_bytes(self) -> bytes:
+        n = len(self.times_ms)
+        header = _HEADER.pack(_MAGIC, _VERSION, n, self.duration_ms, self.source_size, self.source_mtime_ns)
+        return header + struct.pack(f"<{n}I{n}I", *self.times_ms, *self.offsets)
+
+    @classmethod
+    def from_bytes(cls, raw: bytes) -> Optional["SeekIndex"]:
+        """None if `raw` isn't a (current version) seek index."""
+        if len(raw) < _HEADER.size:
+            return None
+        magic, version, n, duration_ms, size, mtime_ns = _HEADER.unpack_from(raw)
+        if magic != _MAGIC or version != _VERSION or n == 0 or len(raw) != _HEADER.size + 8 * n:
+            return None
+        values = struct.unpack_from(f"<{2 * n}I", raw, _HEADER.size)
+        return cls(times_ms=values[:n], offsets=values[n:], duration_ms=duration_ms, source_size=size, source_mtime_ns=mtime_ns)
+
+
+def build_seek_index(data: bytes, *, interval_ms: int, source_size: int, source_mtime_ns: int) -> Optional[SeekIndex]:
+    """
+    Walk the frame headers of an mp3 and keep the first frame of every interval.
+
+    Junk between frames (a stray tag, a damaged frame) is skipped by searching for
+    the next header that is followed by another one.
+
+    Returns:
+        Optional[SeekIndex]: None if no mpeg layer III frames were found.
+    """
+    times: List[int] = []
+    offsets: List[int] = []
+    samples = 0 #at the frame's sample rate, it can't change mid stream in practice
+    rate = 0
+    next_mark = 0
+    pos = _audio_start(data)
+    first = True
+    end = len(data)
+
+    while pos + 4 <= end:
+        frame = _frame(data, pos)
+        if frame is None or pos + frame[0] > end:
+            #resync on a header whose successor is a header too, a lone 0xFFE is often audio data
+            pos = data.find(b"\xff", pos + 1)
+            while pos != -1:
+                candidate = _frame(data, pos)
+                if candidate and (pos + candidate[0] == end or _frame(data, pos + candidate[0])):
+                    break
+                pos = data.find(b"\xff", pos + 1)
+            if pos == -1:
+                break
+            continue
+
+        length, frame_samples, rate = frame
+        if first:
+            first = False
+            if _is_xing(data, pos):
+                pos += length
+                continue
+
+        ms = samples * 1000 // rate
+        if ms >= next_mark:
+            times.append(ms)
+            offsets.append(pos)
+            next_mark = (ms // interval_ms + 1) * interval_ms
+
+        samples += frame_samples
+        pos += length
+
+    if not times:
+        return None
+    return SeekIndex(
+        times_ms=tuple(times),
+        offsets=tuple(offsets),
+        duration_ms=samples * 1000 // rate,
+        source_size=source_size,
+        source_mtime_ns=source_mtime_ns
+    )
+
+
+class SeekIndexer:
+    """
+    Seek indexes of downloaded mp3s, built once and kept next to the file.
+
+    `{id}.seekidx` is written when a download lands (the post-download stage) or on
+    the first seek into an older download, and checked against the audio file's
+    size and mtime before use, so a re-download can't be served a stale map.
+    Recently used indexes stay in memory. Other containers have no index.
+
+    Args:
+        file_index (FileIndex): Audio files, their formats and metadata.
+        interval_ms (int): Spacing of the index entries.
+        max_cached (int): Indexes kept in memory.
+        metrics (MetricsRegistry, optional): Records seek_index_builds_total and
+            seek_lookups_total{result}.
+        event_bus (EventBus, optional): Bus the AudioDatabase publishes on.
+        source (str, optional): Name of the AudioDatabase whose events to follow.
+    """
+    def __init__(
+        self,
+        *,
+        file_index: FileIndex,
+        interval_ms: int = 200,
+        max_cached: int = 256,
+        metrics: Optional[MetricsRegistry] = None,
+        event_bus: Optional[EventBus] = None,
+        source: Optional[str] = None
+    ):
+        self.file_index = file_index
+        self.interval_ms = interval_ms
+        self.max_cached = max_cached
+        self.metrics = metrics
+
+        self._cache: OrderedDict[str, SeekIndex] = OrderedDict()
+        self._jobs: Dict[str, asyncio.Task] = {}
+
+        if event_bus and source:
+            event_bus.subscribe(source=source, action=ADA.LOG_DOWNLOAD, handler=self._on_download)
+            event_bus.subscribe(source=source, action=ADA.LOG_DOWNLOADS, handler=self._on_downloads)
+            event_bus.subscribe(source=source, action=ADA.UNLOG_DOWNLOAD, handler=self._on_unlog)
+            event_bus.subscribe(source=source, action=ADA.UNLOG_TRACK, handler=self._on_unlog)
+
+
+    def path(self, id: str) -> Path:
+        return self.file_index.base_dir / f"{id}.{SEEK_INDEX_SUFFIX}"
+
+    def supports(self, id: str) -> bool:
+        return self.file_index.format(id) == "mp3"
+
+
+    #lookups
+    async def get(self, id: str) -> Optional[SeekIndex]:
+        """
+        The current seek index of a downloaded mp3, built if missing or stale.
+
+        Returns:
+            Optional[SeekIndex]: None if the track isn't a downloaded mp3 or has no frames.
+        """
+        info = self.file_index.get(id)
+        if info is None or not self.supports(id):
+            self._count("unsupported")
+            return None
+
+        index = self._cache.get(id)
+        if index is not None and index.matches(info):
+            self._cache.move_to_end(id)
+            self._count("hit")
+            return index
+
+        index = await asyncio.shield(self._job(id))
+        if index is not None and not index.matches(info):
+            index = None #a build of the file this one replaced was still running
+        self._count("built" if index is not None else "unsupported")
+        return index
+
+    async def lookup(self, id: str, seconds: float) -> Optional[Tuple[float, int]]:
+        """(frame start time, byte offset) to play `id` from `seconds`, see SeekIndex.lookup."""
+        index = await self.get(id)
+        return index.lookup(seconds) if index is not None else None
+
+    def _count(self, result: str):
+        if self.metrics:
+            self.metrics.inc("seek_lookups_total", result=result)
+
+
+    #building
+    def schedule(self, ids: Iterable[str]):
+        for id in ids:
+            if self.supports(id):
+                self._job(id)
+
+    def _job(self, id: str) -> asyncio.Task:
+        task = self._jobs.get(id)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._load_or_build(id))
+            task.add_done_callback(lambda _: self._jobs.pop(id, None))
+            self._jobs[id] = task
+        return task
+
+    async def _load_or_build(self, id: str) -> Optional[SeekIndex]:
+        info = self.file_index.get(id)
+        if info is None:
+            return None
+
+        try:
+            index, built = await asyncio.to_thread(self._read_or_build, id, info)
+        except OSError as e:
+            print(f"[SeekIndexer] Failed to index {id}: {e}")
+            return None
+
+        if built and self.metrics:
+            self.metrics.inc("seek_index_builds_total")
+        if index is not None:
+            self._cache[id] = index
+            self._cache.move_to_end(id)
+            while len(self._cache) > self.max_cached:
+                self._cache.popitem(last=False)
+        return index
+
+    def _read_or_build(self, id: str, info: FileInfo) -> Tuple[Optional[SeekIndex], bool]:
+        #worker thread: reuse the file next to the audio when it describes this exact file
+        path = self.path(id)
+        try:
+            index = SeekIndex.from_bytes(path.read_bytes())
+            if index is not None and index.matches(info):
+                return index, False
+        except FileNotFoundError:
+            pass
+
+        index = build_seek_index(
+            info.path.read_bytes(),
+            interval_ms=self.interval_ms,
+            source_size=info.size,
+            source_mtime_ns=info.mtime_ns
+        )
+        if index is None:
+            return None, True
+
+        part = path.with_name(path.name + ".part")
+        part.write_bytes(index.to_bytes())
+        os.replace(part, path)
+        return index, True
+
+    def remove(self, ids: Iterable[str]):
+        for id in ids:
+            self._cache.pop(id, None)
+            try:
+                self.path(id).unlink(missing_ok=True)
+            except OSError as e:
+                print(f"[SeekIndexer] Failed to delete {id}.{SEEK_INDEX_SUFFIX}: {e}")
+
+
+    #event handlers, FileIndex subscribed first so it already knows the new formats
+    def _on_download(self, event: Event):
+        id = event.payload["content"]["id"]
+        self._cache.pop(id, None)
+        self.schedule([id])
+
+    def _on_downloads(self, event: Event):
+        ids = [track["id"] for track in event.payload["content"]["tracks"]]
+        for id in ids:
+            self._cache.pop(id, None)
+        self.schedule(ids)
+
+    def _on_unlog(self, event: Event):
+        self.remove([event.payload["content"]["id"]])
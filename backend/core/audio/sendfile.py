@@ -0,0 +1,211 @@
+import secrets
+import time
+from pathlib import Path
+from typing import Callable, Iterator, List, Mapping, Optional, Tuple, Union
+
+from fastapi.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+import backend.globals as G
+
+
+#asgi extensions that let the server hand the file to the kernel (sendfile) instead of us copying it
+PATHSEND = "http.response.pathsend"
+ZEROCOPYSEND = "http.response.zerocopysend"
+
+#a response body is literal bytes and (start, length) ranges of the file, in order
+Segment = Union[bytes, Tuple[int, int]]
+
+
+def iter_file_range(path: Path, start: int, length: int, chunk_size: int = G.STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """Read `length` bytes of `path` from `start` in `chunk_size` blocks, the copy-through fallback."""
+    with path.open("rb") as f:
+        f.seek(start)
+        remaining = length
+        while remaining > 0:
+            data = f.read(min(chunk_size, remaining))
+            if not data:
+                break
+            remaining -= len(data)
+            yield data
+
+
+def iter_segments(path: Path, segments: List[Segment], chunk_size: int = G.STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    for segment in segments:
+        if isinstance(segment, bytes):
+            yield segment
+        else:
+            yield from iter_file_range(path, *segment, chunk_size=chunk_size)
+
+
+def zero_copy_mode(scope: Scope, *, full_file: bool) -> Optional[str]:
+    """
+    The zero-copy extension to use for this request, None for the generator fallback.
+
+    zerocopysend takes an offset and count so it serves ranges too. pathsend only sends
+    whole files, so it is used for full responses only.
+    """
+    if not G.STREAM_ZERO_COPY:
+        return None
+    extensions = scope.get("extensions") or {}
+    if ZEROCOPYSEND in extensions:
+        return ZEROCOPYSEND
+    if PATHSEND in extensions and full_file:
+        return PATHSEND
+    return None
+
+
+class FileRangeResponse(StreamingResponse):
+    """
+    A byte range of a file on disk, sent by the kernel when the server allows it.
+
+    Servers that advertise the ASGI zerocopysend extension get the open file with
+    an offset and count and send it with os.sendfile. Servers with pathsend get the
+    path for full-file responses. The bytes then go from the page cache to the
+    socket without passing through Python or a worker thread.
+
+    Everywhere else (uvicorn today) the response is the plain StreamingResponse over
+    iter_file_range, read in the threadpool one G.STREAM_CHUNK_SIZE block at a time.
+
+    When the caller already holds the first bytes of the file in memory (`head`, see
+    HeadCache) the overlapping part of the range is sent from there, and the file is
+    only opened for what comes after, if anything.
+
+    `on_sent` is called with the body length and the seconds it took to send, the
+    sample ThroughputEstimator picks quality tiers from.
+
+    Args:
+        path (Path): File to send.
+        start (int): First byte.
+        length (int): Number of bytes.
+        file_size (int): Size of the whole file, decides whether pathsend can be used.
+        status_code (int): 200 or 206.
+        headers (Mapping[str, str], optional): Content-Range, Content-Length and so on.
+        media_type (str, optional): Content-Type.
+        head (bytes, optional): The file's first len(head) bytes.
+        on_sent (Callable[[int, float], None], optional): Called once the body is sent.
+    """
+    def __init__(
+        self,
+        path: Path,
+        *,
+        start: int,
+        length: int,
+        file_size: int,
+        status_code: int = 200,
+        headers: Optional[Mapping[str, str]] = None,
+        media_type: Optional[str] = None,
+        head: Optional[bytes] = None,
+        on_sent: Optional[Callable[[int, float], None]] = None
+    ):
+        self.on_sent = on_sent
+
+        segments: List[Segment] = [(start, length)]
+        if head and start < len(head):
+            cut = min(start + length, len(head))
+            segments = [head[start:cut]]
+            if start + length > cut:
+                segments.append((cut, start + length - cut))
+
+        self._init_segments(path, segments, file_size, status_code, headers, media_type)
+
+    def _init_segments(
+        self,
+        path: Path,
+        segments: List[Segment],
+        file_size: int,
+        status_code: int,
+        headers: Optional[Mapping[str, str]],
+        media_type: Optional[str]
+    ):
+        super().__init__(iter_segments(path, segments), status_code=status_code, headers=headers, media_type=media_type)
+        self.path = path
+        self.segments = segments
+        self.full_file = segments == [(0, file_size)]
+        self.body_length = sum(len(s) if isinstance(s, bytes) else s[1] for s in segments)
+
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        started = time.perf_counter()
+        mode = zero_copy_mode(scope, full_file=self.full_file) if scope["type"] == "http" else None
+        if mode is None:
+            await super().__call__(scope, receive, send)
+            self._sent(started)
+            return
+
+        #the fallback generator is never started, so it never opens the file
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if mode == PATHSEND:
+            await send({"type": PATHSEND, "path": str(self.path)})
+        else:
+            f = None
+            try:
+                last = len(self.segments) - 1
+                for i, segment in enumerate(self.segments):
+                    if isinstance(segment, bytes):
+                        await send({"type": "http.response.body", "body": segment, "more_body": i < last})
+                        continue
+
+                    if f is None:
+                        f = self.path.open("rb")
+                    await send({
+                        "type": ZEROCOPYSEND,
+                        "file": f,
+                        "offset": segment[0],
+                        "count": segment[1],
+                        "more_body": i < last
+                    })
+            finally:
+                if f is not None:
+                    f.close()
+
+        self._sent(started)
+        if self.background is not None:
+            await self.background()
+
+    def _sent(self, started: float):
+        if self.on_sent is not None:
+            self.on_sent(self.body_length, time.perf_counter() - started)
+
+
+class MultipartRangeResponse(FileRangeResponse):
+    """
+    Several byte ranges of a file as one multipart/byteranges 206 response.
+
+    Part headers and boundaries are small literal segments between the file
+    ranges, so the zero-copy path still hands every range to the kernel.
+
+    Args:
+        path (Path): File to send.
+        ranges (List[Tuple[int, int]]): Inclusive (start, end) byte ranges, in order.
+        file_size (int): Size of the whole file, for the part Content-Range headers.
+        media_type (str): Content-Type of each part.
+        headers (Mapping[str, str], optional): Extra response headers (ETag and so on).
+    """
+    def __init__(
+        self,
+        path: Path,
+        *,
+        ranges: List[Tuple[int, int]],
+        file_size: int,
+        media_type: str,
+        headers: Optional[Mapping[str, str]] = None
+    ):
+        boundary = secrets.token_hex(16)
+
+        segments: List[Segment] = []
+        for i, (start, end) in enumerate(ranges):
+            part = (
+                f"--{boundary}\r\n"
+                f"Content-Type: {media_type}\r\n"
+                f"Content-Range: bytes {start}-{end}/{file_size}\r\n\r\n"
+            )
+            segments.append((b"\r\n" if i else b"") + part.encode("latin-1"))
+            segments.append((start, end - start + 1))
+        segments.append(f"\r\n--{boundary}--\r\n".encode("latin-1"))
+
+        length = sum(len(s) if isinstance(s, bytes) else s[1] for s in segments)
+        headers = {**(headers or {}), "Content-Length": str(length)}
+
+        self.on_sent = None
+        self._init_segments(path, segments, file_size, 206, headers, f"multipart/byteranges; boundary={boundary}")
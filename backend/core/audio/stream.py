@@ -1,85 +1,227 @@
-from pathlib import Path
-from fastapi import Request, HTTPException
+from fastapi import Request, HTTPException, Response
 from fastapi.responses import StreamingResponse
-from typing import Union
+from functools import partial
+from typing import Callable, Optional, Union
 
-from backend.core.lib.utils import is_downloaded, get_audio_path, get_audio_size
+from backend.core.audio.file_index import FileIndex, FileInfo
+from backend.core.audio.growing import GrowingFile
+from backend.core.audio.head_cache import HeadCache
+from backend.core.audio.ranges import if_range_matches, not_modified, parse_range
+from backend.core.audio.sendfile import FileRangeResponse, MultipartRangeResponse
+from backend.core.audio.throughput import ThroughputEstimator, client_key
+from backend.core.audio.transcode import Transcoder
+from backend.core.lib.utils import get_audio_path
 from backend.core.models.track import Track
+from backend.exceptions import DownloadFailedError, InvalidRangeError, RangeNotSatisfiableError, TranscodeFailedError
 import backend.globals as G
 
-def stream_audio(req: Request, track_or_id: Union[Track, str], full: False) -> StreamingResponse:
+ORIGINAL = "original" #quality of the stored file
+
+
+def _file_info(track_id: str, file_index: Optional[FileIndex]) -> Optional[FileInfo]:
+    if file_index is not None:
+        return file_index.get(track_id)
+
+    path = get_audio_path(track_or_id=track_id)
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return FileInfo(path=path, size=st.st_size, mtime_ns=st.st_mtime_ns)
+
+
+def stream_audio(
+    req: Request,
+    track_or_id: Union[Track, str],
+    full: False,
+    file_index: Optional[FileIndex] = None,
+    head_cache: Optional[HeadCache] = None,
+    on_sent: Optional[Callable[[int, float], None]] = None,
+    start_at: Optional[int] = None
+) -> Response:
+    """
+    Serve a downloaded track with HTTP caching and range semantics.
+
+    The Content-Type is the stored container's (mp3, or opus/m4a for native
+    downloads). Every response carries a strong ETag and Last-Modified from the file's size and
+    mtime (cached in `file_index`, no stat per request). If-None-Match and
+    If-Modified-Since give 304, If-Range falls back to the full file when the
+    client's copy is stale, and several ranges come back as multipart/byteranges.
+    Single ranges starting inside the cached head of the track are served from
+    `head_cache` as far as it reaches.
+
+    Args:
+        req (Request): The incoming request, for its Range and conditional headers.
+        track_or_id (Union[Track, str]): Track to serve.
+        full (bool): Ignore Range and send the whole file.
+        file_index (FileIndex, optional): Cached file metadata, stat() per request without it.
+        head_cache (HeadCache, optional): First bytes of recently played and queued tracks.
+        on_sent (Callable[[int, float], None], optional): Throughput sample callback, see FileRangeResponse.
+        start_at (int, optional): Send from this byte to the end as a 206, instead of
+            what the Range header asks for (a time seek, see SeekIndexer).
+
+    Returns:
+        Response: 200, 206, 304 or a multipart 206.
+
+    Raises:
+        HTTPException: 404 when the file is missing, 400 on a malformed Range, 416
+            when no range overlaps the file.
+    """
     #checks for status
     if not track_or_id:
         raise HTTPException(status_code=404, detail="No track provided.")
-    
-    if not is_downloaded(track_or_id=track_or_id):
+
+    track_id = track_or_id.id if isinstance(track_or_id, Track) else track_or_id
+    info = _file_info(track_id, file_index)
+    if info is None:
         raise HTTPException(status_code=404, detail="Track not downloaded.")
 
-    file_path = get_audio_path(track_or_id=track_or_id)
-    file_size = get_audio_size(track_or_id=track_or_id)
+    head_lookup = None
+    if head_cache is not None:
+        head_lookup = lambda start: head_cache.get(track_id, info) if start < head_cache.head_bytes else None
+    return serve_file(req, info, full=full, media_type=info.media_type, head_lookup=head_lookup, on_sent=on_sent, start_at=start_at)
 
-    range_header = req.headers.get("range")
-    if range_header and not full:
-        #parse range heade: ex. bytes=0-1023
-        range_value = range_header.strip().lower()
-        if not range_value.startswith("bytes="):
-            raise HTTPException(status_code=400, detail="Invalid Range header")
 
-        range_value = range_value[len("bytes="):]
-        start_str, end_str = range_value.split("-")
+def serve_file(
+    req: Request,
+    info: FileInfo,
+    *,
+    full: bool,
+    media_type: str,
+    head_lookup: Optional[Callable[[int], Optional[bytes]]] = None,
+    on_sent: Optional[Callable[[int, float], None]] = None,
+    start_at: Optional[int] = None
+) -> Response:
+    """
+    The conditional and range handling of stream_audio for any file on disk.
 
+    Args:
+        req (Request): The incoming request.
+        info (FileInfo): File to send.
+        full (bool): Ignore Range and send the whole file.
+        media_type (str): Content-Type.
+        head_lookup (Callable[[int], Optional[bytes]], optional): Cached first bytes
+            of the file for a response starting at the given offset.
+        on_sent (Callable[[int, float], None], optional): Throughput sample callback.
+        start_at (int, optional): Byte to send from, overrides the Range header.
+    """
+    validators = {
+        "ETag": info.etag,
+        "Last-Modified": info.last_modified,
+        "Accept-Ranges": "bytes",
+    }
+
+    if not_modified(req.headers, info):
+        return Response(status_code=304, headers=validators)
+
+    ranges = None
+    range_header = req.headers.get("range")
+    if start_at is not None and start_at < info.size:
+        ranges = [(start_at, info.size - 1)]
+    elif range_header and not full and if_range_matches(req.headers, info):
         try:
-            start = int(start_str)
-            end = int(end_str) if end_str else file_size - 1
-        except ValueError:
-            raise HTTPException(status_code=400, detail="Invalid Range values")
-
-        if start >= file_size or end >= file_size:
-            raise HTTPException(status_code=416, detail="Range not satisfiable")
-
-        length = end - start + 1
-
-        #streaming in chunks
-        def iter_file_range(path: Path, start_byte: int, length_bytes: int):
-            with path.open("rb") as f:
-                f.seek(start_byte)
-                bytes_read = 0
-                while bytes_read < length_bytes:
-                    to_read = min(G.STREAM_CHUNK_SIZE, length_bytes - bytes_read)
-                    data = f.read(to_read)
-                    if not data:
-                        break
-                    bytes_read += len(data)
-                    yield data
+            ranges = parse_range(range_header, info.size, max_ranges=G.STREAM_MAX_RANGES)
+        except InvalidRangeError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except RangeNotSatisfiableError as e:
+            raise HTTPException(status_code=416, detail=str(e), headers={"Content-Range": f"bytes */{info.size}"})
 
+    if ranges and len(ranges) > 1:
+        return MultipartRangeResponse(info.path, ranges=ranges, file_size=info.size, media_type=media_type, headers=validators)
+
+    start, end = ranges[0] if ranges else (0, info.size - 1)
+    head = head_lookup(start) if head_lookup is not None else None
+
+    if not ranges:
+        #no (usable) range header, return full file
         headers = {
-            "Content-Range": f"bytes {start}-{end}/{file_size}",
-            "Accept-Ranges": "bytes",
-            "Content-Length": str(length),
-            "Content-Type": "audio/mpeg",
+            **validators,
+            "Content-Length": str(info.size),
+            "Content-Type": media_type,
         }
+        return FileRangeResponse(info.path, start=0, length=info.size, file_size=info.size, status_code=200, headers=headers, head=head, on_sent=on_sent)
 
-        return StreamingResponse(
-            iter_file_range(file_path, start, length),
-            status_code=206,
-            headers=headers,
-        )
+    length = end - start + 1
+    headers = {
+        **validators,
+        "Content-Range": f"bytes {start}-{end}/{info.size}",
+        "Content-Length": str(length),
+        "Content-Type": media_type,
+    }
+    return FileRangeResponse(info.path, start=start, length=length, file_size=info.size, status_code=206, headers=headers, head=head, on_sent=on_sent)
 
-    else:
-        #if no range header, return full file
-        def iter_file(path: Path):
-            with path.open("rb") as f:
-                while chunk := f.read(G.STREAM_CHUNK_SIZE):
-                    yield chunk
 
-        headers = {
-            "Content-Length": str(file_size),
-            "Accept-Ranges": "bytes",
-            "Content-Type": "audio/mpeg",
-        }
+async def stream_audio_tier(
+    req: Request,
+    track_id: str,
+    quality: Optional[str],
+    *,
+    full: bool,
+    transcoder: Optional[Transcoder],
+    throughput: Optional[ThroughputEstimator],
+    file_index: Optional[FileIndex] = None,
+    head_cache: Optional[HeadCache] = None
+) -> Response:
+    """
+    stream_audio at a quality tier.
+
+    `quality` is a tier name from G.TRANSCODE_TIERS, "auto" to pick one from the
+    client's measured throughput, or None/"original" for the stored file. Tiers are
+    transcoded on first use and cached on disk; when that fails (no ffmpeg, broken
+    source) the original is served. Every response feeds the throughput estimate
+    and says which tier it is in X-Audio-Quality.
+
+    Raises:
+        HTTPException: 400 on an unknown tier, and the errors of stream_audio.
+    """
+    client = client_key(req)
+    on_sent = partial(throughput.record, client) if throughput is not None else None
+    tiers = transcoder.tiers if transcoder is not None else {}
+
+    tier = None
+    if quality == "auto":
+        if throughput is not None:
+            tier = throughput.choose(client, [(t.name, t.kbps) for t in tiers.values()], G.TRANSCODE_ORIGINAL_KBPS)
+    elif quality not in (None, ORIGINAL):
+        if quality not in tiers:
+            raise HTTPException(status_code=400, detail=f"Unknown quality {quality!r}, expected one of {[ORIGINAL, 'auto', *tiers]}")
+        tier = quality
+
+    if tier is not None:
+        try:
+            info = await transcoder.ensure(track_id, tier)
+        except TranscodeFailedError as e:
+            print(f"[Stream] Serving the original of {track_id}: {e}")
+        else:
+            response = serve_file(req, info, full=full, media_type=tiers[tier].media_type, on_sent=on_sent)
+            response.headers["X-Audio-Quality"] = tier
+            return response
+
+    response = stream_audio(req=req, track_or_id=track_id, full=full, file_index=file_index, head_cache=head_cache, on_sent=on_sent)
+    response.headers["X-Audio-Quality"] = ORIGINAL
+    return response
+
+
+def stream_growing(growing: GrowingFile, *, chunk_size: int = G.STREAM_CHUNK_SIZE, poll: float = G.PROGRESSIVE_POLL_S) -> Response:
+    """
+    Serve a track that is still downloading, its bytes sent as they land.
+
+    The length isn't known yet, so this is a chunked 200 without ranges, validators
+    or caching; the player can seek once it reloads the finished track. The
+    response ends with the download, or breaks if the download fails.
+
+    Raises:
+        HTTPException: 503 if the download already failed.
+    """
+    try:
+        f = growing.open()
+    except DownloadFailedError as e:
+        raise HTTPException(status_code=503, detail=str(e))
 
-        return StreamingResponse(
-            iter_file(file_path), 
-            status_code=200, 
-            headers=headers
-        )
+    headers = {
+        "Accept-Ranges": "none",
+        "Cache-Control": "no-store",
+        "X-Audio-Quality": ORIGINAL,
+        "X-Audio-Progressive": "1",
+    }
+    return StreamingResponse(growing.tail(f, chunk_size=chunk_size, poll=poll), media_type=growing.media_type, headers=headers)
@@ -0,0 +1,85 @@
+from collections import OrderedDict
+from typing import Optional, Sequence, Tuple
+
+from fastapi import Request
+
+
+def client_key(req: Request) -> str:
+    """
+    Who a throughput sample belongs to. Behind the cloudflared tunnel every request
+    comes from localhost, the real address is in CF-Connecting-IP.
+    """
+    forwarded = req.headers.get("cf-connecting-ip")
+    if forwarded:
+        return forwarded
+    return req.client.host if req.client else "unknown"
+
+
+class ThroughputEstimator:
+    """
+    Per-client download speed, an EWMA over the stream responses each client received.
+
+    Samples come from FileRangeResponse (body length and send time). Responses
+    smaller than `min_bytes` are skipped: they are dominated by latency, or
+    served from the head cache, and say little about the link.
+
+    Args:
+        alpha (float): Weight of the newest sample.
+        min_bytes (int): Smallest response that counts as a sample.
+        headroom (float): How many times a tier's bitrate the link must carry
+            before that tier is picked.
+        max_clients (int): Clients remembered, least recently seen go first.
+    """
+    def __init__(
+        self,
+        *,
+        alpha: float = 0.3,
+        min_bytes: int = 256 * 1024,
+        headroom: float = 1.5,
+        max_clients: int = 1024
+    ):
+        self.alpha = alpha
+        self.min_bytes = min_bytes
+        self.headroom = headroom
+        self.max_clients = max_clients
+        self._kbps: OrderedDict[str, float] = OrderedDict() #client -> ewma kbps
+
+    def record(self, client: str, nbytes: int, seconds: float):
+        if nbytes < self.min_bytes or seconds <= 0:
+            return
+        sample = nbytes * 8 / 1000 / seconds
+
+        previous = self._kbps.pop(client, None)
+        self._kbps[client] = sample if previous is None else self.alpha * sample + (1 - self.alpha) * previous
+        if len(self._kbps) > self.max_clients:
+            self._kbps.popitem(last=False)
+
+    def estimate(self, client: str) -> Optional[float]:
+        """
+        Returns:
+            Optional[float]: Estimated kbps, None before the first sample.
+        """
+        return self._kbps.get(client)
+
+    def choose(self, client: str, tiers: Sequence[Tuple[str, int]], original_kbps: int) -> Optional[str]:
+        """
+        The best tier the client's link can carry.
+
+        Args:
+            client (str): Key from client_key.
+            tiers (Sequence[Tuple[str, int]]): (name, kbps) of the available tiers.
+            original_kbps (int): Bitrate of the stored file.
+
+        Returns:
+            Optional[str]: Tier name, None for the original file (also while the
+                client has no estimate yet, its first responses become the samples).
+        """
+        kbps = self.estimate(client)
+        if kbps is None or kbps >= original_kbps * self.headroom or not tiers:
+            return None
+
+        ladder = sorted(tiers, key=lambda tier: tier[1], reverse=True)
+        for name, tier_kbps in ladder:
+            if kbps >= tier_kbps * self.headroom:
+                return name
+        return ladder[-1][0]
@@ -0,0 +1,299 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+from backend.core.audio.file_index import FileIndex, FileInfo
+from backend.core.events.event_bus import EventBus
+from backend.core.lib.metrics import MetricsRegistry
+from backend.core.models.event import Event
+from backend.exceptions import TranscodeFailedError
+
+from backend.core.models.enums import AudioDatabaseAction as ADA
+
+
+#codec -> (file extension, ffmpeg muxer, content type, encoder arguments)
+CODECS: Dict[str, Tuple[str, str, str, Tuple[str, ...]]] = {
+    "aac": ("m4a", "ipod", "audio/mp4", ("-c:a", "aac", "-movflags", "+faststart")), #moov atom first, playable from a range request
+    "opus": ("opus", "opus", "audio/ogg", ("-c:a", "libopus", "-application", "audio")),
+}
+
+
+@dataclass(frozen=True)
+class Tier:
+    name: str
+    codec: str
+    kbps: int
+
+    @property
+    def ext(self) -> str:
+        return CODECS[self.codec][0]
+
+    @property
+    def media_type(self) -> str:
+        return CODECS[self.codec][2]
+
+
+def parse_tiers(config: Mapping[str, Tuple[str, int]]) -> Dict[str, Tier]:
+    """Tiers from G.TRANSCODE_TIERS ({name: (codec, kbps)})."""
+    tiers = {}
+    for name, (codec, kbps) in config.items():
+        if codec not in CODECS:
+            raise ValueError(f"Unknown transcode codec {codec!r} for tier {name!r}, expected one of {sorted(CODECS)}")
+        tiers[name] = Tier(name=name, codec=codec, kbps=int(kbps))
+    return tiers
+
+
+def ffmpeg_command(ffmpeg: str, src: Path, dst: Path, tier: Tier) -> List[str]:
+    _, muxer, _, encoder = CODECS[tier.codec]
+    return [
+        ffmpeg,
+        "-hide_banner",
+        "-loglevel", "error",
+        "-nostdin",
+        "-y",
+        "-i", str(src),
+        "-map", "0:a:0", #drops embedded cover art
+        "-vn",
+        *encoder,
+        "-b:a", f"{tier.kbps}k",
+        "-f", muxer,
+        str(dst)
+    ]
+
+
+class Transcoder:
+    """
+    Lower bitrate renditions of downloaded tracks, made by ffmpeg and kept on disk.
+
+    Renditions are `{id}.{tier}.{ext}` files in `cache_dir`, in an LRU bounded by
+    total bytes that is rebuilt from the folder (oldest mtime first) on load().
+    Concurrent requests for the same rendition share one ffmpeg run, and at most
+    `workers` ffmpeg processes run at once so transcodes can't starve the streams
+    served from the same box. Renditions of a track are deleted when the
+    AudioDatabase announces it was re-downloaded or removed.
+
+    Args:
+        cache_dir (Path): Folder of the renditions.
+        tiers (Mapping[str, Tier]): Available tiers by name.
+        file_index (FileIndex): Source files.
+        max_bytes (int): Total size of the renditions kept.
+        workers (int): Concurrent ffmpeg processes.
+        timeout (float): Seconds a transcode may take.
+        ffmpeg (str): ffmpeg executable.
+        metrics (MetricsRegistry, optional): Records transcode_jobs_total{tier, result},
+            transcode_seconds{tier} and transcode_evictions_total.
+        event_bus (EventBus, optional): Bus the AudioDatabase publishes on.
+        source (str, optional): Name of the AudioDatabase whose events to follow.
+    """
+    def __init__(
+        self,
+        *,
+        cache_dir: Path,
+        tiers: Mapping[str, Tier],
+        file_index: FileIndex,
+        max_bytes: int,
+        workers: int = 2,
+        timeout: float = 120.0,
+        ffmpeg: str = "ffmpeg",
+        metrics: Optional[MetricsRegistry] = None,
+        event_bus: Optional[EventBus] = None,
+        source: Optional[str] = None
+    ):
+        self.cache_dir = cache_dir
+        self.tiers = dict(tiers)
+        self.file_index = file_index
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.ffmpeg = ffmpeg
+        self.metrics = metrics
+
+        self._entries: OrderedDict[Tuple[str, str], FileInfo] = OrderedDict() #(id, tier) -> rendition, oldest first
+        self._bytes = 0
+        self._jobs: Dict[Tuple[str, str], asyncio.Task] = {}
+        self._slots = asyncio.Semaphore(workers)
+
+        if event_bus and source:
+            for action in (ADA.LOG_DOWNLOAD, ADA.UNLOG_DOWNLOAD, ADA.UNLOG_TRACK):
+                event_bus.subscribe(source=source, action=action, handler=self._on_download)
+            event_bus.subscribe(source=source, action=ADA.LOG_DOWNLOADS, handler=self._on_downloads)
+
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size(self) -> int:
+        return self._bytes
+
+    def path(self, id: str, tier: Tier) -> Path:
+        return self.cache_dir / f"{id}.{tier.name}.{tier.ext}"
+
+
+    #startup
+    async def load(self):
+        """Index the renditions already on disk and delete leftovers of interrupted runs."""
+        found = await asyncio.to_thread(self._scan)
+        for key, info in found:
+            self._put(key, info)
+        print(f"[Transcoder] {len(self._entries)} renditions, {self._bytes / 1e6:.1f}MB")
+
+    def _scan(self) -> List[Tuple[Tuple[str, str], FileInfo]]:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        found = []
+        with os.scandir(self.cache_dir) as it:
+            for entry in it:
+                if not entry.is_file():
+                    continue
+                if entry.name.endswith(".part"):
+                    os.unlink(entry.path)
+                    continue
+
+                id, _, rest = entry.name.partition(".")
+                tier = self.tiers.get(rest.partition(".")[0])
+                if tier is None or entry.name != f"{id}.{tier.name}.{tier.ext}":
+                    continue #tier removed from the config, left for the user to clean up
+                st = entry.stat()
+                found.append(((id, tier.name), FileInfo(path=Path(entry.path), size=st.st_size, mtime_ns=st.st_mtime_ns)))
+
+        found.sort(key=lambda item: item[1].mtime_ns)
+        return found
+
+
+    #lookups
+    def get(self, id: str, tier: str) -> Optional[FileInfo]:
+        """The cached rendition, None if it hasn't been made."""
+        info = self._entries.get((id, tier))
+        if info is not None:
+            self._entries.move_to_end((id, tier))
+        return info
+
+    async def ensure(self, id: str, tier: str) -> FileInfo:
+        """
+        The rendition of `id` at `tier`, transcoding it first if needed.
+
+        The transcode runs in its own task, a client that gives up doesn't cancel
+        it for the others waiting on it (or for the next play).
+
+        Raises:
+            KeyError: If `tier` isn't configured.
+            TranscodeFailedError: If the source is missing or ffmpeg fails.
+        """
+        info = self.get(id, tier)
+        if info is not None:
+            return info
+
+        key = (id, self.tiers[tier].name)
+        task = self._jobs.get(key)
+        if task is None:
+            task = asyncio.get_running_loop().create_task(self._transcode(key))
+            task.add_done_callback(lambda _: self._jobs.pop(key, None))
+            self._jobs[key] = task
+        return await asyncio.shield(task)
+
+    async def close(self):
+        """Stop running transcodes (their ffmpeg processes are killed)."""
+        jobs = list(self._jobs.values())
+        for task in jobs:
+            task.cancel()
+        await asyncio.gather(*jobs, return_exceptions=True)
+
+    async def _transcode(self, key: Tuple[str, str]) -> FileInfo:
+        id, name = key
+        tier = self.tiers[name]
+        src = self.file_index.get(id)
+        if src is None:
+            raise TranscodeFailedError(f"{id} is not downloaded")
+
+        dst = self.path(id, tier)
+        part = dst.with_name(dst.name + ".part")
+        result = "error"
+        start = time.perf_counter()
+        try:
+            async with self._slots:
+                await asyncio.to_thread(self.cache_dir.mkdir, parents=True, exist_ok=True)
+                await self._run(ffmpeg_command(self.ffmpeg, src.path, part, tier))
+
+            #re-downloaded or removed while ffmpeg ran, the output is of the old file
+            if self.file_index.get(id) != src:
+                raise TranscodeFailedError(f"{id} changed while transcoding to {name}")
+
+            os.replace(part, dst)
+            st = os.stat(dst)
+            info = FileInfo(path=dst, size=st.st_size, mtime_ns=st.st_mtime_ns)
+            self._put(key, info)
+            result = "ok"
+            print(f"[Transcoder] {id} -> {name} ({st.st_size / 1e6:.1f}MB) in {time.perf_counter() - start:.2f}s")
+            return info
+        finally:
+            if result != "ok":
+                part.unlink(missing_ok=True)
+            if self.metrics:
+                self.metrics.inc("transcode_jobs_total", tier=name, result=result)
+                self.metrics.observe("transcode_seconds", time.perf_counter() - start, tier=name)
+
+    async def _run(self, cmd: List[str]):
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                *cmd,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.PIPE
+            )
+        except OSError as e:
+            raise TranscodeFailedError(f"Failed to start ffmpeg: {e}")
+
+        try:
+            _, stderr = await asyncio.wait_for(proc.communicate(), timeout=self.timeout)
+        except asyncio.TimeoutError:
+            proc.kill()
+            await proc.wait()
+            raise TranscodeFailedError(f"ffmpeg timed out after {self.timeout}s")
+        except asyncio.CancelledError:
+            proc.kill()
+            await proc.wait()
+            raise
+
+        if proc.returncode != 0:
+            raise TranscodeFailedError(f"ffmpeg exited with code {proc.returncode}: {stderr.decode(errors='replace').strip()}")
+
+
+    #cache bookkeeping
+    def _put(self, key: Tuple[str, str], info: FileInfo):
+        self._drop(key)
+        self._entries[key] = info
+        self._bytes += info.size
+
+        #the newest rendition stays even alone over the cap, it is about to be streamed
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            old_key, _ = next(iter(self._entries.items()))
+            self._drop(old_key, delete=True)
+            if self.metrics:
+                self.metrics.inc("transcode_evictions_total")
+
+    def _drop(self, key: Tuple[str, str], delete: bool = False):
+        info = self._entries.pop(key, None)
+        if info is None:
+            return
+        self._bytes -= info.size
+        if delete:
+            try:
+                info.path.unlink(missing_ok=True)
+            except OSError as e:
+                print(f"[Transcoder] Failed to delete {info.path.name}: {e}")
+
+    def invalidate(self, ids: Iterable[str]):
+        ids = set(ids)
+        for key in [key for key in self._entries if key[0] in ids]:
+            self._drop(key, delete=True)
+
+
+    #event handlers
+    def _on_download(self, event: Event):
+        self.invalidate([event.payload["content"]["id"]])
+
+    def _on_downloads(self, event: Event):
+        self.invalidate(track["id"] for track in event.payload["content"]["tracks"])
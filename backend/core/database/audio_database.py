@@ -1,31 +1,106 @@
 import asyncio
-from contextlib import contextmanager
+import json
+import re
+from contextlib import contextmanager, nullcontext
+from functools import lru_cache
 from pathlib import Path
 import sqlite3
-from typing import List, Optional
-
+from typing import Callable, Dict, List, Optional, Tuple
+
+from backend.core.database.library_cache import LibraryCache
+from backend.core.database.migrations import apply_migrations
+from backend.core.database.ordering import POSITION_GAP, plan_reorder, positions_between
+from backend.core.database.executor import DatabaseExecutor
+from backend.core.database.storage import AudioStorage, decode_cursor, download_file, search_tokens, track_formats, track_stats
+from backend.core.database.write_queue import GroupCommitQueue
 from backend.core.events.event_bus import EventBus
-from backend.core.lib.utils import run_in_executor
-from backend.core.models.event import Event
+from backend.core.lib.formats import mime_type
+from backend.core.lib.metrics import MetricsRegistry
 from backend.core.models.track import Track
+from backend.exceptions import PlaylistOrderError
 
 from backend.core.models.enums import AudioDatabaseAction as ADA
 
 
-class AudioDatabase:
+def build_fts_query(q: str) -> Optional[str]:
+    """
+    Turn a raw search box string into an FTS5 MATCH expression.
+
+    Every word becomes a quoted prefix term, so "beat ab" matches "Beatles - Abbey Road"
+    and user input can never inject FTS5 syntax. Returns None when the query has no
+    searchable words (punctuation only), in which case callers should fall back to LIKE.
+    """
+    tokens = search_tokens(q)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+@lru_cache(maxsize=512)
+def query_op(query: str) -> str:
+    """Short metrics label for a sql string, e.g. "select_downloads" or "update_tracks"."""
+    verb = re.match(r"\s*(\w+)", query)
+    table = re.search(r"\b(?:FROM|INTO|UPDATE|TABLE|INDEX)\s+(?:IF (?:NOT )?EXISTS\s+)?(\w+)", query, re.IGNORECASE)
+    return "_".join(m.group(1).lower() for m in (verb, table) if m) or "query"
+
+
+class AudioDatabase(AudioStorage):
     def __init__(
         self, 
         *,
         name: str,
         filepath: Path,
         event_bus: Optional[EventBus] = None,
+
+        wal: bool = False,
+        reader_pool_size: int = 4,
+        cache_size_kb: Optional[int] = None,
+        mmap_size: Optional[int] = None,
+
+        group_commit: bool = False,
+        group_commit_max_ops: int = 64,
+        group_commit_delay_ms: float = 0,
+
+        library_cache: Optional[LibraryCache] = None,
+        metrics: Optional[MetricsRegistry] = None,
     ):
-        self.name = name
+        """
+        Args:
+            name (str): Event source name.
+            filepath (Path): Location of the sqlite file.
+            event_bus (EventBus, optional): Bus that receives ADA events.
+            wal (bool): Open the database in WAL mode. Writes stay serialized on
+                one writer connection behind the lock, while reads go through a
+                pool of reader threads, each with its own connection, and never
+                wait on the lock.
+            reader_pool_size (int): Number of reader threads (and connections) in WAL mode.
+            cache_size_kb (int, optional): Page cache size per connection in KiB.
+            mmap_size (int, optional): Bytes of the file to memory map per connection.
+            group_commit (bool): Write-behind mode, requires wal. Writes are queued and
+                committed together every `group_commit_delay_ms` or every
+                `group_commit_max_ops` operations, callers still await durability.
+            group_commit_max_ops (int): Operations per group commit.
+            group_commit_delay_ms (float): Max time a write waits for others to join its batch.
+                With 0, batches still form from whatever queued up while the previous
+                commit was in flight, without adding latency to lone writes.
+            library_cache (LibraryCache, optional): Read-through cache for the downloads
+                listing. It follows this database's events, so it must be subscribed to
+                the same event bus under this database's name.
+            metrics (MetricsRegistry, optional): Records per-query timing, queue wait and
+                rows returned for both executors, see DatabaseExecutor.
+        """
+        if group_commit and not wal:
+            raise ValueError("group_commit requires wal mode, reads need their own connections")
+
+        super().__init__(name=name, event_bus=event_bus, library_cache=library_cache, metrics=metrics)
 
         self._filepath = filepath
-        self._event_bus = event_bus
         self._lock = asyncio.Lock()
 
+        self._wal = wal
+        self._cache_size_kb = cache_size_kb
+        self._mmap_size = mmap_size
+
         self.TRACKS_TABLE = "tracks"
         self.DOWNLOADS_TABLE = "downloads"
         self.LIKES_TABLE = "likes"
@@ -35,6 +110,17 @@ class AudioDatabase:
         self.PLAYLISTS_TABLE = "playlists"
         self.PLAYLIST_TRACKS_TABLE = "playlist_tracks"
 
+        #(size, mtime) of every audio file at the last reconcile pass (migration 3)
+        self.FILE_MANIFEST_TABLE = "file_manifest"
+
+        #library change log filled by triggers, and its compaction floor (migration 4)
+        self.CHANGES_TABLE = "changes"
+        self.SYNC_META_TABLE = "sync_meta"
+
+        #full text index over effective title/artist, only if sqlite was compiled with fts5
+        self.TRACKS_FTS_TABLE = "tracks_fts"
+        self._fts = False
+
         #ensure parent directories exist
         self._filepath.parent.mkdir(parents=True, exist_ok=True)
 
@@ -45,19 +131,62 @@ class AudioDatabase:
         else:
             print(f"[AudioDatabase] Using existing database at {self._filepath}")
 
-        #connect
-        self._conn = sqlite3.connect(
+        #connect, the writer connection is the only one allowed to mutate
+        self._conn = self._connect()
+        if self._wal:
+            self._conn.execute("PRAGMA journal_mode = WAL;")
+            self._conn.execute("PRAGMA synchronous = NORMAL;") #durable across app crashes, fsync only on checkpoint
+
+        #database work runs on its own threads instead of the loop's default executor.
+        #a single writer thread is the only one that ever touches the writer connection
+        self._writer = DatabaseExecutor(name="writer", connect=lambda: self._conn, size=1, metrics=metrics, db=name)
+
+        #readers only exist in wal mode, otherwise reads share the writer thread, connection and lock
+        self._readers = DatabaseExecutor(
+            name="reader",
+            connect=self._connect_reader,
+            size=reader_pool_size,
+            metrics=metrics,
+            db=name
+        ) if self._wal else None
+
+        #in group commit mode the queue owns the writer thread and replaces the write lock
+        self._write_queue = GroupCommitQueue(
+            executor=self._writer,
+            max_ops=group_commit_max_ops,
+            max_delay=group_commit_delay_ms / 1000
+        ) if group_commit else None
+
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
             self._filepath,
             detect_types=sqlite3.PARSE_DECLTYPES,
-            check_same_thread=False #allow multithread access
+            check_same_thread=False #created on the loop thread and closed there, used by one executor thread
         )
-        self._conn.row_factory = sqlite3.Row
-        self._conn.execute("PRAGMA foreign_keys = ON;")
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA foreign_keys = ON;")
+        conn.execute("PRAGMA busy_timeout = 5000;")
+
+        if self._cache_size_kb is not None:
+            conn.execute(f"PRAGMA cache_size = {-int(self._cache_size_kb)};") #negative means KiB instead of pages
+        if self._mmap_size is not None:
+            conn.execute(f"PRAGMA mmap_size = {int(self._mmap_size)};")
+        return conn
 
+    def _connect_reader(self) -> sqlite3.Connection:
+        conn = self._connect()
+        conn.execute("PRAGMA query_only = ON;")
+        return conn
 
-    def close(self):
-        if self._conn:
-            self._conn.close()
+
+    async def close(self):
+        #queued group commit writes land before the writer thread goes away
+        if self._write_queue:
+            await self._write_queue.close()
+        if self._readers:
+            self._readers.close()
+        self._writer.close() #also closes the writer connection
 
 
     @contextmanager
@@ -74,35 +203,51 @@ class AudioDatabase:
             cur.close()
 
 
-    #async functions thanks to the decorator, prevents blocking on heavier db operations
-    @run_in_executor
-    def _execute(self, query: str, params: tuple = ()):
-        with self.cursor() as cur:
-            cur.execute(query, params)
+    #writes run on the writer thread, prevents blocking on heavier db operations
+    async def _commit_now(self, func: Callable[[sqlite3.Cursor], object], op: str):
+        def commit(conn: sqlite3.Connection):
+            with self.cursor() as cur:
+                return func(cur)
+        return await self._writer.run(commit, op=op)
+
+    async def _transaction(self, func: Callable[[sqlite3.Cursor], object], op: Optional[str] = None):
+        #runs several statements as one commit, func receives the cursor and its return value is passed back
+        #in group commit mode it joins the next batch instead, still resolving only once durable
+        if self._write_queue:
+            return await self._write_queue.submit(func)
+        return await self._commit_now(func, op=op or func.__name__)
 
-    @run_in_executor
-    def _fetchone(self, query: str, params: tuple = ()):
-        with self.cursor() as cur:
-            return cur.execute(query, params).fetchone()
+    async def _execute(self, query: str, params: tuple = ()):
+        await self._transaction(lambda cur: cur.execute(query, params), op=query_op(query))
 
-    @run_in_executor
-    def _fetchall(self, query: str, params: tuple = ()):
-        with self.cursor() as cur:
-            return cur.execute(query, params).fetchall()
+    def _write_guard(self):
+        #the group commit queue already serializes writes, holding the lock would stop batching
+        return nullcontext() if self._write_queue else self._lock
 
-    async def _emit_event(self, action: str, payload: Optional[dict] = None):
-        if self._event_bus:
-            event = Event(
-                source=self.name,
-                action=action,
-                payload={**(payload or {})}
-            )
-            await self._event_bus.publish(event)
+    async def flush(self):
+        """Wait until every queued write is committed (no-op outside group commit mode)."""
+        if self._write_queue:
+            await self._write_queue.flush()
+
+    #reads, served by the reader threads in wal mode
+    def _read_guard(self):
+        #wal readers see the last committed snapshot so they don't need the write lock
+        return nullcontext() if self._readers else self._lock
+
+    def _read_executor(self) -> DatabaseExecutor:
+        #outside wal mode the writer thread and connection double as the reader (guarded by the lock)
+        return self._readers or self._writer
+
+    async def _read_one(self, query: str, params: tuple = ()):
+        return await self._read_executor().run(lambda conn: conn.execute(query, params).fetchone(), op=query_op(query))
+
+    async def _read_all(self, query: str, params: tuple = ()):
+        return await self._read_executor().run(lambda conn: conn.execute(query, params).fetchall(), op=query_op(query))
 
 
     #callable exposed functions
     async def build(self):
-        async with self._lock:
+        async with self._write_guard():
             await self._execute(f'''
                 CREATE TABLE IF NOT EXISTS {self.TRACKS_TABLE} (
                     id TEXT PRIMARY KEY,
@@ -147,11 +292,97 @@ class AudioDatabase:
                 );
             ''')
 
+            #schema changes since the tables above, tracked with PRAGMA user_version
+            await self._transaction(apply_migrations, op="migrations")
+
+            self._fts = await self._transaction(self._build_search_index, op="build_search_index")
+
+
+    def _build_search_index(self, cur: sqlite3.Cursor) -> bool:
+        """
+        Create the FTS5 search index over tracks and the triggers that keep it in sync.
+
+        The index is keyed by the tracks rowid and stores the effective (custom or
+        original) title and artist, plus the overridden originals in `aliases` so a
+        renamed track is still found by its old name. On a fresh index existing tracks
+        are backfilled once.
+
+        Returns:
+            bool: False if this sqlite build has no FTS5, in which case search()
+                falls back to LIKE scans.
+        """
+        fts = self.TRACKS_FTS_TABLE
+        effective = '''
+            COALESCE(new.custom_title, new.title),
+            COALESCE(new.custom_artist, new.artist),
+            CASE WHEN new.custom_title IS NOT NULL THEN new.title ELSE '' END || ' ' ||
+            CASE WHEN new.custom_artist IS NOT NULL THEN COALESCE(new.artist, '') ELSE '' END
+        '''
+
+        exists = cur.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?;", (fts,)
+        ).fetchone() is not None
+
+        try:
+            cur.execute(f'''
+                CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5(
+                    title, 
+                    artist, 
+                    aliases,
+                    tokenize = 'unicode61 remove_diacritics 2',
+                    prefix = '2 3'
+                );
+            ''')
+        except sqlite3.OperationalError as e:
+            print(f"[AudioDatabase] FTS5 unavailable ({e}), search falls back to LIKE scans")
+            return False
+
+        cur.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {self.TRACKS_TABLE} BEGIN
+                INSERT INTO {fts} (rowid, title, artist, aliases) VALUES (new.rowid, {effective});
+            END;
+        ''')
+        cur.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {self.TRACKS_TABLE} BEGIN
+                DELETE FROM {fts} WHERE rowid = old.rowid;
+            END;
+        ''')
+        cur.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS {fts}_au AFTER UPDATE ON {self.TRACKS_TABLE} BEGIN
+                DELETE FROM {fts} WHERE rowid = old.rowid;
+                INSERT INTO {fts} (rowid, title, artist, aliases) VALUES (new.rowid, {effective});
+            END;
+        ''')
+
+        if not exists:
+            cur.execute(f'''
+                INSERT INTO {fts} (rowid, title, artist, aliases)
+                SELECT rowid, {effective.replace("new.", "")}
+                FROM {self.TRACKS_TABLE};
+            ''')
+
+        return True
+
+
+    async def count_rows(self) -> Dict[str, int]:
+        """
+        Row count of every table in one query, the cheap startup summary instead of view_all().
+
+        Returns:
+            Dict[str, int]: Table name to row count.
+        """
+        tables = (self.TRACKS_TABLE, self.DOWNLOADS_TABLE, self.LIKES_TABLE, self.PLAYLISTS_TABLE, self.PLAYLIST_TRACKS_TABLE)
+        columns = ", ".join(f"(SELECT COUNT(*) FROM {table}) AS {table}" for table in tables)
+
+        async with self._read_guard():
+            row = await self._read_one(f"SELECT {columns};")
+        return {table: row[table] for table in tables}
 
     async def view_all(self):
-        async with self._lock:
+        #debug dump of every row, prints the whole library so keep it out of the startup path
+        async with self._read_guard():
             print("\n=== TRACKS TABLE ===")
-            tracks = await self._fetchall(f"SELECT * FROM {self.TRACKS_TABLE};")
+            tracks = await self._read_all(f"SELECT * FROM {self.TRACKS_TABLE};")
             if tracks:
                 for row in tracks:
                     print(dict(row))
@@ -159,7 +390,7 @@ class AudioDatabase:
                 print("(no tracks found)")
 
             print("\n=== DOWNLOADS TABLE ===")
-            downloads = await self._fetchall(f"SELECT * FROM {self.DOWNLOADS_TABLE};")
+            downloads = await self._read_all(f"SELECT * FROM {self.DOWNLOADS_TABLE};")
             if downloads:
                 for row in downloads:
                     print(dict(row))
@@ -167,7 +398,7 @@ class AudioDatabase:
                 print("(no downloads found)")
 
             print("\n=== PLAYLISTS TABLE ===")
-            playlists = await self._fetchall(f"SELECT * FROM {self.PLAYLISTS_TABLE};")
+            playlists = await self._read_all(f"SELECT * FROM {self.PLAYLISTS_TABLE};")
             if playlists:
                 for row in playlists:
                     print(dict(row))
@@ -175,7 +406,7 @@ class AudioDatabase:
                 print("(no playlists found)")
 
             print("\n=== PLAYLIST_TRACKS TABLE ===")
-            playlist_tracks = await self._fetchall(f"SELECT * FROM {self.PLAYLIST_TRACKS_TABLE};")
+            playlist_tracks = await self._read_all(f"SELECT * FROM {self.PLAYLIST_TRACKS_TABLE};")
             if playlist_tracks:
                 for row in playlist_tracks:
                     print(dict(row))
@@ -183,6 +414,21 @@ class AudioDatabase:
                 print("(no playlist tracks found)")
 
 
+    def _upsert_track_query(self) -> str:
+        #upsert rather than INSERT OR REPLACE, a replace deletes the old row first which
+        #cascades into downloads/likes/playlists and skips the search index triggers
+        return f'''
+            INSERT INTO {self.TRACKS_TABLE}
+            (id, title, artist, duration, custom_title, custom_artist)
+            VALUES (?, ?, ?, ?, NULL, NULL)
+            ON CONFLICT(id) DO UPDATE SET
+                title = excluded.title,
+                artist = excluded.artist,
+                duration = excluded.duration,
+                custom_title = NULL,
+                custom_artist = NULL;
+        '''
+
     async def log_track(self, track: Track):
         """
         Log (insert or update) a track's metadata into the TRACKS table.
@@ -210,12 +456,8 @@ class AudioDatabase:
         Example:
             >>> await db.log_track(Track(id="abc123", title="Song", artist="Artist", duration=200))
         """
-        async with self._lock:
-            await self._execute(f'''
-                INSERT OR REPLACE INTO {self.TRACKS_TABLE}
-                (id, title, artist, duration, custom_title, custom_artist)
-                VALUES (?, ?, ?, ?, NULL, NULL);
-            ''', (
+        async with self._write_guard():
+            await self._execute(self._upsert_track_query(), (
                 track.id,
                 track.title,
                 track.artist,
@@ -259,7 +501,7 @@ class AudioDatabase:
             # Removes the track metadata and all related entries
         """
         #deletes via ON DELETE CASCADE foreign keys automatically cleaning up tables
-        async with self._lock:
+        async with self._write_guard():
             await self._execute(f'''
                 DELETE FROM {self.TRACKS_TABLE}
                 WHERE id = ?;
@@ -282,15 +524,21 @@ class AudioDatabase:
         Returns:
             bool: True if the track exists in TRACKS, False otherwise.
         """
-        async with self._lock:
-            row = await self._fetchone(f'''
+        async with self._read_guard():
+            row = await self._read_one(f'''
                 SELECT 1 FROM {self.TRACKS_TABLE} WHERE id = ? LIMIT 1;
             ''', (track_id,))
             return row is not None
 
 
 
-    async def log_download(self, id: str) -> dict:
+    async def log_download(
+        self,
+        id: str,
+        format: Optional[str] = None,
+        size: Optional[int] = None,
+        mtime_ns: Optional[int] = None
+    ) -> dict:
         """
         Log a new download event for an existing track and return its full metadata.
 
@@ -303,8 +551,14 @@ class AudioDatabase:
         TRACKS_TABLE (id, title, artist, duration), emits an ADA.LOG_DOWNLOAD
         event, and returns the track object.
 
+        When the downloaded file is known, its container and stat() are written
+        with the row (see ingest_many), replacing those of an earlier download.
+
         Args:
             id (str): The unique track ID to log as downloaded.
+            format (str, optional): Container of the downloaded file, e.g. "opus".
+            size (int, optional): Size of the file in bytes, recorded with `format`.
+            mtime_ns (int, optional): Modification time of the file, recorded with `format`.
 
         Returns:
             dict: A dictionary containing the track's metadata:
@@ -323,37 +577,175 @@ class AudioDatabase:
             >>> track = await db.log_download("abc123")
             {"id": "abc123", "title": "Song A", "artist": "Artist X", "duration": 210}
         """
-        async with self._lock:
-            # Insert into downloads table
-            await self._execute(f'''
-                INSERT OR IGNORE INTO {self.DOWNLOADS_TABLE} (id, downloaded_at)
-                VALUES (?, CURRENT_TIMESTAMP);
-            ''', (id,))
-
-            # Fetch full track metadata from tracks table
-            row = await self._fetchone(f'''
-                SELECT t.id,
-                       COALESCE(t.custom_title, t.title) AS title,
-                       COALESCE(t.custom_artist, t.artist) AS artist,
-                       t.duration
-                FROM {self.TRACKS_TABLE} t
-                WHERE t.id = ?;
-            ''', (id,))
+        formats, stats = download_file(id, format, size, mtime_ns)
 
-            if row is None:
+        def log(cur: sqlite3.Cursor) -> dict:
+            #insert and read back in one transaction, in group commit mode too
+            tracks = self._insert_downloads(cur, [id], [], formats, stats)
+            if not tracks:
                 raise ValueError(f"Track with id {id} does not exist in TRACKS_TABLE")
+            return tracks[0]
+
+        async with self._write_guard():
+            track = await self._transaction(log, op="log_download")
 
-            track = {
+            # Emit event with full track object
+            await self._emit_download(track, formats, stats)
+
+            return track
+
+
+
+    #bulk ingest, one transaction and one event per batch instead of per track
+    def _insert_tracks(self, cur: sqlite3.Cursor, tracks: List[Track]):
+        cur.executemany(self._upsert_track_query(), [
+            (track.id, track.title, track.artist, track.duration) 
+            for track in tracks
+        ])
+
+    def _insert_downloads(
+        self,
+        cur: sqlite3.Cursor,
+        ids: List[str],
+        memberships: List[Tuple[str, int]],
+        formats: Optional[Dict[str, str]] = None,
+        stats: Optional[Dict[str, Tuple[int, int]]] = None
+    ) -> List[dict]:
+        if formats is None:
+            cur.executemany(f'''
+                INSERT OR IGNORE INTO {self.DOWNLOADS_TABLE} (id, downloaded_at)
+                VALUES (?, CURRENT_TIMESTAMP);
+            ''', [(id,) for id in ids])
+        else:
+            #a re-download may land in another container, the row follows the file (stats of the old one go too)
+            stats = stats or {}
+            cur.executemany(f'''
+                INSERT INTO {self.DOWNLOADS_TABLE} (id, downloaded_at, format, mime, size, mtime_ns)
+                VALUES (?, CURRENT_TIMESTAMP, ?, ?, ?, ?)
+                ON CONFLICT (id) DO UPDATE SET
+                    format = excluded.format,
+                    mime = excluded.mime,
+                    size = excluded.size,
+                    mtime_ns = excluded.mtime_ns;
+            ''', [(id, formats[id], mime_type(formats[id]), *stats.get(id, (None, None))) for id in ids])
+
+        cur.executemany(self._append_membership_query(), [
+            (playlist_id, track_id, playlist_id) 
+            for track_id, playlist_id in memberships
+        ])
+
+        #json_each keeps this to one bound parameter regardless of batch size
+        rows = cur.execute(f'''
+            SELECT t.id,
+                   COALESCE(t.custom_title, t.title) AS title,
+                   COALESCE(t.custom_artist, t.artist) AS artist,
+                   t.duration
+            FROM {self.TRACKS_TABLE} t
+            WHERE t.id IN (SELECT value FROM json_each(?));
+        ''', (json.dumps(ids),)).fetchall()
+
+        by_id = {
+            row["id"]: {
                 "id": row["id"],
                 "title": row["title"],
                 "artist": row["artist"],
                 "duration": row["duration"]
             }
+            for row in rows
+        }
+        return [by_id[id] for id in ids if id in by_id]
 
-            # Emit event with full track object
-            await self._emit_event(action=ADA.LOG_DOWNLOAD, payload={"content": track})
 
-            return track
+    async def log_tracks_many(self, tracks: List[Track]):
+        """
+        Bulk version of log_track, upserts every track's metadata in one transaction.
+
+        Args:
+            tracks (List[Track]): Tracks to insert or update. Custom metadata is reset
+                the same way log_track does.
+
+        Emits:
+            ADA.LOG_TRACKS — once, with the list of logged track metadata.
+        """
+        if not tracks:
+            return
+
+        async with self._write_guard():
+            await self._transaction(lambda cur: self._insert_tracks(cur, tracks), op="log_tracks_many")
+
+            content = [
+                {
+                    "id": track.id,
+                    "title": track.title,
+                    "artist": track.artist,
+                    "duration": track.duration
+                }
+                for track in tracks
+            ]
+            await self._emit_event(action=ADA.LOG_TRACKS, payload={"content": content})
+
+
+    async def log_downloads_many(self, ids: List[str], memberships: Optional[List[Tuple[str, int]]] = None) -> List[dict]:
+        """
+        Bulk version of log_download, optionally adding the downloads to playlists.
+
+        All ids must already be logged in TRACKS. Downloads and playlist memberships
+        are written with executemany in a single transaction, so either all of them
+        land or none do.
+
+        Args:
+            ids (List[str]): Track ids to mark as downloaded.
+            memberships (List[Tuple[str, int]], optional): (track_id, playlist_id) pairs
+                to insert into PLAYLIST_TRACKS, existing pairs are kept.
+
+        Returns:
+            List[dict]: Effective metadata of the downloaded tracks, in `ids` order.
+
+        Emits:
+            ADA.LOG_DOWNLOADS — once, with {"tracks": [...], "memberships": [...]}.
+        """
+        memberships = memberships or []
+        if not ids:
+            return []
+
+        async with self._write_guard():
+            tracks = await self._transaction(lambda cur: self._insert_downloads(cur, ids, memberships), op="log_downloads_many")
+            await self._emit_downloads(tracks, memberships)
+            return tracks
+
+
+    async def ingest_many(self, tracks: List[Track], memberships: Optional[List[Tuple[str, int]]] = None) -> List[dict]:
+        """
+        Log tracks, mark them downloaded and add them to playlists in one transaction.
+
+        This is the path the download worker uses after yt-dlp finishes, instead of
+        log_track + log_download + update_track_playlists each committing on their own.
+
+        Args:
+            tracks (List[Track]): Freshly downloaded tracks.
+            memberships (List[Tuple[str, int]], optional): (track_id, playlist_id) pairs.
+
+        Returns:
+            List[dict]: Effective metadata of the ingested tracks.
+
+        Emits:
+            ADA.LOG_DOWNLOADS — once, with {"tracks": [...], "memberships": [...]}.
+        """
+        memberships = memberships or []
+        if not tracks:
+            return []
+
+        formats = track_formats(tracks)
+        stats = track_stats(tracks)
+
+        def ingest(cur: sqlite3.Cursor) -> List[dict]:
+            self._insert_tracks(cur, tracks)
+            return self._insert_downloads(cur, [track.id for track in tracks], memberships, formats, stats)
+
+        async with self._write_guard():
+            content = await self._transaction(ingest, op="ingest_many")
+            await self._emit_downloads(content, memberships, formats, stats)
+            return content
 
 
 
@@ -384,7 +776,7 @@ class AudioDatabase:
             >>> await db.unlog_download("abc123")
             # Removes the download entry but preserves the track metadata
         """
-        async with self._lock:
+        async with self._write_guard():
             await self._execute(f'''
                 DELETE FROM {self.DOWNLOADS_TABLE}
                 WHERE id = ?;
@@ -407,136 +799,205 @@ class AudioDatabase:
         Returns:
             bool: True if the track is downloaded, False otherwise.
         """
-        async with self._lock:
-            row = await self._fetchone(f'''
+        async with self._read_guard():
+            row = await self._read_one(f'''
                 SELECT 1 FROM {self.DOWNLOADS_TABLE} WHERE id = ? LIMIT 1;
             ''', (track_id,))
             return row is not None
 
 
 
-    async def get_downloads_content(self):
+    async def get_download_files(self) -> Dict[str, Tuple[str, Optional[int], Optional[int]]]:
+        """
+        Returns:
+            Dict[str, Tuple[str, Optional[int], Optional[int]]]: Track id to (format, size,
+                mtime_ns) of its downloaded file, see FileIndex.load. Size and mtime are
+                None for downloads logged before they were recorded.
         """
-        Retrieve full metadata for all downloaded tracks, ordered by download time.
+        async with self._read_guard():
+            rows = await self._read_all(f"SELECT id, format, size, mtime_ns FROM {self.DOWNLOADS_TABLE};")
+        return {row["id"]: (row["format"], row["size"], row["mtime_ns"]) for row in rows}
 
-        This method joins the DOWNLOADS and TRACKS tables to fetch detailed
-        information (id, title, artist, duration) for each downloaded track.
-        Custom title and artist fields are preferred if available.
+    async def backfill_download_stats(self, stats: Dict[str, Tuple[int, int]]):
+        """
+        Record the stat() of downloads logged before size and mtime were, once, so
+        FileIndex.load trusts them from the next start on. Rows that already have
+        stats are left alone, a re-download racing the caller wrote newer ones.
 
-        The results are returned in reverse chronological order of download time,
-        with the most recently downloaded tracks first.
+        Args:
+            stats (Dict[str, Tuple[int, int]]): Track id to (size, mtime_ns) of its file.
+        """
+        if not stats:
+            return
 
-        After fetching, an ADA.GET_DOWNLOADS_CONTENT event is emitted to notify
-        connected clients or listeners.
+        async with self._write_guard():
+            await self._transaction(lambda cur: cur.executemany(f'''
+                UPDATE {self.DOWNLOADS_TABLE} SET size = ?, mtime_ns = ?
+                WHERE id = ? AND (size IS NULL OR mtime_ns IS NULL);
+            ''', [(size, mtime_ns, id) for id, (size, mtime_ns) in stats.items()]), op="backfill_download_stats")
 
-        Returns:
-            list[dict]: A list of track objects in the following shape:
-                [
-                    {
-                        "id": str,
-                        "title": str,
-                        "artist": str,
-                        "duration": int
-                    },
-                    ...
-                ]
 
-        Example:
-            >>> await db.get_downloads_content()
-            [
-                {"id": "abc123", "title": "Song A", "artist": "Artist X", "duration": 210},
-                {"id": "xyz456", "title": "Song B", "artist": "Artist Y", "duration": 185},
-            ]
-        """
-        async with self._lock:
-            query = f"""
+
+    async def _read_library(self) -> List[dict]:
+        async with self._read_guard():
+            rows = await self._read_all(f"""
                 SELECT t.id,
                        COALESCE(t.custom_title, t.title) AS title,
                        COALESCE(t.custom_artist, t.artist) AS artist,
                        t.duration
                 FROM {self.TRACKS_TABLE} t
                 INNER JOIN {self.DOWNLOADS_TABLE} d ON t.id = d.id
-                ORDER BY d.downloaded_at DESC;
-            """
-            rows = await self._fetchall(query)
-
-            content = [
-                {
-                    "id": row["id"],
-                    "title": row["title"],
-                    "artist": row["artist"],
-                    "duration": row["duration"]
-                }
-                for row in rows
-            ]
+                ORDER BY d.downloaded_at DESC, d.id DESC;
+            """)
 
-            await self._emit_event(
-                action=ADA.GET_DOWNLOADS_CONTENT,
-                payload={"content": content}
-            )
+        return [
+            {
+                "id": row["id"],
+                "title": row["title"],
+                "artist": row["artist"],
+                "duration": row["duration"]
+            }
+            for row in rows
+        ]
 
-            return content
 
+    #keyset pagination, see AudioStorage._page
+    async def get_downloads_page(self, limit: int, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """
+        One page of get_downloads_content(), newest first.
 
+        The cursor encodes (downloaded_at, id) of the last row, so every page is an
+        index range scan on idx_downloads_downloaded_at no matter how deep it is.
 
-    
-    async def set_custom_metadata(self, id: str, custom_title: Optional[str] = None, custom_artist: Optional[str] = None):
-        async with self._lock:
-            #some robustness for handling None or "" values
-            custom_title_val = custom_title if custom_title not in (None, "") else None
-            custom_artist_val = custom_artist if custom_artist not in (None, "") else None
+        Args:
+            limit (int): Max tracks on the page.
+            cursor (str, optional): next_cursor from the previous page.
 
-            await self._execute(f'''
-                UPDATE {self.TRACKS_TABLE}
-                SET custom_title = ?,
-                    custom_artist = ?
-                WHERE id = ?;
-            ''', (custom_title_val, custom_artist_val, id))
+        Returns:
+            Tuple[List[dict], Optional[str]]: The tracks and the cursor of the next
+                page, or None on the last page.
 
-            #compute effective title/artist (unfortunately uses another query but it works)
-            row = await self._fetchone(f'''
-                SELECT 
-                    COALESCE(t.custom_title, t.title) AS title,
-                    COALESCE(t.custom_artist, t.artist) AS artist
-                FROM {self.TRACKS_TABLE} t
-                WHERE id = ?;
-            ''', (id,))
+        Raises:
+            InvalidCursorError: If the cursor is malformed.
+        """
+        where, params = "", ()
+        if cursor:
+            where = "WHERE (d.downloaded_at, d.id) < (?, ?)"
+            params = tuple(decode_cursor(cursor, 2))
 
-            content = {
-                "id": id,
+        async with self._read_guard():
+            rows = await self._read_all(f"""
+                SELECT t.id,
+                       COALESCE(t.custom_title, t.title) AS title,
+                       COALESCE(t.custom_artist, t.artist) AS artist,
+                       t.duration,
+                       d.downloaded_at
+                FROM {self.DOWNLOADS_TABLE} d
+                INNER JOIN {self.TRACKS_TABLE} t ON t.id = d.id
+                {where}
+                ORDER BY d.downloaded_at DESC, d.id DESC
+                LIMIT ?;
+            """, (*params, limit + 1))
+
+        rows, next_cursor = self._page(rows, limit, lambda row: (row["downloaded_at"], row["id"]))
+        content = [
+            {
+                "id": row["id"],
                 "title": row["title"],
-                "artist": row["artist"]
+                "artist": row["artist"],
+                "duration": row["duration"]
             }
+            for row in rows
+        ]
+
+        await self._emit_event(
+            action=ADA.GET_DOWNLOADS_CONTENT,
+            payload={"content": content}
+        )
+
+        return content, next_cursor
+
+
+    def _set_metadata(self, cur: sqlite3.Cursor, edits: List[dict]) -> List[dict]:
+        #edits are {"id", "title", "artist"}, blank values clear the override back to the original
+        cur.executemany(f'''
+            UPDATE {self.TRACKS_TABLE}
+            SET custom_title = ?,
+                custom_artist = ?
+            WHERE id = ?;
+        ''', [
+            (edit.get("title") or None, edit.get("artist") or None, edit["id"]) 
+            for edit in edits
+        ])
+
+        ids = [edit["id"] for edit in edits]
+        rows = cur.execute(f'''
+            SELECT t.id,
+                   COALESCE(t.custom_title, t.title) AS title,
+                   COALESCE(t.custom_artist, t.artist) AS artist
+            FROM {self.TRACKS_TABLE} t
+            WHERE t.id IN (SELECT value FROM json_each(?));
+        ''', (json.dumps(ids),)).fetchall()
+
+        by_id = {row["id"]: {"id": row["id"], "title": row["title"], "artist": row["artist"]} for row in rows}
+        return [by_id[id] for id in ids if id in by_id]
+
+    async def set_custom_metadata(self, id: str, custom_title: Optional[str] = None, custom_artist: Optional[str] = None):
+        async with self._write_guard():
+            #update and read back the effective title/artist in the same transaction
+            edits = await self._transaction(lambda cur: self._set_metadata(cur, [{
+                "id": id, 
+                "title": custom_title, 
+                "artist": custom_artist
+            }]), op="set_custom_metadata")
+            content = edits[0] if edits else {"id": id, "title": None, "artist": None}
 
             await self._emit_event(action=ADA.SET_METADATA, payload={"content": content})
 
             return content
 
 
-    async def search(self, q: str) -> List[Track]:
+    async def search(self, q: str, limit: Optional[int] = 100) -> List[Track]:
         """
         Search for tracks by title or artist, matching both original and custom values.
 
+        An empty query returns every downloaded track, newest first, exactly like
+        get_downloads_content().
+
+        Uses the FTS5 index when available: every word of `q` is matched as a prefix
+        and results are ordered by BM25 rank. Without FTS5 (or for punctuation only
+        queries) it falls back to a case-insensitive substring scan ordered by title.
+
         Args:
             q (str): The search query string. If empty, returns all tracks.
+            limit (int, optional): Max matches, the best ranked ones. None returns every
+                match, which for a short prefix on a big library is most of it.
 
         Returns:
             list[dict]: List of track objects with id, title, artist, duration.
         """
-        async with self._lock:
-            if not q:
-                #no filtering, return all entries from downloads
+        if not q:
+            #no filtering, return all entries from downloads (served by the library cache if present)
+            content = await self._library_content()
+            await self._emit_event(action=ADA.SEARCH, payload={"content": content})
+            return content
+
+        async with self._read_guard():
+            if self._fts and (match := build_fts_query(q)):
+                #ranked prefix search through the fts index, title hits weigh more than artist hits
                 query = f"""
                     SELECT t.id,
                         COALESCE(t.custom_title, t.title) AS title,
                         COALESCE(t.custom_artist, t.artist) AS artist,
                         t.duration
-                    FROM {self.TRACKS_TABLE} t
-                    INNER JOIN {self.DOWNLOADS_TABLE} d ON t.id = d.id
-                    ORDER BY d.downloaded_at DESC;
+                    FROM {self.TRACKS_FTS_TABLE} f
+                    INNER JOIN {self.TRACKS_TABLE} t ON t.rowid = f.rowid
+                    WHERE {self.TRACKS_FTS_TABLE} MATCH ?
+                    ORDER BY bm25({self.TRACKS_FTS_TABLE}, 10.0, 5.0, 1.0), t.id
+                    LIMIT ?;
                 """
-                params = ()
-            
+                params = (match,)
+
             else:
                 pattern = f"%{q.lower()}%"
                 query = f"""
@@ -549,11 +1010,12 @@ class AudioDatabase:
                     OR t.artist LIKE ? COLLATE NOCASE
                     OR COALESCE(t.custom_title, t.title) LIKE ? COLLATE NOCASE 
                     OR COALESCE(t.custom_artist, t.artist) LIKE ? COLLATE NOCASE
-                ORDER BY t.title COLLATE NOCASE;
+                ORDER BY t.title COLLATE NOCASE
+                LIMIT ?;
                 """
                 params = (pattern, pattern, pattern, pattern)
 
-            rows = await self._fetchall(query, params)
+            rows = await self._read_all(query, (*params, -1 if limit is None else limit)) #a negative LIMIT is none
             content = [
                 Track(
                     id=row["id"], 
@@ -569,31 +1031,118 @@ class AudioDatabase:
             return [track.to_json() for track in content]
 
 
+    async def search_page(self, q: str, limit: int, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """
+        One page of search() results, in the same order.
+
+        An empty query pages through the downloads like get_downloads_page(). FTS
+        results are keyed by (rank, id) and the LIKE fallback by (title, id), so a
+        page never re-sorts rows that were already returned.
+
+        Args:
+            q (str): The search query string.
+            limit (int): Max tracks on the page.
+            cursor (str, optional): next_cursor from the previous page.
+
+        Returns:
+            Tuple[List[dict], Optional[str]]: The tracks and the next cursor or None.
+
+        Raises:
+            InvalidCursorError: If the cursor is malformed.
+        """
+        if not q:
+            content, next_cursor = await self.get_downloads_page(limit, cursor)
+            await self._emit_event(action=ADA.SEARCH, payload={"content": content})
+            return content, next_cursor
+
+        after = decode_cursor(cursor, 2) if cursor else None
+
+        if self._fts and (match := build_fts_query(q)):
+            query = f"""
+                SELECT * FROM (
+                    SELECT t.id,
+                        COALESCE(t.custom_title, t.title) AS title,
+                        COALESCE(t.custom_artist, t.artist) AS artist,
+                        t.duration,
+                        bm25({self.TRACKS_FTS_TABLE}, 10.0, 5.0, 1.0) AS sort_key
+                    FROM {self.TRACKS_FTS_TABLE} f
+                    INNER JOIN {self.TRACKS_TABLE} t ON t.rowid = f.rowid
+                    WHERE {self.TRACKS_FTS_TABLE} MATCH ?
+                )
+                {"WHERE (sort_key, id) > (?, ?)" if after else ""}
+                ORDER BY sort_key, id
+                LIMIT ?;
+            """
+            params = (match,)
+
+        else:
+            pattern = f"%{q.lower()}%"
+            query = f"""
+                SELECT * FROM (
+                    SELECT t.id,
+                        COALESCE(t.custom_title, t.title) AS title,
+                        COALESCE(t.custom_artist, t.artist) AS artist,
+                        t.duration,
+                        LOWER(t.title) AS sort_key
+                    FROM {self.TRACKS_TABLE} t
+                    WHERE t.title LIKE ? COLLATE NOCASE
+                        OR t.artist LIKE ? COLLATE NOCASE
+                        OR COALESCE(t.custom_title, t.title) LIKE ? COLLATE NOCASE 
+                        OR COALESCE(t.custom_artist, t.artist) LIKE ? COLLATE NOCASE
+                )
+                {"WHERE (sort_key, id) > (?, ?)" if after else ""}
+                ORDER BY sort_key, id
+                LIMIT ?;
+            """
+            params = (pattern, pattern, pattern, pattern)
+
+        async with self._read_guard():
+            rows = await self._read_all(query, (*params, *(after or ()), limit + 1))
+
+        rows, next_cursor = self._page(rows, limit, lambda row: (row["sort_key"], row["id"]))
+        content = [
+            {
+                "id": row["id"],
+                "title": row["title"],
+                "artist": row["artist"],
+                "duration": row["duration"]
+            }
+            for row in rows
+        ]
+
+        await self._emit_event(action=ADA.SEARCH, payload={"content": content})
+
+        return content, next_cursor
+
+
     #likes
     async def toggle_like(self, id: str):
-        async with self._lock:
-            #check if already in db
-            row = await self._fetchone(f'''
+        def toggle(cur: sqlite3.Cursor):
+            #check and flip in one transaction so concurrent toggles can't both insert
+            row = cur.execute(f'''
                 SELECT 1 FROM {self.LIKES_TABLE}
                 WHERE id = ?;
-            ''', (id,))
+            ''', (id,)).fetchone()
 
             if row:
-                await self._execute(f'''
+                cur.execute(f'''
                     DELETE FROM {self.LIKES_TABLE}
                     WHERE id = ?;
                 ''', (id,))
             else:
-                await self._execute(f'''
+                cur.execute(f'''
                     INSERT INTO {self.LIKES_TABLE} (id) VALUES (?);
                 ''', (id,))
 
+        async with self._write_guard():
+            await self._transaction(toggle, op="toggle_like")
+
     async def fetch_liked_tracks(self):
-        async with self._lock:
-            rows = await self._fetchall(f'''
+        async with self._read_guard():
+            rows = await self._read_all(f'''
                 SELECT id
                 FROM {self.LIKES_TABLE}
-                ORDER BY liked_at ASC;
+                ORDER BY liked_at ASC, id ASC;
             ''')
             track_ids = [row["id"] for row in rows]
             await self._emit_event(action=ADA.FETCH_LIKES, payload={"content": track_ids})
@@ -602,14 +1151,179 @@ class AudioDatabase:
 
 
 
+    #download folder manifest, maintained by reconcile.DownloadReconciler
+    async def get_file_manifest(self) -> Dict[str, Tuple[int, int]]:
+        """
+        Returns:
+            Dict[str, Tuple[int, int]]: File name to (size, mtime_ns) as of the last reconcile pass.
+        """
+        async with self._read_guard():
+            rows = await self._read_all(f"SELECT name, size, mtime_ns FROM {self.FILE_MANIFEST_TABLE};")
+        return {row["name"]: (row["size"], row["mtime_ns"]) for row in rows}
+
+    async def update_file_manifest(self, upserts: List[Tuple[str, int, int]], removals: List[str]):
+        """
+        Apply a reconcile pass' manifest diff in one transaction. No events, the
+        manifest is bookkeeping only.
+
+        Args:
+            upserts (List[Tuple[str, int, int]]): (name, size, mtime_ns) of new or changed files.
+            removals (List[str]): Names no longer tracked.
+        """
+        if not upserts and not removals:
+            return
+
+        def update(cur: sqlite3.Cursor):
+            cur.executemany(f'''
+                DELETE FROM {self.FILE_MANIFEST_TABLE}
+                WHERE name = ?;
+            ''', [(name,) for name in removals])
+            cur.executemany(f'''
+                INSERT INTO {self.FILE_MANIFEST_TABLE} (name, size, mtime_ns)
+                VALUES (?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET size = excluded.size, mtime_ns = excluded.mtime_ns;
+            ''', upserts)
+
+        async with self._write_guard():
+            await self._transaction(update, op="update_file_manifest")
+
+
+    #library change log, written by the migration 4 triggers in the same transaction as each mutation
+    async def get_changes(self, since: int, limit: int) -> dict:
+        """
+        Library mutations after sequence number `since`, oldest first.
+
+        Entities are "download", "like", "playlist" and "playlist_track" (keyed
+        "<playlist_id>:<track_id>"), each change is an "upsert" carrying the row's
+        current fields in `data` or a "delete" with only the key. Replaying them in
+        order over a copy of the library taken at `since` yields the current library.
+
+        Syncing from 0 replays the whole library until compaction drops its first
+        deletes. When `since` predates the compaction floor (or comes from another
+        database) the log can't bridge the gap and `reset` is set: the client should
+        remember `latest`, fetch the full library and continue from there.
+
+        Args:
+            since (int): Last sequence number the client has applied.
+            limit (int): Max changes to return.
+
+        Returns:
+            dict: {
+                "seq": int,       sequence number to pass as `since` next time
+                "latest": int,    newest sequence number in the log
+                "reset": bool,
+                "more": bool,     another call would return more changes
+                "changes": [{"seq", "entity", "key", "op", "data"}, ...]
+            }
+        """
+        def read(conn: sqlite3.Connection) -> Tuple[int, int, list]:
+            #floor, latest and rows from one snapshot, a compaction in between could otherwise hide a gap
+            conn.execute("BEGIN;")
+            try:
+                floor = conn.execute(f'''
+                    SELECT value FROM {self.SYNC_META_TABLE}
+                    WHERE key = 'changes_floor';
+                ''').fetchone()[0]
+                latest = conn.execute(f'''
+                    SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence
+                    WHERE name = '{self.CHANGES_TABLE}';
+                ''').fetchone()[0]
+                rows = []
+                if floor <= since <= latest:
+                    rows = conn.execute(f'''
+                        SELECT seq, entity, key, op, data
+                        FROM {self.CHANGES_TABLE}
+                        WHERE seq > ?
+                        ORDER BY seq
+                        LIMIT ?;
+                    ''', (since, limit + 1)).fetchall()
+                return floor, latest, rows
+            finally:
+                conn.execute("COMMIT;")
+
+        async with self._read_guard():
+            floor, latest, rows = await self._read_executor().run(read, op="get_changes")
+
+        if not floor <= since <= latest:
+            return {"seq": latest, "latest": latest, "reset": True, "more": False, "changes": []}
+
+        more = len(rows) > limit
+        changes = [
+            {
+                "seq": row["seq"],
+                "entity": row["entity"],
+                "key": row["key"],
+                "op": row["op"],
+                "data": json.loads(row["data"]) if row["data"] is not None else None
+            }
+            for row in rows[:limit]
+        ]
+        return {
+            "seq": changes[-1]["seq"] if changes else since,
+            "latest": latest,
+            "reset": False,
+            "more": more,
+            "changes": changes
+        }
+
+    async def compact_changes(self, retain: int) -> int:
+        """
+        Shrink the change log without breaking clients that can still sync from it.
+
+        Superseded changes (an older change to an entity that changed again later)
+        are always dropped, a client replaying from any point still ends on the
+        newest one. Deletes older than the last `retain` sequence numbers are dropped
+        too, which raises the floor: clients behind it get `reset` from get_changes.
+
+        Args:
+            retain (int): How many of the newest sequence numbers keep their deletes.
+
+        Returns:
+            int: Changes removed.
+        """
+        def compact(cur: sqlite3.Cursor) -> int:
+            removed = cur.execute(f'''
+                DELETE FROM {self.CHANGES_TABLE}
+                WHERE seq < (
+                    SELECT MAX(newer.seq) FROM {self.CHANGES_TABLE} AS newer
+                    WHERE newer.entity = {self.CHANGES_TABLE}.entity AND newer.key = {self.CHANGES_TABLE}.key
+                );
+            ''').rowcount
+
+            horizon = cur.execute(f'''
+                SELECT MAX(seq) FROM {self.CHANGES_TABLE}
+                WHERE op = 'delete' AND seq <= (
+                    SELECT COALESCE(MAX(seq), 0) FROM sqlite_sequence WHERE name = '{self.CHANGES_TABLE}'
+                ) - ?;
+            ''', (retain,)).fetchone()[0]
+            if horizon is not None:
+                removed += cur.execute(f'''
+                    DELETE FROM {self.CHANGES_TABLE}
+                    WHERE op = 'delete' AND seq <= ?;
+                ''', (horizon,)).rowcount
+                cur.execute(f'''
+                    UPDATE {self.SYNC_META_TABLE}
+                    SET value = MAX(value, ?)
+                    WHERE key = 'changes_floor';
+                ''', (horizon,))
+            return removed
+
+        async with self._write_guard():
+            removed = await self._transaction(compact, op="compact_changes")
+
+        print(f"[AudioDatabase] Compacted change log, {removed} entries removed")
+        return removed
+
+
+
     #playlists
     async def create_playlist(self, name: str, temp_id: str):
-        async with self._lock:
-            row = await self._fetchone(f'''
+        async with self._write_guard():
+            row = await self._transaction(lambda cur: cur.execute(f'''
                 INSERT INTO {self.PLAYLISTS_TABLE} (name) 
                 VALUES (?)
                 RETURNING id;
-            ''', (name,))
+            ''', (name,)).fetchone(), op="create_playlist")
 
             content = {
                 "temp_id": temp_id, 
@@ -621,8 +1335,8 @@ class AudioDatabase:
             return content
         
     async def get_all_playlists(self):
-        async with self._lock:
-            rows = await self._fetchall(f'''
+        async with self._read_guard():
+            rows = await self._read_all(f'''
                 SELECT id, name
                 FROM {self.PLAYLISTS_TABLE}
                 ORDER BY id;
@@ -634,9 +1348,9 @@ class AudioDatabase:
             return playlists
 
     async def get_playlist_content(self, playlist_id: int):
-        async with self._lock:
+        async with self._read_guard():
             # Get playlist info
-            playlist_row = await self._fetchone(f'''
+            playlist_row = await self._read_one(f'''
                 SELECT id, name
                 FROM {self.PLAYLISTS_TABLE}
                 WHERE id = ?
@@ -648,11 +1362,11 @@ class AudioDatabase:
                     "trackIds": []
                 } 
     
-            rows = await self._fetchall(f'''
+            rows = await self._read_all(f'''
                 SELECT track_id
                 FROM {self.PLAYLIST_TRACKS_TABLE} 
                 WHERE playlist_id = ?
-                ORDER BY added_at ASC;
+                ORDER BY position ASC, track_id ASC;
             ''', (playlist_id,))
             track_ids = [row["track_id"] for row in rows]
 
@@ -669,7 +1383,265 @@ class AudioDatabase:
         
 
 
+    async def get_playlist_content_page(self, playlist_id: int, limit: int, cursor: Optional[str] = None) -> Tuple[dict, Optional[str]]:
+        """
+        One page of get_playlist_content(), same shape with a partial trackIds list.
+
+        The cursor encodes (position, track_id) of the last row and pages are range
+        scans on idx_playlist_tracks_position.
+
+        Args:
+            playlist_id (int): The playlist to read.
+            limit (int): Max track ids on the page.
+            cursor (str, optional): next_cursor from the previous page.
+
+        Returns:
+            Tuple[dict, Optional[str]]: {"id", "name", "trackIds"} and the next cursor or None.
+
+        Raises:
+            InvalidCursorError: If the cursor is malformed.
+        """
+        where, params = "", ()
+        if cursor:
+            where = "AND (position, track_id) > (?, ?)"
+            params = tuple(decode_cursor(cursor, 2))
+
+        async with self._read_guard():
+            playlist_row = await self._read_one(f'''
+                SELECT id, name
+                FROM {self.PLAYLISTS_TABLE}
+                WHERE id = ?
+            ''', (playlist_id,))
+            if not playlist_row:
+                return {"id": playlist_id, "name": None, "trackIds": []}, None
+
+            rows = await self._read_all(f'''
+                SELECT track_id, position
+                FROM {self.PLAYLIST_TRACKS_TABLE}
+                WHERE playlist_id = ? {where}
+                ORDER BY position ASC, track_id ASC
+                LIMIT ?;
+            ''', (playlist_id, *params, limit + 1))
+
+        rows, next_cursor = self._page(rows, limit, lambda row: (row["position"], row["track_id"]))
+        content = {
+            "id": playlist_row["id"],
+            "name": playlist_row["name"],
+            "trackIds": [row["track_id"] for row in rows]
+        }
+
+        await self._emit_event(action=ADA.GET_PLAYLIST_CONTENT, payload={"content": content})
+
+        return content, next_cursor
+
+
+
+    #playlist ordering, rows are kept in playlist_tracks.position order (see ordering.py)
+    def _append_membership_query(self) -> str:
+        #params (playlist_id, track_id, playlist_id), MAX(position) is a single seek on idx_playlist_tracks_position
+        return f'''
+            INSERT OR IGNORE INTO {self.PLAYLIST_TRACKS_TABLE} (playlist_id, track_id, position)
+            VALUES (?, ?, COALESCE((
+                SELECT MAX(position) 
+                FROM {self.PLAYLIST_TRACKS_TABLE} 
+                WHERE playlist_id = ?
+            ), 0) + {POSITION_GAP});
+        '''
+
+    def _renumber_playlist(self, cur: sqlite3.Cursor, playlist_id: int):
+        #respaces every row POSITION_GAP apart, only needed once repeated midpoints run out of precision
+        print(f"[AudioDatabase] Renumbering positions of playlist {playlist_id}")
+        cur.execute(f'''
+            UPDATE {self.PLAYLIST_TRACKS_TABLE}
+            SET position = ranked.rn * {POSITION_GAP}
+            FROM (
+                SELECT rowid AS rid, ROW_NUMBER() OVER (ORDER BY position, track_id) AS rn
+                FROM {self.PLAYLIST_TRACKS_TABLE}
+                WHERE playlist_id = ?
+            ) AS ranked
+            WHERE {self.PLAYLIST_TRACKS_TABLE}.rowid = ranked.rid;
+        ''', (playlist_id,))
+
+    def _position_after(self, cur: sqlite3.Cursor, playlist_id: int, track_id: str, after_id: Optional[str]) -> float:
+        #free position right after `after_id` (None for the front), ignoring track_id's own row
+        def neighbours() -> Tuple[Optional[float], Optional[float]]:
+            if after_id is None:
+                row = cur.execute(f'''
+                    SELECT position
+                    FROM {self.PLAYLIST_TRACKS_TABLE}
+                    WHERE playlist_id = ? AND track_id != ?
+                    ORDER BY position ASC, track_id ASC
+                    LIMIT 1;
+                ''', (playlist_id, track_id)).fetchone()
+                return None, row["position"] if row else None
+
+            row = cur.execute(f'''
+                SELECT position 
+                FROM {self.PLAYLIST_TRACKS_TABLE}
+                WHERE playlist_id = ? AND track_id = ?;
+            ''', (playlist_id, after_id)).fetchone()
+            if row is None or after_id == track_id:
+                raise PlaylistOrderError(f"Track {after_id} is not in playlist {playlist_id}")
+            lo = row["position"]
+
+            #row value comparison so a neighbour tied on position shows up and forces a renumber
+            row = cur.execute(f'''
+                SELECT position
+                FROM {self.PLAYLIST_TRACKS_TABLE}
+                WHERE playlist_id = ? AND track_id != ? AND (position, track_id) > (?, ?)
+                ORDER BY position ASC, track_id ASC
+                LIMIT 1;
+            ''', (playlist_id, track_id, lo, after_id)).fetchone()
+            return lo, row["position"] if row else None
+
+        positions = positions_between(*neighbours(), 1)
+        if positions is None:
+            self._renumber_playlist(cur, playlist_id)
+            positions = positions_between(*neighbours(), 1)
+        return positions[0]
+
+
+    async def move_track(self, playlist_id: int, track_id: str, after_id: Optional[str] = None):
+        """
+        Move a track within a playlist to right after another track.
+
+        Only the moved row is written, its new position is the midpoint between the
+        new neighbours, which are found with two index seeks.
+
+        Args:
+            playlist_id (int): The playlist to reorder.
+            track_id (str): Track to move, must be in the playlist.
+            after_id (str, optional): Track it should follow, None moves it to the front.
+
+        Raises:
+            PlaylistOrderError: If either track is not in the playlist.
+
+        Emits:
+            ADA.MOVE_PLAYLIST_TRACKS — with {"id": playlist_id, "moves": [{"id", "after_id"}]}.
+        """
+        def move(cur: sqlite3.Cursor):
+            updated = cur.execute(f'''
+                UPDATE {self.PLAYLIST_TRACKS_TABLE}
+                SET position = ?
+                WHERE playlist_id = ? AND track_id = ?;
+            ''', (self._position_after(cur, playlist_id, track_id, after_id), playlist_id, track_id))
+            if updated.rowcount == 0:
+                raise PlaylistOrderError(f"Track {track_id} is not in playlist {playlist_id}")
+
+        async with self._write_guard():
+            await self._transaction(move, op="move_track")
+            await self._emit_moves(playlist_id, [{"id": track_id, "after_id": after_id}])
+
+
+    async def insert_track_at(self, playlist_id: int, track_id: str, index: int):
+        """
+        Put a downloaded track at `index` of a playlist, adding it if it isn't in it yet.
+
+        The track currently at `index - 1` is found by walking idx_playlist_tracks_position,
+        then the track is placed right after it like move_track does.
+
+        Args:
+            playlist_id (int): The playlist to insert into.
+            track_id (str): A downloaded track.
+            index (int): Zero based target index, clamped to the playlist bounds.
+
+        Emits:
+            ADA.MOVE_PLAYLIST_TRACKS — with {"id": playlist_id, "moves": [{"id", "after_id"}]}.
+        """
+        def insert(cur: sqlite3.Cursor) -> Optional[str]:
+            after_id = None
+            if index > 0:
+                #index - 1 counted without the track itself, or the last track when past the end
+                rows = cur.execute(f'''
+                    SELECT track_id
+                    FROM {self.PLAYLIST_TRACKS_TABLE}
+                    WHERE playlist_id = ? AND track_id != ?
+                    ORDER BY position ASC, track_id ASC
+                    LIMIT 1 OFFSET ?;
+                ''', (playlist_id, track_id, index - 1)).fetchall() or cur.execute(f'''
+                    SELECT track_id
+                    FROM {self.PLAYLIST_TRACKS_TABLE}
+                    WHERE playlist_id = ? AND track_id != ?
+                    ORDER BY position DESC, track_id DESC
+                    LIMIT 1;
+                ''', (playlist_id, track_id)).fetchall()
+                after_id = rows[0]["track_id"] if rows else None
+
+            cur.execute(f'''
+                INSERT INTO {self.PLAYLIST_TRACKS_TABLE} (playlist_id, track_id, position)
+                VALUES (?, ?, ?)
+                ON CONFLICT(playlist_id, track_id) DO UPDATE SET position = excluded.position;
+            ''', (playlist_id, track_id, self._position_after(cur, playlist_id, track_id, after_id)))
+            return after_id
+
+        async with self._write_guard():
+            after_id = await self._transaction(insert, op="insert_track_at")
+            await self._emit_moves(playlist_id, [{"id": track_id, "after_id": after_id}])
+
+
+    async def reorder_playlist(self, playlist_id: int, track_ids: List[str]):
+        """
+        Set the full order of a playlist, writing only the rows that actually moved.
+
+        The tracks on a longest increasing subsequence of the current order keep their
+        positions, every other track gets a position between its new kept neighbours,
+        so dragging one track in a 5k playlist is one UPDATE, not 5k. If a gap runs out
+        of float precision the playlist is renumbered instead.
+
+        Args:
+            playlist_id (int): The playlist to reorder.
+            track_ids (List[str]): Every track of the playlist, in the new order.
+
+        Raises:
+            PlaylistOrderError: If `track_ids` isn't exactly the playlist's tracks.
+
+        Emits:
+            ADA.MOVE_PLAYLIST_TRACKS — with one {"id", "after_id"} move per moved track,
+                in an order that reproduces the new order when applied one by one.
+        """
+        def reorder(cur: sqlite3.Cursor) -> List[dict]:
+            rows = cur.execute(f'''
+                SELECT track_id, position
+                FROM {self.PLAYLIST_TRACKS_TABLE}
+                WHERE playlist_id = ?
+                ORDER BY position ASC, track_id ASC;
+            ''', (playlist_id,)).fetchall()
+
+            rank = {row["track_id"]: i for i, row in enumerate(rows)}
+            if len(track_ids) != len(rank) or set(track_ids) != rank.keys():
+                raise PlaylistOrderError(f"New order doesn't match the tracks of playlist {playlist_id}")
+
+            updates, moves = plan_reorder([row["position"] for row in rows], rank, track_ids)
+
+            cur.executemany(f'''
+                UPDATE {self.PLAYLIST_TRACKS_TABLE}
+                SET position = ?
+                WHERE playlist_id = ? AND track_id = ?;
+            ''', [(position, playlist_id, id) for position, id in updates])
+
+            return moves
+
+        async with self._write_guard():
+            moves = await self._transaction(reorder, op="reorder_playlist")
+            if moves:
+                await self._emit_moves(playlist_id, moves)
+            return moves
+
+
+
     #modifications to data
+    def _apply_memberships(self, cur: sqlite3.Cursor, add: List[Tuple[str, int]], remove: List[Tuple[str, int]]):
+        #removals first so a pair in both lists ends up in the playlist
+        cur.executemany(f'''
+            DELETE FROM {self.PLAYLIST_TRACKS_TABLE}
+            WHERE playlist_id = ? AND track_id = ?;
+        ''', [(playlist_id, track_id) for track_id, playlist_id in remove])
+
+        cur.executemany(self._append_membership_query(), [
+            (playlist_id, track_id, playlist_id) 
+            for track_id, playlist_id in add
+        ])
+
     async def update_track_playlists(self, track_id: str, playlist_updates: list[dict]):
         """
         Update a track's playlist memberships based on a set of updates.
@@ -680,6 +1652,8 @@ class AudioDatabase:
           - If `checked` is False: remove the track from the playlist if it exists.
           - If `checked` is None or not provided: make no changes for that playlist.
 
+        All changes are written in one transaction.
+
         Args:
             track_id (str): The ID of the track to update.
             playlist_updates (list[dict]): A list of updates, where each item is a dict
@@ -687,27 +1661,11 @@ class AudioDatabase:
                   - "id" (str): Playlist ID
                   - "checked" (bool | None): Desired membership state
         """
-        async with self._lock:
-            for playlist in playlist_updates:
-                playlist_id, checked = playlist["id"], playlist["checked"]
-
-                if checked is True:
-                    #insert or keep existing
-                    await self._execute(f'''
-                        INSERT OR IGNORE INTO {self.PLAYLIST_TRACKS_TABLE} (playlist_id, track_id)
-                        VALUES (?, ?);
-                    ''', (playlist_id, track_id))
-
-                elif checked is False:
-                    #remove if exists
-                    await self._execute(f'''
-                        DELETE FROM {self.PLAYLIST_TRACKS_TABLE}
-                        WHERE playlist_id = ? AND track_id = ?;
-                    ''', (playlist_id, track_id))
-                
-                else:
-                    #none or undefined do nothing
-                    continue
+        add = [(track_id, pl["id"]) for pl in playlist_updates if pl.get("checked") is True]
+        remove = [(track_id, pl["id"]) for pl in playlist_updates if pl.get("checked") is False]
+
+        async with self._write_guard():
+            await self._transaction(lambda cur: self._apply_memberships(cur, add, remove), op="update_track_playlists")
 
             content = {
                 "id": track_id,
@@ -716,6 +1674,55 @@ class AudioDatabase:
             await self._emit_event(ADA.UPDATE_PLAYLISTS, payload={"content": content})
 
 
+    async def apply_track_edits(
+        self, 
+        *, 
+        add: Optional[List[Tuple[str, int]]] = None, 
+        remove: Optional[List[Tuple[str, int]]] = None, 
+        metadata: Optional[List[dict]] = None
+    ) -> dict:
+        """
+        Apply a membership diff and metadata edits for any number of tracks at once.
+
+        Deletes, inserts (appended at the end of their playlist) and custom metadata
+        updates are each one executemany inside a single transaction, so the whole
+        edit lands or none of it does, and listeners get one event instead of one
+        per playlist plus one for the metadata.
+
+        Args:
+            add (List[Tuple[str, int]], optional): (track_id, playlist_id) pairs to add,
+                existing pairs are kept where they are.
+            remove (List[Tuple[str, int]], optional): (track_id, playlist_id) pairs to remove.
+                A pair in both lists ends up added.
+            metadata (List[dict], optional): {"id", "title", "artist"} custom metadata,
+                blank values reset to the original.
+
+        Returns:
+            dict: The emitted content.
+
+        Emits:
+            ADA.EDIT_TRACKS — once, with {"add": [{"id", "playlist_id"}], "remove": [...],
+                "metadata": [{"id", "title", "artist"}]} where metadata is the effective value.
+        """
+        add, remove, metadata = add or [], remove or [], metadata or []
+
+        def edit(cur: sqlite3.Cursor) -> List[dict]:
+            self._apply_memberships(cur, add, remove)
+            return self._set_metadata(cur, metadata) if metadata else []
+
+        async with self._write_guard():
+            effective = await self._transaction(edit, op="apply_track_edits")
+
+            content = {
+                "add": [{"id": track_id, "playlist_id": playlist_id} for track_id, playlist_id in add],
+                "remove": [{"id": track_id, "playlist_id": playlist_id} for track_id, playlist_id in remove],
+                "metadata": effective
+            }
+            await self._emit_event(action=ADA.EDIT_TRACKS, payload={"content": content})
+
+            return content
+
+
 
     # Edit a playlist's name
     async def edit_playlist(self, playlist_id: int, name: str):
@@ -729,7 +1736,7 @@ class AudioDatabase:
         Returns:
             dict: The updated playlist info.
         """
-        async with self._lock:
+        async with self._write_guard():
             await self._execute(f'''
                 UPDATE {self.PLAYLISTS_TABLE}
                 SET name = ?
@@ -756,7 +1763,7 @@ class AudioDatabase:
         Returns:
             dict: Info about the deleted playlist.
         """
-        async with self._lock:
+        async with self._write_guard():
             # Delete associated tracks
             await self._execute(f'''
                 DELETE FROM {self.PLAYLIST_TRACKS_TABLE}
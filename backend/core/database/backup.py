@@ -0,0 +1,251 @@
+import asyncio
+import os
+import sqlite3
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+from backend.core.lib.metrics import MetricsRegistry
+
+
+SNAPSHOT_PREFIX = "audio-"
+SNAPSHOT_SUFFIX = ".db"
+
+
+@dataclass
+class BackupReport:
+    path: Path
+    pages: int = 0
+    steps: int = 0
+    restarts: int = 0   #source changed by another connection mid copy, sqlite started over
+    elapsed: float = 0.0
+
+
+def list_snapshots(backup_dir: Path) -> List[Path]:
+    """
+    Returns:
+        List[Path]: Finished snapshots in `backup_dir`, oldest first (names sort by time).
+    """
+    if not backup_dir.exists():
+        return []
+    return sorted(
+        path for path in backup_dir.iterdir()
+        if path.name.startswith(SNAPSHOT_PREFIX) and path.name.endswith(SNAPSHOT_SUFFIX)
+    )
+
+
+def _check(conn: sqlite3.Connection, path: Path):
+    result = conn.execute("PRAGMA quick_check;").fetchone()[0]
+    if result != "ok":
+        raise sqlite3.DatabaseError(f"{path} failed quick_check: {result}")
+
+
+def backup_database(
+    db_file: Path,
+    target: Path,
+    *,
+    pages_per_step: int = 256,
+    pause: float = 0.005
+) -> BackupReport:
+    """
+    Copy a live database into `target` with the sqlite backup API, a few pages at a time.
+
+    Blocking, run it on a worker thread. The copy sleeps `pause` seconds between
+    steps, with the source lock released, so the server's own connections are never
+    stalled behind it. In WAL mode the source connection also holds one read transaction for
+    the whole copy: readers don't block the writer there, and copying a single
+    snapshot means concurrent commits can't force the backup to restart from page 1.
+
+    The copy is written to a temporary file, checked and then renamed into place, so
+    `target` only ever exists complete.
+
+    Args:
+        db_file (Path): Database to copy.
+        target (Path): Snapshot file to create.
+        pages_per_step (int): Pages copied per step.
+        pause (float): Seconds to sleep between steps, and before retrying a step that
+            found the source busy or locked.
+
+    Returns:
+        BackupReport: Size of the copy and how it went.
+    """
+    started = time.perf_counter()
+    report = BackupReport(path=target)
+    partial = target.with_name(target.name + ".tmp")
+
+    src = sqlite3.connect(db_file, isolation_level=None) #autocommit, the snapshot transaction is managed here
+    dst = sqlite3.connect(partial)
+    try:
+        pinned = src.execute("PRAGMA journal_mode;").fetchone()[0] == "wal"
+        if pinned:
+            src.execute("BEGIN;")
+            src.execute("SELECT COUNT(*) FROM sqlite_master;").fetchone() #opens the read snapshot
+
+        remaining_before = None
+        def progress(status: int, remaining: int, total: int):
+            nonlocal remaining_before
+            report.steps += 1
+            report.pages = total
+            if remaining_before is not None and remaining > remaining_before:
+                report.restarts += 1
+            remaining_before = remaining
+            if remaining and pause:
+                #sqlite3's own `sleep` only applies to BUSY/LOCKED steps, never between successful ones
+                time.sleep(pause)
+
+        src.backup(dst, pages=pages_per_step, progress=progress, sleep=pause)
+
+        if pinned:
+            src.execute("COMMIT;")
+        dst.execute("PRAGMA journal_mode = DELETE;") #the copy keeps the source's wal flag, snapshots are single files
+        _check(dst, partial)
+    except BaseException:
+        dst.close()
+        partial.unlink(missing_ok=True)
+        raise
+    finally:
+        src.close()
+
+    dst.close()
+    os.replace(partial, target)
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+def restore_database(snapshot: Path, db_file: Path, *, keep_current: bool = True) -> Optional[Path]:
+    """
+    Replace `db_file`'s contents with a snapshot. Stop the server first.
+
+    Goes through the backup API as well (snapshot -> database), so the target's
+    WAL and journal files stay consistent with the restored pages.
+
+    Args:
+        snapshot (Path): Snapshot to restore, checked before anything is touched.
+        db_file (Path): Database to overwrite.
+        keep_current (bool): Save the current database next to the snapshot first.
+
+    Returns:
+        Optional[Path]: Where the current database was saved, if it was.
+    """
+    src = sqlite3.connect(f"file:{snapshot}?mode=ro", uri=True)
+    try:
+        _check(src, snapshot)
+
+        saved = None
+        if keep_current and db_file.exists():
+            saved = snapshot.parent / f"pre-restore-{datetime.now():%Y%m%d-%H%M%S-%f}{SNAPSHOT_SUFFIX}"
+            backup_database(db_file, saved, pause=0)
+
+        db_file.parent.mkdir(parents=True, exist_ok=True)
+        dst = sqlite3.connect(db_file)
+        try:
+            src.backup(dst)
+        finally:
+            dst.close()
+    finally:
+        src.close()
+
+    return saved
+
+
+class BackupService:
+    """
+    Scheduled online backups of the audio database, keeping the newest `keep` snapshots.
+
+    Snapshots are named audio-<YYYYmmdd-HHMMSS-micros>.db in `backup_dir`, copied in small
+    steps on a worker thread while the server keeps serving, see backup_database.
+
+    Args:
+        db_file (Path): Database to back up.
+        backup_dir (Path): Where snapshots go.
+        keep (int): Snapshots to retain, older ones are deleted after each backup.
+        pages_per_step (int): Pages copied per backup step.
+        pause_ms (float): Sleep between steps.
+        metrics (MetricsRegistry, optional): Records backup_seconds and backups_total.
+    """
+    def __init__(
+        self,
+        *,
+        db_file: Path,
+        backup_dir: Path,
+        keep: int = 7,
+        pages_per_step: int = 256,
+        pause_ms: float = 5,
+        metrics: Optional[MetricsRegistry] = None
+    ):
+        if keep < 1:
+            raise ValueError("BackupService must keep at least one snapshot")
+
+        self._db_file = db_file
+        self._dir = backup_dir
+        self._keep = keep
+        self._pages_per_step = pages_per_step
+        self._pause = pause_ms / 1000
+        self._metrics = metrics
+        self._lock = asyncio.Lock()
+
+
+    async def backup(self) -> BackupReport:
+        """
+        Take one snapshot now and apply retention. Concurrent calls run one after the other.
+
+        Returns:
+            BackupReport: The new snapshot.
+        """
+        async with self._lock:
+            self._dir.mkdir(parents=True, exist_ok=True)
+            target = self._dir / f"{SNAPSHOT_PREFIX}{datetime.now():%Y%m%d-%H%M%S-%f}{SNAPSHOT_SUFFIX}"
+
+            try:
+                report = await asyncio.to_thread(
+                    backup_database, self._db_file, target, pages_per_step=self._pages_per_step, pause=self._pause
+                )
+            except Exception:
+                if self._metrics:
+                    self._metrics.inc("backups_total", status="error")
+                raise
+
+            removed = await asyncio.to_thread(self._prune)
+
+        if self._metrics:
+            self._metrics.inc("backups_total", status="ok")
+            self._metrics.observe("backup_seconds", report.elapsed)
+
+        print(
+            f"[Backup] {report.path.name}: {report.pages} pages in {report.steps} steps "
+            f"({report.restarts} restarts), {report.elapsed * 1000:.1f}ms, {len(removed)} old snapshots removed"
+        )
+        return report
+
+    def _prune(self) -> List[Path]:
+        removed = []
+        for path in list_snapshots(self._dir)[:-self._keep]:
+            try:
+                path.unlink()
+                removed.append(path)
+            except OSError as e:
+                print(f"[Backup] Failed to remove {path.name}: {e}")
+        return removed
+
+
+    async def run(self, interval: float):
+        """
+        Back up every `interval` seconds until cancelled. The first backup is due
+        `interval` after the newest existing snapshot, so server restarts don't keep
+        pushing it back. A failed backup is logged and retried on the next tick.
+
+        Args:
+            interval (float): Seconds between backups.
+        """
+        snapshots = list_snapshots(self._dir)
+        age = time.time() - snapshots[-1].stat().st_mtime if snapshots else interval
+        await asyncio.sleep(max(0.0, interval - age))
+
+        while True:
+            try:
+                await self.backup()
+            except (OSError, sqlite3.Error) as e:
+                print(f"[Backup] Failed: {e}")
+            await asyncio.sleep(interval)
@@ -0,0 +1,125 @@
+import asyncio
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional, TypeVar
+
+from backend.core.lib.metrics import MetricsRegistry
+
+
+T = TypeVar("T")
+
+
+def count_rows(result: object) -> int:
+    #rows handed back to the caller, writes that return nothing count as 0
+    if isinstance(result, (list, tuple)):
+        return len(result)
+    if isinstance(result, sqlite3.Row):
+        return 1
+    return 0
+
+
+class DatabaseExecutor:
+    """
+    Dedicated thread pool for one kind of AudioDatabase work (reads or writes).
+
+    Each worker thread opens its own connection on first use and keeps it for its
+    lifetime, so connections are never shared between threads and database calls
+    never queue behind unrelated work on the loop's default executor.
+
+    Every call is recorded in `metrics` under the executor's labels:
+        db_queue_wait_seconds   time between submit and a worker picking the call up
+        db_query_seconds        time spent running it on the connection
+        db_rows_total           rows returned (len of a list, 1 for a single row)
+        db_queries_total / db_query_errors_total
+
+    Args:
+        name (str): Label for metrics and thread names, e.g. "reader".
+        connect (Callable[[], sqlite3.Connection]): Opens one connection, called once per worker thread.
+        size (int): Worker threads.
+        metrics (MetricsRegistry, optional): Where to record timings, skipped if None.
+        db (str): Database label for metrics.
+    """
+    def __init__(
+        self,
+        *,
+        name: str,
+        connect: Callable[[], sqlite3.Connection],
+        size: int,
+        metrics: Optional[MetricsRegistry] = None,
+        db: str = "db"
+    ):
+        if size < 1:
+            raise ValueError("DatabaseExecutor size must be at least 1")
+
+        self.name = name
+        self._connect = connect
+        self._metrics = metrics
+        self._labels = {"db": db, "executor": name}
+
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+
+        self._pool = ThreadPoolExecutor(max_workers=size, thread_name_prefix=f"{db}-{name}")
+        self._size = size
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+
+    async def run(self, func: Callable[[sqlite3.Connection], T], *, op: str = "query") -> T:
+        """
+        Run `func` with this thread's connection on the pool and await its result.
+
+        Args:
+            func (Callable[[sqlite3.Connection], T]): Work to run, receives the connection.
+            op (str): Metrics label for the kind of call.
+
+        Returns:
+            Whatever `func` returned.
+        """
+        submitted = time.perf_counter()
+
+        def call() -> T:
+            started = time.perf_counter()
+            result, failed = None, True
+            try:
+                result = func(self._connection())
+                failed = False
+                return result
+            finally:
+                if self._metrics:
+                    self._record(op, started - submitted, time.perf_counter() - started, result, failed)
+
+        return await asyncio.get_running_loop().run_in_executor(self._pool, call)
+
+    def _record(self, op: str, wait: float, duration: float, result: object, failed: bool):
+        labels = {**self._labels, "op": op}
+        self._metrics.observe("db_queue_wait_seconds", wait, **self._labels)
+        self._metrics.observe("db_query_seconds", duration, **labels)
+        self._metrics.inc("db_queries_total", **labels)
+        if failed:
+            self._metrics.inc("db_query_errors_total", **labels)
+        else:
+            self._metrics.inc("db_rows_total", count_rows(result), **labels)
+
+
+    def close(self):
+        #finish queued work first, then close from here. the connections were opened with
+        #check_same_thread=False for exactly this, each one is otherwise used by its own thread only
+        self._pool.shutdown(wait=True)
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
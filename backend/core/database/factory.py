@@ -0,0 +1,74 @@
+from typing import Optional
+
+from backend.core.database.audio_database import AudioDatabase
+from backend.core.database.library_cache import LibraryCache
+from backend.core.database.storage import AudioStorage
+from backend.core.events.event_bus import EventBus
+from backend.core.lib.metrics import MetricsRegistry
+
+import backend.globals as G
+
+
+def create_audio_storage(
+    *,
+    backend: Optional[str] = None,
+    event_bus: Optional[EventBus] = None,
+    library_cache: Optional[LibraryCache] = None,
+    metrics: Optional[MetricsRegistry] = None
+) -> AudioStorage:
+    """
+    Build the configured storage backend from globals, not built yet (call build()).
+
+    asyncpg is only imported for the postgres backend, sqlite installs don't need it
+    (it comes with requirements-postgres.txt).
+
+    Args:
+        backend (str, optional): "sqlite" or "postgres", defaults to G.DB_BACKEND.
+        event_bus (EventBus, optional): Bus that receives ADA events.
+        library_cache (LibraryCache, optional): Read-through cache for the downloads listing.
+        metrics (MetricsRegistry, optional): Query timing.
+
+    Returns:
+        AudioStorage: AudioDatabase or PostgresAudioDatabase.
+
+    Raises:
+        ValueError: On an unknown backend, or postgres without G.DB_POSTGRES_DSN or asyncpg.
+    """
+    backend = backend or G.DB_BACKEND
+    if backend == "sqlite":
+        return AudioDatabase(
+            name=G.AUDIO_DATABASE_NAME,
+            filepath=G.DB_FILE,
+            event_bus=event_bus,
+            wal=G.DB_WAL_MODE,
+            reader_pool_size=G.DB_READER_POOL_SIZE,
+            cache_size_kb=G.DB_CACHE_SIZE_KB,
+            mmap_size=G.DB_MMAP_SIZE,
+            group_commit=G.DB_GROUP_COMMIT,
+            group_commit_max_ops=G.DB_GROUP_COMMIT_MAX_OPS,
+            group_commit_delay_ms=G.DB_GROUP_COMMIT_DELAY_MS,
+            library_cache=library_cache,
+            metrics=metrics
+        )
+
+    if backend == "postgres":
+        if not G.DB_POSTGRES_DSN:
+            raise ValueError("DB_BACKEND=postgres needs DB_POSTGRES_DSN")
+
+        try:
+            from backend.core.database.postgres_database import PostgresAudioDatabase
+        except ModuleNotFoundError as e:
+            raise ValueError("DB_BACKEND=postgres needs asyncpg, pip install -r requirements-postgres.txt") from e
+        return PostgresAudioDatabase(
+            name=G.AUDIO_DATABASE_NAME,
+            dsn=G.DB_POSTGRES_DSN,
+            event_bus=event_bus,
+            schema=G.DB_POSTGRES_SCHEMA,
+            min_size=G.DB_POSTGRES_POOL_MIN,
+            max_size=G.DB_POSTGRES_POOL_MAX,
+            statement_cache_size=G.DB_POSTGRES_STATEMENT_CACHE,
+            library_cache=library_cache,
+            metrics=metrics
+        )
+
+    raise ValueError(f"Unknown storage backend: {backend}")
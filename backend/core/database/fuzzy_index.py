@@ -0,0 +1,182 @@
+import heapq
+import math
+import re
+import sys
+import unicodedata
+from difflib import SequenceMatcher
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+
+_SEPARATORS = re.compile(r"[\W_]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents and turn anything that isn't a letter or digit into a space."""
+    text = text.lower()
+    if not text.isascii():
+        text = unicodedata.normalize("NFKD", text)
+        text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return _SEPARATORS.sub(" ", text).strip()
+
+
+def trigrams(text: str) -> FrozenSet[str]:
+    """
+    Trigrams of every word in `text`, padded like pg_trgm ("  b", " be", ..., "ls ") so
+    word starts and ends weigh in and a one letter typo still leaves most grams intact.
+    Sliced from one padded string in a single pass, which also yields a "s  " word
+    end gram per word, on both sides of every comparison.
+    """
+    padded = f"  {normalize(text).replace(' ', '  ')} "
+    return frozenset([padded[i:i + 3] for i in range(len(padded) - 2)]) if len(padded) > 3 else frozenset()
+
+
+def word_score(query_words: List[str], text: str) -> float:
+    """Mean over the query words of their best SequenceMatcher ratio against a word of `text`."""
+    words = normalize(text).split()
+    if not query_words or not words:
+        return 0.0
+    total = 0.0
+    for query_word in query_words:
+        matcher = SequenceMatcher(None, query_word, autojunk=False)
+        best = 0.0
+        for word in words:
+            matcher.set_seq1(word)
+            best = max(best, matcher.ratio())
+        total += best
+    return total / len(query_words)
+
+
+class FuzzyIndex:
+    """
+    In-memory trigram index over track titles and artists for typo tolerant search.
+
+    Each track is stored as the set of trigrams of "title artist", with an inverted
+    index from trigram to tracks. A query matches a track when at least `threshold`
+    of the query's trigrams occur in it, so "beatels" still finds "The Beatles".
+
+    Lookups use prefix filtering: a track that shares `m` of the query's `n` grams has
+    to contain at least one of its `n - m + 1` rarest grams, so only those postings
+    are walked and the common grams ("  t", "the") never are. Candidates are then
+    scored with one set intersection each, and only the best few are re-ranked word
+    by word with difflib, which handles swapped letters better than trigrams do.
+
+    Not thread safe, it's meant to be owned by the LibraryCache and touched from the
+    event loop only.
+
+    Args:
+        threshold (float): Fraction of the query trigrams a match must contain.
+    """
+    def __init__(self, *, threshold: float = 0.5):
+        self.threshold = threshold
+
+        self._docs: Dict[str, Tuple[FrozenSet[str], dict]] = {} #id -> (grams, track)
+        self._postings: Dict[str, Set[str]] = {}
+
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def __contains__(self, id: str) -> bool:
+        return id in self._docs
+
+
+    #maintenance
+    def clear(self):
+        self._docs.clear()
+        self._postings.clear()
+
+    def rebuild(self, tracks: Iterable[dict]):
+        self.clear()
+        for track in tracks:
+            self.add(track)
+
+    def add(self, track: dict):
+        """
+        Index a track, replacing its previous entry.
+
+        Args:
+            track (dict): {"id", "title", "artist", ...}, kept by reference and
+                returned as is from search() so later edits to it show up.
+        """
+        id = track["id"]
+        #interned so every doc shares one string object per trigram
+        grams = frozenset(map(sys.intern, trigrams(f"{track.get('title') or ''} {track.get('artist') or ''}")))
+
+        previous = self._docs.get(id)
+        if previous is not None:
+            if previous[0] == grams:
+                self._docs[id] = (grams, track)
+                return
+            self.remove(id)
+
+        self._docs[id] = (grams, track)
+        for gram in grams:
+            self._postings.setdefault(gram, set()).add(id)
+
+    def remove(self, id: str):
+        entry = self._docs.pop(id, None)
+        if entry is None:
+            return
+        for gram in entry[0]:
+            ids = self._postings[gram]
+            ids.discard(id)
+            if not ids:
+                del self._postings[gram]
+
+
+    #lookup
+    RERANK_FACTOR = 4 #trigram best `limit * RERANK_FACTOR` get the word level re-rank
+    MIN_QUERY_CHARS = 3 #shorter queries share their few grams with most of the library
+
+    def search(self, q: str, limit: int = 20, threshold: Optional[float] = None) -> List[dict]:
+        """
+        Tracks that fuzzily match `q`, best first.
+
+        The trigram best (query trigrams found, then share of the track's trigrams
+        covered) are ranked by how closely each query word matches a word of the
+        track, then by those trigram scores and the title. Queries under
+        MIN_QUERY_CHARS letters match nothing.
+
+        Args:
+            q (str): Raw search box string.
+            limit (int): Most results to return.
+            threshold (float, optional): Overrides the index threshold for this query.
+
+        Returns:
+            List[dict]: The indexed track dicts.
+        """
+        if limit <= 0 or len(normalize(q).replace(" ", "")) < self.MIN_QUERY_CHARS:
+            return []
+        query = trigrams(q)
+
+        threshold = self.threshold if threshold is None else threshold
+        needed = max(1, math.ceil(threshold * len(query)))
+
+        #grams missing from the index can't be part of any match
+        postings = self._postings
+        present = sorted((gram for gram in query if gram in postings), key=lambda gram: len(postings[gram]))
+        if len(present) < needed:
+            return []
+
+        candidates = set()
+        for gram in present[:len(present) - needed + 1]:
+            candidates.update(postings[gram])
+
+        #cheap keys for every candidate, titles and difflib only for the shortlist
+        docs = self._docs
+        scored = []
+        for id in candidates:
+            grams, track = docs[id]
+            common = len(query & grams)
+            if common >= needed:
+                scored.append((common, common / len(grams), id))
+        shortlist = heapq.nlargest(limit * self.RERANK_FACTOR, scored)
+
+        query_words = normalize(q).split()
+        def rank(entry: tuple) -> tuple:
+            common, coverage, id = entry
+            track = docs[id][1]
+            text = f"{track.get('title') or ''} {track.get('artist') or ''}"
+            return (-word_score(query_words, text), -common, -coverage, (track.get("title") or "").lower(), id)
+
+        return [docs[entry[2]][1] for entry in sorted(shortlist, key=rank)[:limit]]
@@ -0,0 +1,192 @@
+import asyncio
+from typing import Dict, List, Optional
+
+from backend.core.database.fuzzy_index import FuzzyIndex
+from backend.core.events.event_bus import EventBus
+from backend.core.models.event import Event
+
+from backend.core.models.enums import AudioDatabaseAction as ADA
+
+
+class LibraryCache:
+    """
+    In-process copy of the downloaded library, kept in sync by AudioDatabase events.
+
+    Holds one compact record ({id, title, artist, duration}, effective metadata) per
+    downloaded track in download order. AudioDatabase reads through it for
+    get_downloads_content() and search(""), so opening the library costs no query and
+    no per-row object building once the cache is loaded.
+
+    The cache never writes to the database. It is loaded lazily from the first
+    read-through query and afterwards only changes through the LOG_TRACK(S),
+    LOG_DOWNLOAD(S), UNLOG_DOWNLOAD, UNLOG_TRACK, SET_METADATA and EDIT_TRACKS events.
+    The same events keep a FuzzyIndex over the records up to date for fuzzy_search().
+    The index is built after the records load, in chunks between event loop turns
+    (warm_fuzzy_index), since indexing a large library in one go would stall requests.
+
+    Args:
+        event_bus (EventBus): Bus the AudioDatabase publishes on.
+        source (str): Name of the AudioDatabase whose events to follow.
+        fuzzy_threshold (float): Share of query trigrams a fuzzy match must contain.
+    """
+    def __init__(self, *, event_bus: EventBus, source: str, fuzzy_threshold: float = 0.5):
+        #oldest download first, so a new download is an O(1) append and listing is a reversed walk
+        self._downloads: Dict[str, dict] = {}
+        self._snapshot: Optional[List[dict]] = None
+        self._fuzzy = FuzzyIndex(threshold=fuzzy_threshold)
+        self._fuzzy_task: Optional[asyncio.Task] = None
+        self._fuzzy_generation = 0 #bumped by load(), abandons a build over the old records
+
+        self._ready = False
+        self._version = 0 #bumped on every applied event, guards loads that raced an event
+
+        handlers = {
+            ADA.LOG_TRACK: self._on_log_track,
+            ADA.LOG_TRACKS: self._on_log_tracks,
+            ADA.LOG_DOWNLOAD: self._on_log_download,
+            ADA.LOG_DOWNLOADS: self._on_log_downloads,
+            ADA.UNLOG_DOWNLOAD: self._on_unlog,
+            ADA.UNLOG_TRACK: self._on_unlog,
+            ADA.SET_METADATA: self._on_set_metadata,
+            ADA.EDIT_TRACKS: self._on_edit_tracks,
+        }
+        for action, handler in handlers.items():
+            event_bus.subscribe(source=source, action=action, handler=handler)
+
+
+    #read-through api used by AudioDatabase
+    def is_ready(self) -> bool:
+        return self._ready
+
+    def version(self) -> int:
+        return self._version
+
+    def load(self, content: List[dict], version: int) -> bool:
+        """
+        Populate the cache from a get_downloads_content style list (newest first).
+
+        Args:
+            content (List[dict]): Track records ordered by download time, newest first.
+            version (int): version() observed before the query ran. If an event was
+                applied since, the rows may be stale and the load is dropped.
+
+        Returns:
+            bool: True if the cache is now ready.
+        """
+        if version != self._version:
+            return False
+
+        self._downloads = {track["id"]: dict(track) for track in reversed(content)}
+        self._fuzzy.clear()
+        self._fuzzy_task = None
+        self._fuzzy_generation += 1
+        self._snapshot = None
+        self._ready = True
+        return True
+
+    def get_downloads(self) -> List[dict]:
+        """
+        Downloaded tracks, newest first. The list is shared between callers until the
+        next change, so treat it as read-only.
+        """
+        if self._snapshot is None:
+            self._snapshot = list(reversed(self._downloads.values()))
+        return self._snapshot
+
+    async def warm_fuzzy_index(self, chunk: int = 500):
+        """
+        Index the loaded records for fuzzy_search(), `chunk` records per event loop turn.
+        Concurrent callers share one build, later calls return at once.
+        """
+        if self._fuzzy_task is None:
+            self._fuzzy_task = asyncio.create_task(self._build_fuzzy(chunk))
+        await asyncio.shield(self._fuzzy_task)
+
+    async def _build_fuzzy(self, chunk: int):
+        generation = self._fuzzy_generation
+        records = list(self._downloads.values())
+        for start in range(0, len(records), chunk):
+            if generation != self._fuzzy_generation:
+                return
+            for record in records[start:start + chunk]:
+                #events already indexed new records and dropped removed ones, skip those that left since
+                if self._downloads.get(record["id"]) is record:
+                    self._fuzzy.add(record)
+            await asyncio.sleep(0)
+
+    async def fuzzy_search(self, q: str, limit: int) -> List[dict]:
+        """Typo tolerant matches on effective title and artist, best first, see FuzzyIndex.search."""
+        await self.warm_fuzzy_index()
+        return self._fuzzy.search(q, limit)
+
+    def get(self, id: str) -> Optional[dict]:
+        return self._downloads.get(id)
+
+    def __contains__(self, id: str) -> bool:
+        return id in self._downloads
+
+    def __len__(self) -> int:
+        return len(self._downloads)
+
+
+    #event handlers
+    def _changed(self):
+        self._version += 1
+        self._snapshot = None
+
+    def _update_record(self, content: dict):
+        record = self._downloads.get(content["id"])
+        if record is None:
+            return #not downloaded, the record arrives with its LOG_DOWNLOAD(S) event
+        renamed = any(key in content and content[key] != record[key] for key in ("title", "artist"))
+        for key in ("title", "artist", "duration"):
+            if key in content:
+                record[key] = content[key]
+        if renamed:
+            self._fuzzy.add(record)
+
+    def _add_download(self, track: dict):
+        #INSERT OR IGNORE keeps the original downloaded_at, so existing entries keep their place
+        if track["id"] in self._downloads:
+            self._update_record(track)
+        else:
+            record = {
+                "id": track["id"],
+                "title": track["title"],
+                "artist": track["artist"],
+                "duration": track["duration"]
+            }
+            self._downloads[track["id"]] = record
+            self._fuzzy.add(record)
+
+    def _on_log_track(self, event: Event):
+        self._update_record(event.payload["content"])
+        self._changed()
+
+    def _on_log_tracks(self, event: Event):
+        for track in event.payload["content"]:
+            self._update_record(track)
+        self._changed()
+
+    def _on_log_download(self, event: Event):
+        self._add_download(event.payload["content"])
+        self._changed()
+
+    def _on_log_downloads(self, event: Event):
+        for track in event.payload["content"]["tracks"]:
+            self._add_download(track)
+        self._changed()
+
+    def _on_unlog(self, event: Event):
+        self._downloads.pop(event.payload["content"]["id"], None)
+        self._fuzzy.remove(event.payload["content"]["id"])
+        self._changed()
+
+    def _on_set_metadata(self, event: Event):
+        self._update_record(event.payload["content"])
+        self._changed()
+
+    def _on_edit_tracks(self, event: Event):
+        for edit in event.payload["content"]["metadata"]:
+            self._update_record(edit)
+        self._changed()
@@ -0,0 +1,311 @@
+import sqlite3
+from dataclasses import dataclass
+from typing import List, Tuple
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    statements: Tuple[str, ...]
+
+
+#ordered schema changes on top of the tables AudioDatabase.build() creates (version 0).
+#never edit a released migration, append a new one instead.
+MIGRATIONS: List[Migration] = [
+    Migration(
+        version=1,
+        name="hot path indexes",
+        statements=(
+            #get_downloads_content / get_downloads_page: ORDER BY downloaded_at DESC, id DESC
+            '''
+            CREATE INDEX IF NOT EXISTS idx_downloads_downloaded_at
+            ON downloads (downloaded_at, id);
+            ''',
+            #get_playlist_content / get_playlist_content_page: WHERE playlist_id = ? ORDER BY added_at, track_id
+            '''
+            CREATE INDEX IF NOT EXISTS idx_playlist_tracks_added_at
+            ON playlist_tracks (playlist_id, added_at, track_id);
+            ''',
+            #ON DELETE CASCADE from downloads and any lookup by track: playlist_tracks.track_id
+            '''
+            CREATE INDEX IF NOT EXISTS idx_playlist_tracks_track_id
+            ON playlist_tracks (track_id);
+            ''',
+            #fetch_liked_tracks: ORDER BY liked_at, covering so the ids come straight from the index
+            '''
+            CREATE INDEX IF NOT EXISTS idx_likes_liked_at
+            ON likes (liked_at, id);
+            ''',
+            #search LIKE fallback: ORDER BY title COLLATE NOCASE
+            '''
+            CREATE INDEX IF NOT EXISTS idx_tracks_title_nocase
+            ON tracks (title COLLATE NOCASE);
+            ''',
+        )
+    ),
+    Migration(
+        version=2,
+        name="playlist track positions",
+        statements=(
+            #explicit order instead of added_at, which ties for tracks imported within the same second
+            '''
+            ALTER TABLE playlist_tracks ADD COLUMN position REAL;
+            ''',
+            #keep the order users saw before, spaced 1024 apart (ordering.POSITION_GAP)
+            '''
+            UPDATE playlist_tracks
+            SET position = ranked.rn * 1024.0
+            FROM (
+                SELECT rowid AS rid,
+                       ROW_NUMBER() OVER (PARTITION BY playlist_id ORDER BY added_at, track_id) AS rn
+                FROM playlist_tracks
+            ) AS ranked
+            WHERE playlist_tracks.rowid = ranked.rid;
+            ''',
+            #reads and neighbour lookups range scan by position now, nothing orders by added_at anymore
+            '''
+            DROP INDEX IF EXISTS idx_playlist_tracks_added_at;
+            ''',
+            '''
+            CREATE INDEX IF NOT EXISTS idx_playlist_tracks_position
+            ON playlist_tracks (playlist_id, position, track_id);
+            ''',
+        )
+    ),
+    Migration(
+        version=3,
+        name="download file manifest",
+        statements=(
+            #size and mtime of every audio file as of the last reconcile pass, see reconcile.py
+            '''
+            CREATE TABLE IF NOT EXISTS file_manifest (
+                name TEXT PRIMARY KEY,
+                size INTEGER NOT NULL,
+                mtime_ns INTEGER NOT NULL
+            ) WITHOUT ROWID;
+            ''',
+        )
+    ),
+    Migration(
+        version=4,
+        name="library change log",
+        statements=(
+            #one row per library mutation, written by the triggers below in the mutating transaction.
+            #AUTOINCREMENT so seq never goes backwards, even after compaction deletes the newest rows
+            '''
+            CREATE TABLE IF NOT EXISTS changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                entity TEXT NOT NULL,
+                key TEXT NOT NULL,
+                op TEXT NOT NULL,
+                data TEXT
+            );
+            ''',
+            '''
+            CREATE INDEX IF NOT EXISTS idx_changes_entity_key
+            ON changes (entity, key, seq);
+            ''',
+            #changes_floor: smallest `since` still answerable from the log, raised by compaction
+            '''
+            CREATE TABLE IF NOT EXISTS sync_meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            );
+            ''',
+            '''
+            INSERT OR IGNORE INTO sync_meta (key, value) VALUES ('changes_floor', 0);
+            ''',
+            #seed with the library as it is, so syncing from 0 is complete on upgraded databases too
+            '''
+            INSERT INTO changes (entity, key, op, data)
+            SELECT 'download', t.id, 'upsert', json_object(
+                'id', t.id,
+                'title', COALESCE(t.custom_title, t.title),
+                'artist', COALESCE(t.custom_artist, t.artist),
+                'duration', t.duration,
+                'downloaded_at', d.downloaded_at
+            )
+            FROM downloads d JOIN tracks t ON t.id = d.id
+            ORDER BY d.downloaded_at, d.id;
+            ''',
+            '''
+            INSERT INTO changes (entity, key, op, data)
+            SELECT 'like', id, 'upsert', json_object('id', id, 'liked_at', liked_at)
+            FROM likes ORDER BY liked_at, id;
+            ''',
+            '''
+            INSERT INTO changes (entity, key, op, data)
+            SELECT 'playlist', id, 'upsert', json_object('id', id, 'name', name)
+            FROM playlists ORDER BY id;
+            ''',
+            '''
+            INSERT INTO changes (entity, key, op, data)
+            SELECT 'playlist_track', playlist_id || ':' || track_id, 'upsert', json_object(
+                'playlist_id', playlist_id, 'track_id', track_id, 'position', position
+            )
+            FROM playlist_tracks ORDER BY playlist_id, position, track_id;
+            ''',
+
+            #downloads, with the effective metadata the library shows
+            '''
+            CREATE TRIGGER IF NOT EXISTS changes_downloads_ai AFTER INSERT ON downloads BEGIN
+                INSERT INTO changes (entity, key, op, data)
+                SELECT 'download', t.id, 'upsert', json_object(
+                    'id', t.id,
+                    'title', COALESCE(t.custom_title, t.title),
+                    'artist', COALESCE(t.custom_artist, t.artist),
+                    'duration', t.duration,
+                    'downloaded_at', new.downloaded_at
+                )
+                FROM tracks t WHERE t.id = new.id;
+            END;
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS changes_downloads_ad AFTER DELETE ON downloads BEGIN
+                INSERT INTO changes (entity, key, op) VALUES ('download', old.id, 'delete');
+            END;
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS changes_tracks_au AFTER UPDATE ON tracks
+            WHEN (
+                old.title IS NOT new.title OR old.artist IS NOT new.artist OR old.duration IS NOT new.duration
+                OR old.custom_title IS NOT new.custom_title OR old.custom_artist IS NOT new.custom_artist
+            ) AND EXISTS (SELECT 1 FROM downloads WHERE id = new.id) BEGIN
+                INSERT INTO changes (entity, key, op, data) VALUES ('download', new.id, 'upsert', json_object(
+                    'id', new.id,
+                    'title', COALESCE(new.custom_title, new.title),
+                    'artist', COALESCE(new.custom_artist, new.artist),
+                    'duration', new.duration,
+                    'downloaded_at', (SELECT downloaded_at FROM downloads WHERE id = new.id)
+                ));
+            END;
+            ''',
+
+            #likes
+            '''
+            CREATE TRIGGER IF NOT EXISTS changes_likes_ai AFTER INSERT ON likes BEGIN
+                INSERT INTO changes (entity, key, op, data)
+                VALUES ('like', new.id, 'upsert', json_object('id', new.id, 'liked_at', new.liked_at));
+            END;
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS changes_likes_ad AFTER DELETE ON likes BEGIN
+                INSERT INTO changes (entity, key, op) VALUES ('like', old.id, 'delete');
+            END;
+            ''',
+
+            #playlists
+            '''
+            CREATE TRIGGER IF NOT EXISTS changes_playlists_ai AFTER INSERT ON playlists BEGIN
+                INSERT INTO changes (entity, key, op, data)
+                VALUES ('playlist', new.id, 'upsert', json_object('id', new.id, 'name', new.name));
+            END;
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS changes_playlists_au AFTER UPDATE OF name ON playlists BEGIN
+                INSERT INTO changes (entity, key, op, data)
+                VALUES ('playlist', new.id, 'upsert', json_object('id', new.id, 'name', new.name));
+            END;
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS changes_playlists_ad AFTER DELETE ON playlists BEGIN
+                INSERT INTO changes (entity, key, op) VALUES ('playlist', old.id, 'delete');
+            END;
+            ''',
+
+            #playlist membership and order, keyed "<playlist_id>:<track_id>"
+            '''
+            CREATE TRIGGER IF NOT EXISTS changes_playlist_tracks_ai AFTER INSERT ON playlist_tracks BEGIN
+                INSERT INTO changes (entity, key, op, data)
+                VALUES ('playlist_track', new.playlist_id || ':' || new.track_id, 'upsert', json_object(
+                    'playlist_id', new.playlist_id, 'track_id', new.track_id, 'position', new.position
+                ));
+            END;
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS changes_playlist_tracks_au AFTER UPDATE OF position ON playlist_tracks BEGIN
+                INSERT INTO changes (entity, key, op, data)
+                VALUES ('playlist_track', new.playlist_id || ':' || new.track_id, 'upsert', json_object(
+                    'playlist_id', new.playlist_id, 'track_id', new.track_id, 'position', new.position
+                ));
+            END;
+            ''',
+            '''
+            CREATE TRIGGER IF NOT EXISTS changes_playlist_tracks_ad AFTER DELETE ON playlist_tracks BEGIN
+                INSERT INTO changes (entity, key, op)
+                VALUES ('playlist_track', old.playlist_id || ':' || old.track_id, 'delete');
+            END;
+            ''',
+        )
+    ),
+    Migration(
+        version=5,
+        name="download formats",
+        statements=(
+            #container and content type of each downloaded file, everything before this was mp3
+            '''
+            ALTER TABLE downloads ADD COLUMN format TEXT NOT NULL DEFAULT 'mp3';
+            ''',
+            '''
+            ALTER TABLE downloads ADD COLUMN mime TEXT NOT NULL DEFAULT 'audio/mpeg';
+            ''',
+        )
+    ),
+    Migration(
+        version=6,
+        name="download file stats",
+        statements=(
+            #size and mtime of the file when it was downloaded, what FileIndex serves from instead of stat().
+            #NULL for older downloads, those are stat()ed once per process
+            '''
+            ALTER TABLE downloads ADD COLUMN size INTEGER;
+            ''',
+            '''
+            ALTER TABLE downloads ADD COLUMN mtime_ns INTEGER;
+            ''',
+        )
+    ),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1].version if MIGRATIONS else 0
+
+
+def get_schema_version(cur: sqlite3.Cursor) -> int:
+    return cur.execute("PRAGMA user_version;").fetchone()[0]
+
+
+def apply_migrations(cur: sqlite3.Cursor, migrations: List[Migration] = MIGRATIONS) -> List[int]:
+    """
+    Apply every migration newer than the database's PRAGMA user_version, in order.
+
+    Runs on the caller's cursor, so with AudioDatabase._transaction the whole
+    upgrade commits (or rolls back) as one unit together with the user_version bump.
+
+    Args:
+        cur (sqlite3.Cursor): Cursor on the writer connection.
+        migrations (List[Migration]): Ordered migrations, defaults to MIGRATIONS.
+
+    Returns:
+        List[int]: Versions that were applied, empty if already up to date.
+    """
+    current = get_schema_version(cur)
+    applied = []
+
+    #sqlite3 autocommits DDL outside an explicit transaction, open one so a failed step undoes the rest
+    if not cur.connection.in_transaction:
+        cur.execute("BEGIN;")
+
+    for migration in sorted(migrations, key=lambda m: m.version):
+        if migration.version <= current:
+            continue
+
+        print(f"[AudioDatabase] Applying migration {migration.version}: {migration.name}")
+        for statement in migration.statements:
+            cur.execute(statement)
+
+        #pragmas can't take bound parameters, version is an int from this file
+        cur.execute(f"PRAGMA user_version = {int(migration.version)};")
+        applied.append(migration.version)
+
+    return applied
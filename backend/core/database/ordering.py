@@ -0,0 +1,116 @@
+from bisect import bisect_left
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+
+#spacing between neighbouring playlist_tracks.position values after an append or renumber.
+#a REAL midpoint can be taken ~50 times between two neighbours before the gap runs out.
+POSITION_GAP = 1024.0
+
+
+def positions_between(lo: Optional[float], hi: Optional[float], count: int) -> Optional[List[float]]:
+    """
+    Evenly spaced positions strictly between two neighbours.
+
+    Args:
+        lo (float, optional): Position of the row before the slot, None for the start.
+        hi (float, optional): Position of the row after the slot, None for the end.
+        count (int): How many positions to place in the slot.
+
+    Returns:
+        Optional[List[float]]: `count` increasing positions, or None if the gap is too
+            small to hold them and the playlist needs renumbering first.
+    """
+    if lo is None and hi is None:
+        positions = [POSITION_GAP * (i + 1) for i in range(count)]
+    elif lo is None:
+        positions = [hi - POSITION_GAP * (count - i) for i in range(count)]
+    elif hi is None:
+        positions = [lo + POSITION_GAP * (i + 1) for i in range(count)]
+    else:
+        step = (hi - lo) / (count + 1)
+        positions = [lo + step * (i + 1) for i in range(count)]
+
+    #float precision, neighbours that are too close produce duplicates or hit the bounds
+    bounded = [p for p in (lo, *positions, hi) if p is not None]
+    if any(a >= b for a, b in zip(bounded, bounded[1:])):
+        return None
+    return positions
+
+
+def longest_increasing_subsequence(values: Sequence[int]) -> Set[int]:
+    """
+    Indices of one longest strictly increasing subsequence of `values`, in O(n log n).
+
+    Used by reorder: with `values` being each track's current rank in the new order,
+    the tracks on the subsequence are already correctly ordered relative to each
+    other and keep their positions, everything else is a moved row.
+    """
+    tails: List[int] = [] #tails[k] is the smallest tail value of an increasing run of length k + 1
+    tail_index: List[int] = []
+    previous: List[int] = [-1] * len(values)
+
+    for i, value in enumerate(values):
+        k = bisect_left(tails, value)
+        if k == len(tails):
+            tails.append(value)
+            tail_index.append(i)
+        else:
+            tails[k] = value
+            tail_index[k] = i
+        previous[i] = tail_index[k - 1] if k > 0 else -1
+
+    keep = set()
+    i = tail_index[-1] if tail_index else -1
+    while i != -1:
+        keep.add(i)
+        i = previous[i]
+    return keep
+
+
+def plan_reorder(positions: Sequence[float], rank: Dict[str, int], track_ids: Sequence[str]) -> Tuple[List[Tuple[float, str]], List[dict]]:
+    """
+    Which rows a reorder has to write, and the moves that describe it.
+
+    The tracks on a longest increasing subsequence of the current order keep their
+    positions, each run of other tracks is spread into the gap between the kept
+    tracks around it. If a gap runs out of precision every track is respaced.
+
+    Args:
+        positions (Sequence[float]): Current positions, in current order.
+        rank (Dict[str, int]): Track id to its index in the current order.
+        track_ids (Sequence[str]): The same tracks in the new order.
+
+    Returns:
+        Tuple[List[Tuple[float, str]], List[dict]]: (position, track_id) updates, and
+            one {"id", "after_id"} move per moved track that reproduces the new order
+            when applied one by one.
+    """
+    keep = longest_increasing_subsequence([rank[id] for id in track_ids])
+
+    #fill each run of moved tracks into the gap between the kept tracks around it
+    updates, run, lo, fits = [], [], None, True
+    for i, id in enumerate([*track_ids, None]):
+        if id is not None and i not in keep:
+            run.append(id)
+            continue
+
+        hi = positions[rank[id]] if id is not None else None
+        if run:
+            between = positions_between(lo, hi, len(run))
+            if between is None:
+                fits = False
+                break
+            updates.extend(zip(between, run))
+            run = []
+        lo = hi
+
+    if not fits:
+        #out of precision somewhere, respace the whole playlist in the new order
+        updates = [(POSITION_GAP * (i + 1), id) for i, id in enumerate(track_ids)]
+
+    moves = [
+        {"id": id, "after_id": track_ids[i - 1] if i > 0 else None}
+        for i, id in enumerate(track_ids)
+        if i not in keep
+    ]
+    return updates, moves
@@ -0,0 +1,1183 @@
+import json
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+import asyncpg
+
+from backend.core.database.library_cache import LibraryCache
+from backend.core.database.migrations import Migration
+from backend.core.database.ordering import POSITION_GAP, plan_reorder, positions_between
+from backend.core.database.storage import AudioStorage, decode_cursor, download_file, search_tokens, track_formats, track_stats
+from backend.core.events.event_bus import EventBus
+from backend.core.lib.formats import mime_type
+from backend.core.lib.metrics import MetricsRegistry
+from backend.core.models.track import Track
+from backend.exceptions import PlaylistOrderError
+
+from backend.core.models.enums import AudioDatabaseAction as ADA
+
+
+T = TypeVar("T")
+
+
+def build_tsquery(q: str) -> Optional[str]:
+    """
+    Turn a raw search box string into a to_tsquery expression, the postgres
+    counterpart of audio_database.build_fts_query: every word is a prefix term and
+    all of them must match. None when the query has no searchable words.
+    """
+    tokens = search_tokens(q)
+    if not tokens:
+        return None
+    return " & ".join(f"{token}:*" for token in tokens)
+
+
+def _status_count(status: str) -> int:
+    #asyncpg returns the command tag, e.g. "DELETE 3"
+    return int(status.rsplit(" ", 1)[-1])
+
+
+#effective title/artist and the original values they override, weighted A/B/D like the sqlite fts bm25 weights
+_SEARCH_VECTOR = '''
+    setweight(to_tsvector('simple', COALESCE(custom_title, title)), 'A') ||
+    setweight(to_tsvector('simple', COALESCE(custom_artist, artist, '')), 'B') ||
+    setweight(to_tsvector('simple',
+        CASE WHEN custom_title IS NOT NULL THEN title ELSE '' END || ' ' ||
+        CASE WHEN custom_artist IS NOT NULL THEN COALESCE(artist, '') ELSE '' END
+    ), 'D')
+'''
+
+#sqlite's CURRENT_TIMESTAMP, utc without a zone
+_NOW = "(CURRENT_TIMESTAMP AT TIME ZONE 'UTC')"
+
+#the same text format sqlite stores, so events, change log payloads and cursors look alike on both backends
+_TIMESTAMP_FORMAT = "'YYYY-MM-DD HH24:MI:SS'"
+
+
+#ordered schema changes, tracked in schema_version. never edit a released migration, append a new one instead.
+PG_MIGRATIONS: List[Migration] = [
+    Migration(
+        version=1,
+        name="library schema",
+        statements=(
+            f'''
+            CREATE TABLE IF NOT EXISTS tracks (
+                id TEXT PRIMARY KEY,
+                title TEXT NOT NULL,
+                artist TEXT,
+                duration INTEGER,
+                custom_title TEXT,
+                custom_artist TEXT,
+                search tsvector GENERATED ALWAYS AS ({_SEARCH_VECTOR}) STORED
+            );
+            ''',
+            '''
+            CREATE INDEX IF NOT EXISTS idx_tracks_search ON tracks USING gin (search);
+            ''',
+            '''
+            CREATE INDEX IF NOT EXISTS idx_tracks_title_lower ON tracks (LOWER(title), id);
+            ''',
+            f'''
+            CREATE TABLE IF NOT EXISTS downloads (
+                id TEXT PRIMARY KEY REFERENCES tracks (id) ON DELETE CASCADE,
+                downloaded_at TIMESTAMP NOT NULL DEFAULT {_NOW}
+            );
+            ''',
+            '''
+            CREATE INDEX IF NOT EXISTS idx_downloads_downloaded_at ON downloads (downloaded_at, id);
+            ''',
+            f'''
+            CREATE TABLE IF NOT EXISTS likes (
+                id TEXT PRIMARY KEY REFERENCES downloads (id) ON DELETE CASCADE,
+                liked_at TIMESTAMP NOT NULL DEFAULT {_NOW}
+            );
+            ''',
+            '''
+            CREATE INDEX IF NOT EXISTS idx_likes_liked_at ON likes (liked_at, id);
+            ''',
+            f'''
+            CREATE TABLE IF NOT EXISTS playlists (
+                id BIGINT GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+                name TEXT NOT NULL,
+                created_at TIMESTAMP NOT NULL DEFAULT {_NOW}
+            );
+            ''',
+            f'''
+            CREATE TABLE IF NOT EXISTS playlist_tracks (
+                playlist_id BIGINT NOT NULL REFERENCES playlists (id) ON DELETE CASCADE,
+                track_id TEXT NOT NULL REFERENCES downloads (id) ON DELETE CASCADE,
+                added_at TIMESTAMP NOT NULL DEFAULT {_NOW},
+                position DOUBLE PRECISION NOT NULL,
+                PRIMARY KEY (playlist_id, track_id)
+            );
+            ''',
+            '''
+            CREATE INDEX IF NOT EXISTS idx_playlist_tracks_position ON playlist_tracks (playlist_id, position, track_id);
+            ''',
+            '''
+            CREATE INDEX IF NOT EXISTS idx_playlist_tracks_track_id ON playlist_tracks (track_id);
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS file_manifest (
+                name TEXT PRIMARY KEY,
+                size BIGINT NOT NULL,
+                mtime_ns BIGINT NOT NULL
+            );
+            ''',
+
+            #library change log, see AudioDatabase.get_changes
+            '''
+            CREATE TABLE IF NOT EXISTS changes (
+                seq BIGSERIAL PRIMARY KEY,
+                entity TEXT NOT NULL,
+                key TEXT NOT NULL,
+                op TEXT NOT NULL,
+                data JSONB
+            );
+            ''',
+            '''
+            CREATE INDEX IF NOT EXISTS idx_changes_entity_key ON changes (entity, key, seq);
+            ''',
+            '''
+            CREATE TABLE IF NOT EXISTS sync_meta (
+                key TEXT PRIMARY KEY,
+                value BIGINT NOT NULL
+            );
+            ''',
+            '''
+            INSERT INTO sync_meta (key, value) VALUES ('changes_floor', 0) ON CONFLICT (key) DO NOTHING;
+            ''',
+            #sequences hand out numbers at insert, not at commit. holding this lock until commit makes
+            #seq order match commit order, otherwise a reader could skip a change that commits late
+            '''
+            CREATE OR REPLACE FUNCTION log_change(p_entity TEXT, p_key TEXT, p_op TEXT, p_data JSONB) RETURNS void AS $$
+            BEGIN
+                PERFORM pg_advisory_xact_lock(hashtext('changes'));
+                INSERT INTO changes (entity, key, op, data) VALUES (p_entity, p_key, p_op, p_data);
+            END;
+            $$ LANGUAGE plpgsql;
+            ''',
+            f'''
+            CREATE OR REPLACE FUNCTION download_json(p_id TEXT) RETURNS JSONB AS $$
+                SELECT jsonb_build_object(
+                    'id', t.id,
+                    'title', COALESCE(t.custom_title, t.title),
+                    'artist', COALESCE(t.custom_artist, t.artist),
+                    'duration', t.duration,
+                    'downloaded_at', to_char(d.downloaded_at, {_TIMESTAMP_FORMAT})
+                )
+                FROM tracks t JOIN downloads d ON d.id = t.id
+                WHERE t.id = p_id;
+            $$ LANGUAGE sql STABLE;
+            ''',
+            '''
+            CREATE OR REPLACE FUNCTION changes_downloads() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'DELETE' THEN
+                    PERFORM log_change('download', OLD.id, 'delete', NULL);
+                ELSE
+                    PERFORM log_change('download', NEW.id, 'upsert', download_json(NEW.id));
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+            ''',
+            '''
+            CREATE TRIGGER changes_downloads AFTER INSERT OR DELETE ON downloads
+            FOR EACH ROW EXECUTE FUNCTION changes_downloads();
+            ''',
+            '''
+            CREATE OR REPLACE FUNCTION changes_tracks() RETURNS trigger AS $$
+            BEGIN
+                IF EXISTS (SELECT 1 FROM downloads WHERE id = NEW.id) THEN
+                    PERFORM log_change('download', NEW.id, 'upsert', download_json(NEW.id));
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+            ''',
+            '''
+            CREATE TRIGGER changes_tracks AFTER UPDATE ON tracks
+            FOR EACH ROW WHEN (
+                OLD.title IS DISTINCT FROM NEW.title OR OLD.artist IS DISTINCT FROM NEW.artist
+                OR OLD.duration IS DISTINCT FROM NEW.duration OR OLD.custom_title IS DISTINCT FROM NEW.custom_title
+                OR OLD.custom_artist IS DISTINCT FROM NEW.custom_artist
+            ) EXECUTE FUNCTION changes_tracks();
+            ''',
+            f'''
+            CREATE OR REPLACE FUNCTION changes_likes() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'DELETE' THEN
+                    PERFORM log_change('like', OLD.id, 'delete', NULL);
+                ELSE
+                    PERFORM log_change('like', NEW.id, 'upsert', jsonb_build_object(
+                        'id', NEW.id, 'liked_at', to_char(NEW.liked_at, {_TIMESTAMP_FORMAT})
+                    ));
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+            ''',
+            '''
+            CREATE TRIGGER changes_likes AFTER INSERT OR DELETE ON likes
+            FOR EACH ROW EXECUTE FUNCTION changes_likes();
+            ''',
+            '''
+            CREATE OR REPLACE FUNCTION changes_playlists() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'DELETE' THEN
+                    PERFORM log_change('playlist', OLD.id::TEXT, 'delete', NULL);
+                ELSE
+                    PERFORM log_change('playlist', NEW.id::TEXT, 'upsert', jsonb_build_object('id', NEW.id, 'name', NEW.name));
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+            ''',
+            '''
+            CREATE TRIGGER changes_playlists AFTER INSERT OR UPDATE OF name OR DELETE ON playlists
+            FOR EACH ROW EXECUTE FUNCTION changes_playlists();
+            ''',
+            '''
+            CREATE OR REPLACE FUNCTION changes_playlist_tracks() RETURNS trigger AS $$
+            BEGIN
+                IF TG_OP = 'DELETE' THEN
+                    PERFORM log_change('playlist_track', OLD.playlist_id || ':' || OLD.track_id, 'delete', NULL);
+                ELSE
+                    PERFORM log_change('playlist_track', NEW.playlist_id || ':' || NEW.track_id, 'upsert', jsonb_build_object(
+                        'playlist_id', NEW.playlist_id, 'track_id', NEW.track_id, 'position', NEW.position
+                    ));
+                END IF;
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql;
+            ''',
+            '''
+            CREATE TRIGGER changes_playlist_tracks AFTER INSERT OR UPDATE OF position OR DELETE ON playlist_tracks
+            FOR EACH ROW EXECUTE FUNCTION changes_playlist_tracks();
+            ''',
+        )
+    ),
+    Migration(
+        version=2,
+        name="download formats",
+        statements=(
+            '''
+            ALTER TABLE downloads ADD COLUMN IF NOT EXISTS format TEXT NOT NULL DEFAULT 'mp3';
+            ''',
+            '''
+            ALTER TABLE downloads ADD COLUMN IF NOT EXISTS mime TEXT NOT NULL DEFAULT 'audio/mpeg';
+            ''',
+        )
+    ),
+    Migration(
+        version=3,
+        name="download file stats",
+        statements=(
+            '''
+            ALTER TABLE downloads ADD COLUMN IF NOT EXISTS size BIGINT;
+            ''',
+            '''
+            ALTER TABLE downloads ADD COLUMN IF NOT EXISTS mtime_ns BIGINT;
+            ''',
+        )
+    ),
+]
+
+
+class PostgresAudioDatabase(AudioStorage):
+    """
+    AudioStorage on postgres through an asyncpg connection pool.
+
+    Unlike AudioDatabase there is no single writer: every call borrows a pooled
+    connection, writes run in their own transaction and postgres row locks do the
+    serializing (playlist rows are locked while their order changes). Statements
+    are prepared once per connection by asyncpg's statement cache and bulk writes
+    go through executemany, so hot queries skip parsing and planning entirely.
+
+    The schema lives in PG_MIGRATIONS, not scripts/001_init_schema.sql (which
+    carries the hosted worker's blob columns), so point `dsn` at a dedicated
+    database or pass `schema`.
+
+    Args:
+        name (str): Event source name.
+        dsn (str): postgres:// connection string.
+        event_bus (EventBus, optional): Bus that receives ADA events.
+        schema (str, optional): Schema to create and use instead of the search_path default.
+        min_size (int): Connections the pool keeps open.
+        max_size (int): Most connections the pool opens.
+        statement_cache_size (int): Prepared statements kept per connection.
+        library_cache (LibraryCache, optional): Read-through cache for the downloads listing.
+        metrics (MetricsRegistry, optional): Records pool wait and query timing under the
+            same names DatabaseExecutor uses, with executor="pool".
+    """
+    def __init__(
+        self,
+        *,
+        name: str,
+        dsn: str,
+        event_bus: Optional[EventBus] = None,
+        schema: Optional[str] = None,
+        min_size: int = 2,
+        max_size: int = 10,
+        statement_cache_size: int = 256,
+        library_cache: Optional[LibraryCache] = None,
+        metrics: Optional[MetricsRegistry] = None
+    ):
+        super().__init__(name=name, event_bus=event_bus, library_cache=library_cache, metrics=metrics)
+
+        self._dsn = dsn
+        self._schema = schema
+        self._min_size = min_size
+        self._max_size = max_size
+        self._statement_cache_size = statement_cache_size
+        self._pool: Optional[asyncpg.Pool] = None
+
+
+    #connections
+    async def _run(self, func: Callable[[asyncpg.Connection], Awaitable[T]], *, op: str, write: bool = False) -> T:
+        #borrow a connection, writes get a transaction, and record wait/run time like DatabaseExecutor
+        if self._pool is None:
+            raise RuntimeError("PostgresAudioDatabase.build() has not been called")
+
+        submitted = time.perf_counter()
+        async with self._pool.acquire() as conn:
+            started = time.perf_counter()
+            result, failed = None, True
+            try:
+                if write:
+                    async with conn.transaction():
+                        result = await func(conn)
+                else:
+                    result = await func(conn)
+                failed = False
+                return result
+            finally:
+                if self.metrics:
+                    self._record(op, started - submitted, time.perf_counter() - started, result, failed)
+
+    def _record(self, op: str, wait: float, duration: float, result: object, failed: bool):
+        labels = {"db": self.name, "executor": "pool"}
+        self.metrics.observe("db_queue_wait_seconds", wait, **labels)
+        self.metrics.observe("db_query_seconds", duration, **labels, op=op)
+        self.metrics.inc("db_queries_total", **labels, op=op)
+        if failed:
+            self.metrics.inc("db_query_errors_total", **labels, op=op)
+        else:
+            self.metrics.inc("db_rows_total", len(result) if isinstance(result, list) else 0, **labels, op=op)
+
+    async def _fetch(self, op: str, query: str, *args) -> list:
+        return await self._run(lambda conn: conn.fetch(query, *args), op=op)
+
+    async def _fetchrow(self, op: str, query: str, *args):
+        return await self._run(lambda conn: conn.fetchrow(query, *args), op=op)
+
+    async def _transaction(self, op: str, func: Callable[[asyncpg.Connection], Awaitable[T]]) -> T:
+        return await self._run(func, op=op, write=True)
+
+    async def _lock_playlists(self, conn: asyncpg.Connection, playlist_ids: List[int]):
+        #concurrent appends and reorders of one playlist would pick the same positions, in id order so two can't deadlock
+        if playlist_ids:
+            await conn.execute('''
+                SELECT id FROM playlists
+                WHERE id = ANY($1::BIGINT[])
+                ORDER BY id
+                FOR UPDATE;
+            ''', sorted(set(playlist_ids)))
+
+
+    #lifecycle
+    async def build(self):
+        """Open the pool and apply every migration newer than schema_version."""
+        server_settings = {"search_path": self._schema} if self._schema else None
+
+        if self._schema:
+            conn = await asyncpg.connect(self._dsn)
+            try:
+                await conn.execute(f'CREATE SCHEMA IF NOT EXISTS "{self._schema}";')
+            finally:
+                await conn.close()
+
+        self._pool = await asyncpg.create_pool(
+            self._dsn,
+            min_size=self._min_size,
+            max_size=self._max_size,
+            statement_cache_size=self._statement_cache_size,
+            server_settings=server_settings
+        )
+
+        async def migrate(conn: asyncpg.Connection) -> List[int]:
+            #one server at a time, the loser waits and then finds nothing left to do
+            await conn.execute("SELECT pg_advisory_xact_lock(hashtext('schema_version'));")
+            await conn.execute("CREATE TABLE IF NOT EXISTS schema_version (version INTEGER NOT NULL);")
+            current = await conn.fetchval("SELECT MAX(version) FROM schema_version;") or 0
+
+            applied = []
+            for migration in sorted(PG_MIGRATIONS, key=lambda m: m.version):
+                if migration.version <= current:
+                    continue
+                print(f"[AudioDatabase] Applying postgres migration {migration.version}: {migration.name}")
+                for statement in migration.statements:
+                    await conn.execute(statement)
+                await conn.execute("INSERT INTO schema_version (version) VALUES ($1);", migration.version)
+                applied.append(migration.version)
+            return applied
+
+        await self._transaction("migrations", migrate)
+
+    async def close(self):
+        #waits for queries that hold a connection, every write is its own transaction so nothing is queued
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            await pool.close()
+
+    async def count_rows(self) -> Dict[str, int]:
+        tables = ("tracks", "downloads", "likes", "playlists", "playlist_tracks")
+        columns = ", ".join(f"(SELECT COUNT(*) FROM {table}) AS {table}" for table in tables)
+        row = await self._fetchrow("count_rows", f"SELECT {columns};")
+        return {table: row[table] for table in tables}
+
+    async def view_all(self):
+        #debug dump of every row, prints the whole library so keep it out of the startup path
+        for table in ("tracks", "downloads", "playlists", "playlist_tracks"):
+            print(f"\n=== {table.upper()} TABLE ===")
+            rows = await self._fetch("view_all", f"SELECT * FROM {table};")
+            for row in rows:
+                print(dict(row))
+            if not rows:
+                print(f"(no {table.replace('_', ' ')} found)")
+
+
+    #tracks
+    _UPSERT_TRACK = '''
+        INSERT INTO tracks (id, title, artist, duration, custom_title, custom_artist)
+        VALUES ($1, $2, $3, $4, NULL, NULL)
+        ON CONFLICT (id) DO UPDATE SET
+            title = excluded.title,
+            artist = excluded.artist,
+            duration = excluded.duration,
+            custom_title = NULL,
+            custom_artist = NULL;
+    '''
+
+    async def log_track(self, track: Track):
+        await self._transaction("log_track", lambda conn: conn.execute(
+            self._UPSERT_TRACK, track.id, track.title, track.artist, track.duration
+        ))
+
+        content = {
+            "id": track.id,
+            "title": track.title,
+            "artist": track.artist,
+            "duration": track.duration
+        }
+        await self._emit_event(action=ADA.LOG_TRACK, payload={"content": content})
+
+    async def unlog_track(self, id: str):
+        await self._transaction("unlog_track", lambda conn: conn.execute("DELETE FROM tracks WHERE id = $1;", id))
+        await self._emit_event(action=ADA.UNLOG_TRACK, payload={"content": {"id": id}})
+
+    async def is_logged(self, track_id: str) -> bool:
+        return await self._fetchrow("is_logged", "SELECT 1 FROM tracks WHERE id = $1;", track_id) is not None
+
+
+    #downloads
+    _EFFECTIVE_TRACKS = '''
+        SELECT t.id,
+               COALESCE(t.custom_title, t.title) AS title,
+               COALESCE(t.custom_artist, t.artist) AS artist,
+               t.duration
+        FROM tracks t
+        WHERE t.id = ANY($1::TEXT[]);
+    '''
+
+    _APPEND_MEMBERSHIP = f'''
+        INSERT INTO playlist_tracks (playlist_id, track_id, position)
+        SELECT $1, $2, COALESCE(MAX(position), 0) + {POSITION_GAP}
+        FROM playlist_tracks
+        WHERE playlist_id = $1
+        ON CONFLICT (playlist_id, track_id) DO NOTHING;
+    '''
+
+    async def _insert_downloads(
+        self,
+        conn: asyncpg.Connection,
+        ids: List[str],
+        memberships: List[Tuple[str, int]],
+        formats: Optional[Dict[str, str]] = None,
+        stats: Optional[Dict[str, Tuple[int, int]]] = None
+    ) -> List[dict]:
+        if formats is None:
+            await conn.executemany(f'''
+                INSERT INTO downloads (id, downloaded_at)
+                VALUES ($1, {_NOW})
+                ON CONFLICT (id) DO NOTHING;
+            ''', [(id,) for id in ids])
+        else:
+            stats = stats or {}
+            await conn.executemany(f'''
+                INSERT INTO downloads (id, downloaded_at, format, mime, size, mtime_ns)
+                VALUES ($1, {_NOW}, $2, $3, $4, $5)
+                ON CONFLICT (id) DO UPDATE SET
+                    format = EXCLUDED.format,
+                    mime = EXCLUDED.mime,
+                    size = EXCLUDED.size,
+                    mtime_ns = EXCLUDED.mtime_ns;
+            ''', [(id, formats[id], mime_type(formats[id]), *stats.get(id, (None, None))) for id in ids])
+
+        await self._append_memberships(conn, memberships)
+
+        rows = await conn.fetch(self._EFFECTIVE_TRACKS, ids)
+        by_id = {row["id"]: dict(row) for row in rows}
+        return [by_id[id] for id in ids if id in by_id]
+
+    async def _append_memberships(self, conn: asyncpg.Connection, memberships: List[Tuple[str, int]]):
+        if not memberships:
+            return
+        await self._lock_playlists(conn, [int(playlist_id) for _, playlist_id in memberships])
+        await conn.executemany(self._APPEND_MEMBERSHIP, [
+            (int(playlist_id), track_id)
+            for track_id, playlist_id in memberships
+        ])
+
+    async def log_download(
+        self,
+        id: str,
+        format: Optional[str] = None,
+        size: Optional[int] = None,
+        mtime_ns: Optional[int] = None
+    ) -> dict:
+        formats, stats = download_file(id, format, size, mtime_ns)
+
+        async def log(conn: asyncpg.Connection) -> List[dict]:
+            return await self._insert_downloads(conn, [id], [], formats, stats)
+
+        tracks = await self._transaction("log_download", log)
+        if not tracks:
+            raise ValueError(f"Track with id {id} does not exist in TRACKS_TABLE")
+
+        await self._emit_download(tracks[0], formats, stats)
+        return tracks[0]
+
+    async def log_tracks_many(self, tracks: List[Track]):
+        if not tracks:
+            return
+
+        await self._transaction("log_tracks_many", lambda conn: conn.executemany(self._UPSERT_TRACK, [
+            (track.id, track.title, track.artist, track.duration)
+            for track in tracks
+        ]))
+
+        content = [
+            {
+                "id": track.id,
+                "title": track.title,
+                "artist": track.artist,
+                "duration": track.duration
+            }
+            for track in tracks
+        ]
+        await self._emit_event(action=ADA.LOG_TRACKS, payload={"content": content})
+
+    async def log_downloads_many(self, ids: List[str], memberships: Optional[List[Tuple[str, int]]] = None) -> List[dict]:
+        memberships = memberships or []
+        if not ids:
+            return []
+
+        tracks = await self._transaction("log_downloads_many", lambda conn: self._insert_downloads(conn, ids, memberships))
+        await self._emit_downloads(tracks, memberships)
+        return tracks
+
+    async def ingest_many(self, tracks: List[Track], memberships: Optional[List[Tuple[str, int]]] = None) -> List[dict]:
+        memberships = memberships or []
+        if not tracks:
+            return []
+
+        formats = track_formats(tracks)
+        stats = track_stats(tracks)
+
+        async def ingest(conn: asyncpg.Connection) -> List[dict]:
+            await conn.executemany(self._UPSERT_TRACK, [
+                (track.id, track.title, track.artist, track.duration)
+                for track in tracks
+            ])
+            return await self._insert_downloads(conn, [track.id for track in tracks], memberships, formats, stats)
+
+        content = await self._transaction("ingest_many", ingest)
+        await self._emit_downloads(content, memberships, formats, stats)
+        return content
+
+    async def unlog_download(self, id: str):
+        await self._transaction("unlog_download", lambda conn: conn.execute("DELETE FROM downloads WHERE id = $1;", id))
+        await self._emit_event(action=ADA.UNLOG_DOWNLOAD, payload={"content": {"id": id}})
+
+    async def is_downloaded(self, track_id: str) -> bool:
+        return await self._fetchrow("is_downloaded", "SELECT 1 FROM downloads WHERE id = $1;", track_id) is not None
+
+    async def get_download_files(self) -> Dict[str, Tuple[str, Optional[int], Optional[int]]]:
+        rows = await self._fetch("get_download_files", "SELECT id, format, size, mtime_ns FROM downloads;")
+        return {row["id"]: (row["format"], row["size"], row["mtime_ns"]) for row in rows}
+
+    async def backfill_download_stats(self, stats: Dict[str, Tuple[int, int]]):
+        if not stats:
+            return
+        await self._transaction("backfill_download_stats", lambda conn: conn.executemany('''
+            UPDATE downloads SET size = $2, mtime_ns = $3
+            WHERE id = $1 AND (size IS NULL OR mtime_ns IS NULL);
+        ''', [(id, size, mtime_ns) for id, (size, mtime_ns) in stats.items()]))
+
+    async def _read_library(self) -> List[dict]:
+        rows = await self._fetch("read_library", '''
+            SELECT t.id,
+                   COALESCE(t.custom_title, t.title) AS title,
+                   COALESCE(t.custom_artist, t.artist) AS artist,
+                   t.duration
+            FROM downloads d
+            INNER JOIN tracks t ON t.id = d.id
+            ORDER BY d.downloaded_at DESC, d.id DESC;
+        ''')
+        return [dict(row) for row in rows]
+
+    async def get_downloads_page(self, limit: int, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        #the cursor carries downloaded_at as text with microseconds, cast back for the row comparison
+        where, params = "", ()
+        if cursor:
+            where = "WHERE (d.downloaded_at, d.id) < ($2::TEXT::TIMESTAMP, $3)"
+            params = tuple(decode_cursor(cursor, 2))
+
+        rows = await self._fetch("get_downloads_page", f'''
+            SELECT t.id,
+                   COALESCE(t.custom_title, t.title) AS title,
+                   COALESCE(t.custom_artist, t.artist) AS artist,
+                   t.duration,
+                   to_char(d.downloaded_at, 'YYYY-MM-DD HH24:MI:SS.US') AS downloaded_key
+            FROM downloads d
+            INNER JOIN tracks t ON t.id = d.id
+            {where}
+            ORDER BY d.downloaded_at DESC, d.id DESC
+            LIMIT $1;
+        ''', limit + 1, *params)
+
+        rows, next_cursor = self._page(rows, limit, lambda row: (row["downloaded_key"], row["id"]))
+        content = [
+            {
+                "id": row["id"],
+                "title": row["title"],
+                "artist": row["artist"],
+                "duration": row["duration"]
+            }
+            for row in rows
+        ]
+
+        await self._emit_event(action=ADA.GET_DOWNLOADS_CONTENT, payload={"content": content})
+        return content, next_cursor
+
+
+    #metadata
+    async def _set_metadata(self, conn: asyncpg.Connection, edits: List[dict]) -> List[dict]:
+        #edits are {"id", "title", "artist"}, blank values clear the override back to the original
+        await conn.executemany('''
+            UPDATE tracks
+            SET custom_title = $1,
+                custom_artist = $2
+            WHERE id = $3;
+        ''', [
+            (edit.get("title") or None, edit.get("artist") or None, edit["id"])
+            for edit in edits
+        ])
+
+        ids = [edit["id"] for edit in edits]
+        rows = await conn.fetch(self._EFFECTIVE_TRACKS, ids)
+        by_id = {row["id"]: {"id": row["id"], "title": row["title"], "artist": row["artist"]} for row in rows}
+        return [by_id[id] for id in ids if id in by_id]
+
+    async def set_custom_metadata(self, id: str, custom_title: Optional[str] = None, custom_artist: Optional[str] = None):
+        edits = await self._transaction("set_custom_metadata", lambda conn: self._set_metadata(conn, [{
+            "id": id,
+            "title": custom_title,
+            "artist": custom_artist
+        }]))
+        content = edits[0] if edits else {"id": id, "title": None, "artist": None}
+
+        await self._emit_event(action=ADA.SET_METADATA, payload={"content": content})
+        return content
+
+
+    #search
+    def _search_query(self, q: str, after: bool) -> Tuple[str, tuple]:
+        #(query, params) for one page of matches ordered by (sort_key, id), limit is the last parameter
+        tsquery = build_tsquery(q)
+        if tsquery:
+            #ts_rank is higher for better matches, negated so every backend pages ascending
+            inner = '''
+                SELECT t.id,
+                    COALESCE(t.custom_title, t.title) AS title,
+                    COALESCE(t.custom_artist, t.artist) AS artist,
+                    t.duration,
+                    (-ts_rank(t.search, query))::DOUBLE PRECISION AS sort_key
+                FROM tracks t, to_tsquery('simple', $1) AS query
+                WHERE t.search @@ query
+            '''
+            params = (tsquery,)
+            after_clause = "WHERE (sort_key, id) > ($2::DOUBLE PRECISION, $3)"
+        else:
+            inner = '''
+                SELECT t.id,
+                    COALESCE(t.custom_title, t.title) AS title,
+                    COALESCE(t.custom_artist, t.artist) AS artist,
+                    t.duration,
+                    LOWER(t.title) AS sort_key
+                FROM tracks t
+                WHERE t.title ILIKE $1
+                    OR t.artist ILIKE $1
+                    OR COALESCE(t.custom_title, t.title) ILIKE $1
+                    OR COALESCE(t.custom_artist, t.artist) ILIKE $1
+            '''
+            params = (f"%{q.lower()}%",)
+            after_clause = "WHERE (sort_key, id) > ($2::TEXT, $3)"
+
+        limit = "$4" if after else "$2"
+        query = f'''
+            SELECT * FROM ({inner}) AS matches
+            {after_clause if after else ""}
+            ORDER BY sort_key, id
+            {f"LIMIT {limit}"}
+        '''
+        return query, params
+
+    async def search(self, q: str, limit: Optional[int] = 100) -> List[dict]:
+        if not q:
+            content = await self._library_content()
+            await self._emit_event(action=ADA.SEARCH, payload={"content": content})
+            return content
+
+        query, params = self._search_query(q, after=False)
+        rows = await self._fetch("search", query, *params, limit) #LIMIT NULL is no limit
+        content = [
+            Track(id=row["id"], title=row["title"], artist=row["artist"], duration=row["duration"])
+            for row in rows
+        ]
+
+        await self._emit_event(action=ADA.SEARCH, payload={"content": content})
+        return [track.to_json() for track in content]
+
+    async def search_page(self, q: str, limit: int, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        if not q:
+            content, next_cursor = await self.get_downloads_page(limit, cursor)
+            await self._emit_event(action=ADA.SEARCH, payload={"content": content})
+            return content, next_cursor
+
+        after = decode_cursor(cursor, 2) if cursor else None
+        query, params = self._search_query(q, after=after is not None)
+        rows = await self._fetch("search_page", query, *params, *(after or ()), limit + 1)
+
+        rows, next_cursor = self._page(rows, limit, lambda row: (row["sort_key"], row["id"]))
+        content = [
+            {
+                "id": row["id"],
+                "title": row["title"],
+                "artist": row["artist"],
+                "duration": row["duration"]
+            }
+            for row in rows
+        ]
+
+        await self._emit_event(action=ADA.SEARCH, payload={"content": content})
+        return content, next_cursor
+
+
+    #likes
+    async def toggle_like(self, id: str):
+        async def toggle(conn: asyncpg.Connection):
+            #a concurrent toggle waits on the conflicting row and then unlikes instead of failing
+            inserted = await conn.fetchrow('''
+                INSERT INTO likes (id) VALUES ($1)
+                ON CONFLICT (id) DO NOTHING
+                RETURNING id;
+            ''', id)
+            if inserted is None:
+                await conn.execute("DELETE FROM likes WHERE id = $1;", id)
+
+        await self._transaction("toggle_like", toggle)
+
+    async def fetch_liked_tracks(self) -> List[str]:
+        rows = await self._fetch("fetch_liked_tracks", "SELECT id FROM likes ORDER BY liked_at ASC, id ASC;")
+        track_ids = [row["id"] for row in rows]
+
+        await self._emit_event(action=ADA.FETCH_LIKES, payload={"content": track_ids})
+        return track_ids
+
+
+    #download folder manifest
+    async def get_file_manifest(self) -> Dict[str, Tuple[int, int]]:
+        rows = await self._fetch("get_file_manifest", "SELECT name, size, mtime_ns FROM file_manifest;")
+        return {row["name"]: (row["size"], row["mtime_ns"]) for row in rows}
+
+    async def update_file_manifest(self, upserts: List[Tuple[str, int, int]], removals: List[str]):
+        if not upserts and not removals:
+            return
+
+        async def update(conn: asyncpg.Connection):
+            await conn.execute("DELETE FROM file_manifest WHERE name = ANY($1::TEXT[]);", removals)
+            await conn.executemany('''
+                INSERT INTO file_manifest (name, size, mtime_ns)
+                VALUES ($1, $2, $3)
+                ON CONFLICT (name) DO UPDATE SET size = excluded.size, mtime_ns = excluded.mtime_ns;
+            ''', upserts)
+
+        await self._transaction("update_file_manifest", update)
+
+
+    #library change log, written by the log_change triggers
+    _LATEST_CHANGE = '''
+        SELECT GREATEST(
+            (SELECT COALESCE(MAX(seq), 0) FROM changes),
+            (SELECT value FROM sync_meta WHERE key = 'changes_floor')
+        );
+    '''
+
+    async def get_changes(self, since: int, limit: int) -> dict:
+        #the newest committed row rather than the sequence, which also counts uncommitted inserts.
+        #compaction only ever removes the newest row by raising the floor past it, hence GREATEST
+        async def read(conn: asyncpg.Connection) -> Tuple[int, int, list]:
+            async with conn.transaction(isolation="repeatable_read", readonly=True):
+                floor = await conn.fetchval("SELECT value FROM sync_meta WHERE key = 'changes_floor';")
+                latest = await conn.fetchval(self._LATEST_CHANGE)
+                rows = []
+                if floor <= since <= latest:
+                    rows = await conn.fetch('''
+                        SELECT seq, entity, key, op, data
+                        FROM changes
+                        WHERE seq > $1
+                        ORDER BY seq
+                        LIMIT $2;
+                    ''', since, limit + 1)
+                return floor, latest, rows
+
+        floor, latest, rows = await self._run(read, op="get_changes")
+
+        if not floor <= since <= latest:
+            return {"seq": latest, "latest": latest, "reset": True, "more": False, "changes": []}
+
+        more = len(rows) > limit
+        changes = [
+            {
+                "seq": row["seq"],
+                "entity": row["entity"],
+                "key": row["key"],
+                "op": row["op"],
+                "data": json.loads(row["data"]) if row["data"] is not None else None
+            }
+            for row in rows[:limit]
+        ]
+        return {
+            "seq": changes[-1]["seq"] if changes else since,
+            "latest": latest,
+            "reset": False,
+            "more": more,
+            "changes": changes
+        }
+
+    async def compact_changes(self, retain: int) -> int:
+        async def compact(conn: asyncpg.Connection) -> int:
+            removed = _status_count(await conn.execute('''
+                DELETE FROM changes c
+                WHERE EXISTS (
+                    SELECT 1 FROM changes newer
+                    WHERE newer.entity = c.entity AND newer.key = c.key AND newer.seq > c.seq
+                );
+            '''))
+
+            horizon = await conn.fetchval(f'''
+                SELECT MAX(seq) FROM changes
+                WHERE op = 'delete' AND seq <= ({self._LATEST_CHANGE.strip().rstrip(";")}) - $1;
+            ''', retain)
+            if horizon is not None:
+                removed += _status_count(await conn.execute('''
+                    DELETE FROM changes
+                    WHERE op = 'delete' AND seq <= $1;
+                ''', horizon))
+                await conn.execute('''
+                    UPDATE sync_meta
+                    SET value = GREATEST(value, $1)
+                    WHERE key = 'changes_floor';
+                ''', horizon)
+            return removed
+
+        removed = await self._transaction("compact_changes", compact)
+        print(f"[AudioDatabase] Compacted change log, {removed} entries removed")
+        return removed
+
+
+    #playlists
+    async def create_playlist(self, name: str, temp_id: str) -> dict:
+        id = await self._transaction("create_playlist", lambda conn: conn.fetchval(
+            "INSERT INTO playlists (name) VALUES ($1) RETURNING id;", name
+        ))
+
+        content = {
+            "temp_id": temp_id,
+            "id": id,
+            "name": name
+        }
+        await self._emit_event(action=ADA.CREATE_PLAYLIST, payload={"content": content})
+        return content
+
+    async def get_all_playlists(self) -> List[dict]:
+        rows = await self._fetch("get_all_playlists", "SELECT id, name FROM playlists ORDER BY id;")
+        playlists = [{"id": row["id"], "name": row["name"]} for row in rows]
+
+        await self._emit_event(action=ADA.GET_ALL_PLAYLISTS, payload={"content": playlists})
+        return playlists
+
+    async def get_playlist_content(self, playlist_id: int) -> dict:
+        async def read(conn: asyncpg.Connection) -> Optional[dict]:
+            async with conn.transaction(isolation="repeatable_read", readonly=True):
+                playlist = await conn.fetchrow("SELECT id, name FROM playlists WHERE id = $1;", int(playlist_id))
+                if playlist is None:
+                    return None
+                rows = await conn.fetch('''
+                    SELECT track_id
+                    FROM playlist_tracks
+                    WHERE playlist_id = $1
+                    ORDER BY position ASC, track_id ASC;
+                ''', int(playlist_id))
+                return {"id": playlist["id"], "name": playlist["name"], "trackIds": [row["track_id"] for row in rows]}
+
+        content = await self._run(read, op="get_playlist_content")
+        if content is None:
+            return {"id": playlist_id, "name": None, "trackIds": []}
+
+        await self._emit_event(action=ADA.GET_PLAYLIST_CONTENT, payload={"content": content})
+        return content
+
+    async def get_playlist_content_page(self, playlist_id: int, limit: int, cursor: Optional[str] = None) -> Tuple[dict, Optional[str]]:
+        where, params = "", ()
+        if cursor:
+            where = "AND (position, track_id) > ($3::DOUBLE PRECISION, $4)"
+            params = tuple(decode_cursor(cursor, 2))
+
+        async def read(conn: asyncpg.Connection):
+            async with conn.transaction(isolation="repeatable_read", readonly=True):
+                playlist = await conn.fetchrow("SELECT id, name FROM playlists WHERE id = $1;", int(playlist_id))
+                if playlist is None:
+                    return None, []
+                rows = await conn.fetch(f'''
+                    SELECT track_id, position
+                    FROM playlist_tracks
+                    WHERE playlist_id = $1 {where}
+                    ORDER BY position ASC, track_id ASC
+                    LIMIT $2;
+                ''', int(playlist_id), limit + 1, *params)
+                return playlist, rows
+
+        playlist, rows = await self._run(read, op="get_playlist_content_page")
+        if playlist is None:
+            return {"id": playlist_id, "name": None, "trackIds": []}, None
+
+        rows, next_cursor = self._page(rows, limit, lambda row: (row["position"], row["track_id"]))
+        content = {
+            "id": playlist["id"],
+            "name": playlist["name"],
+            "trackIds": [row["track_id"] for row in rows]
+        }
+
+        await self._emit_event(action=ADA.GET_PLAYLIST_CONTENT, payload={"content": content})
+        return content, next_cursor
+
+
+    #playlist ordering, see ordering.py and the AudioDatabase counterparts
+    async def _renumber_playlist(self, conn: asyncpg.Connection, playlist_id: int):
+        print(f"[AudioDatabase] Renumbering positions of playlist {playlist_id}")
+        await conn.execute(f'''
+            UPDATE playlist_tracks p
+            SET position = ranked.rn * {POSITION_GAP}
+            FROM (
+                SELECT track_id, ROW_NUMBER() OVER (ORDER BY position, track_id) AS rn
+                FROM playlist_tracks
+                WHERE playlist_id = $1
+            ) AS ranked
+            WHERE p.playlist_id = $1 AND p.track_id = ranked.track_id;
+        ''', playlist_id)
+
+    async def _position_after(self, conn: asyncpg.Connection, playlist_id: int, track_id: str, after_id: Optional[str]) -> float:
+        #free position right after `after_id` (None for the front), ignoring track_id's own row
+        async def neighbours() -> Tuple[Optional[float], Optional[float]]:
+            if after_id is None:
+                hi = await conn.fetchval('''
+                    SELECT position
+                    FROM playlist_tracks
+                    WHERE playlist_id = $1 AND track_id != $2
+                    ORDER BY position ASC, track_id ASC
+                    LIMIT 1;
+                ''', playlist_id, track_id)
+                return None, hi
+
+            lo = await conn.fetchval('''
+                SELECT position
+                FROM playlist_tracks
+                WHERE playlist_id = $1 AND track_id = $2;
+            ''', playlist_id, after_id)
+            if lo is None or after_id == track_id:
+                raise PlaylistOrderError(f"Track {after_id} is not in playlist {playlist_id}")
+
+            hi = await conn.fetchval('''
+                SELECT position
+                FROM playlist_tracks
+                WHERE playlist_id = $1 AND track_id != $2 AND (position, track_id) > ($3, $4)
+                ORDER BY position ASC, track_id ASC
+                LIMIT 1;
+            ''', playlist_id, track_id, lo, after_id)
+            return lo, hi
+
+        positions = positions_between(*await neighbours(), 1)
+        if positions is None:
+            await self._renumber_playlist(conn, playlist_id)
+            positions = positions_between(*await neighbours(), 1)
+        return positions[0]
+
+    async def move_track(self, playlist_id: int, track_id: str, after_id: Optional[str] = None):
+        pid = int(playlist_id)
+
+        async def move(conn: asyncpg.Connection):
+            await self._lock_playlists(conn, [pid])
+            status = await conn.execute('''
+                UPDATE playlist_tracks
+                SET position = $1
+                WHERE playlist_id = $2 AND track_id = $3;
+            ''', await self._position_after(conn, pid, track_id, after_id), pid, track_id)
+            if _status_count(status) == 0:
+                raise PlaylistOrderError(f"Track {track_id} is not in playlist {playlist_id}")
+
+        await self._transaction("move_track", move)
+        await self._emit_moves(playlist_id, [{"id": track_id, "after_id": after_id}])
+
+    async def insert_track_at(self, playlist_id: int, track_id: str, index: int):
+        pid = int(playlist_id)
+
+        async def insert(conn: asyncpg.Connection) -> Optional[str]:
+            await self._lock_playlists(conn, [pid])
+            after_id = None
+            if index > 0:
+                #index - 1 counted without the track itself, or the last track when past the end
+                after_id = await conn.fetchval('''
+                    SELECT track_id
+                    FROM playlist_tracks
+                    WHERE playlist_id = $1 AND track_id != $2
+                    ORDER BY position ASC, track_id ASC
+                    LIMIT 1 OFFSET $3;
+                ''', pid, track_id, index - 1) or await conn.fetchval('''
+                    SELECT track_id
+                    FROM playlist_tracks
+                    WHERE playlist_id = $1 AND track_id != $2
+                    ORDER BY position DESC, track_id DESC
+                    LIMIT 1;
+                ''', pid, track_id)
+
+            await conn.execute('''
+                INSERT INTO playlist_tracks (playlist_id, track_id, position)
+                VALUES ($1, $2, $3)
+                ON CONFLICT (playlist_id, track_id) DO UPDATE SET position = excluded.position;
+            ''', pid, track_id, await self._position_after(conn, pid, track_id, after_id))
+            return after_id
+
+        after_id = await self._transaction("insert_track_at", insert)
+        await self._emit_moves(playlist_id, [{"id": track_id, "after_id": after_id}])
+
+    async def reorder_playlist(self, playlist_id: int, track_ids: List[str]) -> List[dict]:
+        pid = int(playlist_id)
+
+        async def reorder(conn: asyncpg.Connection) -> List[dict]:
+            await self._lock_playlists(conn, [pid])
+            rows = await conn.fetch('''
+                SELECT track_id, position
+                FROM playlist_tracks
+                WHERE playlist_id = $1
+                ORDER BY position ASC, track_id ASC;
+            ''', pid)
+
+            rank = {row["track_id"]: i for i, row in enumerate(rows)}
+            if len(track_ids) != len(rank) or set(track_ids) != rank.keys():
+                raise PlaylistOrderError(f"New order doesn't match the tracks of playlist {playlist_id}")
+
+            updates, moves = plan_reorder([row["position"] for row in rows], rank, track_ids)
+            await conn.executemany('''
+                UPDATE playlist_tracks
+                SET position = $1
+                WHERE playlist_id = $2 AND track_id = $3;
+            ''', [(position, pid, id) for position, id in updates])
+            return moves
+
+        moves = await self._transaction("reorder_playlist", reorder)
+        if moves:
+            await self._emit_moves(playlist_id, moves)
+        return moves
+
+
+    #memberships and metadata edits
+    async def _apply_memberships(self, conn: asyncpg.Connection, add: List[Tuple[str, int]], remove: List[Tuple[str, int]]):
+        #removals first so a pair in both lists ends up in the playlist
+        await conn.executemany('''
+            DELETE FROM playlist_tracks
+            WHERE playlist_id = $1 AND track_id = $2;
+        ''', [(int(playlist_id), track_id) for track_id, playlist_id in remove])
+        await self._append_memberships(conn, add)
+
+    async def update_track_playlists(self, track_id: str, playlist_updates: List[dict]):
+        add = [(track_id, pl["id"]) for pl in playlist_updates if pl.get("checked") is True]
+        remove = [(track_id, pl["id"]) for pl in playlist_updates if pl.get("checked") is False]
+
+        await self._transaction("update_track_playlists", lambda conn: self._apply_memberships(conn, add, remove))
+
+        content = {
+            "id": track_id,
+            "updates": playlist_updates
+        }
+        await self._emit_event(ADA.UPDATE_PLAYLISTS, payload={"content": content})
+
+    async def apply_track_edits(
+        self,
+        *,
+        add: Optional[List[Tuple[str, int]]] = None,
+        remove: Optional[List[Tuple[str, int]]] = None,
+        metadata: Optional[List[dict]] = None
+    ) -> dict:
+        add, remove, metadata = add or [], remove or [], metadata or []
+
+        async def edit(conn: asyncpg.Connection) -> List[dict]:
+            await self._apply_memberships(conn, add, remove)
+            return await self._set_metadata(conn, metadata) if metadata else []
+
+        effective = await self._transaction("apply_track_edits", edit)
+
+        content = {
+            "add": [{"id": track_id, "playlist_id": playlist_id} for track_id, playlist_id in add],
+            "remove": [{"id": track_id, "playlist_id": playlist_id} for track_id, playlist_id in remove],
+            "metadata": effective
+        }
+        await self._emit_event(action=ADA.EDIT_TRACKS, payload={"content": content})
+        return content
+
+    async def edit_playlist(self, playlist_id: int, name: str) -> dict:
+        await self._transaction("edit_playlist", lambda conn: conn.execute(
+            "UPDATE playlists SET name = $1 WHERE id = $2;", name, int(playlist_id)
+        ))
+
+        content = {
+            "id": playlist_id,
+            "name": name
+        }
+        await self._emit_event(action=ADA.EDIT_PLAYLIST, payload={"content": content})
+        return content
+
+    async def delete_playlist(self, playlist_id: int) -> dict:
+        #memberships go with it through ON DELETE CASCADE
+        await self._transaction("delete_playlist", lambda conn: conn.execute(
+            "DELETE FROM playlists WHERE id = $1;", int(playlist_id)
+        ))
+
+        content = {
+            "id": playlist_id
+        }
+        await self._emit_event(action=ADA.DELETE_PLAYLIST, payload={"content": content})
+        return content
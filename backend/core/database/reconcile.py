@@ -0,0 +1,208 @@
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Set, Tuple
+
+from backend.core.database.storage import AudioStorage
+from backend.core.audio.seek_index import SEEK_INDEX_SUFFIX
+from backend.core.lib.formats import is_audio_format
+
+
+#(name, size, mtime_ns) of one regular file in the downloads folder
+FileStat = Tuple[str, int, int]
+
+
+@dataclass
+class ReconcileReport:
+    scanned: int = 0
+    unchanged: int = 0          #same size and mtime as the manifest, nothing else looked at
+    updated: int = 0            #new or changed audio files written to the manifest
+    orphans_removed: int = 0    #audio files without a downloads row
+    partials_removed: int = 0   #stale yt-dlp leftovers (.part, .ytdl, pre-conversion containers)
+    missing: List[str] = field(default_factory=list)    #downloaded ids without an audio file
+    truncated: List[str] = field(default_factory=list)  #downloaded ids whose file is too small for their duration
+    backfilled: int = 0         #downloads logged without size and mtime, now recorded from their file
+    slices: int = 0
+    elapsed: float = 0.0
+
+
+def _scan_slice(entries: Iterator[os.DirEntry], budget: float) -> Tuple[List[FileStat], bool]:
+    #consume scandir entries until the time budget is spent, runs on a worker thread
+    batch = []
+    deadline = time.perf_counter() + budget
+    for entry in entries:
+        try:
+            if entry.is_file(follow_symlinks=False):
+                stat = entry.stat(follow_symlinks=False)
+                batch.append((entry.name, stat.st_size, stat.st_mtime_ns))
+        except OSError:
+            continue #vanished mid scan
+        if time.perf_counter() >= deadline:
+            return batch, False
+    return batch, True
+
+
+class DownloadReconciler:
+    """
+    Keeps the downloads folder and the downloads table consistent, incrementally.
+
+    Each pass walks the folder with os.scandir in bounded time slices on a worker
+    thread, yielding to the event loop between slices, and compares every file's
+    (size, mtime) with the file_manifest table from the previous pass. Unchanged
+    audio files cost one stat and nothing else. It then:
+        - removes audio files with no downloads row
+        - removes stale partials: .part/.ytdl files, containers yt-dlp never converted
+          and files of a downloaded id in another container than its row says
+        - reports downloaded ids whose file is missing or truncated (removing the
+          truncated file) and hands them to `on_broken`, e.g. to queue a re-download
+        - records size and mtime of healthy files whose downloads row has none, logged
+          before the downloader wrote them, so the FileIndex stops stat()ing them
+
+    Only files last modified before `older_than` are ever deleted, so a pass running
+    next to the download worker can't touch an in-flight download.
+
+    Args:
+        db (AudioStorage): Source of the downloads list, owner of the manifest table.
+        downloads_dir (Path): Folder yt-dlp writes into.
+        audio_format (str): Extension of finished audio files without a recorded format, e.g. "mp3".
+        slice_ms (float): Max time per scandir slice.
+        pause_ms (float): Sleep between slices, leaves the loop and disk to requests.
+        min_bytes_per_sec (int): Files smaller than duration * this are considered truncated.
+        on_broken (Callable[[str], Awaitable], optional): Called with each missing or truncated id.
+    """
+    def __init__(
+        self,
+        *,
+        db: AudioStorage,
+        downloads_dir: Path,
+        audio_format: str,
+        slice_ms: float = 20,
+        pause_ms: float = 5,
+        min_bytes_per_sec: int = 2000,
+        on_broken: Optional[Callable[[str], Awaitable]] = None
+    ):
+        self._db = db
+        self._dir = downloads_dir
+        self._audio_format = audio_format
+        self._slice = slice_ms / 1000
+        self._pause = pause_ms / 1000
+        self._min_bytes_per_sec = min_bytes_per_sec
+        self._on_broken = on_broken
+
+
+    async def run(self, older_than: Optional[float] = None) -> ReconcileReport:
+        """
+        One reconciliation pass.
+
+        Args:
+            older_than (float, optional): Unix time, only files modified before it may be
+                deleted. Defaults to now.
+
+        Returns:
+            ReconcileReport: What was found and done.
+        """
+        started = time.perf_counter()
+        cutoff_ns = int((older_than if older_than is not None else time.time()) * 1e9)
+        report = ReconcileReport()
+
+        if not self._dir.exists():
+            print(f"[Reconcile] Downloads directory does not exist: {self._dir}")
+            return report
+
+        manifest = await self._db.get_file_manifest()
+        downloads = {track["id"]: track for track in await self._db.get_downloads_content()}
+        files = await self._db.get_download_files()
+        formats = {id: fmt for id, (fmt, _, _) in files.items()}
+        legacy = {id for id, (_, size, mtime_ns) in files.items() if size is None or mtime_ns is None}
+
+        seen: Set[str] = set()
+        upserts: List[FileStat] = []
+        backfill: Dict[str, Tuple[int, int]] = {}
+        to_remove: List[Tuple[str, str]] = [] #(name, reason)
+
+        with os.scandir(self._dir) as entries:
+            done = False
+            while not done:
+                batch, done = await asyncio.to_thread(_scan_slice, entries, self._slice)
+                report.slices += 1
+
+                for name, size, mtime_ns in batch:
+                    report.scanned += 1
+                    stem, _, rest = name.partition(".")
+                    deletable = mtime_ns < cutoff_ns
+
+                    if stem not in downloads:
+                        if deletable:
+                            #<id>.<audio container> is a finished file, anything else a yt-dlp intermediate
+                            to_remove.append((name, "orphan" if is_audio_format(rest) else "partial"))
+                        continue
+
+                    if rest == SEEK_INDEX_SUFFIX:
+                        continue #SeekIndexer's, it checks and rebuilds them itself
+
+                    if rest != formats.get(stem, self._audio_format):
+                        if deletable:
+                            to_remove.append((name, "partial"))
+                        continue
+
+                    seen.add(stem)
+                    if manifest.get(name) == (size, mtime_ns):
+                        report.unchanged += 1
+                        if stem in legacy:
+                            backfill[stem] = (size, mtime_ns)
+                        continue
+
+                    duration = downloads[stem].get("duration") or 0
+                    if size < duration * self._min_bytes_per_sec:
+                        if deletable: #otherwise it may still be growing, look again next pass
+                            report.truncated.append(stem)
+                            to_remove.append((name, "truncated")) #yt-dlp skips ids whose file already exists
+                        continue
+
+                    upserts.append((name, size, mtime_ns))
+                    if stem in legacy:
+                        backfill[stem] = (size, mtime_ns)
+
+                if not done and self._pause:
+                    await asyncio.sleep(self._pause)
+
+        report.missing = [id for id in downloads if id not in seen]
+        report.updated = len(upserts)
+
+        removed = await asyncio.to_thread(self._remove, [name for name, _ in to_remove])
+        reasons = dict(to_remove)
+        report.orphans_removed = sum(1 for name in removed if reasons[name] == "orphan")
+        report.partials_removed = sum(1 for name in removed if reasons[name] == "partial")
+
+        #the manifest only remembers healthy audio files that are still there
+        broken = set(report.truncated)
+        stale = [name for name in manifest if name.partition(".")[0] not in seen or name.partition(".")[0] in broken]
+        await self._db.update_file_manifest(upserts=upserts, removals=stale)
+        await self._db.backfill_download_stats(backfill)
+        report.backfilled = len(backfill)
+
+        if self._on_broken:
+            for id in report.missing + report.truncated:
+                await self._on_broken(id)
+
+        report.elapsed = time.perf_counter() - started
+        print(
+            f"[Reconcile] {report.scanned} files in {report.slices} slices, {report.elapsed * 1000:.1f}ms: "
+            f"{report.unchanged} unchanged, {report.updated} updated, {report.orphans_removed} orphans and "
+            f"{report.partials_removed} partials removed, {len(report.missing)} missing, {len(report.truncated)} truncated, "
+            f"{report.backfilled} backfilled"
+        )
+        return report
+
+    def _remove(self, names: List[str]) -> List[str]:
+        removed = []
+        for name in names:
+            try:
+                (self._dir / name).unlink()
+                removed.append(name)
+                print(f"[Reconcile] Removed {name}")
+            except OSError as e:
+                print(f"[Reconcile] Failed to remove {name}: {e}")
+        return removed
@@ -0,0 +1,429 @@
+import base64
+import binascii
+import json
+import re
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from backend.core.database.fuzzy_index import FuzzyIndex
+from backend.core.database.library_cache import LibraryCache
+from backend.core.events.event_bus import EventBus
+from backend.core.lib.formats import DEFAULT_FORMAT
+from backend.core.lib.metrics import MetricsRegistry
+from backend.core.models.event import Event
+from backend.core.models.track import Track
+from backend.exceptions import InvalidCursorError
+
+from backend.core.models.enums import AudioDatabaseAction as ADA
+
+
+def search_tokens(q: str) -> List[str]:
+    """Lowercased words of a search box string, the only part of user input that reaches a full text query."""
+    return re.findall(r"\w+", q.lower())
+
+
+def track_formats(tracks: List[Track]) -> Dict[str, str]:
+    """Container of each freshly downloaded track, the legacy default for tracks that don't say."""
+    return {track.id: track.format or DEFAULT_FORMAT for track in tracks}
+
+def track_stats(tracks: List[Track]) -> Dict[str, Tuple[int, int]]:
+    """(size, mtime_ns) of the freshly downloaded tracks whose file was stat()ed by the downloader."""
+    return {
+        track.id: (track.size, track.mtime_ns)
+        for track in tracks
+        if track.size is not None and track.mtime_ns is not None
+    }
+
+def download_file(
+    id: str,
+    format: Optional[str],
+    size: Optional[int],
+    mtime_ns: Optional[int]
+) -> Tuple[Optional[Dict[str, str]], Optional[Dict[str, Tuple[int, int]]]]:
+    """
+    The formats and stats of a single log_download, None for a download whose file isn't known.
+
+    Raises:
+        ValueError: If size or mtime_ns are given without the format they belong to.
+    """
+    if format is None:
+        if size is not None or mtime_ns is not None:
+            raise ValueError(f"Stats of {id} given without its format")
+        return None, None
+    if size is None or mtime_ns is None:
+        return {id: format}, None
+    return {id: format}, {id: (size, mtime_ns)}
+
+
+def encode_cursor(key: Sequence) -> str:
+    """Pack the sort key of the last row on a page into an opaque url-safe cursor."""
+    raw = json.dumps(list(key), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, size: int) -> list:
+    """
+    Inverse of encode_cursor.
+
+    Raises:
+        InvalidCursorError: If the cursor is malformed or doesn't hold `size` values.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        key = json.loads(raw)
+    except (binascii.Error, ValueError) as e:
+        raise InvalidCursorError(f"Malformed cursor: {cursor}") from e
+
+    if not isinstance(key, list) or len(key) != size:
+        raise InvalidCursorError(f"Malformed cursor: {cursor}")
+    return key
+
+
+class AudioStorage(ABC):
+    """
+    The library storage interface behind `app.state.db`.
+
+    Implemented by AudioDatabase (sqlite, the default) and PostgresAudioDatabase
+    (asyncpg), see create_audio_storage. Both publish the same ADA events with the
+    same payloads, so websocket handlers and the library cache don't care which
+    one is running. The parts that don't touch sql (events, library cache
+    read-through, paging) live here.
+
+    Args:
+        name (str): Event source name.
+        event_bus (EventBus, optional): Bus that receives ADA events.
+        library_cache (LibraryCache, optional): Read-through cache for the downloads
+            listing, subscribed to the same bus under `name`.
+        metrics (MetricsRegistry, optional): Where implementations record query timing.
+    """
+    def __init__(
+        self,
+        *,
+        name: str,
+        event_bus: Optional[EventBus] = None,
+        library_cache: Optional[LibraryCache] = None,
+        metrics: Optional[MetricsRegistry] = None
+    ):
+        self.name = name
+        self._event_bus = event_bus
+        self._library_cache = library_cache
+        self.metrics = metrics
+
+
+    #events
+    async def _emit_event(self, action: str, payload: Optional[dict] = None):
+        if self._event_bus:
+            event = Event(
+                source=self.name,
+                action=action,
+                payload={**(payload or {})}
+            )
+            await self._event_bus.publish(event)
+
+    async def _emit_downloads(
+        self,
+        tracks: List[dict],
+        memberships: List[Tuple[str, int]],
+        formats: Optional[Dict[str, str]] = None,
+        stats: Optional[Dict[str, Tuple[int, int]]] = None
+    ):
+        content = {
+            "tracks": tracks,
+            "memberships": [
+                {"id": track_id, "playlist_id": playlist_id}
+                for track_id, playlist_id in memberships
+            ],
+            "formats": formats or {}, #id -> container, for tracks whose file was just written
+            "stats": {id: list(stat) for id, stat in (stats or {}).items()} #id -> [size, mtime_ns] of those files
+        }
+        await self._emit_event(action=ADA.LOG_DOWNLOADS, payload={"content": content})
+
+    async def _emit_download(
+        self,
+        track: dict,
+        formats: Optional[Dict[str, str]] = None,
+        stats: Optional[Dict[str, Tuple[int, int]]] = None
+    ):
+        id = track["id"]
+        stat = (stats or {}).get(id)
+        payload = {
+            "content": track,
+            "format": (formats or {}).get(id), #container of the file just written, None when not known
+            "stats": list(stat) if stat else None #[size, mtime_ns] of that file
+        }
+        await self._emit_event(action=ADA.LOG_DOWNLOAD, payload=payload)
+
+    async def _emit_moves(self, playlist_id: int, moves: List[dict]):
+        content = {
+            "id": playlist_id,
+            "moves": moves
+        }
+        await self._emit_event(action=ADA.MOVE_PLAYLIST_TRACKS, payload={"content": content})
+
+
+    #downloads listing, read through the library cache
+    @abstractmethod
+    async def _read_library(self) -> List[dict]:
+        """Every downloaded track as {"id", "title", "artist", "duration"}, newest download first."""
+
+    async def _library_content(self) -> List[dict]:
+        #read-through the library cache when there is one, only the first call hits the db
+        cache = self._library_cache
+        if cache and cache.is_ready():
+            return cache.get_downloads()
+
+        version = cache.version() if cache else None
+        content = await self._read_library()
+
+        if cache and cache.load(content, version):
+            return cache.get_downloads()
+        return content
+
+    async def get_downloads_content(self) -> List[dict]:
+        """
+        Retrieve full metadata for all downloaded tracks, ordered by download time.
+
+        Custom title and artist fields are preferred if available, and the most
+        recently downloaded tracks come first.
+
+        After fetching, an ADA.GET_DOWNLOADS_CONTENT event is emitted to notify
+        connected clients or listeners.
+
+        Returns:
+            list[dict]: A list of track objects in the following shape:
+                [
+                    {
+                        "id": str,
+                        "title": str,
+                        "artist": str,
+                        "duration": int
+                    },
+                    ...
+                ]
+
+        Example:
+            >>> await db.get_downloads_content()
+            [
+                {"id": "abc123", "title": "Song A", "artist": "Artist X", "duration": 210},
+                {"id": "xyz456", "title": "Song B", "artist": "Artist Y", "duration": 185},
+            ]
+        """
+        content = await self._library_content()
+
+        await self._emit_event(
+            action=ADA.GET_DOWNLOADS_CONTENT,
+            payload={"content": content}
+        )
+
+        return content
+
+
+    async def fuzzy_search(self, q: str, limit: int) -> List[dict]:
+        """
+        Typo tolerant search over the downloaded library, for when search() finds nothing.
+
+        Served from the library cache's trigram index, no query once the cache is
+        loaded. Without a cache a throwaway index is built from the library.
+
+        Args:
+            q (str): Raw search box string.
+            limit (int): Most results to return.
+
+        Returns:
+            List[dict]: {"id", "title", "artist", "duration"} records, best match first.
+        """
+        content = await self._library_content()
+
+        cache = self._library_cache
+        if cache and cache.is_ready():
+            return await cache.fuzzy_search(q, limit)
+
+        index = FuzzyIndex()
+        index.rebuild(content)
+        return index.search(q, limit)
+
+
+    #keyset pagination, each implementation fetches limit + 1 rows to know if another page exists
+    def _page(self, rows: list, limit: int, key: Callable[[object], Sequence]) -> Tuple[list, Optional[str]]:
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, encode_cursor(key(rows[-1]))
+
+
+    #lifecycle
+    @abstractmethod
+    async def build(self):
+        """Create or upgrade the schema, call once before anything else."""
+
+    @abstractmethod
+    async def close(self):
+        """Commit writes that were already accepted, then release connections and worker threads."""
+
+    async def flush(self):
+        """Wait until every accepted write is durable (no-op unless writes are batched)."""
+
+    @abstractmethod
+    async def count_rows(self) -> Dict[str, int]:
+        """Row count of every library table."""
+
+    @abstractmethod
+    async def view_all(self):
+        """Debug dump of every row."""
+
+
+    #tracks and downloads
+    @abstractmethod
+    async def log_track(self, track: Track):
+        """Insert or update a track's metadata, resetting custom metadata. Emits ADA.LOG_TRACK."""
+
+    @abstractmethod
+    async def unlog_track(self, id: str):
+        """Remove a track and, by cascade, its download, like and memberships. Emits ADA.UNLOG_TRACK."""
+
+    @abstractmethod
+    async def is_logged(self, track_id: str) -> bool:
+        """Whether the track has metadata."""
+
+    @abstractmethod
+    async def log_download(
+        self,
+        id: str,
+        format: Optional[str] = None,
+        size: Optional[int] = None,
+        mtime_ns: Optional[int] = None
+    ) -> dict:
+        """
+        Mark a logged track downloaded and return its effective metadata, recording the
+        file's container and stat() when given. Emits ADA.LOG_DOWNLOAD.
+        """
+
+    @abstractmethod
+    async def log_tracks_many(self, tracks: List[Track]):
+        """Bulk log_track in one transaction. Emits ADA.LOG_TRACKS once."""
+
+    @abstractmethod
+    async def log_downloads_many(self, ids: List[str], memberships: Optional[List[Tuple[str, int]]] = None) -> List[dict]:
+        """Bulk log_download plus (track_id, playlist_id) appends in one transaction. Emits ADA.LOG_DOWNLOADS once."""
+
+    @abstractmethod
+    async def ingest_many(self, tracks: List[Track], memberships: Optional[List[Tuple[str, int]]] = None) -> List[dict]:
+        """log_tracks_many and log_downloads_many in one transaction. Emits ADA.LOG_DOWNLOADS once."""
+
+    @abstractmethod
+    async def unlog_download(self, id: str):
+        """Remove a download (and its memberships) but keep the metadata. Emits ADA.UNLOG_DOWNLOAD."""
+
+    @abstractmethod
+    async def is_downloaded(self, track_id: str) -> bool:
+        """Whether the track is downloaded."""
+
+    @abstractmethod
+    async def get_download_files(self) -> Dict[str, Tuple[str, Optional[int], Optional[int]]]:
+        """Track id to (format, size, mtime_ns) of its file, size and mtime are None for downloads logged before they were recorded."""
+
+    @abstractmethod
+    async def backfill_download_stats(self, stats: Dict[str, Tuple[int, int]]):
+        """Record (size, mtime_ns) of downloads logged without them, rows that have stats are left alone. No events."""
+
+    @abstractmethod
+    async def get_downloads_page(self, limit: int, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """One page of get_downloads_content() and the next cursor. Raises InvalidCursorError."""
+
+    @abstractmethod
+    async def set_custom_metadata(self, id: str, custom_title: Optional[str] = None, custom_artist: Optional[str] = None):
+        """Override a track's title/artist, blank resets. Emits ADA.SET_METADATA with the effective values."""
+
+
+    #search
+    @abstractmethod
+    async def search(self, q: str, limit: Optional[int] = 100) -> List[dict]:
+        """
+        Ranked prefix search over effective and original title/artist, the best `limit`
+        matches (all of them for None), every download for "". Emits ADA.SEARCH.
+        """
+
+    @abstractmethod
+    async def search_page(self, q: str, limit: int, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """One page of search() in the same order. Raises InvalidCursorError. Emits ADA.SEARCH."""
+
+
+    #likes
+    @abstractmethod
+    async def toggle_like(self, id: str):
+        """Like a downloaded track, or unlike it if it already is."""
+
+    @abstractmethod
+    async def fetch_liked_tracks(self) -> List[str]:
+        """Liked track ids, oldest like first. Emits ADA.FETCH_LIKES."""
+
+
+    #download folder manifest, see reconcile.py
+    @abstractmethod
+    async def get_file_manifest(self) -> Dict[str, Tuple[int, int]]:
+        """File name to (size, mtime_ns) as of the last reconcile pass."""
+
+    @abstractmethod
+    async def update_file_manifest(self, upserts: List[Tuple[str, int, int]], removals: List[str]):
+        """Apply a reconcile pass' manifest diff in one transaction."""
+
+
+    #library change log
+    @abstractmethod
+    async def get_changes(self, since: int, limit: int) -> dict:
+        """Library mutations after `since`, see AudioDatabase.get_changes for the shape."""
+
+    @abstractmethod
+    async def compact_changes(self, retain: int) -> int:
+        """Drop superseded changes and deletes older than `retain` sequence numbers."""
+
+
+    #playlists
+    @abstractmethod
+    async def create_playlist(self, name: str, temp_id: str) -> dict:
+        """Create a playlist. Emits ADA.CREATE_PLAYLIST with {"temp_id", "id", "name"}."""
+
+    @abstractmethod
+    async def get_all_playlists(self) -> List[dict]:
+        """Every playlist as {"id", "name"}. Emits ADA.GET_ALL_PLAYLISTS."""
+
+    @abstractmethod
+    async def get_playlist_content(self, playlist_id: int) -> dict:
+        """{"id", "name", "trackIds"} in playlist order. Emits ADA.GET_PLAYLIST_CONTENT."""
+
+    @abstractmethod
+    async def get_playlist_content_page(self, playlist_id: int, limit: int, cursor: Optional[str] = None) -> Tuple[dict, Optional[str]]:
+        """One page of get_playlist_content() and the next cursor. Raises InvalidCursorError."""
+
+    @abstractmethod
+    async def move_track(self, playlist_id: int, track_id: str, after_id: Optional[str] = None):
+        """Move a track right after another (None for the front). Raises PlaylistOrderError. Emits ADA.MOVE_PLAYLIST_TRACKS."""
+
+    @abstractmethod
+    async def insert_track_at(self, playlist_id: int, track_id: str, index: int):
+        """Add or move a downloaded track to `index`. Emits ADA.MOVE_PLAYLIST_TRACKS."""
+
+    @abstractmethod
+    async def reorder_playlist(self, playlist_id: int, track_ids: List[str]) -> List[dict]:
+        """Set the full order writing only moved rows, returns the moves. Raises PlaylistOrderError."""
+
+    @abstractmethod
+    async def update_track_playlists(self, track_id: str, playlist_updates: List[dict]):
+        """Apply [{"id", "checked"}] memberships for one track in one transaction. Emits ADA.UPDATE_PLAYLISTS."""
+
+    @abstractmethod
+    async def apply_track_edits(
+        self,
+        *,
+        add: Optional[List[Tuple[str, int]]] = None,
+        remove: Optional[List[Tuple[str, int]]] = None,
+        metadata: Optional[List[dict]] = None
+    ) -> dict:
+        """Membership diff and metadata edits in one transaction. Emits ADA.EDIT_TRACKS once."""
+
+    @abstractmethod
+    async def edit_playlist(self, playlist_id: int, name: str) -> dict:
+        """Rename a playlist. Emits ADA.EDIT_PLAYLIST."""
+
+    @abstractmethod
+    async def delete_playlist(self, playlist_id: int) -> dict:
+        """Delete a playlist and its memberships. Emits ADA.DELETE_PLAYLIST."""
@@ -0,0 +1,157 @@
+import asyncio
+import sqlite3
+from typing import Callable, List, Optional, Tuple
+
+from backend.core.database.executor import DatabaseExecutor
+
+
+WriteOp = Callable[[sqlite3.Cursor], object]
+
+
+class GroupCommitQueue:
+    """
+    Write-behind queue that commits many AudioDatabase writes as one transaction.
+
+    Callers submit a function that receives a cursor on the writer connection and
+    await the returned future. A single writer task drains the queue once it holds
+    `max_ops` operations or `max_delay` seconds after the first one arrived, runs
+    every operation inside its own SAVEPOINT, and commits the batch once. Futures
+    resolve only after that commit, so callers still observe durable writes. A
+    failing operation is rolled back to its savepoint and only its own future
+    receives the exception.
+
+    Args:
+        executor (DatabaseExecutor): The single-thread writer executor, batches run on its
+            connection and show up in its metrics as "group_commit" (rows = ops in the batch).
+        max_ops (int): Operations per batch before committing early.
+        max_delay (float): Seconds to wait for more operations after the first one. With 0
+            a batch is whatever queued up while the previous commit was running.
+    """
+    def __init__(self, *, executor: DatabaseExecutor, max_ops: int = 64, max_delay: float = 0):
+        self._executor = executor
+        self._max_ops = max_ops
+        self._max_delay = max_delay
+
+        self._pending: "asyncio.Queue[Tuple[WriteOp, asyncio.Future]]" = asyncio.Queue()
+        self._full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._closed = False
+
+        #simple counters, handy for benchmarks and tests
+        self.ops_committed = 0
+        self.batches_committed = 0
+
+
+    async def submit(self, func: WriteOp):
+        """
+        Queue a write and wait until the batch containing it is committed.
+
+        Returns:
+            Whatever `func` returned.
+
+        Raises:
+            RuntimeError: If the queue was closed.
+        """
+        if self._closed:
+            raise RuntimeError("GroupCommitQueue is closed")
+        return await self._submit(func)
+
+    async def _submit(self, func: WriteOp):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+        future = asyncio.get_running_loop().create_future()
+        await self._pending.put((func, future))
+        if self._pending.qsize() >= self._max_ops:
+            self._full.set()
+
+        return await future
+
+    async def flush(self):
+        #everything submitted before this no-op is committed once it resolves
+        await self.submit(lambda cur: None)
+
+    async def close(self):
+        """
+        Commit everything already submitted, then stop the writer task. Later
+        submits raise, so nothing can be queued behind the final batch.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if self._task is None:
+            return
+
+        #the no-op is the last thing queued, once it resolves the task idles on an empty queue
+        await self._submit(lambda cur: None)
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+
+    async def _run(self):
+        while True:
+            first = await self._pending.get()
+
+            #give concurrent writers a few ms to join the batch unless it is already full
+            if self._max_delay > 0 and self._pending.qsize() + 1 < self._max_ops:
+                self._full.clear()
+                try:
+                    await asyncio.wait_for(self._full.wait(), timeout=self._max_delay)
+                except asyncio.TimeoutError:
+                    pass
+
+            batch = [first]
+            while len(batch) < self._max_ops and not self._pending.empty():
+                batch.append(self._pending.get_nowait())
+
+            try:
+                ops = [func for func, _ in batch]
+                results = await self._executor.run(lambda conn: self._commit(conn, ops), op="group_commit")
+            except Exception as e:
+                #the commit itself failed, nothing in the batch is durable
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future), (error, value) in zip(batch, results):
+                if future.done():
+                    continue #caller was cancelled, the write still happened
+                if error:
+                    future.set_exception(error)
+                else:
+                    future.set_result(value)
+
+    def _commit(self, conn: sqlite3.Connection, ops: List[WriteOp]) -> List[Tuple[Optional[BaseException], object]]:
+        #runs on the writer thread, the only place the writer connection is touched
+        results = []
+        cur = conn.cursor()
+        try:
+            if not conn.in_transaction:
+                cur.execute("BEGIN;") #explicit so releasing the savepoints below never commits early
+
+            for op in ops:
+                cur.execute("SAVEPOINT op;")
+                try:
+                    value = op(cur)
+                    cur.execute("RELEASE op;")
+                    results.append((None, value))
+                except Exception as e:
+                    cur.execute("ROLLBACK TO op;")
+                    cur.execute("RELEASE op;")
+                    results.append((e, None))
+
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+        self.ops_committed += len(ops)
+        self.batches_committed += 1
+        return results
@@ -36,15 +36,19 @@ def register_event_handlers(event_bus: EventBus, websocket_manager: WebsocketMan
 
 
         (G.AUDIO_DATABASE_NAME, ADA.SET_METADATA),
+        (G.AUDIO_DATABASE_NAME, ADA.EDIT_TRACKS),
 
         (G.AUDIO_DATABASE_NAME, ADA.CREATE_PLAYLIST),
         (G.AUDIO_DATABASE_NAME, ADA.UPDATE_PLAYLISTS),
         (G.AUDIO_DATABASE_NAME, ADA.EDIT_PLAYLIST),
         (G.AUDIO_DATABASE_NAME, ADA.DELETE_PLAYLIST),
+        (G.AUDIO_DATABASE_NAME, ADA.MOVE_PLAYLIST_TRACKS),
 
         (G.AUDIO_DATABASE_NAME, ADA.LOG_TRACK),
+        (G.AUDIO_DATABASE_NAME, ADA.LOG_TRACKS),
         (G.AUDIO_DATABASE_NAME, ADA.UNLOG_TRACK),
         (G.AUDIO_DATABASE_NAME, ADA.LOG_DOWNLOAD),
+        (G.AUDIO_DATABASE_NAME, ADA.LOG_DOWNLOADS),
         (G.AUDIO_DATABASE_NAME, ADA.UNLOG_DOWNLOAD),
 
         (G.AUDIO_DATABASE_NAME, ADA.GET_DOWNLOADS_CONTENT),
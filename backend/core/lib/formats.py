@@ -0,0 +1,22 @@
+#container extension -> Content-Type of the audio files we store or make. yt-dlp -x only
+#ever leaves these, so .webm/.mp4 in the downloads folder are unconverted intermediates
+AUDIO_MIME_TYPES = {
+    "mp3": "audio/mpeg",
+    "m4a": "audio/mp4",
+    "aac": "audio/aac",
+    "opus": "audio/ogg", #yt-dlp -x puts opus streams in an ogg container
+    "ogg": "audio/ogg",
+    "oga": "audio/ogg",
+    "flac": "audio/flac",
+    "wav": "audio/wav",
+}
+
+#what every download was before formats were recorded per track
+DEFAULT_FORMAT = "mp3"
+
+
+def mime_type(audio_format: str) -> str:
+    return AUDIO_MIME_TYPES.get(audio_format.lower(), "application/octet-stream")
+
+def is_audio_format(audio_format: str) -> bool:
+    return audio_format.lower() in AUDIO_MIME_TYPES
@@ -0,0 +1,55 @@
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Dict, Optional, TypeVar
+
+from backend.core.lib.metrics import MetricsRegistry
+
+
+T = TypeVar("T")
+
+
+class StartupTimer:
+    """
+    Per-phase wall clock breakdown of the server lifespan startup.
+
+    Phases can overlap (timed coroutines run under asyncio.gather), so the total is
+    measured separately from the first phase to report() rather than summed.
+
+    Args:
+        metrics (MetricsRegistry, optional): Also records each phase as startup_phase_seconds{phase}.
+    """
+    def __init__(self, *, metrics: Optional[MetricsRegistry] = None):
+        self._metrics = metrics
+        self._started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+
+    def _record(self, name: str, seconds: float):
+        self.phases[name] = seconds
+        if self._metrics:
+            self._metrics.observe("startup_phase_seconds", seconds, phase=name)
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._record(name, time.perf_counter() - start)
+
+    async def run(self, name: str, awaitable: Awaitable[T]) -> T:
+        #timed await, for phases that run concurrently under asyncio.gather
+        with self.phase(name):
+            return await awaitable
+
+    def report(self) -> dict:
+        total = time.perf_counter() - self._started
+        if self._metrics:
+            self._metrics.observe("startup_phase_seconds", total, phase="total")
+
+        breakdown = " | ".join(f"{name} {seconds * 1000:.1f}ms" for name, seconds in self.phases.items())
+        print(f"[Startup] ready in {total * 1000:.1f}ms ({breakdown})")
+
+        return {
+            "total_ms": total * 1000,
+            "phases_ms": {name: seconds * 1000 for name, seconds in self.phases.items()}
+        }
@@ -21,11 +21,7 @@ def get_audio_path(track_or_id: Union[str, Track], base_dir: Path = G.DOWNLOAD_D
     id = track_or_id.id if isinstance(track_or_id, Track) else track_or_id
     return base_dir / f"{id}.{audio_format}"
 
-def is_downloaded(track_or_id: Union[str, Track], base_dir: Path = G.DOWNLOAD_DIR, audio_format: str = G.AUDIO_FORMAT) -> bool:
-    return get_audio_path(track_or_id, base_dir, audio_format).exists()
-
-def get_audio_size(track_or_id: Union[str, Track], base_dir: Path = G.DOWNLOAD_DIR, audio_format: str = G.AUDIO_FORMAT) -> int:
-    return get_audio_path(track_or_id, base_dir, audio_format).stat().st_size
+#whether a track is downloaded, and its size, come from FileIndex (app.state.file_index), not the disk
 
 
 #recursively search for first occurrence of a key in a nested dict json
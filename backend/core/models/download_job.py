@@ -1,3 +1,4 @@
+import asyncio
 from typing import Optional
 
 class DownloadJob:
@@ -34,6 +35,8 @@ class DownloadJob:
         self.metadata = metadata
         self.updates = updates #follows convention of {playlist_id: checked(bool)}
 
+        self._completion: Optional[asyncio.Future] = None #made on first use, jobs can be built outside the loop
+
     def get_type(self) -> str:
         if self.id:
             return "id"
@@ -54,6 +57,42 @@ class DownloadJob:
         return self.updates
 
 
+    #completion, shared by everything waiting on this job
+    def completion(self) -> asyncio.Future:
+        """
+        Resolves with the downloaded Track once it's in the database (None when a
+        query found nothing), or with the download's exception.
+        """
+        if self._completion is None:
+            self._completion = asyncio.get_running_loop().create_future()
+            self._completion.add_done_callback(_retrieve)
+        return self._completion
+
+    def is_done(self) -> bool:
+        return self._completion is not None and self._completion.done()
+
+    def resolve(self, track):
+        completion = self.completion()
+        if not completion.done():
+            completion.set_result(track)
+
+    def fail(self, e: BaseException):
+        completion = self.completion()
+        if not completion.done():
+            completion.set_exception(e)
+
+    async def wait(self, timeout: Optional[float] = None):
+        """
+        The completion's result, see completion(). A waiter that times out or is
+        cancelled doesn't affect the job or the other waiters.
+
+        Raises:
+            asyncio.TimeoutError: If the job isn't done within `timeout` seconds.
+            Exception: Whatever the download failed with.
+        """
+        return await asyncio.wait_for(asyncio.shield(self.completion()), timeout=timeout)
+
+
     def get_identifier(self) -> str:
         """
         Return a string uniquely identifying this job.
@@ -76,3 +115,9 @@ class DownloadJob:
 
     def __repr__(self):
         return f"<DownloadJob type={self.get_type()} id={self.get_identifier()}>"
+
+
+def _retrieve(completion: asyncio.Future):
+    #nobody may be waiting, keeps asyncio from logging a failure as never retrieved
+    if not completion.cancelled():
+        completion.exception()
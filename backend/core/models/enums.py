@@ -37,17 +37,21 @@ class PlayQueueAction(str, Enum):
 #backend/core/database/audio_database.py
 class AudioDatabaseAction(str, Enum):
     SET_METADATA = "set_metadata"
+    EDIT_TRACKS = "edit_tracks"
 
     CREATE_PLAYLIST = "create_playlist"
     UPDATE_PLAYLISTS = "update_playlists"
     EDIT_PLAYLIST = "edit_playlist"
     DELETE_PLAYLIST = "delete_playlist"
+    MOVE_PLAYLIST_TRACKS = "move_playlist_tracks"
 
 
     LOG_TRACK = "log_track"
+    LOG_TRACKS = "log_tracks"
     UNLOG_TRACK = "unlog_track"
     
     LOG_DOWNLOAD = "log_download"
+    LOG_DOWNLOADS = "log_downloads"
     UNLOG_DOWNLOAD = "unlog_download"
 
 
@@ -1,10 +1,15 @@
 from pydantic import BaseModel
+from typing import Optional
 
 class Track(BaseModel):
     id: str
     title: str
     artist: str
     duration: int
+    format: Optional[str] = None #container of the downloaded file, set by YouTubeClient downloads
+    size: Optional[int] = None #and its stat(), recorded with the download so serving it needs none
+    mtime_ns: Optional[int] = None
 
     def to_json(self):
-        return self.model_dump() #pydantic v2
+        #file fields are a storage detail of downloads, the library and search payloads stay {id, title, artist, duration}
+        return self.model_dump(exclude={"format", "size", "mtime_ns"}) #pydantic v2
@@ -1,13 +1,22 @@
 from backend.core.models.download_job import DownloadJob
 from backend.core.queue.base.observable_dll import ObservableQueue
 import asyncio
+from typing import Dict, Optional
 
 from backend.core.models.enums import DownloadQueueAction as DQA
 
 class DownloadQueue(ObservableQueue[DownloadJob]):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._pending: Dict[str, DownloadJob] = {} #identifier -> first job queued or downloading for it
+
+    def _track(self, job: DownloadJob):
+        self._pending.setdefault(job.get_identifier(), job)
+
     async def insert_next(self, job: DownloadJob):
         #for queueing the song right after the current one
         async with self._condition:
+            self._track(job)
             self._insert_at(1, job)
             await self._emit_event(action=DQA.INSERT_NEXT, payload={"id": job.get_identifier(), "content": self.to_json()})
             self._condition.notify()
@@ -15,6 +24,7 @@ class DownloadQueue(ObservableQueue[DownloadJob]):
     async def push(self, job: DownloadJob):
         #pushing to end
         async with self._condition:
+            self._track(job)
             self._push(job)
             await self._emit_event(action=DQA.PUSH, payload={"id": job.get_identifier(), "content": self.to_json()})
             self._condition.notify()
@@ -32,6 +42,48 @@ class DownloadQueue(ObservableQueue[DownloadJob]):
             print(f"[DEBUG]: contents of download queue: {self.to_json()}")
             return job
 
+    async def enqueue(self, job: DownloadJob, front: bool = False) -> DownloadJob:
+        """
+        Queue `job` unless a job for the same id or query is queued or downloading.
+
+        Args:
+            job (DownloadJob): The job to add.
+            front (bool): Queue it next (insert_next) instead of last.
+
+        Returns:
+            DownloadJob: The job that will download it, `job` or the one already
+                pending, whose completion() the caller can wait on.
+        """
+        async with self._condition:
+            pending = self._pending.get(job.get_identifier())
+            if pending is not None:
+                return pending
+
+            self._track(job)
+            if front:
+                self._insert_at(1, job)
+                await self._emit_event(action=DQA.INSERT_NEXT, payload={"id": job.get_identifier(), "content": self.to_json()})
+            else:
+                self._push(job)
+                await self._emit_event(action=DQA.PUSH, payload={"id": job.get_identifier(), "content": self.to_json()})
+            self._condition.notify()
+            return job
+
+    def get_pending(self, identifier: str) -> Optional[DownloadJob]:
+        return self._pending.get(identifier)
+
+    def finish(self, job: DownloadJob, track=None, error: Optional[BaseException] = None):
+        """
+        Called by the DownloadWorker once `job` is done (the track ingested, or the
+        download failed), wakes everything waiting on the job.
+        """
+        if self._pending.get(job.get_identifier()) is job:
+            del self._pending[job.get_identifier()]
+        if error is not None:
+            job.fail(error)
+        else:
+            job.resolve(track)
+
     '''
     async def remove_at(self, index: int):
         #remove id
@@ -42,7 +94,7 @@ class DownloadQueue(ObservableQueue[DownloadJob]):
 
 
     def contains(self, item: DownloadJob | str):
-        """Check if a job with the same identifier or YouTube ID exists."""
+        """Check if a job with the same identifier or YouTube ID is queued or downloading."""
         if isinstance(item, DownloadJob):
             identifier = item.get_identifier()
         elif isinstance(item, str):
@@ -50,7 +102,7 @@ class DownloadQueue(ObservableQueue[DownloadJob]):
         else:
             return False
 
-        return any(identifier == job.get_identifier() for job in self)
+        return identifier in self._pending
 
             
     async def send_content(self):
@@ -1,16 +1,18 @@
+import asyncio
 import traceback
-from backend.core.database.audio_database import AudioDatabase
+from backend.core.database.storage import AudioStorage
 from backend.core.models.download_job import DownloadJob
-from backend.core.queue.base.observable_dll import ObservableQueue
+from backend.core.queue.implementations.download_queue import DownloadQueue
 from backend.core.youtube.client import YouTubeClient
+from backend.exceptions import DownloadFailedError
 
 
 class DownloadWorker:
     def __init__(
         self, 
-        download_queue: ObservableQueue, 
+        download_queue: DownloadQueue, 
         youtube_client: YouTubeClient,
-        audio_database: AudioDatabase
+        audio_database: AudioStorage
     ):
         self.download_queue = download_queue
         self.youtube_client = youtube_client #supports retry handling
@@ -23,6 +25,7 @@ class DownloadWorker:
             #potentially rename to job and define a custom DownloadJob wrapper for track with fields like requested_by
             job: DownloadJob = await self.download_queue.pop() #thank you to async condition
             track = None #null this out
+            error = None
 
             try:
                 print(f"[DEBUG] DownloadWorker handling {job.get_type()} type")
@@ -43,16 +46,28 @@ class DownloadWorker:
 
                 #client should return the classic Track metadata with {id, title, artist, dur} 
                 if track:
-                    await self.audio_database.log_track(track)
-                    await self.audio_database.log_download(track.id)
-
                     #put into a playlist right away? in the case of importing a playlist then yes
-                    if job.get_updates():
-                        await self.audio_database.update_track_playlists(track.id, job.get_updates())
+                    memberships = [
+                        (track.id, update["id"]) 
+                        for update in (job.get_updates() or []) 
+                        if update.get("checked") is True
+                    ]
+
+                    #metadata, download and playlist rows land in one transaction
+                    await self.audio_database.ingest_many([track], memberships=memberships)
+
+            except asyncio.CancelledError:
+                error = DownloadFailedError(f"Download of {job.get_identifier()} was cancelled")
+                raise
 
             except Exception as e:
+                error = e
                 print(f"[ERROR] DownloadWorker error ({e}) handling DownloadJob: {job}\n{traceback.format_exc()}")
 
+            finally:
+                #after the ingest, so a waiter that wakes up finds the track downloaded
+                self.download_queue.finish(job, track=track or None, error=error)
+
     def shutdown(self):
         """Signal the worker to stop."""
         self.stopped = True
@@ -2,11 +2,14 @@
 
 import asyncio
 import json
+import os
 from pathlib import Path
 import subprocess
 import sys
 import time
-from typing import Callable, List, Optional
+from typing import Callable, List, Optional, Tuple
+from backend.core.audio.growing import GrowingFiles
+from backend.core.lib.formats import mime_type
 from backend.core.lib.utils import get_audio_path
 from backend.core.events.event_bus import EventBus
 from backend.core.models.event import Event
@@ -18,6 +21,15 @@ from backend.core.models.enums import YouTubeClientAction as YTCA
 
 #if this fucker breaks just run: python -m pip install -U yt-dlp (goated software btw up with ffmpeg)
 class YouTubeClient:
+    #dl_format that keeps the source codec (opus or aac), ffmpeg only remuxes it out of the webm/mp4
+    NATIVE_FORMAT = "native"
+
+    #dl_formats ffmpeg writes front to back, so the file plays while it grows: encoder arguments
+    PROGRESSIVE_CODECS = {
+        "mp3": ("-c:a", "libmp3lame"),
+        "opus": ("-c:a", "libopus"),
+    }
+
     def __init__(
         self,
         *,
@@ -28,12 +40,17 @@ class YouTubeClient:
         dl_format_filter: Optional[str] = None,
         dl_format: Optional[str] = None,
         dl_quality: Optional[str] = None,
-        dl_user_agent: Optional[str] = None
+        dl_user_agent: Optional[str] = None,
+
+        growing_files: Optional[GrowingFiles] = None,
+        ffmpeg: str = "ffmpeg"
     ):
         self.name = name
         self.base_dir = base_dir
 
         self._event_bus = event_bus
+        self.growing_files = growing_files #progressive downloads when set, see _download_progressive
+        self.ffmpeg = ffmpeg
 
         self.id_src = "YT___" #source for id's, so that it'll be like YT_#######...
 
@@ -257,19 +274,25 @@ class YouTubeClient:
         output_path = get_audio_path(track_or_id=id, base_dir=self.base_dir, audio_format=self.dl_format)
         temp_path = get_audio_path(track_or_id=id, base_dir=self.base_dir, audio_format=self.dl_temp_format)
 
+        track_id = id #the id the file and a progressive stream go by
         if id.startswith(self.id_src):
             id = id[len(self.id_src):]
 
         url = f"https://www.youtube.com/watch?v={id}"
 
+        #native keeps the stream as youtube serves it, otherwise ffmpeg re-encodes to dl_format
+        if self.dl_format == self.NATIVE_FORMAT:
+            conversion = ["--audio-format", "best"]
+        else:
+            conversion = ["--audio-format", self.dl_format, "--audio-quality", self.dl_quality]
+
         #cmd line download
         delim = "\x1f"
         cmd = [
             "yt-dlp",
             "-x", #audio only
             "-f", self.dl_format_filter, #defeat SABR fragmentation potentially
-            "--audio-format", self.dl_format,
-            "--audio-quality", self.dl_quality,
+            *conversion,
             "--user-agent", self.dl_user_agent,
             "--quiet",
             "--no-playlist",
@@ -278,18 +301,24 @@ class YouTubeClient:
             "--fragment-retries", "3", #network robustness for missing packets
             "--retry-sleep", "linear=1::5",
             "-o", str(temp_path), #ytdlp requires temporary format
-            "--print", f"after_move:%(id)s{delim}%(title)s{delim}%(uploader)s{delim}%(duration)s", #complete print after download
+            "--print", f"after_move:%(id)s{delim}%(title)s{delim}%(uploader)s{delim}%(duration)s{delim}%(filepath)s", #complete print after download
             url
         ]
-        print(f"Running command: {' '.join(cmd)}")
+
+        progressive = self.growing_files is not None and self.dl_format in self.PROGRESSIVE_CODECS
+        if not progressive:
+            print(f"Running command: {' '.join(cmd)}")
 
         track = None
         try:
             start_time = time.time()
-            code, out, err = await self._run_subprocess(cmd, timeout=timeout)
+            if progressive:
+                out = await self._download_progressive(track_id, url, output_path, timeout=timeout)
+            else:
+                code, out, err = await self._run_subprocess(cmd, timeout=timeout)
 
-            if code != 0:
-                raise RuntimeError(f"[download_by_id] yt-dlp exited with code {code}: {err.strip()}")
+                if code != 0:
+                    raise RuntimeError(f"[download_by_id] yt-dlp exited with code {code}: {err.strip()}")
         
             elapsed = time.time() - start_time
             print(f"[INFO] Downloaded {id} in {elapsed:.2f}s")
@@ -297,17 +326,25 @@ class YouTubeClient:
             # Parse metadata from stdout
             try:
                 line = out.strip().splitlines()[0]  # first line
-                id, title, artist, duration = line.split(delim)
+                id, title, artist, duration, filepath = line.split(delim)
             except Exception as e:
                 raise ValueError(f"[download_by_id] Failed to parse metadata: {e}, Output was: {out}")
 
-            #build track object
+            #build track object, format is the container the file actually landed in. its stat() is
+            #stored with the download row, so FileIndex serves the file without one
+            try:
+                st = os.stat(filepath)
+            except OSError:
+                st = None
             true_id = f"{self.id_src}{id}"
             track = Track(
                 id=true_id,
                 title=title or "Unknown Title",
                 artist=artist or "Unknown Artist",
-                duration=int(duration) if duration.isdigit() else 0
+                duration=int(duration) if duration.isdigit() else 0,
+                format=Path(filepath).suffix.lstrip(".") or self.dl_format,
+                size=st.st_size if st else None,
+                mtime_ns=st.st_mtime_ns if st else None
             )
 
             #override custom fields
@@ -329,6 +366,104 @@ class YouTubeClient:
             await self._emit_event(action=YTCA.FINISH, payload={})
                 
 
+    async def _download_progressive(self, track_id: str, url: str, output_path: Path, timeout: int = 60) -> str:
+        """
+        Download and convert in one pass, yt-dlp piping the source stream into ffmpeg,
+        which writes the track front to back into a part file registered with
+        growing_files. /audio/stream serves that file while it grows, so a track
+        plays a moment after it is requested instead of after download and conversion.
+
+        Returns:
+            str: The metadata line of the regular download (fields joined by \x1f, the
+                final path last).
+
+        Raises:
+            RuntimeError: If either process fails or the download times out, the part
+                file is deleted.
+        """
+        delim = "\x1f"
+        ytdlp_cmd = [
+            "yt-dlp",
+            "-f", self.dl_format_filter,
+            "--user-agent", self.dl_user_agent,
+            "--quiet",
+            "--no-playlist",
+            "--no-cache-dir",
+            "--retries", "10",
+            "--fragment-retries", "3",
+            "--retry-sleep", "linear=1::5",
+            "--no-simulate", #--print would skip the download otherwise
+            "--print", f"%(id)s{delim}%(title)s{delim}%(uploader)s{delim}%(duration)s", #to stderr, stdout is the stream
+            "-o", "-",
+            url
+        ]
+        growing = self.growing_files.start(track_id, output_path, mime_type(self.dl_format))
+
+        quality = self.dl_quality
+        if quality.isdigit():
+            quality_args = ["-q:a", quality] if self.dl_format == "mp3" else [] #vbr preset, like --audio-quality
+        else:
+            quality_args = ["-b:a", quality]
+        ffmpeg_cmd = [
+            self.ffmpeg,
+            "-hide_banner",
+            "-loglevel", "error",
+            "-i", "pipe:0",
+            "-map", "0:a:0",
+            "-vn",
+            *self.PROGRESSIVE_CODECS[self.dl_format],
+            *quality_args,
+            "-f", self.dl_format,
+            "-y",
+            str(growing.part_path) #same inode as the file readers opened, ffmpeg truncates it
+        ]
+        print(f"Running command: {' '.join(ytdlp_cmd)} | {' '.join(ffmpeg_cmd)}")
+
+        procs: List[asyncio.subprocess.Process] = []
+        ok = False
+        try:
+            read_fd, write_fd = os.pipe()
+            try:
+                procs.append(await asyncio.create_subprocess_exec(*ytdlp_cmd, stdout=write_fd, stderr=asyncio.subprocess.PIPE))
+                procs.append(await asyncio.create_subprocess_exec(
+                    *ffmpeg_cmd,
+                    stdin=read_fd,
+                    stdout=asyncio.subprocess.DEVNULL,
+                    stderr=asyncio.subprocess.PIPE
+                ))
+            finally:
+                #the children hold their ends, ffmpeg sees eof when yt-dlp exits
+                os.close(read_fd)
+                os.close(write_fd)
+
+            try:
+                (_, ytdlp_err), (_, ffmpeg_err) = await asyncio.wait_for(
+                    asyncio.gather(procs[0].communicate(), procs[1].communicate()),
+                    timeout=timeout
+                )
+            except asyncio.TimeoutError:
+                raise RuntimeError(f"[download_by_id] yt-dlp | ffmpeg timed out after {timeout} seconds.")
+
+            ytdlp_lines = ytdlp_err.decode(errors="replace").splitlines()
+            if procs[0].returncode != 0:
+                raise RuntimeError(f"[download_by_id] yt-dlp exited with code {procs[0].returncode}: {' '.join(ytdlp_lines).strip()}")
+            if procs[1].returncode != 0:
+                raise RuntimeError(f"[download_by_id] ffmpeg exited with code {procs[1].returncode}: {ffmpeg_err.decode(errors='replace').strip()}")
+
+            meta = next((line for line in ytdlp_lines if line.count(delim) == 3), None)
+            if meta is None:
+                raise RuntimeError(f"[download_by_id] yt-dlp printed no metadata: {' '.join(ytdlp_lines).strip()}")
+            ok = True
+            return f"{meta}{delim}{output_path}"
+
+        finally:
+            for proc in procs:
+                if proc.returncode is None:
+                    proc.kill()
+                    await proc.wait()
+            self.growing_files.finish(growing, ok)
+
+
     async def download_by_query(
         self,
         q: str,
@@ -23,3 +23,25 @@ class CachingFailError(Exception):
 class DownloadLogFailError(Exception):
     """Raised when a sql download logging attempt fails."""
     pass
+
+class InvalidCursorError(Exception):
+    """Raised when a pagination cursor can't be decoded."""
+    pass
+
+class PlaylistOrderError(Exception):
+    """Raised when a playlist move or reorder references tracks that aren't in the playlist."""
+    pass
+
+#/core/audio/ranges.py
+class InvalidRangeError(Exception):
+    """Raised when a bytes Range header is malformed."""
+    pass
+
+class RangeNotSatisfiableError(Exception):
+    """Raised when no range of a Range header overlaps the file."""
+    pass
+
+#/core/audio/transcode.py
+class TranscodeFailedError(Exception):
+    """Raised when ffmpeg can't produce a quality tier of a track."""
+    pass
@@ -1,3 +1,4 @@
+import os
 from pathlib import Path
 from enum import Enum
 
@@ -15,14 +16,90 @@ ROOT_DIR = Path(__file__).resolve().parent.parent
 DB_FILE = ROOT_DIR / "backend" / "data" / "audio.db"
 DOWNLOAD_DIR = ROOT_DIR / "backend" / "data" / "downloads"
 
+#storage backend, "sqlite" (AudioDatabase on DB_FILE) or "postgres" (PostgresAudioDatabase on DB_POSTGRES_DSN)
+DB_BACKEND = os.getenv("DB_BACKEND", "sqlite")
+DB_POSTGRES_DSN = os.getenv("DB_POSTGRES_DSN")
+DB_POSTGRES_SCHEMA = os.getenv("DB_POSTGRES_SCHEMA") #None keeps the connection's search_path
+DB_POSTGRES_POOL_MIN = 2
+DB_POSTGRES_POOL_MAX = 10
+DB_POSTGRES_STATEMENT_CACHE = 256 #prepared statements kept per pooled connection
+
+#sqlite storage tuning, see AudioDatabase
+DB_WAL_MODE = True
+DB_READER_POOL_SIZE = 4
+DB_CACHE_SIZE_KB = 16 * 1024 #16MB page cache per connection
+DB_MMAP_SIZE = 128 * 1024 * 1024 #128MB
+DB_GROUP_COMMIT = False #optional write-behind batching, requires DB_WAL_MODE
+DB_GROUP_COMMIT_MAX_OPS = 64
+DB_GROUP_COMMIT_DELAY_MS = 0 #>0 trades write latency for bigger batches, worth it with synchronous=FULL
+
+#print every table row at startup (slow on big libraries, row counts are always printed)
+STARTUP_DUMP_TABLES = False
+
+#download folder reconciliation, see backend/core/database/reconcile.py
+RECONCILE_SLICE_MS = 20 #max scandir time per slice before yielding to the event loop
+RECONCILE_PAUSE_MS = 5
+RECONCILE_MIN_BYTES_PER_SEC = 2000 #~16kbps, anything smaller than duration * this is truncated
+RECONCILE_REDOWNLOAD = True #queue missing or truncated downloads again
+
+#online database snapshots (sqlite only), see backend/core/database/backup.py. restore with `python main.py --restore`
+BACKUP_DIR = ROOT_DIR / "backend" / "data" / "backups"
+BACKUP_ENABLED = True
+BACKUP_INTERVAL_S = 6 * 60 * 60
+BACKUP_KEEP = 7
+BACKUP_PAGES_PER_STEP = 256 #4096 byte pages, 1MB per step
+BACKUP_STEP_PAUSE_MS = 5
+
+#library change log for /library/changes delta sync
+CHANGES_PAGE_LIMIT = 200
+CHANGES_RETAIN = 10000 #deletes older than this many sequence numbers are compacted away, clients behind must re-fetch
+CHANGES_COMPACT_INTERVAL_S = 60 * 60
+
 
 
 #ytdlp extraction query arguments and core audio formatting
 AUDIO_FORMAT_FILTER = "bestaudio/best" #"bestaudio[ext=m4a]/bestaudio/best"
 AUDIO_FORMAT = "mp3"
 AUDIO_QUALITY = 0 #"192K"
+DOWNLOAD_NATIVE = False #keep youtube's opus/aac stream (remux only, no re-encode to AUDIO_FORMAT), the container is recorded per track
+DOWNLOAD_PROGRESSIVE = False #experimental, yt-dlp pipes into ffmpeg and /audio/stream plays the file while it grows (mp3/opus, not native)
+PROGRESSIVE_START_TIMEOUT_S = 10 #how long /audio/stream holds a request for a missing track before the 503, only with DOWNLOAD_PROGRESSIVE
+PROGRESSIVE_POLL_S = 0.1 #how often a stream of a growing file checks for new bytes
+PROGRESSIVE_LINGER_S = 30 #a finished growing file is served until its download row lands, at most this long
+DOWNLOAD_AWAIT_TIMEOUT_S = 30 #default long poll of /audio/await/{id}
+DOWNLOAD_AWAIT_MAX_S = 120 #longest a client may ask /audio/await/{id} to hold the request
 USER_AGENT = "Mozilla/5.0"# (Windows NT 10.0; Win64; x64) ..." #"Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/115.0.0.0 Safari/537.36"
-STREAM_CHUNK_SIZE = 1024 * 1024 #1MB
+STREAM_CHUNK_SIZE = 1024 * 1024 #1MB, read size of the generator fallback
+STREAM_MAX_RANGES = 16 #ranges per request, more is a 400
+FILE_INDEX_TTL_S = None #seconds until a stat() of a download without recorded stats is re-checked, None: until its next download event
+STREAM_ZERO_COPY = True #kernel sendfile through the asgi zerocopysend/pathsend extensions when the server has them
+HEAD_CACHE_BYTES = 256 * 1024 #256KB, first bytes of a track kept in memory
+HEAD_CACHE_MAX_BYTES = 64 * 1024 * 1024 #64MB, total held by the head cache
+HEAD_CACHE_PREWARM = 3 #tracks at the front of the play queue whose heads are read ahead
+SEEK_INDEX_INTERVAL_MS = 200 #spacing of the time -> byte entries of /audio/stream?t=, about 5 frames
+SEEK_INDEX_CACHE = 256 #seek indexes kept in memory (~10KB each for a 4 minute track)
+
+#lower bitrate tiers for /audio/stream?quality=, made by ffmpeg on first use, see Transcoder
+TRANSCODE_DIR = ROOT_DIR / "backend" / "data" / "transcodes"
+TRANSCODE_TIERS = {"low": ("aac", 64), "medium": ("aac", 128)} #name -> (codec "aac"|"opus", kbps), aac plays everywhere including ios safari, {} disables
+TRANSCODE_MAX_BYTES = 2 * 1024 * 1024 * 1024 #2GB of renditions, least recently played go first
+TRANSCODE_WORKERS = 2 #concurrent ffmpeg processes
+TRANSCODE_TIMEOUT_S = 120
+TRANSCODE_ORIGINAL_KBPS = 256 #about what AUDIO_QUALITY 0 vbr mp3 averages, what quality=auto compares tiers against
+THROUGHPUT_ALPHA = 0.3 #weight of the newest sample in the per client ewma
+THROUGHPUT_MIN_BYTES = 256 * 1024 #smaller responses are latency bound and don't count
+THROUGHPUT_HEADROOM = 1.5 #the link must carry this many times a tier's bitrate
+
+#best ranked local matches /search/ returns without ?limit=, all of them for a short prefix is most of the library
+LOCAL_SEARCH_LIMIT = 100
+
+#typo tolerant fallback for /search/ when the exact search finds nothing, see FuzzyIndex
+FUZZY_SEARCH_LIMIT = 20
+FUZZY_SEARCH_THRESHOLD = 0.5 #share of query trigrams a match must contain
+FUZZY_INDEX_CHUNK = 500 #tracks indexed per event loop turn while the index warms up
+
+#keyset pagination for list endpoints
+PAGE_LIMIT_MAX = 500
 
 #ytdlp search and download handling arguments
 SEARCH_LIMIT_DEFAULT = 3
@@ -1,4 +1,5 @@
 import asyncio
+import time
 from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
@@ -6,10 +7,20 @@ from fastapi.staticfiles import StaticFiles
 from fastapi.responses import FileResponse, HTMLResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-from backend.core.database.cleanup import cleanup_download_folder
+from backend.core.database.backup import BackupService
+from backend.core.database.reconcile import DownloadReconciler
 from backend.core.worker.download import DownloadWorker
 from backend.core.youtube.client import YouTubeClient
-from backend.core.database.audio_database import AudioDatabase
+from backend.core.database.factory import create_audio_storage
+from backend.core.database.library_cache import LibraryCache
+from backend.core.audio.file_index import FileIndex
+from backend.core.audio.growing import GrowingFiles
+from backend.core.audio.head_cache import HeadCache
+from backend.core.audio.seek_index import SeekIndexer
+from backend.core.audio.throughput import ThroughputEstimator
+from backend.core.audio.transcode import Transcoder, parse_tiers
+from backend.core.lib.metrics import MetricsRegistry
+from backend.core.lib.startup import StartupTimer
 
 from backend.core.events.event_bus import EventBus
 from backend.core.events.websocket.manager import WebsocketManager
@@ -20,11 +31,14 @@ from backend.core.queue.implementations.play_queue import PlayQueue
 from backend.core.queue.implementations.download_queue import DownloadQueue
 
 from backend.core.playlists.manager import PlaylistExtractorManager
+from backend.core.models.download_job import DownloadJob
 
 
 import backend.globals as G
 
 from backend.api.routers import audio_router
+from backend.api.routers import library_router
+from backend.api.routers import metrics_router
 from backend.api.routers import playlists_router
 from backend.api.routers import queue_router
 from backend.api.routers import search_router
@@ -37,25 +51,94 @@ from backend.api.routers import websocket_router
 async def lifespan(app: FastAPI):
 
     print("Starting...")
+    booted_at = time.time()
     
     websocket_manager = WebsocketManager()
     event_bus = EventBus()
-
-    # link the db
-    db = AudioDatabase(name=G.AUDIO_DATABASE_NAME, filepath=G.DB_FILE, event_bus=event_bus)
-    await db.build()
-    await db.view_all()
-    await cleanup_download_folder(db, G.DOWNLOAD_DIR)
-
-    print(await db.search(""))
+    metrics = MetricsRegistry()
+    startup = StartupTimer(metrics=metrics)
+
+    # link the db, the library cache follows its events so /playlists/downloads is served from memory
+    with startup.phase("db.open"):
+        library_cache = LibraryCache(event_bus=event_bus, source=G.AUDIO_DATABASE_NAME, fuzzy_threshold=G.FUZZY_SEARCH_THRESHOLD)
+        db = create_audio_storage(event_bus=event_bus, library_cache=library_cache, metrics=metrics)
+    await startup.run("db.build", db.build())
+
+    # independent boot reads run together, row counts instead of dumping every table
+    counts, _ = await asyncio.gather(
+        startup.run("db.count_rows", db.count_rows()),
+        startup.run("library_cache.warm", db.get_downloads_content()),
+    )
+    print(f"[Startup] rows: {counts}")
+
+    # typo tolerant search index, built off the startup path a chunk per loop turn
+    fuzzy_task = asyncio.create_task(library_cache.warm_fuzzy_index(chunk=G.FUZZY_INDEX_CHUNK))
+    if G.STARTUP_DUMP_TABLES:
+        await startup.run("db.view_all", db.view_all())
+
+    # size, mtime and container of every download, /audio/stream and the queue routes never stat()
+    file_index = FileIndex(
+        base_dir=G.DOWNLOAD_DIR,
+        audio_format=G.AUDIO_FORMAT,
+        event_bus=event_bus,
+        source=G.AUDIO_DATABASE_NAME,
+        ttl=G.FILE_INDEX_TTL_S
+    )
+    file_index.load(await startup.run("db.get_download_files", db.get_download_files()))
+
+    # time -> byte offset maps of downloaded mp3s, subscribed after the file index
+    seek_indexer = SeekIndexer(
+        file_index=file_index,
+        interval_ms=G.SEEK_INDEX_INTERVAL_MS,
+        max_cached=G.SEEK_INDEX_CACHE,
+        metrics=metrics,
+        event_bus=event_bus,
+        source=G.AUDIO_DATABASE_NAME
+    )
+
+    # downloads /audio/stream can serve while they are written
+    growing_files = GrowingFiles(linger=G.PROGRESSIVE_LINGER_S, event_bus=event_bus, source=G.AUDIO_DATABASE_NAME)
 
     # ytdlp
-    yt = YouTubeClient(name=G.YOUTUBE_CLIENT_NAME, base_dir=G.DOWNLOAD_DIR, event_bus=event_bus)
+    yt = YouTubeClient(
+        name=G.YOUTUBE_CLIENT_NAME,
+        base_dir=G.DOWNLOAD_DIR,
+        event_bus=event_bus,
+        dl_format=YouTubeClient.NATIVE_FORMAT if G.DOWNLOAD_NATIVE else G.AUDIO_FORMAT,
+        growing_files=growing_files if G.DOWNLOAD_PROGRESSIVE else None
+    )
 
     # Initialize backend components early if needed for handlers
     play_queue = PlayQueue(name=G.PLAY_QUEUE_NAME, event_bus=event_bus)
     download_queue = DownloadQueue(name=G.DOWNLOAD_QUEUE_NAME, event_bus=event_bus)
 
+    # first bytes of recently played and upcoming tracks, in memory
+    head_cache = HeadCache(
+        file_index=file_index,
+        head_bytes=G.HEAD_CACHE_BYTES,
+        max_bytes=G.HEAD_CACHE_MAX_BYTES,
+        prewarm=G.HEAD_CACHE_PREWARM,
+        metrics=metrics,
+        event_bus=event_bus,
+        db_source=G.AUDIO_DATABASE_NAME,
+        queue_source=G.PLAY_QUEUE_NAME
+    )
+
+    # quality tiers for slow links, renditions cached on disk
+    transcoder = Transcoder(
+        cache_dir=G.TRANSCODE_DIR,
+        tiers=parse_tiers(G.TRANSCODE_TIERS),
+        file_index=file_index,
+        max_bytes=G.TRANSCODE_MAX_BYTES,
+        workers=G.TRANSCODE_WORKERS,
+        timeout=G.TRANSCODE_TIMEOUT_S,
+        metrics=metrics,
+        event_bus=event_bus,
+        source=G.AUDIO_DATABASE_NAME
+    )
+    await startup.run("transcoder.load", transcoder.load())
+    throughput = ThroughputEstimator(alpha=G.THROUGHPUT_ALPHA, min_bytes=G.THROUGHPUT_MIN_BYTES, headroom=G.THROUGHPUT_HEADROOM)
+
     queue_manager = QueueManager()
     queue_manager.add(play_queue)
     queue_manager.add(download_queue)
@@ -66,14 +149,60 @@ async def lifespan(app: FastAPI):
     download_worker = DownloadWorker(download_queue=download_queue, youtube_client=yt, audio_database=db)
     download_task = asyncio.create_task(download_worker.run())
 
+    # folder reconciliation doesn't gate serving, only files from before boot are touched
+    async def redownload(id: str):
+        file_index.mark_missing([id])
+        track = library_cache.get(id) or {}
+        await download_queue.enqueue(DownloadJob(id=id, metadata={"title": track.get("title"), "artist": track.get("artist")}))
+
+    reconciler = DownloadReconciler(
+        db=db,
+        downloads_dir=G.DOWNLOAD_DIR,
+        audio_format=G.AUDIO_FORMAT,
+        slice_ms=G.RECONCILE_SLICE_MS,
+        pause_ms=G.RECONCILE_PAUSE_MS,
+        min_bytes_per_sec=G.RECONCILE_MIN_BYTES_PER_SEC,
+        on_broken=redownload if G.RECONCILE_REDOWNLOAD else None
+    )
+    reconcile_task = asyncio.create_task(reconciler.run(older_than=booted_at))
+
+    # keep the change log bounded, superseded entries go on every pass
+    async def compact_changes():
+        while True:
+            await db.compact_changes(retain=G.CHANGES_RETAIN)
+            await asyncio.sleep(G.CHANGES_COMPACT_INTERVAL_S)
+
+    compact_task = asyncio.create_task(compact_changes())
+
+    # snapshots copy a few pages at a time off the loop
+    backup_task = None
+    if G.BACKUP_ENABLED and G.DB_BACKEND == "sqlite": #postgres has its own tooling (pg_dump, PITR)
+        backups = BackupService(
+            db_file=G.DB_FILE,
+            backup_dir=G.BACKUP_DIR,
+            keep=G.BACKUP_KEEP,
+            pages_per_step=G.BACKUP_PAGES_PER_STEP,
+            pause_ms=G.BACKUP_STEP_PAUSE_MS,
+            metrics=metrics
+        )
+        backup_task = asyncio.create_task(backups.run(interval=G.BACKUP_INTERVAL_S))
+
     # Assign to app.state for global access
     app.state.websocket_manager = websocket_manager
     app.state.event_bus = event_bus
+    app.state.metrics = metrics
     app.state.queue_manager = queue_manager
 
     app.state.playlist_ext_manager = playlist_ext_manager
 
     app.state.db = db
+    app.state.library_cache = library_cache
+    app.state.file_index = file_index
+    app.state.head_cache = head_cache
+    app.state.seek_indexer = seek_indexer
+    app.state.growing_files = growing_files
+    app.state.transcoder = transcoder
+    app.state.throughput = throughput
     app.state.yt = yt
 
 
@@ -81,9 +210,21 @@ async def lifespan(app: FastAPI):
     # triggers
     register_event_handlers(event_bus=event_bus, websocket_manager=websocket_manager)
 
+    app.state.startup = startup.report()
+
     yield #app runs
 
     print("Shutting down...")
+    # stop everything that writes first, a download in flight fails its job instead of logging half way
+    tasks = [download_task, reconcile_task, compact_task, fuzzy_task] + ([backup_task] if backup_task else [])
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await transcoder.close()
+
+    # then the storage, queued group commit writes land before its threads and pool go
+    await db.flush()
+    await db.close()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -98,6 +239,8 @@ app.add_middleware(
 app.mount("/frontend", StaticFiles(directory="frontend"), name="frontend")
 
 app.include_router(audio_router.router)
+app.include_router(library_router.router)
+app.include_router(metrics_router.router)
 app.include_router(playlists_router.router)
 app.include_router(queue_router.router)
 app.include_router(search_router.router)
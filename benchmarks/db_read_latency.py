@@ -0,0 +1,109 @@
+"""
+benchmarks/db_read_latency.py
+
+Usage:
+    python -m benchmarks.db_read_latency [--tracks 2000] [--importers 4] [--reads 2000]
+
+Measures AudioDatabase.is_downloaded latency (the check done by every
+/audio/stream request) while several simulated playlist imports hammer the
+database with log_track + log_download + update_track_playlists. Runs with the
+legacy single-connection mode, WAL mode with a reader pool, and WAL plus group
+commit, then prints p50/p99/max read latency and import throughput for each.
+"""
+
+import argparse
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from backend.core.database.audio_database import AudioDatabase
+from backend.core.models.track import Track
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def run_mode(db_path: Path, *, tracks: int, importers: int, reads: int, **db_kwargs) -> dict:
+    db = AudioDatabase(name="bench", filepath=db_path, reader_pool_size=4, **db_kwargs)
+    await db.build()
+
+    #seed a library so the reads hit real rows
+    seeded = [Track(id=f"seed{i}", title=f"Seed {i}", artist="Bench", duration=180) for i in range(200)]
+    for track in seeded:
+        await db.log_track(track)
+        await db.log_download(track.id)
+    playlist = await db.create_playlist(name="bench", temp_id="tmp")
+
+    stop = asyncio.Event()
+    imported = 0
+
+    async def importer(worker: int):
+        nonlocal imported
+        i = 0
+        while not stop.is_set() and i < tracks:
+            track = Track(id=f"imp{worker}_{i}", title=f"Imported {i}", artist="Bench", duration=200)
+            await db.log_track(track)
+            await db.log_download(track.id)
+            await db.update_track_playlists(track.id, [{"id": playlist["id"], "checked": True}])
+            i += 1
+            imported += 1
+
+    async def reader():
+        latencies = []
+        for i in range(reads):
+            start = time.perf_counter()
+            await db.is_downloaded(seeded[i % len(seeded)].id)
+            latencies.append((time.perf_counter() - start) * 1000)
+            await asyncio.sleep(0)
+        return latencies
+
+    start = time.perf_counter()
+    import_tasks = [asyncio.create_task(importer(w)) for w in range(importers)]
+    latencies = await reader()
+    stop.set()
+    await asyncio.gather(*import_tasks)
+    elapsed = time.perf_counter() - start
+    await db.close()
+
+    return {
+        "p50": statistics.median(latencies),
+        "p99": percentile(latencies, 99),
+        "max": max(latencies),
+        "imports_per_s": imported / elapsed,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="AudioDatabase read latency under concurrent imports")
+    parser.add_argument("--tracks", type=int, default=2000, help="Tracks per simulated import")
+    parser.add_argument("--importers", type=int, default=4, help="Concurrent simulated imports")
+    parser.add_argument("--reads", type=int, default=2000, help="is_downloaded calls to time")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        modes = (
+            ("legacy", {}),
+            ("wal", {"wal": True}),
+            ("wal+gc", {"wal": True, "group_commit": True}),
+        )
+        for label, db_kwargs in modes:
+            result = await run_mode(
+                Path(tmp) / f"{label}.db",
+                tracks=args.tracks,
+                importers=args.importers,
+                reads=args.reads,
+                **db_kwargs
+            )
+            print(
+                f"[{label:>6}] is_downloaded p50={result['p50']:.3f}ms p99={result['p99']:.3f}ms "
+                f"max={result['max']:.3f}ms | imports {result['imports_per_s']:.0f}/s"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+"""
+benchmarks/db_search.py
+
+Usage:
+    python -m benchmarks.db_search [--tracks 50000] [--runs 200]
+
+Times AudioDatabase.search on a synthetic library, once through the FTS5 index
+and once through the LIKE fallback, for a few keystroke-style queries. search()
+returns its default 100 best matches, so a broad prefix ("bri" matches ~9k of
+50k tracks) costs what ranking every match with bm25 does, not building them all.
+"""
+
+import argparse
+import asyncio
+import random
+import sqlite3
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from backend.core.database.audio_database import AudioDatabase
+
+
+#pseudo words so term frequencies look like a real library rather than 20 repeated words
+SYLLABLES = ["ka", "lo", "mi", "ra", "ve", "to", "su", "ne", "bri", "dal", "mon", "tes", "gor", "lin", "pha", "qui"]
+_rng = random.Random(1)
+WORDS = sorted({"".join(_rng.choices(SYLLABLES, k=_rng.randint(2, 4))) for _ in range(8000)})
+QUERIES = [WORDS[100][:3], WORDS[2000], f"{WORDS[3000]} {WORDS[4000][:4]}", "artist 4321"]
+
+
+def seed(db_path: Path, tracks: int):
+    #bulk seed through a plain connection, the triggers keep the fts index in sync
+    rng = random.Random(0)
+    conn = sqlite3.connect(db_path)
+    conn.executemany(
+        "INSERT INTO tracks (id, title, artist, duration) VALUES (?, ?, ?, ?);",
+        (
+            (f"t{i}", " ".join(rng.choices(WORDS, k=3)).title(), f"Artist {rng.randrange(tracks // 10 or 1)}", 200)
+            for i in range(tracks)
+        )
+    )
+    conn.commit()
+    conn.close()
+
+
+async def time_queries(db: AudioDatabase, runs: int) -> dict:
+    results = {}
+    for q in QUERIES:
+        samples = []
+        for _ in range(runs):
+            start = time.perf_counter()
+            await db.search(q)
+            samples.append((time.perf_counter() - start) * 1000)
+        results[q] = statistics.median(samples)
+    return results
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="AudioDatabase.search latency, FTS5 vs LIKE")
+    parser.add_argument("--tracks", type=int, default=50000, help="Synthetic library size")
+    parser.add_argument("--runs", type=int, default=200, help="Searches timed per query")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = Path(tmp) / "search.db"
+        db = AudioDatabase(name="bench", filepath=db_path, wal=True)
+        await db.build()
+        seed(db_path, args.tracks)
+
+        fts = await time_queries(db, args.runs)
+        db._fts = False
+        like = await time_queries(db, args.runs)
+        await db.close()
+
+    for q in QUERIES:
+        print(f"{q!r:>14}  fts5 p50={fts[q]:.3f}ms  like p50={like[q]:.3f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
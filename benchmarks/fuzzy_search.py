@@ -0,0 +1,77 @@
+"""
+benchmarks/fuzzy_search.py
+
+Usage:
+    python -m benchmarks.fuzzy_search [--tracks 100000] [--runs 50]
+
+Builds a FuzzyIndex over a synthetic library and times misspelled queries
+against it: one dropped letter, one swapped pair, a misspelled two word query and
+a query below FuzzyIndex.MIN_QUERY_CHARS. Prints build time, index size and
+p50/p99 lookup latency per query.
+"""
+
+import argparse
+import random
+import statistics
+import time
+
+from backend.core.database.fuzzy_index import FuzzyIndex
+
+
+#consonant/vowel pseudo words over the whole alphabet, so trigram frequencies look like real titles
+CONSONANTS = "bcdfghjklmnprstvwyz"
+VOWELS = "aeiou"
+_rng = random.Random(1)
+WORDS = sorted({
+    "".join(_rng.choice(CONSONANTS) + _rng.choice(VOWELS) for _ in range(_rng.randint(2, 4))) + _rng.choice(["", "n", "s", "r"])
+    for _ in range(30000)
+})
+
+
+def library(tracks: int) -> list:
+    rng = random.Random(0)
+    return [
+        {
+            "id": f"t{i}",
+            "title": " ".join(rng.choices(WORDS, k=rng.randint(1, 4))),
+            "artist": f"{rng.choice(WORDS)} {rng.choice(WORDS)}",
+            "duration": 200
+        }
+        for i in range(tracks)
+    ]
+
+
+def typo_queries() -> list:
+    dropped = WORDS[1234][:-2] + WORDS[1234][-1]
+    swapped = WORDS[4321][:2] + WORDS[4321][3] + WORDS[4321][2] + WORDS[4321][4:]
+    two_words = f"{WORDS[777][1:]} {WORDS[5555][:-1]}"
+    return [dropped, swapped, two_words, WORDS[10][:2]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FuzzyIndex build and lookup latency")
+    parser.add_argument("--tracks", type=int, default=100000, help="Synthetic library size")
+    parser.add_argument("--runs", type=int, default=50, help="Lookups timed per query")
+    args = parser.parse_args()
+
+    tracks = library(args.tracks)
+    index = FuzzyIndex()
+
+    start = time.perf_counter()
+    index.rebuild(tracks)
+    build = (time.perf_counter() - start) * 1000
+    print(f"built {len(index)} tracks in {build:.0f}ms, {len(index._postings)} distinct trigrams")
+
+    for q in typo_queries():
+        samples = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            results = index.search(q, limit=20)
+            samples.append((time.perf_counter() - start) * 1000)
+        samples.sort()
+        p99 = samples[min(len(samples) - 1, int(0.99 * len(samples)))]
+        print(f"{q!r:>22}  p50={statistics.median(samples):.2f}ms  p99={p99:.2f}ms  results={len(results)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -110,6 +110,21 @@ export const PlaylistStore = (() => {
             if (pl) pl.tracks.remove(trackId);
         },
 
+        /**
+         * Move a track to right after another one, adding it if it isn't in the playlist.
+         * @param {string} playlistId - The ID of the playlist.
+         * @param {string} trackId - The ID of the track to move.
+         * @param {string|null} afterId - The track it should follow, null for the front.
+         */
+        moveTrack(playlistId, trackId, afterId) {
+            const pl = playlists[playlistId];
+            if (!pl) return;
+
+            pl.tracks.remove(trackId);
+            const index = afterId ? pl.tracks.indexOf(afterId) + 1 : 0;
+            pl.tracks.insert(trackId, index);
+        },
+
         /**
          * Remove a track from all playlists in the store.
          * @param {string} trackId - The ID of the track to remove from all playlists.
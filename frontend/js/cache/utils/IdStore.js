@@ -21,6 +21,9 @@ export function createIdStore() {
         has(id) {
             return idList.includes(id);
         },
+        indexOf(id) {
+            return idList.indexOf(id);
+        },
 
         //modifiers
         insert(id, index) {
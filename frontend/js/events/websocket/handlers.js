@@ -32,15 +32,18 @@ export const handlers = {
     },
     audio_database: {
         set_metadata: handleADSetMetadata,
+        edit_tracks: handleADEditTracks,
 
         create_playlist: handleADCreatePlaylist,
         update_playlists: handleADUpdatePlaylists,
         edit_playlist: handleADEditPlaylist,
         delete_playlist: handleADDeletePlaylist,
+        move_playlist_tracks: handleADMovePlaylistTracks,
 
         //log_track: handleADLogTrack,
         //unlog_track: handleADUnlogTrack,
         log_download: handleADLogDownload,
+        log_downloads: handleADLogDownloads,
         unlog_download: handleADUnlogDownload,
 
         search: handleADSearch,
@@ -129,6 +132,38 @@ function handleADSetMetadata(payload) {
     showToast("Saved");
 }
 
+function handleADEditTracks(payload) {
+    //combined membership + metadata edit, see audio_database.apply_track_edits()
+    console.log("[handleADEditTracks] payload content:", payload.content);
+
+    const { add, remove, metadata } = payload.content;
+
+    const touchedPlaylists = new Set();
+    for (const { id, playlist_id } of remove) {
+        const playlistId = String(playlist_id);
+        if (PlaylistStore.hasTrack(playlistId, id)) {
+            PlaylistStore.removeTrack(playlistId, id);
+            touchedPlaylists.add(playlistId);
+        }
+    }
+    for (const { id, playlist_id } of add) {
+        const playlistId = String(playlist_id);
+        if (!PlaylistStore.hasTrack(playlistId, id)) {
+            PlaylistStore.addTrackId(playlistId, id);
+            touchedPlaylists.add(playlistId);
+        }
+    }
+    touchedPlaylists.forEach(playlistId => renderPlaylistById(playlistId));
+
+    for (const { id, title, artist } of metadata) {
+        TrackStore.update(id, { title, artist });
+        updateAllListTrackItems(id, title, artist);
+    }
+
+    //notif
+    showToast("Saved");
+}
+
 function handleADUpdatePlaylists(payload) {
     //see backend/core/database/audio_database.py
     const trackId = payload.content.id;
@@ -178,6 +213,18 @@ function handleADDeletePlaylist(payload) {
     deleteRenderPlaylistById(playlistId);
 }
 
+function handleADMovePlaylistTracks(payload) {
+    //see audio_database.move_track() / reorder_playlist(), moves applied in order give the new order
+    console.log("[handleADMovePlaylistTracks] payload content:", payload.content);
+
+    const playlistId = String(payload.content.id);
+    for (const { id, after_id } of payload.content.moves) {
+        PlaylistStore.moveTrack(playlistId, id, after_id);
+    }
+
+    renderPlaylistById(playlistId);
+}
+
 
 function handleADLogDownload(payload) {
     console.log("[handleADLogDownload] payload content:", payload.content);
@@ -190,6 +237,34 @@ function handleADLogDownload(payload) {
     renderLibrary();
 }
 
+function handleADLogDownloads(payload) {
+    //batched version of log_download, see audio_database.log_downloads_many()
+    console.log("[handleADLogDownloads] payload content:", payload.content);
+
+    const { tracks, memberships } = payload.content;
+
+    for (const track of tracks) {
+        TrackStore.insert(track);
+    }
+    renderLibrary();
+
+    const touchedPlaylists = new Set();
+    for (const { id, playlist_id } of memberships) {
+        const playlistId = String(playlist_id);
+        if (!PlaylistStore.hasTrack(playlistId, id)) {
+            PlaylistStore.addTrackId(playlistId, id);
+            touchedPlaylists.add(playlistId);
+        }
+    }
+    touchedPlaylists.forEach(playlistId => renderPlaylistById(playlistId));
+
+    if (tracks.length === 1) {
+        showToast(`Downloaded ${tracks[0].title}`);
+    } else if (tracks.length > 1) {
+        showToast(`Downloaded ${tracks.length} tracks`);
+    }
+}
+
 function handleADUnlogDownload(payload) {
     console.log("[handleADUnlogDownload] payload content:", payload.content);
 
@@ -42,6 +42,7 @@ def main():
             "Example usage:\n"
             "  python main.py --setup\n"
             "  python main.py --set-webhook https://discord.com/api/webhooks/...\n"
+            "  python main.py --restore\n"
             "  python main.py"
         ),
         formatter_class=argparse.RawTextHelpFormatter
@@ -70,6 +71,18 @@ def main():
             "  - Download cloudflared binary to tools/"
         )
     )
+    parser.add_argument(
+        "-r", "--restore",
+        nargs="?",
+        const="latest",
+        metavar="SNAPSHOT",
+        help=(
+            "Restore the database from a backup snapshot and exit.\n"
+            "  - Stop the server first\n"
+            "  - Defaults to the newest snapshot in backend/data/backups\n"
+            "  - The current database is saved as pre-restore-*.db first"
+        )
+    )
     args = parser.parse_args()
 
     #parse the arguments and do setup
@@ -95,6 +108,32 @@ def main():
         print("\nThen re-run this script (python main.py) to start Scuttle.")
         return
 
+    if args.restore:
+        from pathlib import Path
+
+        import backend.globals as G
+        from backend.core.database.backup import list_snapshots, restore_database
+
+        if args.restore == "latest":
+            snapshots = list_snapshots(G.BACKUP_DIR)
+            if not snapshots:
+                print(f"❌ No snapshots found in {G.BACKUP_DIR}")
+                return
+            snapshot = snapshots[-1]
+        else:
+            snapshot = Path(args.restore)
+            if not snapshot.exists():
+                snapshot = G.BACKUP_DIR / args.restore #bare snapshot name
+            if not snapshot.exists():
+                print(f"❌ Snapshot not found: {args.restore}")
+                return
+
+        saved = restore_database(snapshot, G.DB_FILE)
+        if saved:
+            print(f"💾 Previous database saved to {saved}")
+        print(f"✅ Restored {G.DB_FILE} from {snapshot}")
+        return
+
 
     #------------------------------- Begin main code -------------------------------#
     from dotenv import load_dotenv
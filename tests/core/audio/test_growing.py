@@ -0,0 +1,91 @@
+import asyncio
+import pytest
+from fastapi import HTTPException
+from pathlib import Path
+from backend.core.audio.growing import GrowingFiles
+from backend.core.audio.stream import stream_growing
+from backend.core.events.event_bus import EventBus
+from backend.core.models.event import Event
+from backend.exceptions import DownloadFailedError
+
+from backend.core.models.enums import AudioDatabaseAction as ADA
+
+
+async def body(response) -> bytes:
+    chunks = []
+
+    async def receive():
+        await asyncio.sleep(3600) #client stays connected
+        return {"type": "http.disconnect"}
+
+    async def send(message: dict):
+        chunks.append(message.get("body", b""))
+
+    await response({"type": "http", "asgi": {"spec_version": "2.4"}}, receive, send)
+    return b"".join(chunks)
+
+async def write_slowly(files: GrowingFiles, id: str, final: Path, parts: list, ok: bool = True):
+    growing = files.start(id, final, "audio/mpeg")
+    with open(growing.part_path, "ab") as f:
+        for part in parts:
+            await asyncio.sleep(0.05)
+            f.write(part)
+            f.flush()
+    files.finish(growing, ok)
+
+
+@pytest.mark.asyncio
+async def test_stream_follows_the_writer(tmp_path: Path):
+    files = GrowingFiles()
+    final = tmp_path / "a.mp3"
+    parts = [bytes([i]) * 1000 for i in range(5)]
+
+    writer = asyncio.create_task(write_slowly(files, "a", final, parts))
+    growing = await files.wait_started("a", timeout=1)
+    assert growing is not None and growing.path == growing.part_path
+
+    response = stream_growing(growing, chunk_size=4096, poll=0.01)
+    assert response.headers["accept-ranges"] == "none" and response.headers["content-type"] == "audio/mpeg"
+    assert await body(response) == b"".join(parts)
+    await writer
+
+    #renamed into place, and still served until the download is logged
+    assert final.read_bytes() == b"".join(parts) and not growing.part_path.exists()
+    assert await body(stream_growing(files.get("a"), poll=0.01)) == b"".join(parts)
+    assert await files.wait_started("missing", timeout=0.05) is None
+
+
+@pytest.mark.asyncio
+async def test_failed_download_breaks_the_stream(tmp_path: Path):
+    files = GrowingFiles()
+    writer = asyncio.create_task(write_slowly(files, "a", tmp_path / "a.mp3", [b"x" * 100] * 3, ok=False))
+    growing = await files.wait_started("a", timeout=1)
+    f = growing.open()
+
+    received = []
+    with pytest.raises(DownloadFailedError):
+        async for chunk in growing.tail(f, chunk_size=4096, poll=0.01):
+            received.append(chunk)
+    await writer
+
+    assert b"".join(received) == b"x" * 300 #what was written before the failure
+    assert files.get("a") is None and list(tmp_path.iterdir()) == []
+    with pytest.raises(HTTPException) as e:
+        stream_growing(growing)
+    assert e.value.status_code == 503
+
+
+@pytest.mark.asyncio
+async def test_entries_leave_once_logged(tmp_path: Path):
+    bus = EventBus()
+    files = GrowingFiles(linger=0.05, event_bus=bus, source="db")
+
+    await write_slowly(files, "a", tmp_path / "a.mp3", [b"a"])
+    await write_slowly(files, "b", tmp_path / "b.mp3", [b"b"])
+    files.start("c", tmp_path / "c.mp3", "audio/mpeg") #still downloading
+
+    await bus.publish(Event(source="db", action=ADA.LOG_DOWNLOADS, payload={"content": {"tracks": [{"id": "a"}, {"id": "c"}], "memberships": []}}))
+    assert files.get("a") is None and files.get("b") is not None and files.get("c") is not None
+
+    await asyncio.sleep(0.1) #b never got its row
+    assert files.get("b") is None and len(files) == 1
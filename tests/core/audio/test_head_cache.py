@@ -0,0 +1,126 @@
+import asyncio
+import pytest
+from fastapi import Request
+from pathlib import Path
+from backend.core.audio.file_index import FileIndex
+from backend.core.audio.head_cache import HeadCache
+from backend.core.audio.stream import stream_audio
+from backend.core.events.event_bus import EventBus
+from backend.core.lib.metrics import MetricsRegistry
+from backend.core.models.event import Event
+
+from backend.core.models.enums import AudioDatabaseAction as ADA
+from backend.core.models.enums import PlayQueueAction as PQA
+
+
+DATA = bytes(range(256)) * 40
+
+
+def request(range: str = None) -> Request:
+    headers = [(b"range", range.encode())] if range else []
+    return Request({"type": "http", "method": "GET", "path": "/audio/stream/a", "headers": headers})
+
+async def body(response) -> bytes:
+    chunks = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict):
+        chunks.append(message.get("body", b""))
+
+    await response({"type": "http", "asgi": {"spec_version": "2.4"}}, receive, send)
+    return b"".join(chunks)
+
+async def settle(cache: HeadCache):
+    while cache._loading:
+        await asyncio.sleep(0.01)
+
+def counter(metrics: MetricsRegistry, name: str, **labels) -> float:
+    series = metrics.snapshot()["counters"].get(name, [])
+    return sum(s["value"] for s in series if s["labels"] == labels)
+
+
+@pytest.fixture
+def bus() -> EventBus:
+    return EventBus()
+
+@pytest.fixture
+def index(tmp_path: Path, bus: EventBus) -> FileIndex:
+    for id in ("a", "b", "c"):
+        (tmp_path / f"{id}.mp3").write_bytes(DATA)
+    return FileIndex(base_dir=tmp_path, audio_format="mp3", event_bus=bus, source="db", ttl=3600)
+
+
+@pytest.mark.asyncio
+async def test_hit_is_served_from_memory(index: FileIndex):
+    metrics = MetricsRegistry()
+    cache = HeadCache(file_index=index, head_bytes=1024, max_bytes=10_000, metrics=metrics)
+
+    #first play misses and fills the cache in the background
+    first = stream_audio(request("bytes=0-99"), "a", False, file_index=index, head_cache=cache)
+    assert await body(first) == DATA[:100]
+    await settle(cache)
+    assert len(cache) == 1 and cache.size == 1024
+
+    #with the file gone, a range inside the head still comes back whole
+    index.get("a").path.unlink()
+    hit = stream_audio(request("bytes=0-99"), "a", False, file_index=index, head_cache=cache)
+    assert hit.status_code == 206 and await body(hit) == DATA[:100]
+
+    assert counter(metrics, "head_cache_requests_total", result="miss") == 1
+    assert counter(metrics, "head_cache_requests_total", result="hit") == 1
+    assert counter(metrics, "head_cache_loads_total") == 1
+
+
+@pytest.mark.asyncio
+async def test_range_past_the_head_reads_the_rest(index: FileIndex):
+    cache = HeadCache(file_index=index, head_bytes=1024, max_bytes=10_000)
+    await cache.schedule(["a"])
+
+    response = stream_audio(request("bytes=1000-2999"), "a", False, file_index=index, head_cache=cache)
+    assert response.segments == [DATA[1000:1024], (1024, 1976)]
+    assert await body(response) == DATA[1000:3000]
+
+    full = stream_audio(request(), "a", False, file_index=index, head_cache=cache)
+    assert full.status_code == 200 and await body(full) == DATA
+
+
+@pytest.mark.asyncio
+async def test_lru_is_bounded_by_bytes(index: FileIndex):
+    metrics = MetricsRegistry()
+    cache = HeadCache(file_index=index, head_bytes=1000, max_bytes=2500, metrics=metrics)
+
+    await cache.schedule(["a", "b"])
+    assert cache.get("a", index.get("a")) is not None #a is now the most recent
+    await cache.schedule(["c"])
+
+    assert cache.size == 2000 and cache.size <= cache.max_bytes
+    assert set(cache._entries) == {"a", "c"}
+    assert counter(metrics, "head_cache_evictions_total") == 1
+
+
+@pytest.mark.asyncio
+async def test_invalidation(tmp_path: Path, index: FileIndex, bus: EventBus):
+    cache = HeadCache(file_index=index, head_bytes=100, max_bytes=10_000, event_bus=bus, db_source="db")
+    await cache.schedule(["a", "b", "c"])
+
+    #a file index entry with a different etag no longer matches the cached head
+    (tmp_path / "a.mp3").write_bytes(b"replaced")
+    index.invalidate(["a"])
+    assert cache.get("a", index.get("a")) is None
+    assert "a" not in cache._entries
+
+    await bus.publish(Event(source="db", action=ADA.UNLOG_DOWNLOAD, payload={"content": {"id": "b"}}))
+    await bus.publish(Event(source="db", action=ADA.LOG_DOWNLOADS, payload={"content": {"tracks": [{"id": "c"}], "memberships": []}}))
+    assert len(cache) == 0 and cache.size == 0
+
+
+@pytest.mark.asyncio
+async def test_play_queue_prewarms(index: FileIndex, bus: EventBus):
+    cache = HeadCache(file_index=index, head_bytes=100, max_bytes=10_000, prewarm=2, event_bus=bus, queue_source="pq")
+
+    await bus.publish(Event(source="pq", action=PQA.SET_ALL, payload={"ids": ["a", "b", "c"], "content": ["a", "b", "c"]}))
+    await settle(cache)
+    assert set(cache._entries) == {"a", "b"}
+
@@ -0,0 +1,125 @@
+import asyncio
+import pytest
+from fastapi import Request
+from pathlib import Path
+from typing import List, Tuple
+from backend.core.audio.file_index import FileIndex
+from backend.core.audio.seek_index import SeekIndex, SeekIndexer, build_seek_index
+from backend.core.audio.stream import stream_audio
+from backend.core.events.event_bus import EventBus
+from backend.core.lib.metrics import MetricsRegistry
+from backend.core.models.event import Event
+
+from backend.core.models.enums import AudioDatabaseAction as ADA
+
+
+#mpeg1 layer III, 44.1kHz stereo: 128kbps frames are 417 bytes, 320kbps ones 1044
+FRAME_128 = b"\xff\xfb\x90\x00" + bytes(413)
+FRAME_320 = b"\xff\xfb\xe0\x00" + bytes(1040)
+XING = b"\xff\xfb\x90\x00" + bytes(32) + b"Xing" + bytes(377)
+ID3 = b"ID3\x04\x00\x00\x00\x00\x00\x14" + bytes(20)
+FRAME_MS = 1152 * 1000 / 44100
+
+
+def vbr_mp3(frames: int = 100) -> Tuple[bytes, List[int]]:
+    """A tagged vbr file and the offset of each audio frame."""
+    data = bytearray(ID3 + XING)
+    starts = []
+    for i in range(frames):
+        starts.append(len(data))
+        data += FRAME_320 if i % 3 == 0 else FRAME_128
+    return bytes(data), starts
+
+def request() -> Request:
+    return Request({"type": "http", "method": "GET", "path": "/audio/stream/a", "headers": []})
+
+def counter(metrics: MetricsRegistry, name: str, **labels) -> float:
+    series = metrics.snapshot()["counters"].get(name, [])
+    return sum(s["value"] for s in series if s["labels"] == labels)
+
+async def settle(indexer: SeekIndexer):
+    while indexer._jobs:
+        await asyncio.sleep(0.01)
+
+
+@pytest.fixture
+def bus() -> EventBus:
+    return EventBus()
+
+@pytest.fixture
+def index(tmp_path: Path, bus: EventBus) -> FileIndex:
+    (tmp_path / "a.mp3").write_bytes(vbr_mp3()[0])
+    (tmp_path / "b.opus").write_bytes(b"OggS" + bytes(100))
+    index = FileIndex(base_dir=tmp_path, audio_format="mp3", event_bus=bus, source="db", ttl=3600)
+    index.load({"a": ("mp3", None, None), "b": ("opus", None, None)})
+    return index
+
+
+def test_build_and_lookup():
+    data, starts = vbr_mp3()
+    index = build_seek_index(data, interval_ms=200, source_size=len(data), source_mtime_ns=1)
+
+    assert index.duration_ms == int(100 * FRAME_MS)
+    assert index.offsets[0] == starts[0] and index.times_ms[0] == 0 #tag and xing frame skipped
+    for seconds in (0.0, 0.5, 1.0, 1.234, 2.5, 60.0):
+        time, offset = index.lookup(seconds)
+        frame = starts.index(offset)
+        assert time == int(frame * FRAME_MS) / 1000
+        assert time <= seconds and (seconds >= 2.6 or seconds - time < 0.2 + FRAME_MS / 1000)
+
+    assert SeekIndex.from_bytes(index.to_bytes()) == index
+    assert SeekIndex.from_bytes(index.to_bytes()[:-1]) is None
+    assert build_seek_index(b"OggS" + bytes(100), interval_ms=200, source_size=104, source_mtime_ns=1) is None
+
+
+def test_resyncs_over_junk():
+    data, starts = vbr_mp3(10)
+    junk = data[:starts[5]] + b"junk\xff\x00" + data[starts[5]:]
+    index = build_seek_index(junk, interval_ms=1, source_size=len(junk), source_mtime_ns=1)
+    assert len(index.offsets) == 10 and index.offsets[5] == starts[5] + 6
+
+
+@pytest.mark.asyncio
+async def test_indexer_persists_and_rebuilds_stale(tmp_path: Path, index: FileIndex):
+    metrics = MetricsRegistry()
+    indexer = SeekIndexer(file_index=index, interval_ms=200, metrics=metrics)
+
+    first = await indexer.get("a")
+    assert indexer.path("a").exists() and await indexer.get("a") is first
+    assert await indexer.get("b") is None and await indexer.get("missing") is None
+
+    #a restart reads the file instead of parsing the mp3 again
+    restarted = SeekIndexer(file_index=index, interval_ms=200, metrics=metrics)
+    assert await restarted.get("a") == first
+    assert counter(metrics, "seek_index_builds_total") == 1
+
+    (tmp_path / "a.mp3").write_bytes(vbr_mp3(50)[0])
+    index.invalidate(["a"])
+    rebuilt = await restarted.get("a")
+    assert rebuilt.duration_ms == int(50 * FRAME_MS) and rebuilt.matches(index.get("a"))
+    assert counter(metrics, "seek_index_builds_total") == 2
+
+
+@pytest.mark.asyncio
+async def test_events(index: FileIndex, bus: EventBus):
+    indexer = SeekIndexer(file_index=index, event_bus=bus, source="db")
+
+    await bus.publish(Event(source="db", action=ADA.LOG_DOWNLOADS, payload={"content": {"tracks": [{"id": "a"}, {"id": "b"}], "memberships": []}}))
+    await settle(indexer)
+    assert indexer.path("a").exists() and not indexer.path("b").exists()
+
+    await bus.publish(Event(source="db", action=ADA.UNLOG_DOWNLOAD, payload={"content": {"id": "a"}}))
+    assert not indexer.path("a").exists() and "a" not in indexer._cache
+
+
+@pytest.mark.asyncio
+async def test_stream_from_offset(index: FileIndex):
+    indexer = SeekIndexer(file_index=index)
+    time, offset = await indexer.lookup("a", 1.0)
+    size = index.get("a").size
+
+    #a 206 from the frame start to the end of the file
+    response = stream_audio(request(), "a", False, file_index=index, start_at=offset)
+    assert response.status_code == 206
+    assert response.headers["content-range"] == f"bytes {offset}-{size - 1}/{size}"
+    assert 0 < time <= 1.0
@@ -0,0 +1,59 @@
+import pytest
+from pathlib import Path
+from backend.core.audio.sendfile import PATHSEND, ZEROCOPYSEND, FileRangeResponse
+
+
+def scope(*extensions: str) -> dict:
+    return {
+        "type": "http",
+        "asgi": {"spec_version": "2.4"},
+        "extensions": {extension: {} for extension in extensions}
+    }
+
+async def call(response: FileRangeResponse, scope: dict) -> list:
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict):
+        if message["type"] == ZEROCOPYSEND:
+            #what a server does with it, minus the socket
+            file = message["file"]
+            file.seek(message["offset"])
+            message = {**message, "data": file.read(message["count"])}
+        messages.append(message)
+
+    await response(scope, receive, send)
+    return messages
+
+def response(path: Path, start: int, length: int) -> FileRangeResponse:
+    return FileRangeResponse(path, start=start, length=length, file_size=path.stat().st_size, status_code=206)
+
+
+@pytest.mark.asyncio
+async def test_fallback_streams_the_range(tmp_path: Path):
+    path = tmp_path / "a.mp3"
+    path.write_bytes(bytes(range(256)) * 10)
+
+    messages = await call(response(path, 10, 300), scope())
+    assert messages[0]["status"] == 206
+    assert b"".join(m.get("body", b"") for m in messages[1:]) == path.read_bytes()[10:310]
+
+
+@pytest.mark.asyncio
+async def test_zero_copy_extensions(tmp_path: Path):
+    path = tmp_path / "a.mp3"
+    path.write_bytes(bytes(range(256)) * 10)
+
+    #ranges go through zerocopysend when the server has it
+    messages = await call(response(path, 10, 300), scope(ZEROCOPYSEND, PATHSEND))
+    assert [m["type"] for m in messages] == ["http.response.start", ZEROCOPYSEND]
+    assert messages[1]["data"] == path.read_bytes()[10:310]
+    assert messages[1]["file"].closed
+
+    #pathsend can only send whole files
+    messages = await call(response(path, 0, 2560), scope(PATHSEND))
+    assert messages[1] == {"type": PATHSEND, "path": str(path)}
+    messages = await call(response(path, 10, 300), scope(PATHSEND))
+    assert messages[1]["type"] == "http.response.body"
@@ -0,0 +1,187 @@
+import os
+import pytest
+from fastapi import HTTPException, Request
+from pathlib import Path
+from backend.core.audio.file_index import FileIndex, FileInfo
+from backend.core.audio.ranges import parse_range
+from backend.core.audio.stream import stream_audio
+from backend.core.events.event_bus import EventBus
+from backend.core.models.event import Event
+from backend.exceptions import InvalidRangeError, RangeNotSatisfiableError
+
+from backend.core.models.enums import AudioDatabaseAction as ADA
+
+
+DATA = bytes(range(256)) * 40
+
+
+def request(**headers: str) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/audio/stream/a",
+        "headers": [(k.replace("_", "-").lower().encode(), v.encode()) for k, v in headers.items()],
+        "asgi": {"spec_version": "2.4"},
+    })
+
+async def body(response) -> bytes:
+    chunks = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict):
+        chunks.append(message.get("body", b""))
+
+    await response({"type": "http", "asgi": {"spec_version": "2.4"}}, receive, send)
+    return b"".join(chunks)
+
+@pytest.fixture
+def index(tmp_path: Path) -> FileIndex:
+    (tmp_path / "a.mp3").write_bytes(DATA)
+    return FileIndex(base_dir=tmp_path, audio_format="mp3")
+
+
+def test_parse_range():
+    assert parse_range("bytes=0-99", 1000, 16) == [(0, 99)]
+    assert parse_range("bytes=900-", 1000, 16) == [(900, 999)]
+    assert parse_range("bytes=-100", 1000, 16) == [(900, 999)]
+    assert parse_range("bytes=500-5000", 1000, 16) == [(500, 999)]
+    #sorted, overlapping and adjacent ranges merged, unsatisfiable ones dropped
+    assert parse_range("bytes=500-599, 0-9, 10-19, 550-700, 2000-", 1000, 16) == [(0, 19), (500, 700)]
+    assert parse_range("items=0-1", 1000, 16) is None
+
+    for header in ("bytes=", "bytes=abc", "bytes=5-1", "bytes=0-1,2-3,4-5"):
+        with pytest.raises(InvalidRangeError):
+            parse_range(header, 1000, 2)
+    with pytest.raises(RangeNotSatisfiableError):
+        parse_range("bytes=1000-", 1000, 16)
+
+
+@pytest.mark.asyncio
+async def test_conditional_requests(index: FileIndex):
+    full = stream_audio(request(), "a", False, file_index=index)
+    etag, last_modified = full.headers["etag"], full.headers["last-modified"]
+    assert full.status_code == 200 and await body(full) == DATA
+
+    assert stream_audio(request(if_none_match=etag), "a", False, file_index=index).status_code == 304
+    assert stream_audio(request(if_none_match=f'"x", W/{etag}'), "a", False, file_index=index).status_code == 304
+    assert stream_audio(request(if_modified_since=last_modified), "a", False, file_index=index).status_code == 304
+    #If-None-Match wins over a matching date
+    assert stream_audio(request(if_none_match='"x"', if_modified_since=last_modified), "a", False, file_index=index).status_code == 200
+
+    #If-Range: a current validator keeps the range, a stale one gets the whole file
+    partial = stream_audio(request(range="bytes=10-19", if_range=etag), "a", False, file_index=index)
+    assert partial.status_code == 206 and await body(partial) == DATA[10:20]
+    stale = stream_audio(request(range="bytes=10-19", if_range='"old"'), "a", False, file_index=index)
+    assert stale.status_code == 200 and stale.headers["content-length"] == str(len(DATA))
+    weak = stream_audio(request(range="bytes=10-19", if_range=f"W/{etag}"), "a", False, file_index=index)
+    assert weak.status_code == 200
+
+    with pytest.raises(HTTPException) as e:
+        stream_audio(request(range=f"bytes={len(DATA)}-"), "a", False, file_index=index)
+    assert e.value.status_code == 416 and e.value.headers["Content-Range"] == f"bytes */{len(DATA)}"
+
+
+@pytest.mark.asyncio
+async def test_multipart_byteranges(index: FileIndex):
+    response = stream_audio(request(range="bytes=0-9,100-109,-5"), "a", False, file_index=index)
+    assert response.status_code == 206
+
+    content_type = response.headers["content-type"]
+    assert content_type.startswith("multipart/byteranges; boundary=")
+    boundary = content_type.split("boundary=")[1].encode()
+
+    raw = await body(response)
+    assert len(raw) == int(response.headers["content-length"])
+
+    parts = raw.split(b"--" + boundary)
+    assert parts[0] == b"" and parts[-1] == b"--\r\n"
+    payloads = []
+    for part in parts[1:-1]:
+        head, _, data = part.partition(b"\r\n\r\n")
+        assert b"Content-Type: audio/mpeg" in head
+        payloads.append((head.split(b"Content-Range: ")[1], data.removesuffix(b"\r\n")))
+
+    total = len(DATA)
+    assert payloads == [
+        (f"bytes 0-9/{total}".encode(), DATA[0:10]),
+        (f"bytes 100-109/{total}".encode(), DATA[100:110]),
+        (f"bytes {total - 5}-{total - 1}/{total}".encode(), DATA[-5:]),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_file_index_caches_and_follows_events(tmp_path: Path):
+    bus = EventBus()
+    index = FileIndex(base_dir=tmp_path, audio_format="mp3", event_bus=bus, source="db", ttl=3600)
+    path = tmp_path / "a.mp3"
+
+    assert index.get("a") is None
+    path.write_bytes(b"one")
+    first = index.get("a")
+    assert first.size == 3
+
+    #replaced behind the server's back, the cached entry holds until an event or the ttl
+    path.write_bytes(b"longer")
+    os.utime(path, ns=(first.mtime_ns + 10**9, first.mtime_ns + 10**9))
+    assert index.get("a") == first
+
+    await bus.publish(Event(source="db", action=ADA.LOG_DOWNLOADS, payload={"content": {"tracks": [{"id": "a"}], "memberships": []}}))
+    second = index.get("a")
+    assert second.size == 6 and second.etag != first.etag
+
+    path.unlink()
+    await bus.publish(Event(source="db", action=ADA.UNLOG_DOWNLOAD, payload={"content": {"id": "a"}}))
+    assert index.get("a") is None
+
+
+@pytest.mark.asyncio
+async def test_loaded_file_index_never_stats(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    bus = EventBus()
+    index = FileIndex(base_dir=tmp_path, audio_format="mp3", event_bus=bus, source="db", ttl=None)
+    index.load({"a": ("mp3", 100, 5), "b": ("opus", 200, 6), "legacy": ("mp3", None, None)})
+    (tmp_path / "legacy.mp3").write_bytes(DATA)
+    (tmp_path / "stray.mp3").write_bytes(DATA) #on disk but not a download
+
+    stats = []
+    real_stat = os.stat
+    monkeypatch.setattr(os, "stat", lambda *args, **kwargs: stats.append(args[0]) or real_stat(*args, **kwargs))
+
+    assert index.get("a") == FileInfo(path=tmp_path / "a.mp3", size=100, mtime_ns=5)
+    assert index.get("b").media_type == "audio/ogg" and index.get("b").size == 200
+    assert not index.is_downloaded("stray") and index.get("stray") is None
+    assert stats == []
+
+    #recorded before stats were, stat()ed once
+    assert index.get("legacy").size == len(DATA) and index.get("legacy").size == len(DATA)
+    assert len(stats) == 1
+
+    await bus.publish(Event(source="db", action=ADA.LOG_DOWNLOADS, payload={"content": {
+        "tracks": [{"id": "c"}, {"id": "a"}], "memberships": [], "formats": {"c": "m4a", "a": "mp3"}, "stats": {"c": [300, 8], "a": [101, 9]}
+    }}))
+    assert index.is_downloaded("c") and index.get("c").size == 300 and index.get("a").mtime_ns == 9
+    await bus.publish(Event(source="db", action=ADA.LOG_DOWNLOAD, payload={"content": {"id": "d"}, "format": "opus", "stats": [400, 10]}))
+    assert index.get("d") == FileInfo(path=tmp_path / "d.opus", size=400, mtime_ns=10, media_type="audio/ogg")
+    await bus.publish(Event(source="db", action=ADA.UNLOG_DOWNLOAD, payload={"content": {"id": "b"}}))
+    index.mark_missing(["c"])
+    assert not index.is_downloaded("b") and index.get("b") is None and not index.is_downloaded("c")
+    assert len(stats) == 1
+
+
+@pytest.mark.asyncio
+async def test_native_containers(tmp_path: Path):
+    bus = EventBus()
+    index = FileIndex(base_dir=tmp_path, audio_format="mp3", event_bus=bus, source="db")
+    index.load({"a": ("mp3", None, None), "b": ("opus", None, None)})
+    (tmp_path / "a.mp3").write_bytes(DATA)
+    (tmp_path / "b.opus").write_bytes(DATA)
+    (tmp_path / "c.m4a").write_bytes(DATA)
+
+    assert stream_audio(request(), "a", False, file_index=index).headers["content-type"] == "audio/mpeg"
+    assert stream_audio(request(), "b", False, file_index=index).headers["content-type"] == "audio/ogg"
+    assert not index.is_downloaded("c")
+
+    await bus.publish(Event(source="db", action=ADA.LOG_DOWNLOADS, payload={"content": {"tracks": [{"id": "c"}], "memberships": [], "formats": {"c": "m4a"}}}))
+    response = stream_audio(request(range="bytes=0-9"), "c", False, file_index=index)
+    assert response.headers["content-type"] == "audio/mp4" and await body(response) == DATA[:10]
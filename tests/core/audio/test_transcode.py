@@ -0,0 +1,163 @@
+import asyncio
+import pytest
+import sys
+from fastapi import HTTPException, Request
+from pathlib import Path
+from backend.core.audio.file_index import FileIndex
+from backend.core.audio.stream import stream_audio_tier
+from backend.core.audio.throughput import ThroughputEstimator
+from backend.core.audio.transcode import Transcoder, parse_tiers
+from backend.core.events.event_bus import EventBus
+from backend.core.models.event import Event
+from backend.exceptions import TranscodeFailedError
+
+from backend.core.models.enums import AudioDatabaseAction as ADA
+
+
+DATA = bytes(range(256)) * 40
+
+#stands in for ffmpeg: logs each run, writes kbps * 10 bytes of the input, fails on inputs starting with "bad"
+FAKE_FFMPEG = f"""#!{sys.executable}
+import sys, time
+args = sys.argv[1:]
+src, dst = args[args.index("-i") + 1], args[-1]
+kbps = int(args[args.index("-b:a") + 1].rstrip("k"))
+with open(__file__ + ".log", "a") as log:
+    log.write(dst + "\\n")
+data = open(src, "rb").read()
+if data.startswith(b"bad"):
+    sys.stderr.write("invalid data")
+    sys.exit(1)
+time.sleep(0.1)
+open(dst, "wb").write(data[:kbps * 10])
+"""
+
+
+def request(**headers: str) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/audio/stream/a",
+        "headers": [(k.replace("_", "-").lower().encode(), v.encode()) for k, v in headers.items()],
+        "client": ("10.0.0.1", 5000),
+    })
+
+@pytest.fixture
+def ffmpeg(tmp_path: Path) -> Path:
+    path = tmp_path / "ffmpeg"
+    path.write_text(FAKE_FFMPEG)
+    path.chmod(0o755)
+    return path
+
+def runs(ffmpeg: Path) -> int:
+    log = Path(str(ffmpeg) + ".log")
+    return len(log.read_text().splitlines()) if log.exists() else 0
+
+@pytest.fixture
+def bus() -> EventBus:
+    return EventBus()
+
+@pytest.fixture
+def transcoder(tmp_path: Path, ffmpeg: Path, bus: EventBus) -> Transcoder:
+    downloads = tmp_path / "downloads"
+    downloads.mkdir()
+    for id in ("a", "b", "c"):
+        (downloads / f"{id}.mp3").write_bytes(DATA)
+
+    index = FileIndex(base_dir=downloads, audio_format="mp3", event_bus=bus, source="db", ttl=3600)
+    return Transcoder(
+        cache_dir=tmp_path / "transcodes",
+        tiers=parse_tiers({"low": ("aac", 64), "medium": ("opus", 128)}),
+        file_index=index,
+        max_bytes=2000,
+        ffmpeg=str(ffmpeg),
+        event_bus=bus,
+        source="db"
+    )
+
+
+@pytest.mark.asyncio
+async def test_waiters_share_one_transcode(transcoder: Transcoder, ffmpeg: Path):
+    infos = await asyncio.gather(*(transcoder.ensure("a", "low") for _ in range(5)))
+    assert runs(ffmpeg) == 1
+    assert len({info.path for info in infos}) == 1
+    assert infos[0].path.name == "a.low.m4a" and infos[0].path.read_bytes() == DATA[:640]
+
+    #cached now, and picked up again after a restart
+    assert await transcoder.ensure("a", "low") == infos[0]
+    assert runs(ffmpeg) == 1
+
+    restarted = Transcoder(cache_dir=transcoder.cache_dir, tiers=transcoder.tiers, file_index=transcoder.file_index, max_bytes=2000)
+    await restarted.load()
+    assert restarted.get("a", "low") == infos[0]
+
+
+@pytest.mark.asyncio
+async def test_cache_is_bounded_and_follows_events(transcoder: Transcoder, bus: EventBus):
+    a = await transcoder.ensure("a", "low")
+    b = await transcoder.ensure("b", "low")
+    c = await transcoder.ensure("c", "low") #640 bytes each, 2000 byte cap
+
+    transcoder.get("a", "low")
+    await transcoder.ensure("b", "medium") #1280 bytes, evicts b and c, a was just used
+    assert transcoder.size <= transcoder.max_bytes
+    assert transcoder.get("b", "low") is None and not b.path.exists() and not c.path.exists()
+    assert transcoder.get("a", "low") == a
+
+    await bus.publish(Event(source="db", action=ADA.LOG_DOWNLOAD, payload={"content": {"id": "a"}}))
+    assert transcoder.get("a", "low") is None and not a.path.exists()
+
+
+@pytest.mark.asyncio
+async def test_failures(transcoder: Transcoder):
+    with pytest.raises(TranscodeFailedError):
+        await transcoder.ensure("missing", "low")
+
+    transcoder.file_index.path("b").write_bytes(b"bad" + DATA)
+    transcoder.file_index.invalidate(["b"])
+    with pytest.raises(TranscodeFailedError, match="invalid data"):
+        await transcoder.ensure("b", "low")
+    assert list(transcoder.cache_dir.iterdir()) == []
+
+
+@pytest.mark.asyncio
+async def test_stream_tiers(transcoder: Transcoder):
+    throughput = ThroughputEstimator(min_bytes=1000, headroom=1.5)
+    args = dict(full=False, transcoder=transcoder, throughput=throughput, file_index=transcoder.file_index)
+
+    original = await stream_audio_tier(request(), "a", None, **args)
+    assert original.headers["x-audio-quality"] == "original" and original.headers["content-type"] == "audio/mpeg"
+
+    low = await stream_audio_tier(request(range="bytes=0-99"), "a", "low", **args)
+    assert low.status_code == 206 and low.headers["content-type"] == "audio/mp4"
+    assert low.headers["content-range"] == "bytes 0-99/640"
+
+    with pytest.raises(HTTPException) as e:
+        await stream_audio_tier(request(), "a", "ultra", **args)
+    assert e.value.status_code == 400
+
+    #auto: original until measured, then the best tier the link carries with headroom
+    assert (await stream_audio_tier(request(), "a", "auto", **args)).headers["x-audio-quality"] == "original"
+    throughput.record("10.0.0.1", 18_750, 1.0) #150kbps, medium needs 192
+    assert (await stream_audio_tier(request(), "a", "auto", **args)).headers["x-audio-quality"] == "low"
+    throughput.record("203.0.113.9", 1_000_000, 1.0)
+    tunneled = await stream_audio_tier(request(cf_connecting_ip="203.0.113.9"), "a", "auto", **args)
+    assert tunneled.headers["x-audio-quality"] == "original"
+
+
+def test_throughput_ewma():
+    estimator = ThroughputEstimator(alpha=0.5, min_bytes=1000, headroom=1.0, max_clients=2)
+    estimator.record("x", 500, 1.0) #too small to count
+    assert estimator.estimate("x") is None
+
+    estimator.record("x", 100_000, 1.0)
+    estimator.record("x", 50_000, 1.0)
+    assert estimator.estimate("x") == pytest.approx(600)
+
+    tiers = [("low", 64), ("medium", 128)]
+    assert estimator.choose("x", tiers, original_kbps=256) is None
+    estimator.record("y", 12_500, 1.0) #100kbps
+    assert estimator.choose("y", tiers, original_kbps=256) == "low"
+    estimator.record("z", 1_000, 1.0) #8kbps, below every tier
+    assert estimator.choose("z", tiers, original_kbps=256) == "low"
+    assert estimator.estimate("x") is None #least recently seen client dropped
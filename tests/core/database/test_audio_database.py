@@ -0,0 +1,271 @@
+import asyncio
+import pytest
+from pathlib import Path
+from backend.core.database.audio_database import AudioDatabase
+from backend.core.database.library_cache import LibraryCache
+from backend.core.database.storage import AudioStorage
+from backend.core.events.event_bus import EventBus
+from backend.core.models.track import Track
+from backend.exceptions import InvalidCursorError
+
+from backend.core.models.enums import AudioDatabaseAction as ADA
+
+
+@pytest.mark.asyncio
+async def test_wal_mode_pragmas(make_db):
+    db = await make_db(wal=True, reader_pool_size=2, cache_size_kb=4096, mmap_size=1024 * 1024)
+
+    assert db._conn.execute("PRAGMA journal_mode;").fetchone()[0] == "wal", "Writer is not in WAL mode"
+    assert db._readers.size == 2, "Reader pool has the wrong size"
+
+    pragmas = await db._readers.run(lambda conn: (
+        conn.execute("PRAGMA cache_size;").fetchone()[0],
+        conn.execute("PRAGMA query_only;").fetchone()[0]
+    ))
+    assert pragmas[0] == -4096, "cache_size not applied to readers"
+    assert pragmas[1] == 1, "Reader connection is writable"
+
+
+@pytest.mark.asyncio
+async def test_wal_reads_do_not_wait_on_write_lock(make_db, add_download):
+    db = await make_db(wal=True)
+    await add_download(db, "a")
+
+    #hold the write lock as a stalled writer would, reads must still complete
+    async with db._lock:
+        assert await asyncio.wait_for(db.is_downloaded("a"), timeout=2), "Read blocked on write lock"
+        content = await asyncio.wait_for(db.get_downloads_content(), timeout=2)
+
+    assert [track["id"] for track in content] == ["a"]
+
+
+@pytest.mark.asyncio
+async def test_downloads_roundtrip(db: AudioStorage, add_download):
+    await add_download(db, "a", title="First")
+    await add_download(db, "b", title="Second")
+
+    assert await db.is_downloaded("a")
+    assert not await db.is_downloaded("missing")
+
+    await db.unlog_download("a")
+    content = await db.get_downloads_content()
+
+    assert [track["id"] for track in content] == ["b"], "Unlogged download still listed"
+
+
+@pytest.mark.asyncio
+async def test_search_prefix_and_rank(db: AudioStorage, add_download):
+    await add_download(db, "a", title="Yesterday", artist="The Beatles")
+    await add_download(db, "b", title="Beat It", artist="Michael Jackson")
+    await add_download(db, "c", title="Roads", artist="Portishead")
+
+    results = await db.search("beat")
+    assert [track["id"] for track in results] == ["b", "a"], "Title match should outrank artist match"
+
+    results = await db.search("beatles yest")
+    assert [track["id"] for track in results] == ["a"]
+
+
+@pytest.mark.asyncio
+async def test_search_index_follows_metadata(db: AudioStorage, add_download):
+    await add_download(db, "a", title="Track 01", artist="Unknown")
+
+    await db.set_custom_metadata("a", "Karma Police", "Radiohead")
+    assert [track["id"] for track in await db.search("karma")] == ["a"]
+    assert [track["id"] for track in await db.search("track 01")] == ["a"], "Original title should stay searchable"
+
+    #relogging resets custom metadata without dropping the download
+    await db.log_track(Track(id="a", title="Track 01", artist="Unknown", duration=200))
+    assert await db.search("karma") == []
+    assert await db.is_downloaded("a"), "log_track cascaded into downloads"
+
+    await db.unlog_track("a")
+    assert await db.search("track") == []
+
+
+@pytest.mark.asyncio
+async def test_search_like_fallback(make_db, add_download):
+    db = await make_db()
+    await add_download(db, "a", title="Yesterday", artist="The Beatles")
+    assert db._fts, "FTS5 index was not built"
+    db._fts = False
+
+    assert [track["id"] for track in await db.search("eatl")] == ["a"], "Substring fallback failed"
+
+    #pages of the fallback are keyed by title, still covering every match once
+    await db.ingest_many([Track(id=f"t{i:02}", title=f"Song {i % 7}", artist="Artist", duration=100) for i in range(23)])
+    like = await collect_pages(lambda limit, cursor: db.search_page("ong", limit, cursor), 4)
+    assert sorted(track["id"] for track in like) == [f"t{i:02}" for i in range(23)]
+
+
+@pytest.mark.asyncio
+async def test_ingest_many_single_event(db: AudioStorage, bus: EventBus):
+    events = []
+    for action in (ADA.LOG_TRACK, ADA.LOG_DOWNLOAD, ADA.LOG_DOWNLOADS, ADA.UPDATE_PLAYLISTS):
+        bus.subscribe("test", action, events.append)
+
+    playlist = await db.create_playlist(name="Import", temp_id="tmp")
+
+    tracks = [Track(id=f"t{i}", title=f"Song {i}", artist="Artist", duration=100) for i in range(50)]
+    content = await db.ingest_many(tracks, memberships=[(track.id, playlist["id"]) for track in tracks])
+
+    assert [track["id"] for track in content] == [track.id for track in tracks]
+    assert [event.action for event in events] == [ADA.LOG_DOWNLOADS], "Expected one aggregated event"
+    assert len(events[0].payload["content"]["memberships"]) == 50
+
+    playlist_content = await db.get_playlist_content(playlist["id"])
+    assert len(playlist_content["trackIds"]) == 50
+
+
+@pytest.mark.asyncio
+async def test_log_downloads_many_is_atomic(db: AudioStorage):
+    await db.log_tracks_many([Track(id="a", title="A", artist="X", duration=1)])
+
+    with pytest.raises(Exception):
+        await db.log_downloads_many(["a", "not_logged"]) #foreign key failure on the second id
+
+    assert not await db.is_downloaded("a"), "Partial batch was committed"
+    assert [track["id"] for track in await db.log_downloads_many(["a"])] == ["a"]
+
+
+@pytest.mark.asyncio
+async def test_apply_track_edits_single_transaction(db: AudioStorage, bus: EventBus):
+    events = []
+    for action in (ADA.UPDATE_PLAYLISTS, ADA.SET_METADATA, ADA.EDIT_TRACKS):
+        bus.subscribe("test", action, events.append)
+
+    first = await db.create_playlist(name="First", temp_id="tmp1")
+    second = await db.create_playlist(name="Second", temp_id="tmp2")
+    await db.ingest_many(
+        [Track(id=id, title=id.upper(), artist="Artist", duration=1) for id in ("a", "b")],
+        memberships=[("a", first["id"])]
+    )
+
+    content = await db.apply_track_edits(
+        add=[("a", second["id"]), ("b", first["id"])],
+        remove=[("a", first["id"])],
+        metadata=[{"id": "a", "title": "Renamed", "artist": ""}]
+    )
+
+    assert [event.action for event in events] == [ADA.EDIT_TRACKS], "Expected one combined event"
+    assert content["metadata"] == [{"id": "a", "title": "Renamed", "artist": "Artist"}]
+    assert (await db.get_playlist_content(first["id"]))["trackIds"] == ["b"]
+    assert (await db.get_playlist_content(second["id"]))["trackIds"] == ["a"]
+
+    #a bad pair rolls back the metadata edit made in the same call
+    with pytest.raises(Exception):
+        await db.apply_track_edits(
+            add=[("not_downloaded", first["id"])],
+            metadata=[{"id": "b", "title": "Lost", "artist": None}]
+        )
+    assert (await db.search("lost")) == [], "Partial edit was committed"
+
+
+@pytest.mark.asyncio
+async def test_group_commit_batches_and_isolates_failures(make_db):
+    db = await make_db(wal=True, group_commit=True, group_commit_delay_ms=20)
+    tracks = [Track(id=f"t{i}", title=f"Song {i}", artist="Artist", duration=100) for i in range(20)]
+    await db.ingest_many(tracks)
+
+    queue = db._write_queue
+    batches_before = queue.batches_committed
+
+    results = await asyncio.gather(
+        *(db.toggle_like(track.id) for track in tracks),
+        db.log_download("not_logged"), #fails on the foreign key, must not sink the others
+        return_exceptions=True
+    )
+
+    assert all(result is None for result in results[:-1])
+    assert isinstance(results[-1], Exception)
+    assert queue.batches_committed - batches_before <= 2, "Concurrent writes were not grouped"
+    assert len(await db.fetch_liked_tracks()) == 20, "Likes were not durable when futures resolved"
+
+
+@pytest.mark.asyncio
+async def test_group_commit_close_commits_queued_writes(make_db):
+    db = await make_db(wal=True, group_commit=True, group_commit_delay_ms=50)
+    await db.ingest_many([Track(id=f"t{i}", title=f"Song {i}", artist="Artist", duration=100) for i in range(10)])
+
+    likes = [asyncio.create_task(db.toggle_like(f"t{i}")) for i in range(10)]
+    await asyncio.sleep(0) #queued, the batch is still waiting for more writers
+    await db.close()
+
+    assert all(task.done() and task.exception() is None for task in likes), "Queued writes were dropped"
+    with pytest.raises(RuntimeError):
+        await db.toggle_like("t0")
+
+    reopened = await make_db(wal=True)
+    assert len(await reopened.fetch_liked_tracks()) == 10
+
+
+def test_group_commit_requires_wal(tmp_path: Path):
+    with pytest.raises(ValueError):
+        AudioDatabase(name="test", filepath=tmp_path / "audio.db", group_commit=True)
+
+
+@pytest.mark.asyncio
+async def test_library_cache_follows_events(make_storage, bus: EventBus, add_download):
+    cache = LibraryCache(event_bus=bus, source="test")
+    db = await make_storage(event_bus=bus, library_cache=cache)
+    await add_download(db, "a", title="First")
+
+    assert [track["id"] for track in await db.get_downloads_content()] == ["a"]
+    assert cache.is_ready(), "First read did not populate the cache"
+
+    #later listings must not read the library from the database at all
+    db._read_library = None
+    await db.ingest_many([Track(id="b", title="Second", artist="X", duration=1)])
+    await db.set_custom_metadata("a", "Renamed", None)
+
+    content = await db.search("")
+    assert [track["id"] for track in content] == ["b", "a"]
+    assert content[1]["title"] == "Renamed"
+
+    await db.unlog_download("b")
+    assert [track["id"] for track in await db.get_downloads_content()] == ["a"]
+
+
+async def collect_pages(fetch, limit: int) -> list:
+    items, cursor = [], None
+    while True:
+        page, cursor = await fetch(limit, cursor)
+        items.extend(page)
+        if cursor is None:
+            return items
+
+
+@pytest.mark.asyncio
+async def test_keyset_pages_match_full_listing(db: AudioStorage):
+    playlist = await db.create_playlist(name="All", temp_id="tmp")
+    tracks = [Track(id=f"t{i:02}", title=f"Song {i % 7}", artist="Artist", duration=100) for i in range(23)]
+    await db.ingest_many(tracks, memberships=[(track.id, playlist["id"]) for track in tracks])
+
+    downloads = await collect_pages(lambda limit, cursor: db.get_downloads_page(limit, cursor), 5)
+    assert downloads == await db.get_downloads_content()
+
+    for q in ("song", "so"):
+        assert await collect_pages(lambda limit, cursor: db.search_page(q, limit, cursor), 4) == await db.search(q)
+
+    async def playlist_page(limit, cursor):
+        content, next_cursor = await db.get_playlist_content_page(playlist["id"], limit, cursor)
+        return content["trackIds"], next_cursor
+
+    full = await db.get_playlist_content(playlist["id"])
+    assert await collect_pages(playlist_page, 6) == full["trackIds"]
+
+
+@pytest.mark.asyncio
+async def test_invalid_cursor(db: AudioStorage):
+    with pytest.raises(InvalidCursorError):
+        await db.get_downloads_page(10, cursor="not-a-cursor")
+
+
+@pytest.mark.asyncio
+async def test_count_rows(db: AudioStorage, add_download):
+    await add_download(db, "a")
+    await add_download(db, "b")
+    await db.toggle_like("a")
+
+    counts = await db.count_rows()
+    assert counts == {"tracks": 2, "downloads": 2, "likes": 1, "playlists": 0, "playlist_tracks": 0}
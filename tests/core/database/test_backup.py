@@ -0,0 +1,82 @@
+import asyncio
+import sqlite3
+import pytest
+from pathlib import Path
+from backend.core.database.audio_database import AudioDatabase
+from backend.core.database.backup import BackupService, backup_database, list_snapshots, restore_database
+from backend.core.models.track import Track
+
+
+async def make_library(make_db, count: int) -> AudioDatabase:
+    db = await make_db(wal=True)
+    await db.ingest_many([Track(id=f"t{i:05d}", title=f"Title {i}", artist="Artist", duration=200) for i in range(count)])
+    return db
+
+def downloads(path: Path) -> int:
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM downloads;").fetchone()[0]
+    finally:
+        conn.close()
+
+
+@pytest.mark.asyncio
+async def test_backup_is_consistent_while_writing(tmp_path: Path, make_db):
+    db = await make_library(make_db, 3000)
+    service = BackupService(db_file=tmp_path / "audio.db", backup_dir=tmp_path / "backups", pages_per_step=4, pause_ms=1)
+
+    async def write():
+        for i in range(50):
+            await db.toggle_like(f"t{i:05d}")
+
+    report, _ = await asyncio.gather(service.backup(), write())
+
+    #one snapshot copied start to finish, commits during the copy didn't restart it
+    assert report.restarts == 0
+    assert report.steps > 1
+    assert downloads(report.path) == 3000
+    assert list_snapshots(tmp_path / "backups") == [report.path]
+    assert not list((tmp_path / "backups").glob("*.tmp"))
+
+
+@pytest.mark.asyncio
+async def test_backup_pauses_between_steps(tmp_path: Path, make_db):
+    db = await make_library(make_db, 1000)
+    await db.flush()
+    conn = sqlite3.connect(tmp_path / "audio.db")
+    try:
+        pages = conn.execute("PRAGMA page_count;").fetchone()[0]
+    finally:
+        conn.close()
+
+    pause = 0.02
+    report = backup_database(tmp_path / "audio.db", tmp_path / "copy.db", pages_per_step=-(-pages // 10), pause=pause)
+
+    #one pause between every two steps, none after the last
+    assert report.steps >= 5
+    assert report.elapsed >= (report.steps - 1) * pause
+    assert downloads(tmp_path / "copy.db") == 1000
+
+
+@pytest.mark.asyncio
+async def test_backup_retention_and_restore(tmp_path: Path, make_db):
+    db = await make_library(make_db, 10)
+    service = BackupService(db_file=tmp_path / "audio.db", backup_dir=tmp_path / "backups", keep=2)
+
+    first = await service.backup()
+    await service.backup()
+    await db.ingest_many([Track(id="new", title="New", artist="Artist", duration=200)])
+    last = await service.backup()
+
+    snapshots = list_snapshots(tmp_path / "backups")
+    assert len(snapshots) == 2 and first.path not in snapshots and snapshots[-1] == last.path
+    await db.close()
+
+    #roll back to the second snapshot, the current database is kept aside
+    saved = restore_database(snapshots[0], tmp_path / "audio.db")
+    assert downloads(tmp_path / "audio.db") == 10
+    assert saved and downloads(saved) == 11
+    assert list_snapshots(tmp_path / "backups") == snapshots
+
+    db = await make_db(wal=True)
+    assert len(await db.get_downloads_content()) == 10
@@ -0,0 +1,135 @@
+import pytest
+from backend.core.database.storage import AudioStorage
+from backend.core.models.track import Track
+
+
+async def ingest(db: AudioStorage, ids: list):
+    await db.ingest_many([Track(id=id, title=id, artist="Artist", duration=200) for id in ids])
+
+async def sync(db: AudioStorage, since: int, state: dict, limit: int = 2) -> int:
+    #what a reconnecting client does, applies pages of changes over its copy of the library
+    while True:
+        page = await db.get_changes(since=since, limit=limit)
+        assert not page["reset"]
+        for change in page["changes"]:
+            entities = state.setdefault(change["entity"], {})
+            if change["op"] == "delete":
+                entities.pop(change["key"], None)
+            else:
+                entities[change["key"]] = change["data"]
+        since = page["seq"]
+        if not page["more"]:
+            return since
+
+async def snapshot(db: AudioStorage) -> dict:
+    #the same library, fetched in full
+    playlists = await db.get_all_playlists()
+    members = {}
+    for playlist in playlists:
+        for track_id in (await db.get_playlist_content(playlist["id"]))["trackIds"]:
+            members[f"{playlist['id']}:{track_id}"] = track_id
+    return {
+        "download": {track["id"]: (track["title"], track["artist"]) for track in await db.get_downloads_content()},
+        "like": set(await db.fetch_liked_tracks()),
+        "playlist": {str(playlist["id"]): playlist["name"] for playlist in playlists},
+        "playlist_track": members
+    }
+
+def project(state: dict) -> dict:
+    return {
+        "download": {key: (data["title"], data["artist"]) for key, data in state.get("download", {}).items()},
+        "like": set(state.get("like", {})),
+        "playlist": {key: data["name"] for key, data in state.get("playlist", {}).items()},
+        "playlist_track": {key: data["track_id"] for key, data in state.get("playlist_track", {}).items()}
+    }
+
+
+@pytest.mark.asyncio
+async def test_changes_replay_to_current_library(db: AudioStorage):
+    await ingest(db, ["a", "b", "c"])
+
+    #a fresh client can build the whole library from the log
+    state = {}
+    since = await sync(db, 0, state)
+    assert project(state) == await snapshot(db)
+
+    #mutations while the client was away
+    playlist = await db.create_playlist(name="pl", temp_id="tmp")
+    await db.apply_track_edits(
+        add=[("a", playlist["id"]), ("b", playlist["id"])],
+        remove=[],
+        metadata=[{"id": "c", "title": "Renamed", "artist": ""}]
+    )
+    await db.toggle_like("a")
+    await db.toggle_like("b")
+    await db.toggle_like("a")
+    await db.edit_playlist(playlist["id"], "renamed pl")
+    await db.unlog_download("b")
+
+    latest = await sync(db, since, state)
+    assert project(state) == await snapshot(db)
+    assert state["download"]["c"]["title"] == "Renamed"
+
+    #nothing new, nothing sent
+    empty = await db.get_changes(since=latest, limit=10)
+    assert empty["changes"] == [] and empty["seq"] == latest and not empty["more"]
+
+
+@pytest.mark.asyncio
+async def test_compaction_keeps_sync_correct_and_raises_floor(db: AudioStorage):
+    await ingest(db, ["a", "b", "c"])
+    await db.create_playlist(name="pl", temp_id="tmp")
+    for _ in range(5):
+        await db.toggle_like("a")
+    await db.unlog_download("b")
+
+    before = {}
+    await sync(db, 0, before)
+
+    #a client that stopped part way through the log
+    partial = {}
+    page = await db.get_changes(since=0, limit=3)
+    for change in page["changes"]:
+        partial.setdefault(change["entity"], {})[change["key"]] = change["data"]
+    pending = len((await db.get_changes(since=page["seq"], limit=100))["changes"])
+
+    #superseded entries go, the deletes are recent enough to stay
+    removed = await db.compact_changes(retain=1000)
+    assert removed > 0
+
+    after = {}
+    await sync(db, 0, after)
+    assert project(after) == project(before) == await snapshot(db)
+
+    #still converges, with less to download
+    assert len((await db.get_changes(since=page["seq"], limit=100))["changes"]) < pending
+    await sync(db, page["seq"], partial)
+    assert project(partial) == await snapshot(db)
+    keys = [(change["entity"], change["key"]) for change in (await db.get_changes(since=0, limit=1000))["changes"]]
+    assert len(keys) == len(set(keys)), "A superseded entry survived compaction"
+
+    #dropping old deletes moves the floor past clients that could miss them
+    latest = (await db.get_changes(since=0, limit=1))["latest"]
+    await db.compact_changes(retain=0)
+    assert (await db.get_changes(since=0, limit=10))["reset"]
+    assert not (await db.get_changes(since=latest, limit=10))["reset"]
+
+    #a client from another database (ahead of the log) also starts over
+    assert (await db.get_changes(since=latest + 100, limit=10))["reset"]
+
+
+@pytest.mark.asyncio
+async def test_changes_roll_back_with_the_mutation(make_db):
+    db = await make_db(wal=True)
+    await ingest(db, ["a"])
+    latest = (await db.get_changes(since=0, limit=1))["latest"]
+
+    def failing(cur):
+        cur.execute("INSERT INTO likes (id) VALUES ('a');")
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        await db._transaction(failing)
+
+    page = await db.get_changes(since=latest, limit=10)
+    assert page["latest"] == latest and page["changes"] == []
@@ -0,0 +1,70 @@
+import asyncio
+import sqlite3
+import threading
+import pytest
+from pathlib import Path
+from backend.core.database.audio_database import AudioDatabase, query_op
+from backend.core.database.executor import DatabaseExecutor
+from backend.core.lib.metrics import MetricsRegistry
+from backend.core.models.track import Track
+
+
+@pytest.mark.asyncio
+async def test_each_thread_owns_one_connection(tmp_path: Path):
+    opened = []
+    def connect():
+        conn = sqlite3.connect(tmp_path / "x.db", check_same_thread=False)
+        opened.append(conn)
+        return conn
+
+    executor = DatabaseExecutor(name="reader", connect=connect, size=3)
+
+    def whoami(conn: sqlite3.Connection):
+        threading.Event().wait(0.01) #keep the thread busy so the pool spreads the calls
+        return threading.get_ident(), id(conn)
+
+    seen = await asyncio.gather(*(executor.run(whoami) for _ in range(12)))
+    by_thread = {}
+    for thread, conn in seen:
+        by_thread.setdefault(thread, set()).add(conn)
+
+    assert len(opened) == len(by_thread) <= 3
+    assert all(len(conns) == 1 for conns in by_thread.values()), "A thread used more than one connection"
+    executor.close()
+
+
+@pytest.mark.asyncio
+async def test_executor_records_metrics(tmp_path: Path):
+    metrics = MetricsRegistry()
+    executor = DatabaseExecutor(name="reader", connect=lambda: sqlite3.connect(":memory:", check_same_thread=False), size=1, metrics=metrics, db="test")
+
+    await executor.run(lambda conn: conn.execute("SELECT 1 UNION SELECT 2;").fetchall(), op="two")
+    with pytest.raises(sqlite3.OperationalError):
+        await executor.run(lambda conn: conn.execute("SELECT * FROM missing;").fetchall(), op="bad")
+
+    labels = {"db": "test", "executor": "reader"}
+    assert metrics.counter("db_rows_total", op="two", **labels) == 2
+    assert metrics.counter("db_query_errors_total", op="bad", **labels) == 1
+    assert metrics.histogram("db_query_seconds", op="two", **labels).count == 1
+    assert metrics.histogram("db_queue_wait_seconds", **labels).count == 2
+    assert 'db_rows_total{db="test",executor="reader",op="two"} 2' in metrics.render_prometheus()
+    executor.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("wal", [False, True])
+async def test_audio_database_queries_are_labelled(make_db, wal: bool):
+    metrics = MetricsRegistry()
+    db = await make_db(wal=wal, metrics=metrics)
+    await db.ingest_many([Track(id="a", title="A", artist="X", duration=1)])
+    assert await db.is_downloaded("a")
+
+    executor = "reader" if wal else "writer"
+    assert metrics.counter("db_queries_total", db="test", executor="writer", op="ingest_many") == 1
+    assert metrics.counter("db_rows_total", db="test", executor=executor, op="select_downloads") >= 1
+
+
+def test_query_op():
+    assert query_op("\n  SELECT id FROM downloads WHERE id = ?;") == "select_downloads"
+    assert query_op("INSERT OR IGNORE INTO playlist_tracks (a) VALUES (?)") == "insert_playlist_tracks"
+    assert query_op("CREATE TABLE IF NOT EXISTS likes (id TEXT)") == "create_likes"
@@ -0,0 +1,60 @@
+import pytest
+from backend.core.database.fuzzy_index import FuzzyIndex, trigrams
+from backend.core.database.library_cache import LibraryCache
+from backend.core.events.event_bus import EventBus
+from backend.core.models.track import Track
+
+
+def track(id: str, title: str, artist: str) -> dict:
+    return {"id": id, "title": title, "artist": artist, "duration": 200}
+
+
+def test_trigrams_normalize():
+    assert trigrams("Beyoncé!") == trigrams("beyonce")
+    assert "  b" in trigrams("beatles") and "es " in trigrams("beatles")
+    assert trigrams("  ...  ") == frozenset()
+
+
+def test_typos_rank_and_removal():
+    index = FuzzyIndex()
+    index.rebuild([
+        track("a", "Hey Jude", "The Beatles"),
+        track("b", "Let It Be", "The Beatles"),
+        track("c", "Beat It", "Michael Jackson"),
+        track("d", "Bohemian Rhapsody", "Queen"),
+    ])
+
+    #close but shorter "Beat It" is a match too, ranked after the actual typo
+    assert [t["id"] for t in index.search("beatels")][2:] == ["c"]
+    assert {t["id"] for t in index.search("beatels")[:2]} == {"a", "b"}
+    assert [t["id"] for t in index.search("bohemain rapsody")] == ["d"]
+    assert [t["id"] for t in index.search("hey jud beatles")][0] == "a"
+    assert index.search("zzzz") == []
+    assert len(index.search("the beatles", limit=1)) == 1
+
+    index.remove("a")
+    assert [t["id"] for t in index.search("beatels")] == ["b", "c"]
+    index.add(track("b", "Let It Be", "Fab Four"))
+    assert [t["id"] for t in index.search("beatels")] == ["c"]
+    assert "b" in index and len(index) == 3
+
+
+@pytest.mark.asyncio
+async def test_cache_index_follows_events(make_storage, bus: EventBus):
+    cache = LibraryCache(event_bus=bus, source="test")
+    db = await make_storage(event_bus=bus, library_cache=cache)
+    await db.ingest_many([Track(id="a", title="Yesterday", artist="The Beatles", duration=120)])
+
+    #exact search misses, the fuzzy fallback doesn't
+    assert await db.search("beatels") == []
+    assert [t["id"] for t in await db.fuzzy_search("beatels", limit=5)] == ["a"]
+
+    await db.ingest_many([Track(id="b", title="Wonderwall", artist="Oasis", duration=200)])
+    assert [t["id"] for t in await db.fuzzy_search("wonderwal oasis", limit=5)] == ["b"]
+
+    await db.set_custom_metadata("a", custom_title="Tomorrow", custom_artist="Someone")
+    assert await db.fuzzy_search("beatels", limit=5) == []
+    assert [t["id"] for t in await db.fuzzy_search("tomorow", limit=5)] == ["a"]
+
+    await db.unlog_download("b")
+    assert await db.fuzzy_search("wonderwal", limit=5) == []
@@ -0,0 +1,74 @@
+import sqlite3
+import pytest
+from pathlib import Path
+from backend.core.database.audio_database import AudioDatabase
+from backend.core.database.migrations import MIGRATIONS, SCHEMA_VERSION, Migration, apply_migrations
+from backend.core.models.track import Track
+
+
+def query_plan(db: AudioDatabase, query: str, params: tuple = ()) -> str:
+    rows = db._conn.execute(f"EXPLAIN QUERY PLAN {query}", params).fetchall()
+    return " | ".join(row["detail"] for row in rows)
+
+
+@pytest.mark.asyncio
+async def test_build_applies_migrations_once(make_db):
+    db = await make_db()
+    assert db._conn.execute("PRAGMA user_version;").fetchone()[0] == SCHEMA_VERSION
+    await db.close()
+
+    #reopening an up to date database is a no-op
+    db = await make_db()
+    assert await db._transaction(apply_migrations) == []
+
+
+@pytest.mark.asyncio
+async def test_rebuild_keeps_the_library(make_storage):
+    db = await make_storage()
+    await db.ingest_many([Track(id="a", title="A", artist="X", duration=1, size=10, mtime_ns=1)])
+    await db.close()
+
+    #building an up to date database again applies nothing and keeps every row
+    db = await make_storage()
+    assert await db.get_download_files() == {"a": ("mp3", 10, 1)}
+    assert (await db.count_rows())["downloads"] == 1
+
+
+def test_failed_migration_rolls_back(tmp_path: Path):
+    conn = sqlite3.connect(tmp_path / "m.db")
+    broken = MIGRATIONS + [Migration(version=SCHEMA_VERSION + 1, name="broken", statements=("CREATE INDEX x ON missing (a);",))]
+
+    conn.execute("CREATE TABLE downloads (id TEXT, downloaded_at DATETIME);")
+    conn.commit()
+
+    with pytest.raises(sqlite3.OperationalError):
+        with conn:
+            apply_migrations(conn.cursor(), broken)
+
+    assert conn.execute("PRAGMA user_version;").fetchone()[0] == 0, "user_version bumped by a failed upgrade"
+    index = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'idx_downloads_downloaded_at';").fetchone()
+    assert index is None, "Earlier statements of a failed upgrade were kept"
+    conn.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("query", [
+    "SELECT d.id FROM downloads d JOIN tracks t ON t.id = d.id ORDER BY d.downloaded_at DESC, d.id DESC",
+    "SELECT id FROM likes ORDER BY liked_at ASC, id ASC",
+    "SELECT track_id FROM playlist_tracks WHERE playlist_id = 1 ORDER BY position ASC, track_id ASC",
+    "SELECT id FROM tracks ORDER BY title COLLATE NOCASE",
+])
+async def test_hot_path_orderings_use_an_index(make_db, query: str):
+    db = await make_db()
+    plan = query_plan(db, query)
+
+    assert "USE TEMP B-TREE" not in plan, f"Query sorts instead of walking an index: {plan}"
+
+
+@pytest.mark.asyncio
+async def test_playlist_track_lookup_by_track_uses_index(make_db):
+    db = await make_db()
+
+    #the ON DELETE CASCADE from downloads runs this lookup for every unlogged track
+    plan = query_plan(db, "SELECT 1 FROM playlist_tracks WHERE track_id = ?", ("a",))
+    assert "idx_playlist_tracks_track_id" in plan, plan
@@ -0,0 +1,152 @@
+import random
+import sqlite3
+import pytest
+from pathlib import Path
+from backend.core.database.migrations import apply_migrations
+from backend.core.database.ordering import longest_increasing_subsequence
+from backend.core.database.storage import AudioStorage
+from backend.core.events.event_bus import EventBus
+from backend.core.models.track import Track
+from backend.exceptions import PlaylistOrderError
+
+from backend.core.models.enums import AudioDatabaseAction as ADA
+
+
+async def make_playlist(make, ids: list, **kwargs):
+    db = await make(**kwargs)
+    playlist = await db.create_playlist(name="pl", temp_id="tmp")
+    tracks = [Track(id=id, title=id, artist="Artist", duration=200) for id in ids]
+    await db.ingest_many(tracks, memberships=[(id, playlist["id"]) for id in ids])
+    return db, playlist["id"]
+
+async def order(db: AudioStorage, playlist_id: int) -> list:
+    return (await db.get_playlist_content(playlist_id))["trackIds"]
+
+def replay(ids: list, moves: list) -> list:
+    #what the frontend does with a move_playlist_tracks event
+    ids = list(ids)
+    for move in moves:
+        ids.remove(move["id"])
+        ids.insert(ids.index(move["after_id"]) + 1 if move["after_id"] else 0, move["id"])
+    return ids
+
+
+def test_longest_increasing_subsequence():
+    values = [3, 0, 1, 7, 2, 5, 4, 6]
+    keep = longest_increasing_subsequence(values)
+    kept = [values[i] for i in sorted(keep)]
+
+    assert len(keep) == 5
+    assert kept == sorted(kept)
+    assert longest_increasing_subsequence([]) == set()
+
+
+def test_migration_backfills_positions_in_added_order(tmp_path: Path):
+    conn = sqlite3.connect(tmp_path / "legacy.db")
+    conn.executescript('''
+        CREATE TABLE tracks (id TEXT PRIMARY KEY, title TEXT, artist TEXT, duration INTEGER, custom_title TEXT, custom_artist TEXT);
+        CREATE TABLE downloads (id TEXT PRIMARY KEY, downloaded_at DATETIME);
+        CREATE TABLE likes (id TEXT PRIMARY KEY, liked_at DATETIME);
+        CREATE TABLE playlists (id INTEGER PRIMARY KEY, name TEXT);
+        CREATE TABLE playlist_tracks (
+            playlist_id INTEGER NOT NULL, track_id TEXT NOT NULL, added_at DATETIME,
+            PRIMARY KEY (playlist_id, track_id)
+        );
+        INSERT INTO playlist_tracks VALUES (1, 'b', '2024-01-01 00:00:02'), (1, 'a', '2024-01-01 00:00:03'),
+                                           (1, 'c', '2024-01-01 00:00:01'), (2, 'a', '2024-01-01 00:00:01');
+    ''')
+    with conn:
+        apply_migrations(conn.cursor())
+
+    rows = conn.execute("SELECT playlist_id, track_id, position FROM playlist_tracks ORDER BY playlist_id, position;").fetchall()
+    assert [(p, t) for p, t, _ in rows] == [(1, "c"), (1, "b"), (1, "a"), (2, "a")]
+    assert [position for _, _, position in rows] == [1024.0, 2048.0, 3072.0, 1024.0]
+    conn.close()
+
+
+@pytest.mark.asyncio
+async def test_same_second_import_keeps_insert_order(make_storage):
+    ids = ["zeta", "alpha", "mid", "beta"]
+    db, playlist_id = await make_playlist(make_storage, ids)
+
+    assert await order(db, playlist_id) == ids, "Tracks added in the same second were resorted"
+
+    content, cursor = await db.get_playlist_content_page(playlist_id, limit=3)
+    rest, _ = await db.get_playlist_content_page(playlist_id, limit=3, cursor=cursor)
+    assert content["trackIds"] + rest["trackIds"] == ids
+
+
+@pytest.mark.asyncio
+async def test_move_and_insert_at(make_storage):
+    db, playlist_id = await make_playlist(make_storage, ["a", "b", "c", "d"])
+
+    await db.move_track(playlist_id, "d", after_id="a")
+    assert await order(db, playlist_id) == ["a", "d", "b", "c"]
+
+    await db.move_track(playlist_id, "c")
+    assert await order(db, playlist_id) == ["c", "a", "d", "b"]
+
+    await db.insert_track_at(playlist_id, "b", 1)
+    assert await order(db, playlist_id) == ["c", "b", "a", "d"]
+    await db.insert_track_at(playlist_id, "c", 99)
+    assert await order(db, playlist_id) == ["b", "a", "d", "c"]
+
+    with pytest.raises(PlaylistOrderError):
+        await db.move_track(playlist_id, "a", after_id="missing")
+    with pytest.raises(PlaylistOrderError):
+        await db.move_track(playlist_id, "missing", after_id="a")
+
+
+@pytest.mark.asyncio
+async def test_repeated_moves_into_one_gap_renumber(make_storage):
+    db, playlist_id = await make_playlist(make_storage, ["a", "b", "c"])
+
+    #always squeezing into the shrinking gap after "a" exhausts float precision after ~50 moves
+    expected = ["a", "b", "c"]
+    for i in range(120):
+        track = expected[-1]
+        await db.move_track(playlist_id, track, after_id="a")
+        expected = ["a", track] + [id for id in expected[1:] if id != track]
+
+    assert await order(db, playlist_id) == expected
+
+
+@pytest.mark.asyncio
+async def test_reorder_sends_only_moved_tracks(make_storage, bus: EventBus):
+    ids = [f"t{i:04d}" for i in range(500)]
+    db, playlist_id = await make_playlist(make_storage, ids, event_bus=bus)
+
+    events = []
+    bus.subscribe(source="test", action=ADA.MOVE_PLAYLIST_TRACKS, handler=events.append)
+
+    #drag one track from the end to near the front
+    new_order = ids[:10] + [ids[-1]] + ids[10:-1]
+    moves = await db.reorder_playlist(playlist_id, new_order)
+
+    assert moves == [{"id": ids[-1], "after_id": ids[9]}]
+    assert await order(db, playlist_id) == new_order
+    assert len(events) == 1
+
+    #a shuffle still lands exactly, and replaying the moves gives the same order
+    before = await order(db, playlist_id)
+    shuffled = list(before)
+    random.Random(3).shuffle(shuffled)
+    moves = await db.reorder_playlist(playlist_id, shuffled)
+
+    assert await order(db, playlist_id) == shuffled
+    assert replay(before, moves) == shuffled
+
+    with pytest.raises(PlaylistOrderError):
+        await db.reorder_playlist(playlist_id, shuffled[:-1])
+
+
+@pytest.mark.asyncio
+async def test_reorder_writes_only_moved_rows(make_db):
+    ids = [f"t{i:04d}" for i in range(500)]
+    db, playlist_id = await make_playlist(make_db, ids)
+
+    changes = db._conn.total_changes
+    await db.reorder_playlist(playlist_id, ids[:10] + [ids[-1]] + ids[10:-1])
+
+    #the moved row plus its change log entry
+    assert db._conn.total_changes - changes == 2, "Reorder rewrote rows that didn't move"
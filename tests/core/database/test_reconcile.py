@@ -0,0 +1,98 @@
+import os
+import pytest
+from pathlib import Path
+from backend.core.database.reconcile import DownloadReconciler
+from backend.core.database.storage import AudioStorage
+from backend.core.models.track import Track
+
+
+OLD = 1_000_000_000 #mtime well before any cutoff used below
+
+
+def write(folder: Path, name: str, size: int, mtime: float = OLD):
+    path = folder / name
+    path.write_bytes(b"x" * size)
+    os.utime(path, (mtime, mtime))
+
+
+@pytest.mark.asyncio
+async def test_reconcile_classifies_files(tmp_path: Path, db: AudioStorage):
+    await db.ingest_many([
+        Track(id=id, title=id, artist="Artist", duration=10) 
+        for id in ("ok", "short", "gone", "fresh")
+    ] + [Track(id="native", title="native", artist="Artist", duration=10, format="opus")])
+
+    downloads = tmp_path / "downloads"
+    downloads.mkdir()
+    write(downloads, "ok.mp3", 50_000)
+    write(downloads, "native.opus", 50_000)                 #kept in the source container
+    write(downloads, "native.mp3", 50_000)                  #not the container its row says, left over
+    write(downloads, "short.mp3", 100)                      #10s can't fit in 100 bytes
+    write(downloads, "fresh.mp3", 100, mtime=OLD + 10_000)  #small but written after the cutoff, still downloading
+    write(downloads, "orphan.mp3", 50_000)
+    write(downloads, "ok.seekidx", 100)                     #SeekIndexer's, not a second container
+    write(downloads, "orphan.seekidx", 100)
+    write(downloads, "ok.webm.part", 10)
+    write(downloads, "new.webm", 10)                        #pre-conversion container
+    write(downloads, "inflight.webm.part", 10, mtime=OLD + 10_000)
+
+    broken = []
+    async def on_broken(id: str):
+        broken.append(id)
+
+    reconciler = DownloadReconciler(db=db, downloads_dir=downloads, audio_format="mp3", slice_ms=0, on_broken=on_broken)
+    report = await reconciler.run(older_than=OLD + 5_000)
+
+    assert sorted(path.name for path in downloads.iterdir()) == ["fresh.mp3", "inflight.webm.part", "native.opus", "ok.mp3", "ok.seekidx"]
+    assert report.orphans_removed == 1 and report.partials_removed == 4
+    assert report.missing == ["gone"] and report.truncated == ["short"]
+    assert sorted(broken) == ["gone", "short"]
+    assert report.slices > 1, "slice_ms=0 should yield after every entry"
+    assert await db.get_file_manifest() == {"ok.mp3": (50_000, OLD * 10**9), "native.opus": (50_000, OLD * 10**9)}
+
+
+@pytest.mark.asyncio
+async def test_reconcile_only_diffs_changes(tmp_path: Path, db: AudioStorage):
+    await db.ingest_many([Track(id=f"t{i}", title="T", artist="A", duration=1) for i in range(20)])
+
+    downloads = tmp_path / "downloads"
+    downloads.mkdir()
+    for i in range(20):
+        write(downloads, f"t{i}.mp3", 10_000)
+
+    reconciler = DownloadReconciler(db=db, downloads_dir=downloads, audio_format="mp3")
+    first = await reconciler.run()
+    assert (first.updated, first.unchanged) == (20, 0)
+
+    write(downloads, "t3.mp3", 20_000, mtime=OLD + 1)
+    second = await reconciler.run()
+    assert (second.updated, second.unchanged) == (1, 19)
+    assert (await db.get_file_manifest())["t3.mp3"] == (20_000, (OLD + 1) * 10**9)
+
+    #a vanished file drops out of the manifest and is reported missing
+    (downloads / "t4.mp3").unlink()
+    third = await reconciler.run()
+    assert third.missing == ["t4"]
+    assert "t4.mp3" not in await db.get_file_manifest()
+
+
+@pytest.mark.asyncio
+async def test_reconcile_backfills_legacy_stats(tmp_path: Path, db: AudioStorage):
+    await db.ingest_many([
+        Track(id="legacy", title="T", artist="A", duration=1),
+        Track(id="recorded", title="T", artist="A", duration=1, size=5, mtime_ns=6)
+    ])
+
+    downloads = tmp_path / "downloads"
+    downloads.mkdir()
+    write(downloads, "legacy.mp3", 10_000)
+    write(downloads, "recorded.mp3", 10_000)
+
+    reconciler = DownloadReconciler(db=db, downloads_dir=downloads, audio_format="mp3")
+    first = await reconciler.run()
+    assert first.backfilled == 1
+    assert await db.get_download_files() == {"legacy": ("mp3", 10_000, OLD * 10**9), "recorded": ("mp3", 5, 6)}
+
+    #unchanged files aren't written again
+    second = await reconciler.run()
+    assert (second.unchanged, second.backfilled) == (2, 0)
@@ -0,0 +1,149 @@
+import pytest
+from backend.core.database.storage import AudioStorage
+from backend.core.models.track import Track
+from backend.exceptions import InvalidCursorError, PlaylistOrderError
+
+
+async def ingest(db: AudioStorage, *tracks: Track):
+    await db.ingest_many(list(tracks))
+
+
+@pytest.mark.asyncio
+async def test_downloads_and_pages(db: AudioStorage):
+    await ingest(db, *[Track(id=f"t{i}", title=f"Title {i}", artist="Artist", duration=200) for i in range(5)])
+    await db.set_custom_metadata("t2", custom_title="Custom")
+
+    content = await db.get_downloads_content()
+    assert len(content) == 5
+    assert {track["id"]: track["title"] for track in content}["t2"] == "Custom"
+
+    pages, cursor = [], None
+    while True:
+        page, cursor = await db.get_downloads_page(limit=2, cursor=cursor)
+        pages.extend(page)
+        if cursor is None:
+            break
+    assert [track["id"] for track in pages] == [track["id"] for track in content]
+
+    with pytest.raises(InvalidCursorError):
+        await db.get_downloads_page(limit=2, cursor="not-a-cursor")
+
+    await db.unlog_download("t0")
+    assert not await db.is_downloaded("t0") and await db.is_logged("t0")
+    counts = await db.count_rows()
+    assert counts["tracks"] == 5 and counts["downloads"] == 4
+
+
+@pytest.mark.asyncio
+async def test_download_formats(db: AudioStorage):
+    await ingest(db, Track(id="a", title="A", artist="X", duration=1), Track(id="b", title="B", artist="X", duration=1, format="opus"))
+    assert await db.get_download_files() == {"a": ("mp3", None, None), "b": ("opus", None, None)}
+
+    #a re-download in another container moves the row with it, the library listing doesn't show formats
+    await ingest(db, Track(id="a", title="A", artist="X", duration=1, format="m4a"))
+    assert (await db.get_download_files())["a"][0] == "m4a"
+    assert set((await db.get_downloads_content())[0]) == {"id", "title", "artist", "duration"}
+
+
+@pytest.mark.asyncio
+async def test_download_files(db: AudioStorage):
+    await ingest(db, Track(id="a", title="A", artist="X", duration=1, size=1000, mtime_ns=7), Track(id="b", title="B", artist="X", duration=1))
+    assert await db.get_download_files() == {"a": ("mp3", 1000, 7), "b": ("mp3", None, None)}
+
+    #a re-download replaces the file, the stats of the old one don't survive it
+    await ingest(db, Track(id="a", title="A", artist="X", duration=1, format="opus"))
+    assert (await db.get_download_files())["a"] == ("opus", None, None)
+
+    #single downloads record their file the same way, a bare log_download keeps what the row has
+    await db.log_download("b", format="m4a", size=2000, mtime_ns=8)
+    await db.log_download("a")
+    assert await db.get_download_files() == {"a": ("opus", None, None), "b": ("m4a", 2000, 8)}
+    with pytest.raises(ValueError):
+        await db.log_download("a", size=1, mtime_ns=1)
+
+    #only rows without stats are backfilled
+    await db.backfill_download_stats({"a": (3000, 9), "b": (1, 1)})
+    assert await db.get_download_files() == {"a": ("opus", 3000, 9), "b": ("m4a", 2000, 8)}
+
+
+@pytest.mark.asyncio
+async def test_search_ranks_and_pages(db: AudioStorage):
+    await ingest(
+        db,
+        Track(id="a", title="Blue Monday", artist="New Order", duration=300),
+        Track(id="b", title="Monday Monday", artist="The Mamas", duration=200),
+        Track(id="c", title="Yellow", artist="Coldplay", duration=250),
+    )
+    await db.set_custom_metadata("c", custom_title="Mellow Yellow")
+
+    assert {track["id"] for track in await db.search("mon")} == {"a", "b"}
+    assert [track["id"] for track in await db.search("mon", limit=1)] == [track["id"] for track in await db.search("mon")][:1]
+    assert [track["id"] for track in await db.search("mellow")] == ["c"]
+    assert [track["id"] for track in await db.search("coldplay")] == ["c"]
+    #the original title still finds a renamed track
+    assert [track["id"] for track in await db.search("yellow")] == ["c"]
+
+    first, cursor = await db.search_page("monday", limit=1)
+    second, end = await db.search_page("monday", limit=1, cursor=cursor)
+    assert end is None
+    assert [track["id"] for track in first + second] == [track["id"] for track in await db.search("monday")]
+
+
+@pytest.mark.asyncio
+async def test_playlist_ordering(db: AudioStorage):
+    await ingest(db, *[Track(id=id, title=id, artist="Artist", duration=200) for id in "abcde"])
+    playlist = await db.create_playlist(name="pl", temp_id="tmp")
+    pid = playlist["id"]
+
+    await db.apply_track_edits(add=[(id, pid) for id in "abcd"])
+    await db.move_track(pid, "d", after_id=None)
+    await db.insert_track_at(pid, "e", 2)
+    assert (await db.get_playlist_content(pid))["trackIds"] == ["d", "a", "e", "b", "c"]
+
+    moves = await db.reorder_playlist(pid, ["a", "e", "b", "c", "d"])
+    assert moves == [{"id": "d", "after_id": "c"}]
+
+    page, cursor = await db.get_playlist_content_page(pid, limit=3)
+    rest, end = await db.get_playlist_content_page(pid, limit=3, cursor=cursor)
+    assert page["trackIds"] + rest["trackIds"] == ["a", "e", "b", "c", "d"] and end is None
+
+    with pytest.raises(PlaylistOrderError):
+        await db.move_track(pid, "a", after_id="missing")
+    with pytest.raises(PlaylistOrderError):
+        await db.reorder_playlist(pid, ["a", "b"])
+
+    #router ids arrive as strings
+    await db.update_track_playlists("a", [{"id": str(pid), "checked": False}])
+    await db.edit_playlist(str(pid), "renamed")
+    assert await db.get_all_playlists() == [{"id": pid, "name": "renamed"}]
+    assert (await db.get_playlist_content(pid))["trackIds"] == ["e", "b", "c", "d"]
+
+    await db.delete_playlist(pid)
+    assert await db.get_all_playlists() == []
+    assert (await db.count_rows())["playlist_tracks"] == 0
+
+
+@pytest.mark.asyncio
+async def test_likes_manifest_and_changes(db: AudioStorage):
+    await ingest(db, Track(id="a", title="A", artist="Artist", duration=200), Track(id="b", title="B", artist="Artist", duration=200))
+    start = (await db.get_changes(since=0, limit=100))["latest"]
+
+    await db.toggle_like("b")
+    await db.toggle_like("a")
+    await db.toggle_like("b")
+    assert await db.fetch_liked_tracks() == ["a"]
+
+    await db.update_file_manifest([("a.mp3", 10, 1), ("b.mp3", 20, 2)], [])
+    await db.update_file_manifest([("b.mp3", 30, 3)], ["a.mp3"])
+    assert await db.get_file_manifest() == {"b.mp3": (30, 3)}
+
+    page = await db.get_changes(since=start, limit=100)
+    assert [(change["entity"], change["key"], change["op"]) for change in page["changes"]] == [
+        ("like", "b", "upsert"), ("like", "a", "upsert"), ("like", "b", "delete")
+    ]
+    assert page["changes"][1]["data"]["id"] == "a" and not page["more"]
+
+    assert await db.compact_changes(retain=0) > 0
+    assert (await db.get_changes(since=0, limit=100))["reset"]
+    latest = (await db.get_changes(since=page["seq"], limit=100))
+    assert not latest["reset"] and latest["changes"] == []
@@ -0,0 +1,67 @@
+import asyncio
+import pytest
+from backend.core.models.download_job import DownloadJob
+from backend.core.models.track import Track
+from backend.core.queue.implementations.download_queue import DownloadQueue
+from backend.core.worker.download import DownloadWorker
+
+
+class FakeClient:
+    """Downloads after `release` is set, fails on ids starting with "bad"."""
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.downloads = []
+
+    async def download_by_id(self, id: str, custom_metadata=None) -> Track:
+        self.downloads.append(id)
+        await self.release.wait()
+        if id.startswith("bad"):
+            raise RuntimeError("yt-dlp exited with code 1")
+        return Track(id=id, title=id, artist="Artist", duration=10)
+
+class FakeDatabase:
+    def __init__(self):
+        self.ingested = []
+
+    async def ingest_many(self, tracks, memberships=None):
+        self.ingested.extend(track.id for track in tracks)
+
+
+@pytest.mark.asyncio
+async def test_waiters_share_one_job():
+    queue = DownloadQueue(name="dq")
+    client, db = FakeClient(), FakeDatabase()
+    worker = asyncio.create_task(DownloadWorker(download_queue=queue, youtube_client=client, audio_database=db).run())
+
+    first = await queue.enqueue(DownloadJob(id="a"))
+    waiters = [asyncio.create_task(first.wait(timeout=5)) for _ in range(3)]
+    await asyncio.sleep(0.01) #popped by the worker, still downloading
+    assert queue.is_empty() and queue.contains("a")
+    assert await queue.enqueue(DownloadJob(id="a")) is first
+
+    #a waiter that gives up doesn't take the job down with it
+    with pytest.raises(asyncio.TimeoutError):
+        await first.wait(timeout=0.01)
+
+    client.release.set()
+    tracks = await asyncio.gather(*waiters)
+    assert all(track.id == "a" for track in tracks)
+    assert client.downloads == ["a"] and db.ingested == ["a"]
+    assert not queue.contains("a")
+    worker.cancel()
+
+
+@pytest.mark.asyncio
+async def test_failure_reaches_every_waiter():
+    queue = DownloadQueue(name="dq")
+    client, db = FakeClient(), FakeDatabase()
+    worker = asyncio.create_task(DownloadWorker(download_queue=queue, youtube_client=client, audio_database=db).run())
+    client.release.set()
+
+    job = await queue.enqueue(DownloadJob(id="bad"))
+    results = await asyncio.gather(job.wait(timeout=5), job.wait(timeout=5), return_exceptions=True)
+    assert all(isinstance(r, RuntimeError) for r in results) and db.ingested == []
+
+    #a failed job isn't pending anymore, the next request retries
+    assert await queue.enqueue(DownloadJob(id="bad")) is not job
+    worker.cancel()
@@ -1,5 +1,8 @@
+import asyncio
 import pytest
+import sys
 from pathlib import Path
+from backend.core.audio.growing import GrowingFiles
 from backend.core.lib.utils import get_audio_path
 from backend.core.models.track import Track
 from backend.core.youtube.client import YouTubeClient 
@@ -80,3 +83,45 @@ async def test_robust_search(tmp_path: Path):
 
     for i, track in enumerate(results):
         assert isinstance(track, Track), f"Result {i} is not a Track"
+
+
+#stand ins for the yt-dlp | ffmpeg pipe: yt-dlp prints its metadata to stderr and streams 3 chunks, ffmpeg copies stdin to its output
+FAKE_YTDLP = """#!{python}
+import sys, time
+sys.stderr.write("abc\\x1fSong\\x1fArtist\\x1f42\\n")
+for i in range(3):
+    sys.stdout.buffer.write(bytes([65 + i]) * 1000)
+    sys.stdout.buffer.flush()
+    time.sleep(0.2)
+"""
+FAKE_FFMPEG = """#!{python}
+import sys
+with open(sys.argv[-1], "wb") as out:
+    while chunk := sys.stdin.buffer.read1(65536):
+        out.write(chunk)
+        out.flush()
+"""
+
+
+@pytest.mark.asyncio
+async def test_progressive_download(tmp_path: Path, monkeypatch: pytest.MonkeyPatch):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    for name, script in (("yt-dlp", FAKE_YTDLP), ("ffmpeg", FAKE_FFMPEG)):
+        (bin_dir / name).write_text(script.format(python=sys.executable))
+        (bin_dir / name).chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+    growing_files = GrowingFiles()
+    client = YouTubeClient(name="test", base_dir=tmp_path, dl_format="mp3", growing_files=growing_files)
+    download = asyncio.create_task(client.download_by_id("YT___abc"))
+
+    #readable while the download runs, and the reader gets every byte
+    growing = await growing_files.wait_started("YT___abc", timeout=5)
+    received = b"".join([chunk async for chunk in growing.tail(growing.open(), chunk_size=4096, poll=0.01)])
+    track = await download
+
+    assert received == b"A" * 1000 + b"B" * 1000 + b"C" * 1000
+    assert (track.id, track.title, track.duration, track.format, track.size) == ("YT___abc", "Song", 42, "mp3", 3000)
+    assert (tmp_path / "YT___abc.mp3").read_bytes() == received
+    assert not (tmp_path / "YT___abc.mp3.part").exists()